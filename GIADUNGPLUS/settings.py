@@ -83,6 +83,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.perf_budget_middleware.PerfBudgetMiddleware',  # Server-Timing + log request vượt budget
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -97,6 +98,51 @@ MIDDLEWARE = [
 
 INSTALLED_APPS += ["whitenoise.runserver_nostatic"]
 MIDDLEWARE = ["whitenoise.middleware.WhiteNoiseMiddleware", *MIDDLEWARE]
+
+# Performance budget mỗi request (core.middleware.perf_budget_middleware)
+# Request vượt budget được log WARNING kèm số queries / HTTP calls / thời gian.
+PERF_BUDGET = {
+    "ENABLED": True,
+    "SERVER_TIMING": True,
+    "DEFAULT": {
+        "max_queries": 50,
+        "max_sql_ms": 500,
+        "max_external_calls": 10,
+        "max_external_ms": 3000,
+        "max_total_ms": 2000,
+    },
+    # Override theo view name (namespace:url_name)
+    "VIEWS": {
+        "products:variant_list": {"max_queries": 80},
+        "products:sum_purchase_order_detail": {"max_queries": 80, "max_external_calls": 30},
+    },
+}
+
+# Rate limit outbound API theo host (core.base.throttling): token bucket dùng chung mọi
+# gunicorn worker qua bảng core_api_rate_limit. rate = request/giây, burst = số request dồn tối đa.
+API_RATE_LIMITS = {
+    "ENABLED": True,
+    "BACKEND": "database",
+    "DEFAULT": {"rate": 10, "burst": 20},
+    "HOSTS": {
+        "mysapogo.com": {"rate": 15, "burst": 40},
+        "market-place.sapoapps.vn": {"rate": 10, "burst": 20},
+        "banhang.shopee.vn": {"rate": 5, "burst": 10},
+    },
+}
+
+# Ngắt host sau N lần liên tiếp 502/503/504/timeout, fail fast trong RESET_TIMEOUT giây
+API_CIRCUIT_BREAKER = {
+    "ENABLED": True,
+    "FAILURE_THRESHOLD": 5,
+    "RESET_TIMEOUT": 30,
+}
+
+# Background jobs (core.services.job_queue), chạy bởi `python manage.py run_workers`.
+# EAGER=True: enqueue() chạy job ngay trong request (dev khi không bật worker).
+BACKGROUND_JOBS = {
+    "EAGER": False,
+}
 ROOT_URLCONF = 'GIADUNGPLUS.urls'
 
 TEMPLATES = [
@@ -152,10 +198,16 @@ if os.environ.get('DB_PASSWORD'):
     DATABASES['default']['PASSWORD'] = os.environ.get('DB_PASSWORD')
 
 # Cache configuration (for Selenium lock mechanism)
+# Cache dùng chung giữa các gunicorn workers (lock Selenium login, token, dữ liệu nóng).
+# Bảng cache được tạo bởi migration core/0004 (createcachetable).
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'sapo-selenium-lock',
+        'BACKEND': 'core.cache_backends.SharedDatabaseCache',
+        'LOCATION': 'core_shared_cache',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
     }
 }
 
@@ -0,0 +1,79 @@
+/**
+ * Background Jobs JavaScript
+ * Đợi job chạy nền (core.services.job_queue) hoàn thành.
+ *
+ * View enqueue job trả về HTTP 202: {status: "queued", job_id, status_url, cancel_url}.
+ * BackgroundJobs.wait(data) poll status_url và resolve bằng kết quả của task
+ * (cùng format JSON mà view trả về trước đây), reject nếu job lỗi / bị hủy.
+ *
+ *   fetch(url, {method: 'POST', ...})
+ *       .then(r => r.json())
+ *       .then(d => BackgroundJobs.wait(d, {onProgress: p => console.log(p)}))
+ *       .then(result => ...)
+ */
+
+(function() {
+    'use strict';
+
+    const CONFIG = {
+        pollInterval: 1500,
+        maxPollInterval: 5000,
+    };
+
+    function getCookie(name) {
+        const value = `; ${document.cookie}`;
+        const parts = value.split(`; ${name}=`);
+        if (parts.length === 2) return parts.pop().split(';').shift();
+        return null;
+    }
+
+    function fetchJob(url) {
+        return fetch(url, {credentials: 'same-origin'}).then(response => {
+            if (!response.ok) {
+                throw new Error(`Không lấy được trạng thái job (HTTP ${response.status})`);
+            }
+            return response.json();
+        });
+    }
+
+    function wait(data, options) {
+        options = options || {};
+        // Response không phải job (chạy đồng bộ / lỗi validate) -> trả về nguyên vẹn
+        if (!data || !data.job_id || !data.status_url) {
+            return Promise.resolve(data);
+        }
+
+        let interval = options.pollInterval || CONFIG.pollInterval;
+        return new Promise((resolve, reject) => {
+            function poll() {
+                fetchJob(data.status_url)
+                    .then(job => {
+                        if (options.onProgress) options.onProgress(job.progress || {}, job);
+                        if (job.status === 'succeeded') {
+                            resolve(job.result);
+                        } else if (job.status === 'failed') {
+                            reject(new Error(job.error || 'Job thất bại'));
+                        } else if (job.status === 'cancelled') {
+                            reject(new Error('Job đã bị hủy'));
+                        } else {
+                            setTimeout(poll, interval);
+                            interval = Math.min(interval * 1.2, CONFIG.maxPollInterval);
+                        }
+                    })
+                    .catch(reject);
+            }
+            poll();
+        });
+    }
+
+    function cancel(data) {
+        if (!data || !data.cancel_url) return Promise.resolve(null);
+        return fetch(data.cancel_url, {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: {'X-CSRFToken': getCookie('csrftoken')},
+        }).then(response => response.json());
+    }
+
+    window.BackgroundJobs = {wait, cancel};
+})();
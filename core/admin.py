@@ -1,3 +1,54 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ApiCallMetric, BackgroundJob
+from .services.api_metrics import estimate_percentile
+from .services.job_queue import cancel_job
+
+
+@admin.register(ApiCallMetric)
+class ApiCallMetricAdmin(admin.ModelAdmin):
+    """Outbound API calls theo giờ / endpoint (xem thêm: manage.py api_metrics)."""
+
+    list_display = (
+        "hour", "client", "method", "path_template", "calls", "errors", "retries",
+        "avg_ms", "p95_ms", "max_ms",
+    )
+    list_filter = ("client", "method", "hour")
+    search_fields = ("path_template",)
+    date_hierarchy = "hour"
+    ordering = ("-hour", "-total_ms")
+    readonly_fields = [field.name for field in ApiCallMetric._meta.fields]
+
+    @admin.display(description="Avg (ms)")
+    def avg_ms(self, obj):
+        return obj.total_ms // obj.calls if obj.calls else 0
+
+    @admin.display(description="P95 (ms)")
+    def p95_ms(self, obj):
+        return estimate_percentile(obj.latency_buckets, 95, obj.max_ms)
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    """Background jobs (chạy bởi: manage.py run_workers)."""
+
+    list_display = (
+        "id", "task", "status", "priority", "attempts", "max_attempts",
+        "locked_by", "created_by", "created_at", "finished_at",
+    )
+    list_filter = ("status", "task")
+    search_fields = ("task", "locked_by")
+    date_hierarchy = "created_at"
+    readonly_fields = [field.name for field in BackgroundJob._meta.fields]
+    actions = ["cancel_jobs"]
+
+    @admin.action(description="Hủy các job đã chọn")
+    def cancel_jobs(self, request, queryset):
+        for job_id in queryset.filter(status__in=BackgroundJob.ACTIVE_STATUSES).values_list("pk", flat=True):
+            cancel_job(job_id)
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,209 @@
+# core/base/paginator.py
+"""
+Paginator song song cho các list endpoint (Sapo Core / Marketplace).
+
+- Fetch page 1, đọc metadata.total để biết số pages.
+- Fetch các pages còn lại song song, số request đồng thời tự điều chỉnh
+  (AdaptiveConcurrency): giảm một nửa khi gặp 429/5xx/timeout, giảm 1 khi latency cao,
+  tăng dần lại khi các page trả về nhanh.
+- Yield (page, items) ngay khi mỗi page về (stream, KHÔNG theo thứ tự page).
+- Consumer break / raise giữa chừng: các page chưa gửi bị hủy, không chờ page đang chạy.
+
+fetch_page chạy trên thread của pool nhưng vẫn gọi repository / requests.Session của caller
+(không theo 1-client-mỗi-thread của get_sapo_client): chỉ nên là GET list thuần, session
+(ThrottledHTTPAdapter, pool_maxsize 32) đủ connection cho DEFAULT_MAX_CONCURRENCY request đồng thời.
+
+Usage:
+    for page, orders in sapo.core.paginate(
+        lambda page: sapo.core.list_orders_raw(page=page, limit=250, status="finalized"),
+        items_key="orders",
+        limit=250,
+    ):
+        ...
+"""
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
+import logging
+import math
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 6
+DEFAULT_MAX_PAGES = 1000
+SLOW_PAGE_SECONDS = 8.0  # Page chậm hơn ngưỡng này -> giảm concurrency
+PAGE_MAX_ATTEMPTS = 4
+# 429 không nằm ở đây: BaseRepository._request đã đợi Retry-After và retry, paginator chỉ giảm concurrency
+RETRYABLE_STATUS_CODES = {500, 502, 503, 504}
+
+
+class AdaptiveConcurrency:
+    """
+    Điều chỉnh số request đồng thời kiểu AIMD (additive increase, multiplicative decrease).
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, initial: Optional[int] = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = min(self.max_concurrency, initial or self.max_concurrency)
+        self._lock = threading.Lock()
+
+    def on_success(self, latency: float):
+        with self._lock:
+            if latency > SLOW_PAGE_SECONDS:
+                self.limit = max(1, self.limit - 1)
+            elif self.limit < self.max_concurrency:
+                self.limit += 1
+
+    def on_throttled(self):
+        with self._lock:
+            self.limit = max(1, self.limit // 2)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def paginate(
+    fetch_page: Callable[[int], Dict[str, Any]],
+    items_key: str,
+    limit: int,
+    max_pages: int = DEFAULT_MAX_PAGES,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    total_getter: Optional[Callable[[Dict[str, Any]], Optional[int]]] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    log_tag: str = "paginate",
+) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """
+    Fetch tất cả pages của 1 list endpoint, yield (page, items) theo thứ tự page về.
+
+    Args:
+        fetch_page: Hàm nhận số page, trả về response dict (vd: lambda p: repo.list_orders_raw(page=p, ...))
+        items_key: Key chứa list items trong response (vd: "orders", "products", "variants")
+        limit: Số items mỗi page (để tính số pages từ total)
+        max_pages: Giới hạn số pages
+        max_concurrency: Số request đồng thời tối đa
+        total_getter: Lấy tổng số items từ response page 1 (mặc định metadata.total)
+        stats: Dict (optional) được ghi {"total", "pages", "truncated", "concurrency"} khi chạy xong
+
+    Raises:
+        Exception của page lỗi (sau khi đã retry) - các page đã yield vẫn hợp lệ
+    """
+    if total_getter is None:
+        total_getter = lambda response: (response.get("metadata") or {}).get("total")
+
+    controller = AdaptiveConcurrency(max_concurrency)
+    start_time = time.time()
+    if stats is None:
+        stats = {}
+    stats.update({"total": None, "pages": 0, "truncated": False, "concurrency": controller.limit})
+
+    def fetch_with_retry(page: int) -> Tuple[int, Dict[str, Any]]:
+        for attempt in range(PAGE_MAX_ATTEMPTS):
+            page_start = time.time()
+            try:
+                response = fetch_page(page)
+            except requests.HTTPError as e:
+                status = _status_code(e)
+                if status == 429:
+                    controller.on_throttled()
+                    logger.warning(f"[{log_tag}] Page {page} still throttled (429), concurrency -> {controller.limit}")
+                    raise
+                if status in RETRYABLE_STATUS_CODES and attempt < PAGE_MAX_ATTEMPTS - 1:
+                    controller.on_throttled()
+                    wait_time = 1.0 * (2 ** attempt)
+                    logger.warning(
+                        f"[{log_tag}] Page {page} got {status}, concurrency -> {controller.limit}, "
+                        f"retry {attempt + 1}/{PAGE_MAX_ATTEMPTS - 1} after {wait_time}s"
+                    )
+                    time.sleep(wait_time)
+                    continue
+                raise
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt < PAGE_MAX_ATTEMPTS - 1:
+                    controller.on_throttled()
+                    wait_time = 1.0 * (2 ** attempt)
+                    logger.warning(
+                        f"[{log_tag}] Page {page} failed ({e.__class__.__name__}), "
+                        f"retry {attempt + 1}/{PAGE_MAX_ATTEMPTS - 1} after {wait_time}s"
+                    )
+                    time.sleep(wait_time)
+                    continue
+                raise
+            controller.on_success(time.time() - page_start)
+            return page, response or {}
+        raise RuntimeError(f"[{log_tag}] Page {page} failed after {PAGE_MAX_ATTEMPTS} attempts")
+
+    # Page 1: lấy total để biết số pages
+    _, first_response = fetch_with_retry(1)
+    first_items = first_response.get(items_key) or []
+    total = total_getter(first_response)
+    stats.update({"total": total, "pages": 1})
+    yield 1, first_items
+
+    if len(first_items) < limit:
+        return
+    if max_pages <= 1:
+        stats["truncated"] = True
+        return
+
+    if total:
+        needed_pages = math.ceil(total / limit)
+        last_page = min(max_pages, needed_pages)
+        stats["truncated"] = needed_pages > max_pages
+    else:
+        # Không có total: fetch theo cửa sổ concurrency, dừng khi gặp page thiếu
+        last_page = max_pages
+
+    next_page = 2
+    reached_end = False
+
+    executor = ThreadPoolExecutor(max_workers=controller.max_concurrency)
+    try:
+        in_flight = {}
+        while in_flight or (next_page <= last_page and not reached_end):
+            while (
+                not reached_end
+                and next_page <= last_page
+                and len(in_flight) < controller.limit
+            ):
+                in_flight[executor.submit(fetch_with_retry, next_page)] = next_page
+                next_page += 1
+
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for future in done:
+                page = in_flight.pop(future)
+                _, response = future.result()
+
+                items = response.get(items_key) or []
+                stats["pages"] += 1
+                if len(items) < limit:
+                    reached_end = True
+                if items:
+                    yield page, items
+    finally:
+        # Consumer dừng sớm (break / exception) hoặc page lỗi: bỏ các page chưa chạy, không chờ page đang chạy
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if not total and not reached_end:
+        stats["truncated"] = True
+    if stats["truncated"]:
+        logger.warning(f"[{log_tag}] Reached max pages limit ({max_pages})")
+
+    stats["concurrency"] = controller.limit
+    logger.info(
+        f"[PERF] {log_tag}: fetched {stats['pages']} pages in {time.time() - start_time:.2f}s "
+        f"(concurrency={controller.limit}/{controller.max_concurrency})"
+    )
+
+
+# ========================= EXPORTS =========================
+
+__all__ = [
+    'AdaptiveConcurrency',
+    'paginate',
+]
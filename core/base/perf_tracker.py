@@ -0,0 +1,174 @@
+# core/base/perf_tracker.py
+"""
+Đếm SQL queries / outbound HTTP calls / wall time trong 1 khối code (1 request, 1 test).
+
+- SQL: connection.execute_wrapper trên mọi DB alias (thread hiện tại).
+- Outbound HTTP: hook requests.Session.send (cài 1 lần), tính vào tracker đang active
+  trong context hiện tại. Calls chạy trong thread pool (paginator, batch) không được tính.
+
+Dùng bởi:
+- core.middleware.perf_budget_middleware.PerfBudgetMiddleware (Server-Timing + log khi vượt budget)
+- core.testing.PerfBudgetMixin.assertPerfBudget (assert budget trong tests)
+
+Usage:
+    with track() as perf:
+        ...
+    perf.queries, perf.sql_ms, perf.external_calls, perf.external_ms, perf.total_ms
+"""
+
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+import functools
+import logging
+import threading
+import time
+
+import requests
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Các key budget hợp lệ -> thuộc tính tương ứng của PerfTracker
+BUDGET_FIELDS = {
+    "max_queries": "queries",
+    "max_sql_ms": "sql_ms",
+    "max_external_calls": "external_calls",
+    "max_external_ms": "external_ms",
+    "max_total_ms": "total_ms",
+}
+
+_current: ContextVar[Optional["PerfTracker"]] = ContextVar("perf_tracker", default=None)
+_hook_lock = threading.Lock()
+_hook_installed = False
+
+
+class PerfTracker:
+    """Bộ đếm của 1 khối code đang được track."""
+
+    def __init__(self, parent: Optional["PerfTracker"] = None):
+        # Tracker lồng nhau (vd middleware bên trong assertPerfBudget): HTTP calls cộng lên cả parent
+        self.parent = parent
+        self.queries = 0
+        self.sql_time = 0.0
+        self.external_calls = 0
+        self.external_time = 0.0
+        self._started = time.perf_counter()
+        self._finished: Optional[float] = None
+
+    @property
+    def sql_ms(self) -> float:
+        return self.sql_time * 1000
+
+    @property
+    def external_ms(self) -> float:
+        return self.external_time * 1000
+
+    @property
+    def total_ms(self) -> float:
+        end = self._finished if self._finished is not None else time.perf_counter()
+        return (end - self._started) * 1000
+
+    def finish(self) -> None:
+        if self._finished is None:
+            self._finished = time.perf_counter()
+
+    def _db_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - started
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "queries": self.queries,
+            "sql_ms": round(self.sql_ms, 1),
+            "external_calls": self.external_calls,
+            "external_ms": round(self.external_ms, 1),
+            "total_ms": round(self.total_ms, 1),
+        }
+
+    def server_timing(self) -> str:
+        """Giá trị header Server-Timing (hiện trong tab Network của DevTools)."""
+        return ", ".join([
+            f'db;dur={self.sql_ms:.1f};desc="{self.queries} queries"',
+            f'ext;dur={self.external_ms:.1f};desc="{self.external_calls} HTTP calls"',
+            f"total;dur={self.total_ms:.1f}",
+        ])
+
+    def over_budget(self, budget: Dict[str, Optional[float]]) -> List[str]:
+        """
+        So với budget {max_queries, max_sql_ms, max_external_calls, max_external_ms, max_total_ms}
+        (None / thiếu key = không giới hạn).
+
+        Returns:
+            List mô tả các chỉ số vượt budget, vd ["queries 120 > 50"]
+        """
+        violations = []
+        for key, attr in BUDGET_FIELDS.items():
+            limit = budget.get(key)
+            value = getattr(self, attr)
+            if limit is not None and value > limit:
+                violations.append(f"{attr} {value:.0f} > {limit}")
+        return violations
+
+
+def install_requests_hook() -> None:
+    """Bọc requests.Session.send để đếm outbound HTTP calls (idempotent)."""
+    global _hook_installed
+    with _hook_lock:
+        if _hook_installed:
+            return
+        original_send = requests.Session.send
+
+        @functools.wraps(original_send)
+        def send(session, request, **kwargs):
+            tracker = _current.get()
+            if tracker is None:
+                return original_send(session, request, **kwargs)
+            started = time.perf_counter()
+            try:
+                return original_send(session, request, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                while tracker is not None:
+                    tracker.external_calls += 1
+                    tracker.external_time += elapsed
+                    tracker = tracker.parent
+
+        requests.Session.send = send
+        _hook_installed = True
+
+
+def current_tracker() -> Optional[PerfTracker]:
+    """Tracker đang active trong context hiện tại (None nếu không track)."""
+    return _current.get()
+
+
+@contextmanager
+def track() -> Iterator[PerfTracker]:
+    """Track SQL / outbound HTTP / wall time trong khối with."""
+    install_requests_hook()
+    tracker = PerfTracker(parent=_current.get())
+    token = _current.set(tracker)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(tracker._db_wrapper))
+            yield tracker
+    finally:
+        tracker.finish()
+        _current.reset(token)
+
+
+# ========================= EXPORTS =========================
+
+__all__ = [
+    'BUDGET_FIELDS',
+    'PerfTracker',
+    'install_requests_hook',
+    'current_tracker',
+    'track',
+]
@@ -2,16 +2,35 @@
 """
 Base repository class cho tất cả API clients.
 Provides retry logic, error handling, và standardized HTTP methods.
+
+Tùy chọn (subclass bật qua class attributes):
+- single_flight: GET giống hệt nhau đang chạy đồng thời dùng chung 1 request
+- cache_ttls: cache response GET vài giây theo prefix path, tự invalidate sau PUT/POST/DELETE
+
+Session được mount ThrottledHTTPAdapter (core.base.throttling): rate limit theo host dùng chung
+mọi process + circuit breaker (CircuitOpenError khi host đang bị ngắt). 429 -> đợi Retry-After rồi retry.
 """
 
 from abc import ABC
+import copy
 import requests
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
 import time
 import logging
 
+from .paginator import paginate, DEFAULT_MAX_CONCURRENCY, DEFAULT_MAX_PAGES
+from .request_coalescer import MISSING, SingleFlight, TTLResponseCache, matches_any, resource_of
+from .throttling import mount_throttled_adapter, retry_after_seconds
+
 logger = logging.getLogger(__name__)
 
+# Dùng chung cho mọi repository trong process (key gồm base_url)
+_single_flight = SingleFlight()
+_response_cache = TTLResponseCache()
+
+# kwargs của get() vẫn cho phép cache / single-flight (không đổi nội dung response)
+_CACHEABLE_KWARGS = {'params', 'timeout', 'retry', 'retry_delay'}
+
 
 class BaseRepository(ABC):
     """
@@ -24,8 +43,21 @@ class BaseRepository(ABC):
         
         repo = MyAPIRepository(session, "https://api.example.com")
         data = repo.get_something(123)
+    
+    Request coalescing (opt-in):
+        class MyAPIRepository(BaseRepository):
+            single_flight = True
+            cache_ttls = {"variants/": 15}              # GET variants/{id}... cache 15s
+            cache_invalidates = {"products": ["variants/"]}  # ghi products -> xóa cache variants
     """
     
+    # GET giống hệt nhau (path + params) đang chạy đồng thời chỉ gửi 1 request
+    single_flight: bool = False
+    # {path prefix: TTL giây} - prefix kết thúc bằng "/" = cả collection
+    cache_ttls: Dict[str, float] = {}
+    # {resource collection: [prefixes]} - ghi lên collection này xóa thêm cache của prefixes
+    cache_invalidates: Dict[str, List[str]] = {}
+    
     def __init__(self, session: requests.Session, base_url: str):
         """
         Initialize repository.
@@ -36,6 +68,8 @@ class BaseRepository(ABC):
         """
         self.session = session
         self.base_url = base_url.rstrip('/')
+        if isinstance(session, requests.Session):
+            mount_throttled_adapter(session)
     
     def _build_url(self, path: str) -> str:
         """
@@ -78,109 +112,155 @@ class BaseRepository(ABC):
         """
         url = self._build_url(path)
         last_exception = None
+        call_start = time.monotonic()
+        attempts = 0
+        status_code = None
+        failed = False
         
-        for attempt in range(retry):
-            try:
-                request_start = time.time()
-                # Log full URL với params để debug
-                if 'params' in kwargs:
-                    from urllib.parse import urlencode
-                    params_str = urlencode(kwargs['params'])
-                    full_url = f"{url}?{params_str}" if params_str else url
-                    logger.debug(f"[{method}] {full_url} (attempt {attempt + 1}/{retry})")
-                else:
-                    logger.debug(f"[{method}] {url} (attempt {attempt + 1}/{retry})")
+        try:
+            for attempt in range(retry):
+                attempts = attempt + 1
+                try:
+                    request_start = time.time()
+                    # Log full URL với params để debug
+                    if 'params' in kwargs:
+                        from urllib.parse import urlencode
+                        params_str = urlencode(kwargs['params'])
+                        full_url = f"{url}?{params_str}" if params_str else url
+                        logger.debug(f"[{method}] {full_url} (attempt {attempt + 1}/{retry})")
+                    else:
+                        logger.debug(f"[{method}] {url} (attempt {attempt + 1}/{retry})")
                 
-                response = self.session.request(
-                    method=method,
-                    url=url,
-                    timeout=timeout,
-                    **kwargs
-                )
+                    response = self.session.request(
+                        method=method,
+                        url=url,
+                        timeout=timeout,
+                        **kwargs
+                    )
                 
-                request_time = time.time() - request_start
-                # Log response status và thời gian
-                logger.debug(f"Response: {response.status_code} (took {request_time:.2f}s)")
+                    request_time = time.time() - request_start
+                    status_code = response.status_code
+                    # Log response status và thời gian
+                    logger.debug(f"Response: {response.status_code} (took {request_time:.2f}s)")
                 
-                # Log performance cho các API calls quan trọng
-                if path.startswith("orders") or path.startswith("variants"):
-                    logger.info(f"[PERF] API {method} {path}: {response.status_code} in {request_time:.2f}s")
+                    # Log performance cho các API calls quan trọng
+                    if path.startswith("orders") or path.startswith("variants"):
+                        logger.info(f"[PERF] API {method} {path}: {response.status_code} in {request_time:.2f}s")
                 
-                # Xử lý 401 Unauthorized - token có thể đã hết hạn
-                if response.status_code == 401:
-                    logger.warning(f"[BaseRepository] Got 401 Unauthorized for {method} {path} (attempt {attempt + 1}/{retry})")
+                    # Xử lý 401 Unauthorized - token có thể đã hết hạn
+                    if response.status_code == 401:
+                        logger.warning(f"[BaseRepository] Got 401 Unauthorized for {method} {path} (attempt {attempt + 1}/{retry})")
                     
-                    # Chỉ xử lý 401 ở lần attempt đầu tiên để tránh vòng lặp vô hạn
-                    if attempt == 0:
-                        # Gọi handler nếu có (subclass có thể override _handle_401)
-                        if hasattr(self, '_handle_401') and callable(getattr(self, '_handle_401')):
-                            logger.info(f"[BaseRepository] Calling _handle_401() to refresh token...")
-                            handled = self._handle_401(response, method, path, **kwargs)
+                        # Chỉ xử lý 401 ở lần attempt đầu tiên để tránh vòng lặp vô hạn
+                        if attempt == 0:
+                            # Gọi handler nếu có (subclass có thể override _handle_401)
+                            if hasattr(self, '_handle_401') and callable(getattr(self, '_handle_401')):
+                                logger.info(f"[BaseRepository] Calling _handle_401() to refresh token...")
+                                handled = self._handle_401(response, method, path, **kwargs)
                             
-                            if handled:
-                                # Token đã được refresh, retry request
-                                logger.info(f"[BaseRepository] Token refreshed, retrying request (attempt {attempt + 2}/{retry})...")
-                                time.sleep(2)  # Đợi một chút để token được apply
-                                continue  # Retry request
+                                if handled:
+                                    # Token đã được refresh, retry request
+                                    logger.info(f"[BaseRepository] Token refreshed, retrying request (attempt {attempt + 2}/{retry})...")
+                                    time.sleep(2)  # Đợi một chút để token được apply
+                                    continue  # Retry request
+                                else:
+                                    # Handler không xử lý được, raise error
+                                    logger.error(f"[BaseRepository] _handle_401() returned False, raising HTTPError")
+                                    response.raise_for_status()
                             else:
-                                # Handler không xử lý được, raise error
-                                logger.error(f"[BaseRepository] _handle_401() returned False, raising HTTPError")
+                                # Không có handler, raise error như bình thường
+                                logger.error(f"[BaseRepository] No _handle_401() handler, raising HTTPError")
                                 response.raise_for_status()
                         else:
-                            # Không có handler, raise error như bình thường
-                            logger.error(f"[BaseRepository] No _handle_401() handler, raising HTTPError")
+                            # Đã retry rồi mà vẫn 401, raise error
+                            logger.error(f"[BaseRepository] Still getting 401 after token refresh attempt, raising HTTPError")
                             response.raise_for_status()
-                    else:
-                        # Đã retry rồi mà vẫn 401, raise error
-                        logger.error(f"[BaseRepository] Still getting 401 after token refresh attempt, raising HTTPError")
-                        response.raise_for_status()
                 
-                return response
+                    # 429: adapter đã phạt bucket của host, request này đợi Retry-After rồi thử lại
+                    if response.status_code == 429 and attempt < retry - 1:
+                        wait = retry_after_seconds(response)
+                        logger.warning(f"[BaseRepository] Got 429 for {method} {path}, retrying in {wait:.1f}s")
+                        time.sleep(wait)
+                        continue
                 
-            except requests.Timeout as e:
-                # Timeout: chỉ retry 1 lần để tăng tốc xử lý
-                last_exception = e
-                logger.warning(
-                    f"Request timeout (attempt {attempt + 1}/{retry}): {e}"
-                )
+                    return response
                 
-                # Chỉ retry 1 lần cho timeout (không phải 3 lần)
-                timeout_retry_limit = min(1, retry - 1)
-                if attempt < timeout_retry_limit:
-                    logger.info(f"Retrying timeout request in {retry_delay}s...")
-                    time.sleep(retry_delay)
-                else:
-                    logger.error(f"Request timeout after {timeout_retry_limit + 1} attempt(s), skipping...")
-                    raise
+                except requests.Timeout as e:
+                    # Timeout: chỉ retry 1 lần để tăng tốc xử lý
+                    last_exception = e
+                    logger.warning(
+                        f"Request timeout (attempt {attempt + 1}/{retry}): {e}"
+                    )
+                
+                    # Chỉ retry 1 lần cho timeout (không phải 3 lần)
+                    timeout_retry_limit = min(1, retry - 1)
+                    if attempt < timeout_retry_limit:
+                        logger.info(f"Retrying timeout request in {retry_delay}s...")
+                        time.sleep(retry_delay)
+                    else:
+                        logger.error(f"Request timeout after {timeout_retry_limit + 1} attempt(s), skipping...")
+                        raise
             
-            except requests.ConnectionError as e:
-                last_exception = e
-                logger.warning(
-                    f"Request failed (attempt {attempt + 1}/{retry}): {e}"
-                )
+                except requests.ConnectionError as e:
+                    last_exception = e
+                    logger.warning(
+                        f"Request failed (attempt {attempt + 1}/{retry}): {e}"
+                    )
                 
-                if attempt < retry - 1:
-                    # Exponential backoff
-                    sleep_time = retry_delay * (2 ** attempt)
-                    logger.info(f"Retrying in {sleep_time}s...")
-                    time.sleep(sleep_time)
-                else:
-                    logger.error(f"Request failed after {retry} attempts")
-                    raise
+                    if attempt < retry - 1:
+                        # Exponential backoff
+                        sleep_time = retry_delay * (2 ** attempt)
+                        logger.info(f"Retrying in {sleep_time}s...")
+                        time.sleep(sleep_time)
+                    else:
+                        logger.error(f"Request failed after {retry} attempts")
+                        raise
             
-            except requests.RequestException as e:
-                # Các lỗi khác (HTTPError, etc.) không retry
-                logger.error(f"Request error: {e}")
-                raise
+                except requests.RequestException as e:
+                    # Các lỗi khác (HTTPError, etc.) không retry
+                    logger.error(f"Request error: {e}")
+                    raise
         
-        # Should not reach here, but just in case
-        if last_exception:
-            raise last_exception
+            # Should not reach here, but just in case
+            if last_exception:
+                raise last_exception
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self._record_call(method, path, time.monotonic() - call_start, status_code, attempts, failed)
+    
+    def _record_call(
+        self,
+        method: str,
+        path: str,
+        duration: float,
+        status_code: Optional[int],
+        attempts: int,
+        failed: bool,
+    ) -> None:
+        """Ghi metrics cho 1 lời gọi _request (xem core.services.api_metrics)."""
+        try:
+            from core.services.api_metrics import record_api_call
+            record_api_call(
+                self.__class__.__name__,
+                method,
+                path,
+                duration,
+                status_code=status_code,
+                retries=max(attempts - 1, 0),
+                error=failed,
+            )
+        except Exception as e:
+            logger.debug(f"[BaseRepository] Failed to record API metrics: {e}")
     
     def get(self, path: str, **kwargs) -> Dict[str, Any]:
         """
         GET request.
         
+        Nếu subclass bật single_flight / cache_ttls, response được dùng chung giữa các caller
+        (mỗi caller nhận 1 bản copy riêng; response không dùng chung thì không copy).
+        
         Args:
             path: API path
             **kwargs: params, headers, timeout, retry, etc.
@@ -188,6 +268,35 @@ class BaseRepository(ABC):
         Returns:
             Response JSON as dict
         """
+        key = self._coalesce_key(path, kwargs)
+        if key is None:
+            return self._get_json(path, **kwargs)
+        
+        ttl = self._cache_ttl(key[1])
+        if ttl:
+            cached = _response_cache.get(key)
+            if cached is not MISSING:
+                logger.debug(f"[BaseRepository] Cache hit GET {key[1]}")
+                return copy.deepcopy(cached)
+        
+        generation = _response_cache.generation
+        shared = False
+        if self.single_flight:
+            result, shared = _single_flight.do(key, lambda: self._get_json(path, **kwargs))
+            if shared:
+                logger.debug(f"[BaseRepository] Shared in-flight GET {key[1]}")
+        else:
+            result = self._get_json(path, **kwargs)
+        
+        if ttl:
+            _response_cache.set(key, result, ttl, generation)
+        # Chỉ copy khi object dùng chung (thread khác / cache); page list lớn không ai chờ thì trả thẳng
+        if shared or ttl:
+            return copy.deepcopy(result)
+        return result
+    
+    def _get_json(self, path: str, **kwargs) -> Dict[str, Any]:
+        """GET request thực sự (không qua cache / single-flight)."""
         response = self._request('GET', path, **kwargs)
         # Chỉ raise nếu không phải 401 (401 đã được xử lý trong _request)
         if response.status_code != 401:
@@ -200,9 +309,54 @@ class BaseRepository(ABC):
             logger.warning(f"Response is not JSON: {response.text[:200]}")
             return {}
     
+    def _coalesce_key(self, path: str, kwargs: Dict[str, Any]) -> Optional[Tuple]:
+        """
+        Key (base_url, path, params) cho single-flight / cache.
+        None nếu repository không bật hoặc request có headers/body riêng.
+        """
+        if not self.single_flight and not self.cache_ttls:
+            return None
+        if set(kwargs) - _CACHEABLE_KWARGS:
+            return None
+        params = kwargs.get('params') or {}
+        try:
+            params_key = tuple(sorted((str(k), str(v)) for k, v in dict(params).items()))
+        except (TypeError, ValueError):
+            return None
+        return (self.base_url, path.lstrip('/'), params_key)
+    
+    def _cache_ttl(self, path: str) -> float:
+        """TTL cache cho path theo prefix dài nhất khớp trong cache_ttls (0 = không cache)."""
+        ttl = 0
+        matched = ''
+        for prefix, prefix_ttl in self.cache_ttls.items():
+            if path.startswith(prefix) and len(prefix) > len(matched):
+                matched, ttl = prefix, prefix_ttl
+        return ttl
+    
+    def invalidate_cache(self, path: str) -> int:
+        """
+        Xóa cache GET + bỏ các GET đang chạy thuộc resource của path
+        (vd PUT "orders/123/fulfillments/5.json" -> xóa "orders/123...").
+        Gọi tự động sau post/put/delete.
+        
+        Returns:
+            Số entry cache đã xóa
+        """
+        if not self.single_flight and not self.cache_ttls:
+            return 0
+        resource = resource_of(path)
+        prefixes = [resource, *self.cache_invalidates.get(resource.split('/')[0], [])]
+        predicate = matches_any(self.base_url, prefixes)
+        _single_flight.forget(predicate)
+        removed = _response_cache.invalidate(predicate)
+        if removed:
+            logger.debug(f"[BaseRepository] Invalidated {removed} cached GET(s) for {prefixes}")
+        return removed
+    
     def post(self, path: str, **kwargs) -> Dict[str, Any]:
         """
-        POST request.
+        POST request (xóa cache GET của resource sau khi ghi).
         
         Args:
             path: API path
@@ -211,7 +365,10 @@ class BaseRepository(ABC):
         Returns:
             Response JSON as dict
         """
-        response = self._request('POST', path, **kwargs)
+        try:
+            response = self._request('POST', path, **kwargs)
+        finally:
+            self.invalidate_cache(path)
         # Chỉ raise nếu không phải 401 (401 đã được xử lý trong _request)
         if response.status_code != 401:
             response.raise_for_status()
@@ -223,7 +380,7 @@ class BaseRepository(ABC):
     
     def put(self, path: str, **kwargs) -> Dict[str, Any]:
         """
-        PUT request.
+        PUT request (xóa cache GET của resource sau khi ghi).
         
         Args:
             path: API path
@@ -232,7 +389,10 @@ class BaseRepository(ABC):
         Returns:
             Response JSON as dict
         """
-        response = self._request('PUT', path, **kwargs)
+        try:
+            response = self._request('PUT', path, **kwargs)
+        finally:
+            self.invalidate_cache(path)
         # Chỉ raise nếu không phải 401 (401 đã được xử lý trong _request)
         if response.status_code != 401:
             response.raise_for_status()
@@ -244,7 +404,7 @@ class BaseRepository(ABC):
     
     def delete(self, path: str, **kwargs) -> Dict[str, Any]:
         """
-        DELETE request.
+        DELETE request (xóa cache GET của resource sau khi ghi).
         
         Args:
             path: API path
@@ -253,7 +413,10 @@ class BaseRepository(ABC):
         Returns:
             Response JSON as dict
         """
-        response = self._request('DELETE', path, **kwargs)
+        try:
+            response = self._request('DELETE', path, **kwargs)
+        finally:
+            self.invalidate_cache(path)
         # Chỉ raise nếu không phải 401 (401 đã được xử lý trong _request)
         if response.status_code != 401:
             response.raise_for_status()
@@ -280,3 +443,37 @@ class BaseRepository(ABC):
         if response.status_code != 401:
             response.raise_for_status()
         return response
+    
+    def paginate(
+        self,
+        fetch_page: Callable[[int], Dict[str, Any]],
+        items_key: str,
+        limit: int = 250,
+        max_pages: int = DEFAULT_MAX_PAGES,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        **kwargs
+    ) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        Fetch tất cả pages của 1 list endpoint song song (xem core.base.paginator.paginate).
+        
+        Args:
+            fetch_page: Hàm nhận số page, trả về response dict
+                        (vd: lambda page: repo.list_orders_raw(page=page, limit=250))
+            items_key: Key chứa list items trong response (vd: "orders")
+            limit: Số items mỗi page
+            max_pages: Giới hạn số pages
+            max_concurrency: Số request đồng thời tối đa (tự giảm khi gặp 429/5xx)
+            **kwargs: total_getter, stats, log_tag
+            
+        Yields:
+            (page, items) theo thứ tự page về (không theo thứ tự page)
+        """
+        kwargs.setdefault("log_tag", self.__class__.__name__)
+        return paginate(
+            fetch_page,
+            items_key=items_key,
+            limit=limit,
+            max_pages=max_pages,
+            max_concurrency=max_concurrency,
+            **kwargs
+        )
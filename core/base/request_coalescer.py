@@ -0,0 +1,188 @@
+# core/base/request_coalescer.py
+"""
+Gộp request trùng lặp cho BaseRepository.
+
+- SingleFlight: các GET giống hệt nhau đang chạy đồng thời (vd 5 thread print_now cùng
+  get_order_raw(id)) chỉ gửi 1 request, các thread còn lại chờ và dùng chung kết quả / exception.
+- TTLResponseCache: cache response GET vài giây theo path, bị xóa khi có PUT/POST/DELETE
+  lên cùng resource.
+
+State dùng chung trong process (mọi repository instance), key đã gồm base_url.
+"""
+
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+DEFAULT_MAX_ENTRIES = 2000
+
+
+def resource_of(path: str) -> str:
+    """
+    Resource mà path thuộc về (2 segment đầu, bỏ đuôi .json / query string).
+
+    vd: "orders/123.json" -> "orders/123", "orders/123/fulfillments/5.json" -> "orders/123",
+        "orders.json" -> "orders"
+    """
+    path = path.lstrip('/').split('?', 1)[0]
+    segments = path.split('/')[:2]
+    segments[-1] = segments[-1].rsplit('.json', 1)[0]
+    return '/'.join(segments)
+
+
+def path_matches(path: str, prefix: str) -> bool:
+    """
+    True nếu path thuộc prefix.
+    Prefix kết thúc bằng "/" (vd "orders/") = cả collection; ngược lại = đúng resource đó.
+    """
+    if prefix.endswith('/'):
+        return path.startswith(prefix)
+    return path == prefix or path.startswith(prefix + '/') or path.startswith(prefix + '.')
+
+
+class _Call:
+    """1 request đang chạy: các thread chờ trên `done`."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Mỗi key chỉ có tối đa 1 lời gọi fn() đang chạy; caller đến sau chờ kết quả của lời gọi đó.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Returns:
+            (result, shared) - shared=True nếu result được dùng chung với thread khác
+            (thread chờ: luôn True; thread gọi fn(): True nếu có thread đã chờ kết quả này)
+
+        Raises:
+            Exception của fn() (cả thread gọi lẫn các thread chờ)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                # Đã bỏ khỏi bảng: không còn thread nào join thêm
+                waiters = call.waiters
+            call.done.set()
+        return call.result, waiters > 0
+
+    def forget(self, predicate: Callable[[Hashable], bool]) -> None:
+        """
+        Bỏ các lời gọi đang chạy khớp predicate khỏi bảng (vd sau khi PUT):
+        caller mới sẽ gửi request mới thay vì nhận kết quả đọc trước khi ghi.
+        """
+        with self._lock:
+            for key in [k for k in self._calls if predicate(k)]:
+                del self._calls[key]
+
+
+class TTLResponseCache:
+    """
+    Cache in-memory có TTL theo từng entry.
+
+    `generation` tăng mỗi lần invalidate; set() nhận generation lúc bắt đầu request
+    và bỏ qua nếu đã có invalidate xen giữa (response có thể đọc trước khi ghi).
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+
+    def get(self, key: Hashable) -> Any:
+        """Trả về value hoặc MISSING."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return MISSING
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float, generation: Optional[int] = None) -> bool:
+        """Lưu value trong `ttl` giây. Trả về False nếu bị bỏ qua do generation đã cũ."""
+        now = time.monotonic()
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: e for k, e in self._entries.items() if e[0] > now}
+                if len(self._entries) >= self.max_entries:
+                    # Vẫn đầy: bỏ entry sắp hết hạn nhất
+                    del self._entries[min(self._entries, key=lambda k: self._entries[k][0])]
+            self._entries[key] = (now + ttl, value)
+            return True
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Xóa các entry có key khớp predicate. Returns: số entry đã xóa."""
+        with self._lock:
+            self.generation += 1
+            keys = [k for k in self._entries if predicate(k)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
+def matches_any(base_url: str, prefixes: Iterable[str]) -> Callable[[Hashable], bool]:
+    """Predicate cho key (base_url, path, params) thuộc 1 trong các prefixes."""
+    prefixes = list(prefixes)
+
+    def predicate(key: Hashable) -> bool:
+        return key[0] == base_url and any(path_matches(key[1], p) for p in prefixes)
+
+    return predicate
+
+
+# ========================= EXPORTS =========================
+
+__all__ = [
+    'MISSING',
+    'SingleFlight',
+    'TTLResponseCache',
+    'resource_of',
+    'path_matches',
+    'matches_any',
+]
@@ -0,0 +1,386 @@
+# core/base/throttling.py
+"""
+Rate limit + circuit breaker cho outbound API (Sapo Core / Marketplace, Shopee) theo host.
+
+- RateLimiter: token bucket (GCRA) theo host. State là 1 số "tat" (theoretical arrival time)
+  trong bảng core_api_rate_limit, cập nhật bằng 1 câu UPDATE atomic trên connection riêng
+  (autocommit, không dính transaction của request) -> mọi thread / gunicorn worker dùng chung
+  1 budget. DB lỗi -> tạm dùng bucket trong process.
+- CircuitBreaker: sau FAILURE_THRESHOLD lần liên tiếp 502/503/504/timeout/lỗi kết nối tới 1 host,
+  fail fast (CircuitOpenError) trong RESET_TIMEOUT giây, rồi cho 1 request thử (half-open).
+  State theo process.
+- ThrottledHTTPAdapter: áp cả 2 cho mọi request đi qua session được mount adapter
+  (SapoClient sessions, ShopeeClient.session, BaseRepository). 429 -> phạt bucket theo Retry-After.
+
+Settings:
+    API_RATE_LIMITS = {
+        "ENABLED": True,
+        "BACKEND": "database",   # "database" (chung mọi process) | "local" (trong process)
+        "DEFAULT": {"rate": 10, "burst": 20},          # request/giây, số request dồn tối đa
+        "HOSTS": {"mysapogo.com": {"rate": 15, "burst": 40}},  # host hoặc domain cha
+    }
+    API_CIRCUIT_BREAKER = {"ENABLED": True, "FAILURE_THRESHOLD": 5, "RESET_TIMEOUT": 30}
+"""
+
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_TABLE = "core_api_rate_limit"
+# DB lỗi -> dùng bucket trong process trong khoảng này rồi thử lại DB
+DB_FALLBACK_SECONDS = 30
+# DB chậm / treo không được chặn mọi HTTP call: câu UPDATE tối đa DB_STATEMENT_TIMEOUT_MS,
+# thread khác chờ connection tối đa DB_LOCK_WAIT_SECONDS rồi coi như DB lỗi (fallback)
+DB_STATEMENT_TIMEOUT_MS = 2000
+DB_LOCK_WAIT_SECONDS = 0.5
+DEFAULT_RETRY_AFTER_SECONDS = 2.0
+
+# Response coi là upstream lỗi (tính vào circuit breaker)
+BREAKER_STATUS_CODES = {502, 503, 504}
+
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 32
+
+
+class CircuitOpenError(requests.RequestException):
+    """Host đang bị ngắt (circuit open): fail fast, không gửi request."""
+
+    def __init__(self, host: str, retry_in: float):
+        self.host = host
+        self.retry_in = retry_in
+        super().__init__(f"Circuit open for {host}, retry in {retry_in:.0f}s")
+
+
+def _rate_config() -> Dict[str, Any]:
+    return getattr(settings, "API_RATE_LIMITS", {})
+
+
+def _breaker_config() -> Dict[str, Any]:
+    return getattr(settings, "API_CIRCUIT_BREAKER", {})
+
+
+def host_limits(host: str) -> Optional[Tuple[float, int]]:
+    """
+    (rate, burst) của host theo API_RATE_LIMITS (match host hoặc domain cha).
+
+    Returns:
+        None nếu rate limit tắt / không cấu hình
+    """
+    config = _rate_config()
+    if not config.get("ENABLED", True):
+        return None
+    limits = config.get("DEFAULT")
+    for name, host_config in config.get("HOSTS", {}).items():
+        if host == name or host.endswith("." + name):
+            limits = host_config
+            break
+    if not limits or not limits.get("rate"):
+        return None
+    return float(limits["rate"]), int(limits.get("burst", 1))
+
+
+# ========================= RATE LIMIT STORES =========================
+
+class LocalRateStore:
+    """State GCRA trong process (fallback / test)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tat: Dict[str, float] = {}
+
+    def reserve(self, key: str, floor: float, increment: float) -> float:
+        """tat = max(tat, floor) + increment. Returns: tat mới."""
+        with self._lock:
+            tat = max(self._tat.get(key, 0.0), floor) + increment
+            self._tat[key] = tat
+            return tat
+
+
+class DatabaseRateStore:
+    """
+    State GCRA trong bảng core_api_rate_limit, dùng chung giữa các process.
+    1 connection riêng / process (autocommit, dùng chung giữa các thread qua lock).
+    Chờ lock quá DB_LOCK_WAIT_SECONDS hoặc câu lệnh quá DB_STATEMENT_TIMEOUT_MS -> raise,
+    RateLimiter chuyển sang bucket trong process.
+    """
+
+    def __init__(self, alias: str = DEFAULT_DB_ALIAS):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _get_connection(self):
+        if self._connection is None:
+            connection = connections.create_connection(self.alias)
+            connection.inc_thread_sharing()
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute(f"SET statement_timeout = {int(DB_STATEMENT_TIMEOUT_MS)}")
+            self._connection = connection
+        return self._connection
+
+    def reserve(self, key: str, floor: float, increment: float) -> float:
+        """tat = max(tat, floor) + increment (1 câu UPDATE atomic). Returns: tat mới."""
+        if not self._lock.acquire(timeout=DB_LOCK_WAIT_SECONDS):
+            raise TimeoutError(f"Rate limit store busy for more than {DB_LOCK_WAIT_SECONDS}s")
+        try:
+            connection = self._get_connection()
+            table = connection.ops.quote_name(RATE_LIMIT_TABLE)
+            with connection.cursor() as cursor:
+                for _ in range(2):
+                    cursor.execute(
+                        f"UPDATE {table} SET tat = (CASE WHEN tat > %s THEN tat ELSE %s END) + %s "
+                        f"WHERE host = %s RETURNING tat",
+                        [floor, floor, increment, key],
+                    )
+                    row = cursor.fetchone()
+                    if row is not None:
+                        return float(row[0])
+                    cursor.execute(
+                        f"INSERT INTO {table} (host, tat) VALUES (%s, %s) ON CONFLICT (host) DO NOTHING",
+                        [key, 0.0],
+                    )
+            raise RuntimeError(f"Cannot create rate limit row for {key}")
+        except Exception:
+            self.close()
+            raise
+        finally:
+            self._lock.release()
+
+    def close(self) -> None:
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+
+# ========================= RATE LIMITER =========================
+
+class RateLimiter:
+    """
+    Token bucket (GCRA) theo host: cho phép `burst` request dồn, sau đó `rate` request/giây.
+    acquire() đặt chỗ rồi sleep tới lượt (không từ chối request).
+    """
+
+    def __init__(
+        self,
+        store: Optional[Any] = None,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        # store=None -> theo API_RATE_LIMITS["BACKEND"]
+        self._store = store
+        self._db_store: Optional[DatabaseRateStore] = None
+        self._local_store = LocalRateStore()
+        self._db_disabled_until = 0.0
+        self._clock = clock
+        self._sleep = sleep
+
+    def _reserve(self, key: str, floor: float, increment: float) -> float:
+        if self._store is not None:
+            return self._store.reserve(key, floor, increment)
+        if _rate_config().get("BACKEND", "database") == "database" and time.monotonic() >= self._db_disabled_until:
+            if self._db_store is None:
+                self._db_store = DatabaseRateStore()
+            try:
+                return self._db_store.reserve(key, floor, increment)
+            except Exception as e:
+                self._db_disabled_until = time.monotonic() + DB_FALLBACK_SECONDS
+                logger.warning(f"[RateLimiter] DB store failed, using in-process bucket for {DB_FALLBACK_SECONDS}s: {e}")
+        return self._local_store.reserve(key, floor, increment)
+
+    def acquire(self, host: str) -> float:
+        """
+        Đợi tới lượt gửi 1 request tới host.
+
+        Returns:
+            Số giây đã đợi
+        """
+        limits = host_limits(host)
+        if limits is None:
+            return 0.0
+        rate, burst = limits
+        interval = 1.0 / rate
+        now = self._clock()
+        tat = self._reserve(host, now, interval)
+        wait = tat - interval * burst - now
+        if wait > 0:
+            if wait > 1:
+                logger.debug(f"[RateLimiter] {host}: waiting {wait:.2f}s")
+            self._sleep(wait)
+            return wait
+        return 0.0
+
+    def penalize(self, host: str, seconds: float) -> None:
+        """Upstream trả 429: chặn mọi request tới host trong `seconds` giây."""
+        limits = host_limits(host)
+        if limits is None:
+            return
+        rate, burst = limits
+        interval = 1.0 / rate
+        logger.warning(f"[RateLimiter] {host} returned 429, backing off {seconds:.1f}s")
+        self._reserve(host, self._clock() + seconds + interval * (burst - 1), 0.0)
+
+
+# ========================= CIRCUIT BREAKER =========================
+
+class CircuitBreaker:
+    """Circuit breaker của 1 host: closed -> open (fail fast) -> half-open (1 request thử) -> closed."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        host: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError nếu host đang bị ngắt."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN:
+                retry_in = self._opened_at + self.reset_timeout - self._clock()
+                if retry_in > 0:
+                    raise CircuitOpenError(self.host, retry_in)
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = True
+                logger.info(f"[CircuitBreaker] {self.host}: half-open, sending probe request")
+                return
+            # HALF_OPEN: chỉ 1 request thử tại 1 thời điểm
+            if self._probe_in_flight:
+                raise CircuitOpenError(self.host, 0)
+            self._probe_in_flight = True
+
+    def record(self, failed: bool) -> None:
+        with self._lock:
+            self._probe_in_flight = False
+            if not failed:
+                if self.state != self.CLOSED:
+                    logger.info(f"[CircuitBreaker] {self.host}: recovered, circuit closed")
+                self.state = self.CLOSED
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(
+                        f"[CircuitBreaker] {self.host}: {self.failures} consecutive failures, "
+                        f"circuit open for {self.reset_timeout:.0f}s"
+                    )
+                self.state = self.OPEN
+                self._opened_at = self._clock()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(host: str) -> Optional[CircuitBreaker]:
+    """CircuitBreaker của host (None nếu API_CIRCUIT_BREAKER tắt)."""
+    config = _breaker_config()
+    if not config.get("ENABLED", True):
+        return None
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                host,
+                failure_threshold=config.get("FAILURE_THRESHOLD", 5),
+                reset_timeout=config.get("RESET_TIMEOUT", 30),
+            )
+            _breakers[host] = breaker
+        return breaker
+
+
+rate_limiter = RateLimiter()
+
+
+# ========================= HTTP ADAPTER =========================
+
+def retry_after_seconds(response: requests.Response) -> float:
+    """Giây cần đợi theo header Retry-After (mặc định DEFAULT_RETRY_AFTER_SECONDS)."""
+    value = response.headers.get("Retry-After")
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER_SECONDS
+
+
+class ThrottledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter đi qua circuit breaker + rate limiter của host trước mỗi request."""
+
+    def send(self, request, **kwargs):
+        host = urlsplit(request.url).hostname or ""
+        breaker = get_circuit_breaker(host)
+        if breaker is not None:
+            breaker.before_call()
+        rate_limiter.acquire(host)
+
+        failed = True
+        try:
+            response = super().send(request, **kwargs)
+            failed = response.status_code in BREAKER_STATUS_CODES
+            if response.status_code == 429:
+                rate_limiter.penalize(host, retry_after_seconds(response))
+            return response
+        finally:
+            if breaker is not None:
+                breaker.record(failed)
+
+
+def mount_throttled_adapter(
+    session: requests.Session,
+    pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+    pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+) -> requests.Session:
+    """Mount ThrottledHTTPAdapter (kèm connection pool keep-alive) cho session (idempotent)."""
+    if isinstance(session.get_adapter("https://"), ThrottledHTTPAdapter):
+        return session
+    adapter = ThrottledHTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# ========================= EXPORTS =========================
+
+__all__ = [
+    'BREAKER_STATUS_CODES',
+    'CircuitOpenError',
+    'host_limits',
+    'LocalRateStore',
+    'DatabaseRateStore',
+    'RateLimiter',
+    'CircuitBreaker',
+    'get_circuit_breaker',
+    'rate_limiter',
+    'retry_after_seconds',
+    'ThrottledHTTPAdapter',
+    'mount_throttled_adapter',
+]
@@ -0,0 +1,82 @@
+# core/cache_backends.py
+"""
+Cache backend dùng chung giữa các process (gunicorn workers) mà không cần service ngoài.
+
+SharedDatabaseCache = DatabaseCache của Django + add() atomic:
+DatabaseCache.add() gốc đọc row rồi UPDATE nếu key đã hết hạn, nên 2 worker
+cùng thấy lock hết hạn đều "chiếm" được lock. Ở đây dùng UPDATE có điều kiện
+(expires < now) rồi INSERT, để DB quyết định chỉ 1 worker thắng.
+
+Bảng cache được tạo bởi migration core (createcachetable).
+"""
+
+import base64
+import pickle
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.db import DatabaseCache
+from django.db import DatabaseError, connections, router, transaction
+from django.utils.timezone import now as tz_now
+
+
+class SharedDatabaseCache(DatabaseCache):
+    """
+    DatabaseCache với add() atomic (dùng cho lock giữa các worker, vd: Selenium login).
+    """
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        timeout = self.get_backend_timeout(timeout)
+
+        db = router.db_for_write(self.cache_model_class)
+        connection = connections[db]
+        quote_name = connection.ops.quote_name
+        table = quote_name(self._table)
+
+        now = tz_now().replace(microsecond=0)
+        if timeout is None:
+            exp = datetime.max
+        else:
+            tz = timezone.utc if settings.USE_TZ else None
+            exp = datetime.fromtimestamp(timeout, tz=tz)
+        exp = exp.replace(microsecond=0)
+
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        b64encoded = base64.b64encode(pickled).decode("latin1")
+
+        now_db = connection.ops.adapt_datetimefield_value(now)
+        exp_db = connection.ops.adapt_datetimefield_value(exp)
+
+        try:
+            with transaction.atomic(using=db), connection.cursor() as cursor:
+                # Key đã hết hạn: chiếm lại bằng UPDATE có điều kiện (atomic theo row)
+                cursor.execute(
+                    "UPDATE %s SET %s = %%s, %s = %%s WHERE %s = %%s AND %s < %%s"
+                    % (
+                        table,
+                        quote_name("value"),
+                        quote_name("expires"),
+                        quote_name("cache_key"),
+                        quote_name("expires"),
+                    ),
+                    [b64encoded, exp_db, key, now_db],
+                )
+                if cursor.rowcount == 1:
+                    return True
+
+                # Key chưa có: INSERT, trùng cache_key (worker khác đang giữ) -> IntegrityError
+                cursor.execute(
+                    "INSERT INTO %s (%s, %s, %s) VALUES (%%s, %%s, %%s)"
+                    % (
+                        table,
+                        quote_name("cache_key"),
+                        quote_name("value"),
+                        quote_name("expires"),
+                    ),
+                    [key, b64encoded, exp_db],
+                )
+                return True
+        except DatabaseError:
+            return False
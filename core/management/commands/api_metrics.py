@@ -0,0 +1,96 @@
+"""
+Management command in thống kê outbound API calls (Sapo / Shopee) theo endpoint.
+
+Usage:
+    python manage.py api_metrics                    # 24 giờ gần nhất, sắp theo tổng thời gian
+    python manage.py api_metrics --hours 1 --sort calls
+    python manage.py api_metrics --client SapoCoreRepository --limit 10
+    python manage.py api_metrics --purge-days 30   # xóa số liệu cũ hơn 30 ngày
+"""
+
+from datetime import timedelta
+import json
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import ApiCallMetric
+from core.services.api_metrics import flush, get_endpoint_summary
+
+SORT_FIELDS = ("total_ms", "calls", "errors", "retries", "avg_ms", "p95_ms", "max_ms")
+
+
+class Command(BaseCommand):
+    help = "In thống kê count / error rate / retries / latency theo (client, method, path template)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=int,
+            default=24,
+            help="Số giờ gần nhất cần thống kê (mặc định: 24)",
+        )
+        parser.add_argument(
+            "--client",
+            type=str,
+            default=None,
+            help="Chỉ thống kê 1 client (vd: SapoCoreRepository, ShopeeRepository)",
+        )
+        parser.add_argument(
+            "--sort",
+            choices=SORT_FIELDS,
+            default="total_ms",
+            help="Sắp xếp giảm dần theo cột (mặc định: total_ms)",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=50,
+            help="Số endpoint tối đa in ra (mặc định: 50)",
+        )
+        parser.add_argument(
+            "--json",
+            action="store_true",
+            help="In dạng JSON",
+        )
+        parser.add_argument(
+            "--purge-days",
+            type=int,
+            default=None,
+            help="Xóa số liệu cũ hơn N ngày rồi thoát",
+        )
+
+    def handle(self, *args, **options):
+        if options["purge_days"] is not None:
+            cutoff = timezone.now() - timedelta(days=options["purge_days"])
+            deleted, _ = ApiCallMetric.objects.filter(hour__lt=cutoff).delete()
+            self.stdout.write(self.style.SUCCESS(f"Đã xóa {deleted} dòng metrics trước {cutoff:%Y-%m-%d %H:%M}"))
+            return
+
+        # Số liệu của chính process này (nếu có) cũng được ghi trước khi đọc
+        flush()
+        rows = get_endpoint_summary(
+            hours=options["hours"],
+            client=options["client"],
+            order_by=options["sort"],
+        )[:options["limit"]]
+
+        if options["json"]:
+            self.stdout.write(json.dumps(rows, ensure_ascii=False, indent=2))
+            return
+
+        if not rows:
+            self.stdout.write(self.style.WARNING(f"Không có số liệu trong {options['hours']} giờ gần nhất"))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f"API metrics {options['hours']} giờ gần nhất (sort: {options['sort']})"))
+        header = f"{'client':<26} {'method':<6} {'path':<48} {'calls':>7} {'err%':>6} {'retry':>6} {'avg':>7} {'p50':>7} {'p95':>7} {'max':>7} {'total_s':>9}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        for row in rows:
+            self.stdout.write(
+                f"{row['client'][:26]:<26} {row['method']:<6} {row['path_template'][:48]:<48} "
+                f"{row['calls']:>7} {row['error_rate'] * 100:>5.1f}% {row['retries']:>6} "
+                f"{row['avg_ms']:>7} {row['p50_ms']:>7} {row['p95_ms']:>7} {row['max_ms']:>7} "
+                f"{row['total_ms'] / 1000:>9.1f}"
+            )
@@ -0,0 +1,101 @@
+"""
+Worker refresh Sapo token (core + marketplace) trước khi hết hạn, để web request không phải
+gặp 401 rồi đợi Selenium login.
+
+Chạy nền (systemd / supervisor):
+    python manage.py refresh_sapo_tokens
+Hoặc bằng cron:
+    */5 * * * * cd /path/to/project && python manage.py refresh_sapo_tokens --once
+
+Usage:
+    python manage.py refresh_sapo_tokens --status        # in time-to-expiry của token
+    python manage.py refresh_sapo_tokens --once --force  # login lại ngay
+"""
+
+import json
+
+from django.core.management.base import BaseCommand
+
+from core.services.sapo_token_refresher import (
+    CHECK_INTERVAL_SECONDS,
+    REFRESH_BEFORE_SECONDS,
+    get_token_status,
+    refresh_tokens,
+    run_forever,
+)
+
+
+class Command(BaseCommand):
+    help = "Refresh Sapo tokens chủ động trước khi hết hạn (worker chạy nền hoặc --once)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Check / refresh 1 lần rồi thoát (dùng với cron)",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Refresh kể cả khi token còn hạn (kèm --once)",
+        )
+        parser.add_argument(
+            "--status",
+            action="store_true",
+            help="Chỉ in thời gian còn lại của token",
+        )
+        parser.add_argument(
+            "--json",
+            action="store_true",
+            help="In kết quả dạng JSON",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=CHECK_INTERVAL_SECONDS,
+            help=f"Chu kỳ check (giây, mặc định: {CHECK_INTERVAL_SECONDS})",
+        )
+        parser.add_argument(
+            "--refresh-before",
+            type=int,
+            default=REFRESH_BEFORE_SECONDS,
+            help=f"Refresh khi token còn ít hơn N giây (mặc định: {REFRESH_BEFORE_SECONDS})",
+        )
+
+    def handle(self, *args, **options):
+        if options["status"]:
+            self._print_status(get_token_status(), options["json"])
+            return
+
+        if options["once"] or options["force"]:
+            result = refresh_tokens(force=options["force"], refresh_before=options["refresh_before"])
+            if options["json"]:
+                self.stdout.write(json.dumps(result, default=str, indent=2))
+                return
+            if result["refreshed"]:
+                self.stdout.write(self.style.SUCCESS(f"✓ Refreshed Sapo tokens in {result['duration']:.1f}s"))
+            elif result["error"]:
+                self.stdout.write(self.style.WARNING(f"Refresh skipped/failed: {result['error']}"))
+            else:
+                self.stdout.write("Tokens still fresh, nothing to do.")
+            self._print_status(result["status"], False)
+            return
+
+        self.stdout.write(
+            f"Token refresher running (interval={options['interval']}s, "
+            f"refresh_before={options['refresh_before']}s)"
+        )
+        run_forever(interval=options["interval"], refresh_before=options["refresh_before"])
+
+    def _print_status(self, status, as_json: bool):
+        if as_json:
+            self.stdout.write(json.dumps(status, default=str, indent=2))
+            return
+        for item in status:
+            if item["expires_at"] is None:
+                self.stdout.write(f"  {item['kind']:<5} ({item['key']}): missing")
+            else:
+                self.stdout.write(
+                    f"  {item['kind']:<5} ({item['key']}): expires {item['expires_at']:%Y-%m-%d %H:%M:%S} "
+                    f"({item['seconds_left']}s left)"
+                )
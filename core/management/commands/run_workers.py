@@ -0,0 +1,158 @@
+"""
+Chạy worker xử lý BackgroundJob (hàng đợi trong DB, xem core/services/job_queue.py).
+
+Chạy nền (systemd / supervisor), gửi SIGTERM để dừng: worker chạy nốt job hiện tại rồi thoát.
+    python manage.py run_workers --workers 4
+
+Usage:
+    python manage.py run_workers --once                         # chạy hết job đang chờ rồi thoát
+    python manage.py run_workers --task cskh.feedback_sync      # chỉ chạy 1 loại task
+"""
+
+import multiprocessing
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.services.job_queue import POLL_INTERVAL_SECONDS, autodiscover, default_worker_id, run_worker
+
+# Thời gian chờ worker chạy nốt job khi dừng, quá thì kill
+SHUTDOWN_GRACE_SECONDS = 60
+
+
+def _worker_process(index: int, poll_interval: float, tasks) -> None:
+    # Ctrl+C gửi SIGINT cho cả process group: child chỉ dừng khi parent gửi SIGTERM
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    run_worker(
+        worker_id=f"{default_worker_id()}#{index}",
+        poll_interval=poll_interval,
+        stop_event=stop_event,
+        tasks=tasks,
+    )
+
+
+class Command(BaseCommand):
+    help = "Chạy N worker process xử lý background jobs (priority, retry, heartbeat, hủy)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=2,
+            help="Số worker process (mặc định: 2)",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=POLL_INTERVAL_SECONDS,
+            help=f"Chu kỳ kiểm tra job mới khi rảnh (giây, mặc định: {POLL_INTERVAL_SECONDS})",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Chạy hết các job đang chờ trong process hiện tại rồi thoát",
+        )
+        parser.add_argument(
+            "--task",
+            action="append",
+            dest="tasks",
+            default=None,
+            help="Chỉ chạy task này (lặp lại để chọn nhiều task)",
+        )
+
+    def handle(self, *args, **options):
+        autodiscover()
+        tasks = options["tasks"]
+        poll_interval = options["poll_interval"]
+
+        if options["once"]:
+            processed = run_worker(poll_interval=poll_interval, once=True, tasks=tasks)
+            self.stdout.write(self.style.SUCCESS(f"✓ Processed {processed} jobs"))
+            return
+
+        workers = max(1, options["workers"])
+        if "fork" in multiprocessing.get_all_start_methods():
+            self._run_processes(workers, poll_interval, tasks)
+        else:
+            # Windows (dev): không fork được, chạy worker bằng thread trong cùng process
+            self._run_threads(workers, poll_interval, tasks)
+
+    def _install_signal_handlers(self, on_stop) -> None:
+        def stop(signum, frame):
+            if not self._stopping:
+                self.stdout.write("Stopping workers (waiting for running jobs)...")
+            self._stopping = True
+            on_stop()
+
+        self._stopping = False
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+    def _run_processes(self, workers: int, poll_interval: float, tasks) -> None:
+        ctx = multiprocessing.get_context("fork")
+        self._install_signal_handlers(lambda: None)
+
+        def spawn(index: int):
+            # Connection DB không được dùng chung giữa process cha và con
+            connections.close_all()
+            process = ctx.Process(
+                target=_worker_process,
+                args=(index, poll_interval, tasks),
+                name=f"job-worker-{index}",
+            )
+            process.start()
+            return process
+
+        processes = {index: spawn(index) for index in range(workers)}
+        self.stdout.write(f"Started {workers} job workers (poll={poll_interval}s)")
+
+        while not self._stopping:
+            for index, process in list(processes.items()):
+                if not process.is_alive() and not self._stopping:
+                    self.stderr.write(f"Worker {index} exited with code {process.exitcode}, restarting")
+                    processes[index] = spawn(index)
+            time.sleep(1)
+
+        # SIGTERM -> worker chạy nốt job hiện tại rồi thoát
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + SHUTDOWN_GRACE_SECONDS
+        for process in processes.values():
+            process.join(timeout=max(0, deadline - time.monotonic()))
+        for process in processes.values():
+            if process.is_alive():
+                self.stderr.write(f"Killing worker {process.name} (job did not finish in time)")
+                process.kill()
+                process.join()
+        self.stdout.write(self.style.SUCCESS("✓ Workers stopped"))
+
+    def _run_threads(self, workers: int, poll_interval: float, tasks) -> None:
+        stop_event = threading.Event()
+        self._install_signal_handlers(stop_event.set)
+        threads = [
+            threading.Thread(
+                target=run_worker,
+                kwargs={
+                    "worker_id": f"{default_worker_id()}#{index}",
+                    "poll_interval": poll_interval,
+                    "stop_event": stop_event,
+                    "tasks": tasks,
+                },
+                name=f"job-worker-{index}",
+                daemon=True,
+            )
+            for index in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Started {workers} job worker threads (poll={poll_interval}s)")
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+        self.stdout.write(self.style.SUCCESS("✓ Workers stopped"))
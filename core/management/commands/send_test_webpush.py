@@ -4,7 +4,7 @@ from django.core.management.base import BaseCommand, CommandParser
 
 from core.models import WebPushSubscription
 from core.services.notifications import (
-    send_webpush_to_subscription,
+    send_webpush_bulk,
     send_webpush_to_user_id,
 )
 
@@ -85,18 +85,12 @@ class Command(BaseCommand):
             self.stdout.write(
                 f"Gửi test WebPush tới TẤT CẢ subscription active với title='{title}', body='{body}'..."
             )
-            qs = WebPushSubscription.objects.filter(is_active=True)
-            total = qs.count()
-            success = 0
-            for sub in qs:
-                if send_webpush_to_subscription(
-                    sub,
-                    title,
-                    body,
-                    data=extra_data,
-                    url=url,
-                ):
-                    success += 1
+            message = {"title": title, "body": body, "data": extra_data, "url": url}
+            results = send_webpush_bulk(
+                (sub, message) for sub in WebPushSubscription.objects.filter(is_active=True)
+            )
+            total = len(results)
+            success = sum(1 for ok in results if ok)
 
             self.stdout.write(
                 self.style.SUCCESS(
@@ -0,0 +1,59 @@
+# core/middleware/perf_budget_middleware.py
+"""
+Middleware đo SQL queries / outbound HTTP calls / wall time của từng request.
+
+- Gắn header Server-Timing (db, ext, total) vào response.
+- Log WARNING khi request vượt budget (settings.PERF_BUDGET).
+
+Settings:
+    PERF_BUDGET = {
+        "ENABLED": True,
+        "SERVER_TIMING": True,
+        "DEFAULT": {"max_queries": 50, "max_sql_ms": 500, "max_external_calls": 10,
+                    "max_external_ms": 3000, "max_total_ms": 2000},
+        # Override theo view name (namespace:url_name)
+        "VIEWS": {"products:variant_list": {"max_queries": 100}},
+    }
+"""
+
+import logging
+
+from django.conf import settings
+
+from core.base.perf_tracker import track
+
+logger = logging.getLogger(__name__)
+
+
+class PerfBudgetMiddleware:
+    """
+    Middleware đo chi phí mỗi request và cảnh báo khi vượt budget.
+    Nên đặt đầu MIDDLEWARE để tính cả queries của session / auth.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = getattr(settings, "PERF_BUDGET", {})
+        if not config.get("ENABLED", True):
+            return self.get_response(request)
+
+        with track() as perf:
+            response = self.get_response(request)
+
+        if config.get("SERVER_TIMING", True):
+            existing = response.get("Server-Timing")
+            timing = perf.server_timing()
+            response["Server-Timing"] = f"{existing}, {timing}" if existing else timing
+
+        match = getattr(request, "resolver_match", None)
+        view_name = match.view_name if match else ""
+        budget = {**config.get("DEFAULT", {}), **config.get("VIEWS", {}).get(view_name, {})}
+        violations = perf.over_budget(budget)
+        if violations:
+            logger.warning(
+                f"[PerfBudget] {request.method} {request.path} ({view_name or '-'}) over budget: "
+                f"{', '.join(violations)} | {perf.as_dict()}"
+            )
+        return response
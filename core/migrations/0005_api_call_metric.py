@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_create_shared_cache_table'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiCallMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(help_text='Đầu giờ (UTC) của bucket')),
+                ('client', models.CharField(help_text='Repository class, vd: SapoCoreRepository', max_length=50)),
+                ('method', models.CharField(help_text='HTTP method', max_length=10)),
+                ('path_template', models.CharField(help_text='Path đã thay ID bằng {id}, vd: orders/{id}.json', max_length=255)),
+                ('calls', models.IntegerField(default=0, help_text='Số lần gọi')),
+                ('errors', models.IntegerField(default=0, help_text='Số lần lỗi (exception hoặc HTTP >= 400)')),
+                ('retries', models.IntegerField(default=0, help_text='Tổng số lần retry')),
+                ('total_ms', models.BigIntegerField(default=0, help_text='Tổng thời gian (ms, gồm retry)')),
+                ('max_ms', models.IntegerField(default=0, help_text='Thời gian lâu nhất (ms)')),
+                ('latency_buckets', models.JSONField(blank=True, default=list, help_text='Số call theo bucket LATENCY_BUCKETS_MS (+1 bucket cuối cho phần vượt)')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'API Call Metric',
+                'verbose_name_plural': 'API Call Metrics',
+                'db_table': 'core_api_call_metric',
+                'indexes': [models.Index(fields=['hour'], name='core_api_ca_hour_0ba8ff_idx')],
+                'constraints': [models.UniqueConstraint(fields=('hour', 'client', 'method', 'path_template'), name='uniq_api_call_metric_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_api_call_metric'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiRateLimit',
+            fields=[
+                ('host', models.CharField(help_text='Upstream host, vd: sisapsan.mysapogo.com', max_length=255, primary_key=True, serialize=False)),
+                ('tat', models.FloatField(default=0, help_text='Theoretical arrival time (epoch giây) của request tiếp theo')),
+            ],
+            options={
+                'verbose_name': 'API Rate Limit',
+                'verbose_name_plural': 'API Rate Limits',
+                'db_table': 'core_api_rate_limit',
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:43
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_api_rate_limit'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackgroundJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(db_index=True, help_text='Tên task đã đăng ký, vd: products.refresh_sales_forecast', max_length=100)),
+                ('payload', models.JSONField(blank=True, default=dict, help_text='Tham số (kwargs) truyền cho task')),
+                ('status', models.CharField(choices=[('queued', 'Chờ chạy'), ('running', 'Đang chạy'), ('succeeded', 'Hoàn thành'), ('failed', 'Thất bại'), ('cancelled', 'Đã hủy')], db_index=True, default='queued', max_length=20)),
+                ('priority', models.IntegerField(default=0, help_text='Lớn hơn chạy trước')),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Số lần đã chạy')),
+                ('max_attempts', models.PositiveIntegerField(default=1, help_text='Số lần chạy tối đa (gồm retry)')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, help_text='Chỉ chạy sau thời điểm này (retry backoff)')),
+                ('locked_by', models.CharField(blank=True, help_text='Worker đang chạy job (host:pid)', max_length=100)),
+                ('heartbeat_at', models.DateTimeField(blank=True, help_text='Lần cuối worker báo còn sống', null=True)),
+                ('cancel_requested', models.BooleanField(default=False, help_text='Đã yêu cầu hủy, worker dừng ở checkpoint kế tiếp')),
+                ('progress', models.JSONField(blank=True, default=dict, help_text='Tiến trình do task tự cập nhật')),
+                ('result', models.JSONField(blank=True, help_text='Kết quả trả về của task', null=True)),
+                ('error', models.TextField(blank=True, help_text='Lỗi của lần chạy cuối')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='background_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Background Job',
+                'verbose_name_plural': 'Background Jobs',
+                'db_table': 'core_background_job',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', '-priority', 'run_after'], name='core_bgjob_claim_idx')],
+            },
+        ),
+    ]
@@ -280,4 +280,139 @@ class NotificationDelivery(models.Model):
         unique_together = [["notification", "user", "channel"]]
 
     def __str__(self) -> str:
-        return f"Delivery #{self.id}: {self.notification.title} -> {self.user.username} ({self.channel})"
\ No newline at end of file
+        return f"Delivery #{self.id}: {self.notification.title} -> {self.user.username} ({self.channel})"
+
+
+class ApiCallMetric(models.Model):
+    """
+    Thống kê outbound API calls (Sapo / Shopee) theo (giờ, client, method, path template).
+    Ghi bởi core.services.api_metrics (gom trong process rồi flush định kỳ).
+    """
+
+    # Cận trên (ms) của các bucket histogram latency; bucket cuối = lớn hơn bucket áp chót
+    LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    hour = models.DateTimeField(help_text="Đầu giờ (UTC) của bucket")
+    client = models.CharField(max_length=50, help_text="Repository class, vd: SapoCoreRepository")
+    method = models.CharField(max_length=10, help_text="HTTP method")
+    path_template = models.CharField(
+        max_length=255,
+        help_text="Path đã thay ID bằng {id}, vd: orders/{id}.json",
+    )
+    calls = models.IntegerField(default=0, help_text="Số lần gọi")
+    errors = models.IntegerField(default=0, help_text="Số lần lỗi (exception hoặc HTTP >= 400)")
+    retries = models.IntegerField(default=0, help_text="Tổng số lần retry")
+    total_ms = models.BigIntegerField(default=0, help_text="Tổng thời gian (ms, gồm retry)")
+    max_ms = models.IntegerField(default=0, help_text="Thời gian lâu nhất (ms)")
+    latency_buckets = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Số call theo bucket LATENCY_BUCKETS_MS (+1 bucket cuối cho phần vượt)",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "core_api_call_metric"
+        verbose_name = "API Call Metric"
+        verbose_name_plural = "API Call Metrics"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hour", "client", "method", "path_template"],
+                name="uniq_api_call_metric_bucket",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["hour"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.client} {self.method} {self.path_template} @ {self.hour:%Y-%m-%d %H}h: {self.calls}"
+
+
+class ApiRateLimit(models.Model):
+    """
+    State token bucket (GCRA) của rate limiter outbound API theo host, dùng chung giữa các process.
+    Ghi bởi core.base.throttling.DatabaseRateStore bằng UPDATE atomic.
+    """
+
+    host = models.CharField(max_length=255, primary_key=True, help_text="Upstream host, vd: sisapsan.mysapogo.com")
+    tat = models.FloatField(
+        default=0,
+        help_text="Theoretical arrival time (epoch giây) của request tiếp theo",
+    )
+
+    class Meta:
+        db_table = "core_api_rate_limit"
+        verbose_name = "API Rate Limit"
+        verbose_name_plural = "API Rate Limits"
+
+    def __str__(self) -> str:
+        return f"{self.host}: {self.tat:.3f}"
+
+
+class BackgroundJob(models.Model):
+    """
+    Job chạy nền (hàng đợi trong DB, không cần broker).
+
+    Tạo bằng core.services.job_queue.enqueue(), chạy bởi `python manage.py run_workers`:
+    worker lấy job bằng SELECT ... FOR UPDATE SKIP LOCKED theo priority, gửi heartbeat khi chạy,
+    retry với backoff khi lỗi và dừng khi được yêu cầu hủy.
+    """
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+    STATUS_CANCELLED = "cancelled"
+
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, "Chờ chạy"),
+        (STATUS_RUNNING, "Đang chạy"),
+        (STATUS_SUCCEEDED, "Hoàn thành"),
+        (STATUS_FAILED, "Thất bại"),
+        (STATUS_CANCELLED, "Đã hủy"),
+    )
+
+    ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+    FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED, STATUS_CANCELLED)
+
+    task = models.CharField(max_length=100, db_index=True, help_text="Tên task đã đăng ký, vd: products.refresh_sales_forecast")
+    payload = models.JSONField(default=dict, blank=True, help_text="Tham số (kwargs) truyền cho task")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    priority = models.IntegerField(default=0, help_text="Lớn hơn chạy trước")
+
+    attempts = models.PositiveIntegerField(default=0, help_text="Số lần đã chạy")
+    max_attempts = models.PositiveIntegerField(default=1, help_text="Số lần chạy tối đa (gồm retry)")
+    run_after = models.DateTimeField(default=timezone.now, help_text="Chỉ chạy sau thời điểm này (retry backoff)")
+
+    locked_by = models.CharField(max_length=100, blank=True, help_text="Worker đang chạy job (host:pid)")
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text="Lần cuối worker báo còn sống")
+    cancel_requested = models.BooleanField(default=False, help_text="Đã yêu cầu hủy, worker dừng ở checkpoint kế tiếp")
+
+    progress = models.JSONField(default=dict, blank=True, help_text="Tiến trình do task tự cập nhật")
+    result = models.JSONField(null=True, blank=True, help_text="Kết quả trả về của task")
+    error = models.TextField(blank=True, help_text="Lỗi của lần chạy cuối")
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="background_jobs",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "core_background_job"
+        ordering = ["-created_at"]
+        verbose_name = "Background Job"
+        verbose_name_plural = "Background Jobs"
+        indexes = [
+            models.Index(fields=["status", "-priority", "run_after"], name="core_bgjob_claim_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Job #{self.id} {self.task} ({self.status})"
@@ -4,26 +4,33 @@ Sapo Client package.
 Provides SapoClient for accessing Sapo Core and Marketplace APIs.
 """
 
-from typing import Optional
+import threading
+
 from .client import SapoClient
 from .filters import BaseFilter
 from .repositories import SapoCoreRepository, SapoMarketplaceRepository, SapoPromotionRepository
+from .session_pool import token_state
 
-# Singleton instance
-_sapo_client: Optional[SapoClient] = None
+# 1 SapoClient / thread: requests.Session + state flags không bị các thread song song
+# (batch in đơn, thread pool) tranh nhau; token dùng chung qua session_pool.token_state
+_local = threading.local()
 
 
 def get_sapo_client() -> SapoClient:
     """
-    Get singleton SapoClient instance (dùng chung toàn project).
+    Get SapoClient của thread hiện tại (dùng chung toàn project).
+    
+    Client của thread mới adopt token đã validate trong process, không load lại DB
+    hay test token remote.
     
     Returns:
         SapoClient instance
     """
-    global _sapo_client
-    if _sapo_client is None:
-        _sapo_client = SapoClient()
-    return _sapo_client
+    client = getattr(_local, "client", None)
+    if client is None:
+        client = SapoClient()
+        _local.client = client
+    return client
 
 
 __all__ = [
@@ -33,4 +40,5 @@ __all__ = [
     "SapoMarketplaceRepository",
     "SapoPromotionRepository",
     "get_sapo_client",
+    "token_state",
 ]
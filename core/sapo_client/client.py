@@ -4,6 +4,7 @@ Sapo Client - Main client để authenticate và access Sapo APIs.
 Quản lý 2 sessions riêng cho Core API và Marketplace API.
 """
 
+import hashlib
 import json
 import os
 import time
@@ -36,6 +37,7 @@ from core.system_settings import SAPO_BASIC, SAPO_TMDT
 
 from .repositories import SapoCoreRepository, SapoMarketplaceRepository, SapoPromotionRepository
 from .exceptions import SeleniumLoginInProgressException
+from .session_pool import configure_session, token_state
 
 logger = logging.getLogger(__name__)
 
@@ -51,6 +53,15 @@ def debug_print(*args, **kwargs):
 SELENIUM_LOCK_KEY = "sapo_selenium_login_lock"
 SELENIUM_LOCK_TIMEOUT = 300  # 5 minutes
 
+# Thời gian nhớ kết quả validate token (shared cache) để các worker không test lại remote
+TOKEN_VALID_CACHE_TIMEOUT = 300  # 5 minutes
+
+# Chu kỳ (giây) mỗi process so expires_at của token đang dùng với DB để nhận token đã refresh
+TOKEN_ROTATION_CHECK_SECONDS = 60
+
+# Key SapoToken trong DB theo loại session
+TOKEN_DB_KEYS = {"core": "loginss", "tmdt": "tmdt"}
+
 
 class SapoClient:
     """
@@ -60,8 +71,11 @@ class SapoClient:
     - core_session: Cho Sapo Core API (sisapsan.mysapogo.com/admin)
     - tmdt_session: Cho Sapo Marketplace API (market-place.sapoapps.vn)
     
+    Thường lấy qua get_sapo_client() (1 instance / thread, token dùng chung qua
+    session_pool.token_state) thay vì tự khởi tạo.
+    
     Usage:
-        sapo = SapoClient()
+        sapo = get_sapo_client()
         
         # Access Core API
         orders = sapo.core.list_orders_raw(limit=50, location_id=241737)
@@ -75,8 +89,8 @@ class SapoClient:
     
     def __init__(self):
         """Initialize Sapo client với 2 sessions."""
-        self.core_session = requests.Session()
-        self.tmdt_session = requests.Session()
+        self.core_session = configure_session(requests.Session())
+        self.tmdt_session = configure_session(requests.Session())
         
         # Add default headers cho core session (cần thiết cho API calls)
         self.core_session.headers.update({
@@ -92,6 +106,11 @@ class SapoClient:
         self.tmdt_loaded = False
         self.tmdt_valid = False
         
+        # Version của token dùng chung (session_pool.token_state) mà session đang mang
+        self._token_versions: Dict[str, int] = {"core": 0, "tmdt": 0}
+        # SapoToken.expires_at của token đã load vào session
+        self._token_expires: Dict[str, Any] = {"core": None, "tmdt": None}
+        
         # Repositories (lazy init)
         self._core_repo: Optional[SapoCoreRepository] = None
         self._marketplace_repo: Optional[SapoMarketplaceRepository] = None
@@ -116,6 +135,7 @@ class SapoClient:
             return None
         
         logger.debug(f"[SapoClient] Core token OK, expires at {token.expires_at}")
+        self._token_expires["core"] = token.expires_at
         # Extract cookies from headers if present
         headers = dict(token.headers)
         cookie_header = headers.pop("cookie", None) or headers.pop("Cookie", None)
@@ -159,6 +179,7 @@ class SapoClient:
             },
         )
         self.core_session.headers.update(headers_with_sapo)
+        self._token_expires["core"] = expires_at
         logger.debug(f"[SapoClient] Core token saved with x-sapo-client, expires at {expires_at}")
     
     # ========================= TOKEN MANAGEMENT (MARKETPLACE) =========================
@@ -176,6 +197,7 @@ class SapoClient:
             return None
         
         logger.debug(f"[SapoClient] Marketplace token OK, expires at {token.expires_at}")
+        self._token_expires["tmdt"] = token.expires_at
         return token.headers
     
     def _save_tmdt_token(self, headers: Dict[str, Any], lifetime_hours: int = 6):
@@ -220,6 +242,40 @@ class SapoClient:
     
     # ========================= TOKEN VALIDATION =========================
     
+    def _token_valid_cache_key(self, kind: str, headers: Dict[str, Any]) -> str:
+        """Cache key (shared giữa các worker) cho kết quả validate 1 token cụ thể."""
+        digest = hashlib.sha1(
+            json.dumps(headers, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        return f"sapo_token_valid:{kind}:{digest}"
+    
+    def _is_core_token_valid(self, headers: Dict[str, Any]) -> bool:
+        """
+        Validate core token, dùng kết quả đã cache (shared cache) nếu worker khác
+        vừa validate cùng token trong TOKEN_VALID_CACHE_TIMEOUT giây.
+        """
+        cache_key = self._token_valid_cache_key("core", headers)
+        if cache.get(cache_key):
+            logger.debug("[SapoClient] Core token valid (shared cache) ✓")
+            return True
+        
+        valid = self._check_token_valid_remote()
+        if valid:
+            cache.set(cache_key, True, TOKEN_VALID_CACHE_TIMEOUT)
+        return valid
+    
+    def _is_tmdt_token_valid(self, headers: Dict[str, Any]) -> bool:
+        """Validate marketplace token, dùng kết quả đã cache nếu có (xem _is_core_token_valid)."""
+        cache_key = self._token_valid_cache_key("tmdt", headers)
+        if cache.get(cache_key):
+            logger.debug("[SapoClient] Marketplace token valid (shared cache) ✓")
+            return True
+        
+        valid = self._check_tmdt_valid_remote(headers)
+        if valid:
+            cache.set(cache_key, True, TOKEN_VALID_CACHE_TIMEOUT)
+        return valid
+    
     def _check_token_valid_remote(self) -> bool:
         """Test core token bằng cách gọi /orders.json."""
         logger.debug("[SapoClient] Testing core token...")
@@ -306,6 +362,69 @@ class SapoClient:
             debug_print(f"   - Traceback: {traceback.format_exc()}")
             return False
     
+    # ========================= SHARED TOKEN STATE =========================
+    
+    def _mark_token_valid(self, kind: str):
+        """Đánh dấu session (core/tmdt) đã valid và publish token cho client của thread khác."""
+        setattr(self, f"{kind}_valid", True)
+        session = self.core_session if kind == "core" else self.tmdt_session
+        self._token_versions[kind] = token_state.publish(kind, session, self._token_expires[kind])
+    
+    def _adopt_shared_token(self, kind: str) -> bool:
+        """
+        Dùng token mà client khác trong process đã validate (không đọc DB, không test remote).
+        
+        Returns:
+            True nếu đã adopt
+        """
+        session = self.core_session if kind == "core" else self.tmdt_session
+        version = token_state.adopt(kind, session)
+        if version is None:
+            return False
+        self._token_versions[kind] = version
+        self._token_expires[kind] = token_state.expires_at(kind)
+        setattr(self, f"{kind}_valid", True)
+        if kind == "core":
+            self.core_initialized = True
+        logger.debug(f"[SapoClient] Adopted shared {kind} token v{version}")
+        return True
+    
+    def _sync_shared_token(self, kind: str):
+        """
+        Đồng bộ với token dùng chung: nếu client khác đã đổi token (login lại / invalidate sau 401)
+        thì adopt token mới, hoặc reset state để _ensure_* load lại.
+        """
+        self._check_token_rotation(kind)
+        if token_state.version(kind) == self._token_versions[kind]:
+            return
+        if self._adopt_shared_token(kind):
+            return
+        setattr(self, f"{kind}_valid", False)
+        if kind == "core":
+            self.core_initialized = False
+    
+    def _check_token_rotation(self, kind: str):
+        """
+        Token trong DB đã được refresh (expires_at mới hơn token đang dùng) -> bỏ token dùng chung
+        để các client load token mới trước khi token cũ hết hạn (tránh 401 + đợi login).
+        Throttle TOKEN_ROTATION_CHECK_SECONDS / process.
+        """
+        if not token_state.rotation_check_due(kind, TOKEN_ROTATION_CHECK_SECONDS):
+            return
+        try:
+            db_expires_at = (
+                SapoToken.objects.filter(key=TOKEN_DB_KEYS[kind])
+                .values_list("expires_at", flat=True)
+                .first()
+            )
+        except Exception as e:
+            logger.debug(f"[SapoClient] Token rotation check failed: {e}")
+            return
+        current = token_state.expires_at(kind)
+        if db_expires_at and db_expires_at > timezone.now() and (current is None or db_expires_at > current):
+            logger.info(f"[SapoClient] {kind} token refreshed in DB (expires {db_expires_at}), reloading")
+            token_state.clear(kind)
+    
     # ========================= ENSURE AUTHENTICATION =========================
     
     def _ensure_logged_in(self):
@@ -314,14 +433,17 @@ class SapoClient:
             logger.debug("[SapoClient] Core session already valid")
             return
         
+        if self._adopt_shared_token("core"):
+            return
+        
         if not self.core_initialized:
             logger.debug("[SapoClient] First-time init, loading core token from DB")
             headers = self._load_token_from_db()
             self.core_initialized = True
             
-            if headers and self._check_token_valid_remote():
+            if headers and self._is_core_token_valid(headers):
                 logger.info("[SapoClient] Core session ready (from DB)")
-                self.core_valid = True
+                self._mark_token_valid("core")
                 return
         
         # Trước khi trigger login mới, kiểm tra lại xem có token trong DB không
@@ -332,9 +454,9 @@ class SapoClient:
             # Thử load token một lần nữa để tránh trigger login không cần thiết
             logger.debug("[SapoClient] Lock active, checking if token is ready...")
             headers = self._load_token_from_db()
-            if headers and self._check_token_valid_remote():
+            if headers and self._is_core_token_valid(headers):
                 logger.info("[SapoClient] Token found in DB after lock check, using it")
-                self.core_valid = True
+                self._mark_token_valid("core")
                 return
             
             logger.warning("[SapoClient] Selenium login already in progress")
@@ -349,9 +471,9 @@ class SapoClient:
         time.sleep(2)  # Đợi 2 giây để DB commit xong nếu login vừa hoàn thành
         
         headers = self._load_token_from_db()
-        if headers and self._check_token_valid_remote():
+        if headers and self._is_core_token_valid(headers):
             logger.info("[SapoClient] Token found in DB, using it (avoid duplicate login)")
-            self.core_valid = True
+            self._mark_token_valid("core")
             self.core_initialized = True
             return
         
@@ -374,6 +496,9 @@ class SapoClient:
             debug_print("   ✅ Session already valid, returning")
             return
         
+        if self._adopt_shared_token("tmdt"):
+            return
+        
         debug_print("   - Loading token from DB...")
         headers = self._load_tmdt_token()
         
@@ -384,11 +509,11 @@ class SapoClient:
             debug_print(f"   ✓ Token loaded from DB (expires_at check passed)")
             debug_print(f"   - Headers keys: {list(headers.keys())[:10]}...")  # Show first 10 keys
         
-        if headers and self._check_tmdt_valid_remote(headers):
+        if headers and self._is_tmdt_token_valid(headers):
             logger.info("[SapoClient] Marketplace session ready (from DB)")
             debug_print("   ✅ Token validation passed, applying to session")
             self._apply_tmdt_headers_to_session(headers)
-            self.tmdt_valid = True
+            self._mark_token_valid("tmdt")
             debug_print("   ✅ tmdt_valid set to True")
             return
         
@@ -408,11 +533,11 @@ class SapoClient:
             while elapsed < wait_timeout:
                 # Kiểm tra xem token đã sẵn sàng chưa
                 headers = self._load_tmdt_token()
-                if headers and self._check_tmdt_valid_remote(headers):
+                if headers and self._is_tmdt_token_valid(headers):
                     logger.info("[SapoClient] Marketplace token found while waiting, using it")
                     debug_print("   ✅ Token found, applying to session")
                     self._apply_tmdt_headers_to_session(headers)
-                    self.tmdt_valid = True
+                    self._mark_token_valid("tmdt")
                     return
                 
                 # Kiểm tra xem lock còn active không
@@ -423,11 +548,11 @@ class SapoClient:
                     
                     # Lock đã release, kiểm tra token một lần nữa
                     headers = self._load_tmdt_token()
-                    if headers and self._check_tmdt_valid_remote(headers):
+                    if headers and self._is_tmdt_token_valid(headers):
                         logger.info("[SapoClient] Marketplace token found after lock release, using it")
                         debug_print("   ✅ Token found, applying to session")
                         self._apply_tmdt_headers_to_session(headers)
-                        self.tmdt_valid = True
+                        self._mark_token_valid("tmdt")
                         return
                     # Nếu không có token, thoát loop và tiếp tục trigger login
                     break
@@ -450,11 +575,11 @@ class SapoClient:
         # (có thể background thread khác vừa hoàn tất)
         debug_print("   - Checking token one more time before triggering login...")
         headers = self._load_tmdt_token()
-        if headers and self._check_tmdt_valid_remote(headers):
+        if headers and self._is_tmdt_token_valid(headers):
             logger.info("[SapoClient] Marketplace token found in DB, using it (avoid duplicate login)")
             debug_print("   ✅ Token found, applying to session")
             self._apply_tmdt_headers_to_session(headers)
-            self.tmdt_valid = True
+            self._mark_token_valid("tmdt")
             return
         
         # Reset core để force browser login (sẽ capture cả marketplace token)
@@ -493,16 +618,16 @@ class SapoClient:
                 # Update state của instance sau khi login thành công
                 # Load token vào session và set core_valid = True
                 headers = self._load_token_from_db()
-                if headers and self._check_token_valid_remote():
-                    self.core_valid = True
+                if headers and self._is_core_token_valid(headers):
+                    self._mark_token_valid("core")
                     self.core_initialized = True
                     logger.info("[BackgroundLogin] Core instance state updated ✓")
                 
                 # Cũng update marketplace token state nếu có
                 tmdt_headers = self._load_tmdt_token()
-                if tmdt_headers and self._check_tmdt_valid_remote(tmdt_headers):
+                if tmdt_headers and self._is_tmdt_token_valid(tmdt_headers):
                     self._apply_tmdt_headers_to_session(tmdt_headers)
-                    self.tmdt_valid = True
+                    self._mark_token_valid("tmdt")
                     logger.info("[BackgroundLogin] Marketplace instance state updated ✓")
                 
                 logger.info("[BackgroundLogin] Selenium login complete ✓")
@@ -1320,9 +1445,11 @@ class SapoClient:
         except Exception as e:
             logger.error(f"[SapoClient] Error deleting token: {e}")
         
-        # Reset state flags
+        # Reset state flags (và token dùng chung để client của thread khác không dùng token cũ)
         self.core_valid = False
         self.core_initialized = False
+        token_state.clear("core")
+        self._token_versions["core"] = token_state.version("core")
         
         # Clear session headers và cookies
         self.core_session.headers.clear()
@@ -1346,6 +1473,7 @@ class SapoClient:
         Returns:
             SapoCoreRepository instance
         """
+        self._sync_shared_token("core")
         self._ensure_logged_in()
         
         # Đảm bảo x-sapo-client luôn có (fix token cũ trong DB)
@@ -1368,6 +1496,7 @@ class SapoClient:
         Returns:
             SapoMarketplaceRepository instance
         """
+        self._sync_shared_token("tmdt")
         self._ensure_tmdt_headers()
         
         if not self._marketplace_repo:
@@ -1386,6 +1515,7 @@ class SapoClient:
         Returns:
             SapoPromotionRepository instance
         """
+        self._sync_shared_token("core")
         self._ensure_logged_in()
         self._ensure_sapo_headers()
         
@@ -25,8 +25,24 @@ class SapoCoreRepository(BaseRepository):
     - /products/{id}.json - Get product
     - /variants/{id}.json - Get variant
     - /shipments.json - List shipments
+    
+    GET trùng lặp đồng thời được gộp (single-flight); variant detail cache vài giây và bị xóa
+    khi PUT/POST lên product tương ứng. Order detail không cache (luồng đọc ngay sau khi ghi
+    như print_now / đóng gói cần trạng thái mới nhất), chỉ gộp single-flight.
     """
     
+    single_flight = True
+    cache_ttls = {
+        "variants/": 15,
+    }
+    cache_invalidates = {
+        # Fulfillment / shipment nằm trong order JSON: ghi xong thì GET order đang chạy không được dùng chung
+        "fulfillments": ["orders/"],
+        "shipments": ["orders/"],
+        # PUT product ghi cả variants
+        "products": ["variants/"],
+    }
+    
     def __init__(self, session: requests.Session, base_url: str, client=None):
         """
         Initialize repository.
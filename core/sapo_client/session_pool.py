@@ -0,0 +1,126 @@
+# core/sapo_client/session_pool.py
+"""
+State dùng chung cho các SapoClient trong 1 process.
+
+get_sapo_client() trả về 1 SapoClient riêng cho mỗi thread (requests.Session không chia sẻ
+giữa các thread in đơn / forecast song song), nhưng token chỉ được load + validate 1 lần:
+client nào validate xong thì publish headers/cookies vào SharedTokenState, client của thread
+khác adopt lại ngay (không đọc DB, không gọi API test token). Khi token trong DB được refresh
+(command refresh_sapo_tokens), mỗi process phát hiện qua expires_at (tối đa 1 query / phút).
+
+Mỗi session được mount ThrottledHTTPAdapter có connection pool đủ lớn cho các luồng song song
+(paginator, batch in đơn) dùng chung 1 session mà không bị "Connection pool is full".
+"""
+
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import logging
+import threading
+import time
+
+import requests
+
+from core.base.throttling import mount_throttled_adapter
+
+logger = logging.getLogger(__name__)
+
+# Số host giữ pool riêng / số connection keep-alive tối đa mỗi host
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 32
+
+TOKEN_KINDS = ("core", "tmdt")
+
+
+def configure_session(session: requests.Session) -> requests.Session:
+    """
+    Mount adapter với connection pool (keep-alive) theo POOL_CONNECTIONS / POOL_MAXSIZE,
+    kèm rate limit + circuit breaker theo host (core.base.throttling).
+    """
+    return mount_throttled_adapter(session, POOL_CONNECTIONS, POOL_MAXSIZE)
+
+
+class SharedTokenState:
+    """
+    Headers + cookies đã validate của core / tmdt session, kèm version tăng mỗi lần đổi.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {kind: 0 for kind in TOKEN_KINDS}
+        self._snapshots: Dict[str, Optional[Tuple[Dict[str, str], Dict[str, str]]]] = {
+            kind: None for kind in TOKEN_KINDS
+        }
+        # SapoToken.expires_at của token đang publish (để phát hiện token đã được refresh trong DB)
+        self._expires_at: Dict[str, Optional[datetime]] = {kind: None for kind in TOKEN_KINDS}
+        self._last_rotation_check: Dict[str, float] = {kind: 0.0 for kind in TOKEN_KINDS}
+
+    def version(self, kind: str) -> int:
+        with self._lock:
+            return self._versions[kind]
+
+    def publish(self, kind: str, session: requests.Session, expires_at: Optional[datetime] = None) -> int:
+        """Lưu headers/cookies hiện tại của session. Returns: version mới."""
+        snapshot = (dict(session.headers), requests.utils.dict_from_cookiejar(session.cookies))
+        with self._lock:
+            self._versions[kind] += 1
+            self._snapshots[kind] = snapshot
+            self._expires_at[kind] = expires_at
+            logger.debug(f"[SharedTokenState] Published {kind} token v{self._versions[kind]}")
+            return self._versions[kind]
+
+    def adopt(self, kind: str, session: requests.Session) -> Optional[int]:
+        """
+        Áp headers/cookies đã publish vào session.
+
+        Returns:
+            Version đã áp, hoặc None nếu chưa có token nào được publish
+        """
+        with self._lock:
+            snapshot = self._snapshots[kind]
+            version = self._versions[kind]
+        if snapshot is None:
+            return None
+        headers, cookies = snapshot
+        session.headers.clear()
+        session.headers.update(headers)
+        session.cookies.clear()
+        session.cookies.update(cookies)
+        return version
+
+    def clear(self, kind: str) -> None:
+        """Bỏ token đã publish (vd sau 401); client khác sẽ thấy version đổi và load lại."""
+        with self._lock:
+            self._versions[kind] += 1
+            self._snapshots[kind] = None
+            self._expires_at[kind] = None
+
+    def has_token(self, kind: str) -> bool:
+        with self._lock:
+            return self._snapshots[kind] is not None
+
+    def expires_at(self, kind: str) -> Optional[datetime]:
+        with self._lock:
+            return self._expires_at[kind]
+
+    def rotation_check_due(self, kind: str, interval: float) -> bool:
+        """True tối đa 1 lần / interval giây mỗi process (throttle việc so token với DB)."""
+        now = time.monotonic()
+        with self._lock:
+            if self._snapshots[kind] is None or now - self._last_rotation_check[kind] < interval:
+                return False
+            self._last_rotation_check[kind] = now
+            return True
+
+
+token_state = SharedTokenState()
+
+
+# ========================= EXPORTS =========================
+
+__all__ = [
+    'POOL_CONNECTIONS',
+    'POOL_MAXSIZE',
+    'configure_session',
+    'SharedTokenState',
+    'token_state',
+]
@@ -0,0 +1,251 @@
+# core/services/api_metrics.py
+"""
+Instrumentation cho outbound API calls của các repository (Sapo Core / Marketplace / Promotion, Shopee).
+
+BaseRepository._request gọi record_api_call() sau mỗi lời gọi (gồm cả retry). Số liệu được gom
+trong process theo (giờ, client, method, path template) rồi flush vào ApiCallMetric định kỳ
+(FLUSH_INTERVAL_SECONDS) và khi process thoát, để mọi gunicorn worker / command cùng ghi 1 bảng.
+
+Flush định kỳ chạy trên 1 thread nền (connection DB riêng, autocommit, đóng sau khi ghi) -
+không ghi trong transaction / connection của request đang gọi API và không cộng vào query budget.
+
+Xem số liệu:
+- Django admin: Core > API Call Metrics
+- python manage.py api_metrics --hours 24
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import atexit
+import bisect
+import logging
+import re
+import threading
+import time
+
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+from core.models import ApiCallMetric
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_SECONDS = 30
+LATENCY_BUCKETS_MS = ApiCallMetric.LATENCY_BUCKETS_MS
+
+# Segment toàn số (ID) trong path: orders/123/fulfillments/5.json -> orders/{id}/fulfillments/{id}.json
+_ID_SEGMENT_RE = re.compile(r'(^|/)\d+(?=/|\.|$)')
+
+_lock = threading.Lock()
+_pending: Dict[Tuple[datetime, str, str, str], Dict[str, Any]] = {}
+_last_flush = time.monotonic()
+_flush_thread: Optional[threading.Thread] = None
+
+
+def path_template(path: str) -> str:
+    """Chuẩn hóa path để gom metrics: bỏ query string, thay ID bằng {id}."""
+    path = path.lstrip('/').split('?', 1)[0]
+    return _ID_SEGMENT_RE.sub(r'\1{id}', path)[:255]
+
+
+def _empty_stats() -> Dict[str, Any]:
+    return {
+        "calls": 0, "errors": 0, "retries": 0, "total_ms": 0, "max_ms": 0,
+        "latency_buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+    }
+
+
+def _merge(target: Dict[str, Any], source: Dict[str, Any]) -> None:
+    for field in ("calls", "errors", "retries", "total_ms"):
+        target[field] += source[field]
+    target["max_ms"] = max(target["max_ms"], source["max_ms"])
+    buckets = list(target["latency_buckets"] or [])
+    buckets += [0] * (len(source["latency_buckets"]) - len(buckets))
+    target["latency_buckets"] = [a + b for a, b in zip(buckets, source["latency_buckets"])]
+
+
+def record_api_call(
+    client: str,
+    method: str,
+    path: str,
+    duration: float,
+    status_code: Optional[int] = None,
+    retries: int = 0,
+    error: bool = False,
+) -> None:
+    """
+    Ghi nhận 1 outbound API call.
+
+    Args:
+        client: Tên repository (vd: SapoCoreRepository)
+        method: HTTP method
+        path: API path (ID sẽ được thay bằng {id})
+        duration: Tổng thời gian (giây, gồm retry)
+        status_code: HTTP status cuối cùng (None nếu exception trước khi có response)
+        retries: Số lần retry
+        error: True nếu raise exception
+    """
+    duration_ms = int(duration * 1000)
+    hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+    key = (hour, client, method.upper(), path_template(path))
+
+    with _lock:
+        stats = _pending.setdefault(key, _empty_stats())
+        stats["calls"] += 1
+        stats["errors"] += int(error or (status_code is not None and status_code >= 400))
+        stats["retries"] += retries
+        stats["total_ms"] += duration_ms
+        stats["max_ms"] = max(stats["max_ms"], duration_ms)
+        stats["latency_buckets"][bisect.bisect_left(LATENCY_BUCKETS_MS, duration_ms)] += 1
+        due = time.monotonic() - _last_flush >= FLUSH_INTERVAL_SECONDS
+
+    if due:
+        _flush_in_background()
+
+
+def _flush_in_background() -> None:
+    """Chạy flush() trên thread nền (tối đa 1 thread mỗi process)."""
+    global _flush_thread
+    with _lock:
+        if _flush_thread is not None and _flush_thread.is_alive():
+            return
+        _flush_thread = threading.Thread(target=_background_flush, name="api-metrics-flush", daemon=True)
+        _flush_thread.start()
+
+
+def _background_flush() -> None:
+    try:
+        flush()
+    finally:
+        # Connection của thread nền: đóng luôn, không để rò rỉ connection mỗi lần flush
+        connections.close_all()
+
+
+def flush() -> int:
+    """
+    Ghi số liệu đang gom trong process vào ApiCallMetric.
+
+    Returns:
+        Số bucket đã ghi
+    """
+    global _pending, _last_flush
+    with _lock:
+        pending, _pending = _pending, {}
+        _last_flush = time.monotonic()
+    if not pending:
+        return 0
+
+    try:
+        for (hour, client, method, template), stats in pending.items():
+            _flush_bucket(hour, client, method, template, stats)
+    except Exception as e:
+        # DB lỗi: trả số liệu lại để lần flush sau ghi tiếp
+        logger.warning(f"[ApiMetrics] Flush failed, keeping {len(pending)} buckets in memory: {e}")
+        with _lock:
+            for key, stats in pending.items():
+                _merge(_pending.setdefault(key, _empty_stats()), stats)
+        return 0
+    return len(pending)
+
+
+def _flush_bucket(hour: datetime, client: str, method: str, template: str, stats: Dict[str, Any]) -> None:
+    bucket = {"hour": hour, "client": client, "method": method, "path_template": template}
+    for _ in range(2):
+        with transaction.atomic():
+            metric = ApiCallMetric.objects.select_for_update().filter(**bucket).first()
+            if metric is None:
+                try:
+                    with transaction.atomic():
+                        ApiCallMetric.objects.create(**bucket, **stats)
+                    return
+                except IntegrityError:
+                    # Worker khác vừa tạo bucket -> đọc lại và cộng dồn
+                    continue
+            current = {field: getattr(metric, field) for field in stats}
+            _merge(current, stats)
+            for field, value in current.items():
+                setattr(metric, field, value)
+            metric.save(update_fields=[*stats, "updated_at"])
+            return
+
+
+def estimate_percentile(latency_buckets: List[int], percentile: float, max_ms: int = 0) -> int:
+    """
+    Ước lượng percentile (ms) từ histogram: cận trên của bucket chứa percentile
+    (bucket cuối dùng max_ms).
+    """
+    total = sum(latency_buckets or [])
+    if not total:
+        return 0
+    threshold = total * percentile / 100
+    seen = 0
+    for index, count in enumerate(latency_buckets):
+        seen += count
+        if seen >= threshold:
+            if index < len(LATENCY_BUCKETS_MS):
+                return min(LATENCY_BUCKETS_MS[index], max_ms) if max_ms else LATENCY_BUCKETS_MS[index]
+            return max_ms
+    return max_ms
+
+
+def get_endpoint_summary(
+    hours: int = 24,
+    client: Optional[str] = None,
+    order_by: str = "total_ms",
+) -> List[Dict[str, Any]]:
+    """
+    Tổng hợp ApiCallMetric trong `hours` giờ gần nhất theo (client, method, path template).
+
+    Returns:
+        [{"client", "method", "path_template", "calls", "errors", "error_rate", "retries",
+          "total_ms", "avg_ms", "p50_ms", "p95_ms", "max_ms"}, ...] sắp xếp giảm dần theo order_by
+    """
+    since = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=max(hours - 1, 0))
+    queryset = ApiCallMetric.objects.filter(hour__gte=since)
+    if client:
+        queryset = queryset.filter(client=client)
+
+    endpoints: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    for metric in queryset.only(
+        "client", "method", "path_template", "calls", "errors", "retries", "total_ms", "max_ms", "latency_buckets",
+    ):
+        stats = endpoints.setdefault((metric.client, metric.method, metric.path_template), _empty_stats())
+        _merge(stats, {
+            "calls": metric.calls, "errors": metric.errors, "retries": metric.retries,
+            "total_ms": metric.total_ms, "max_ms": metric.max_ms, "latency_buckets": metric.latency_buckets or [],
+        })
+
+    rows = []
+    for (client_name, method, template), stats in endpoints.items():
+        calls = stats["calls"]
+        rows.append({
+            "client": client_name,
+            "method": method,
+            "path_template": template,
+            "calls": calls,
+            "errors": stats["errors"],
+            "error_rate": stats["errors"] / calls if calls else 0,
+            "retries": stats["retries"],
+            "total_ms": stats["total_ms"],
+            "avg_ms": stats["total_ms"] // calls if calls else 0,
+            "p50_ms": estimate_percentile(stats["latency_buckets"], 50, stats["max_ms"]),
+            "p95_ms": estimate_percentile(stats["latency_buckets"], 95, stats["max_ms"]),
+            "max_ms": stats["max_ms"],
+        })
+    rows.sort(key=lambda row: row.get(order_by, 0), reverse=True)
+    return rows
+
+
+atexit.register(flush)
+
+
+# ========================= EXPORTS =========================
+
+__all__ = [
+    'FLUSH_INTERVAL_SECONDS',
+    'path_template',
+    'record_api_call',
+    'flush',
+    'estimate_percentile',
+    'get_endpoint_summary',
+]
@@ -0,0 +1,433 @@
+# core/services/job_queue.py
+"""
+Hàng đợi job chạy nền trong DB (BackgroundJob), không cần broker.
+
+- Task đăng ký bằng @task("app.name") trong module `<app>/jobs.py` (autodiscover).
+- View gọi enqueue() rồi trả về ngay {job_id, status_url}; client poll /core/api/jobs/<id>/.
+- `python manage.py run_workers --workers N` chạy N worker process:
+    + lấy job bằng SELECT ... FOR UPDATE SKIP LOCKED theo (priority giảm dần, created_at)
+    + gửi heartbeat mỗi HEARTBEAT_SECONDS khi chạy; job mất heartbeat > STALE_AFTER_SECONDS
+      (worker chết) được đưa lại hàng đợi hoặc đánh dấu failed nếu hết lượt
+    + lỗi -> retry với backoff (max_attempts), hủy -> task dừng ở checkpoint ctx.check_cancelled()
+
+Settings:
+    BACKGROUND_JOBS = {"EAGER": False}   # EAGER=True: enqueue() chạy job ngay trong process (dev/test)
+
+Usage:
+    # products/jobs.py
+    @task("products.refresh_sales_forecast", priority=5)
+    def refresh_sales_forecast(ctx: JobContext) -> Dict[str, Any]:
+        ctx.set_progress(step="30d")
+        ctx.check_cancelled()
+        ...
+        return {"count_30": 120}
+
+    # view
+    job = enqueue("products.refresh_sales_forecast", user=request.user, unique=True)
+    return JsonResponse(job_accepted_payload(job), status=202)
+"""
+
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterable, Optional
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from core.models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL_SECONDS = 2
+HEARTBEAT_SECONDS = 15
+STALE_AFTER_SECONDS = 120
+STALE_CHECK_INTERVAL_SECONDS = 60
+RETRY_BACKOFF_SECONDS = 30
+MAX_RETRY_BACKOFF_SECONDS = 3600
+MAX_ERROR_LENGTH = 10000
+
+
+class JobCancelled(BaseException):
+    """
+    Raise bởi JobContext.check_cancelled() khi job được yêu cầu hủy.
+    Kế thừa BaseException (như asyncio.CancelledError) để không bị `except Exception` trong task nuốt mất.
+    """
+
+
+@dataclass
+class TaskSpec:
+    name: str
+    func: Callable[..., Any]
+    max_attempts: int = 1
+    priority: int = 0
+
+
+_tasks: Dict[str, TaskSpec] = {}
+_discovered = False
+
+
+def task(name: str, max_attempts: int = 1, priority: int = 0) -> Callable:
+    """
+    Decorator đăng ký task. Hàm nhận (ctx: JobContext, **payload) và trả về kết quả JSON-serializable.
+
+    Args:
+        name: Tên task (duy nhất), vd "products.refresh_sales_forecast"
+        max_attempts: Số lần chạy tối đa mặc định (gồm retry)
+        priority: Priority mặc định (lớn hơn chạy trước)
+    """
+    def decorator(func: Callable) -> Callable:
+        _tasks[name] = TaskSpec(name=name, func=func, max_attempts=max_attempts, priority=priority)
+        return func
+    return decorator
+
+
+def autodiscover() -> None:
+    """Import `jobs.py` của mọi app để đăng ký task (1 lần / process)."""
+    global _discovered
+    if not _discovered:
+        autodiscover_modules("jobs")
+        _discovered = True
+
+
+def get_task(name: str) -> TaskSpec:
+    autodiscover()
+    try:
+        return _tasks[name]
+    except KeyError:
+        raise ValueError(f"Unknown background task: {name}")
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _is_eager() -> bool:
+    return bool(getattr(settings, "BACKGROUND_JOBS", {}).get("EAGER", False))
+
+
+# ========================= JOB CONTEXT =========================
+
+class JobContext:
+    """Truyền vào task: cập nhật progress, kiểm tra hủy."""
+
+    def __init__(self, job: BackgroundJob):
+        self.job = job
+
+    @property
+    def job_id(self) -> int:
+        return self.job.id
+
+    def set_progress(self, **progress: Any) -> None:
+        """Gộp progress (hiển thị qua status API) và coi như 1 heartbeat."""
+        self.job.progress = {**(self.job.progress or {}), **progress}
+        BackgroundJob.objects.filter(pk=self.job.pk).update(
+            progress=self.job.progress, heartbeat_at=timezone.now(),
+        )
+
+    def is_cancel_requested(self) -> bool:
+        return BackgroundJob.objects.filter(pk=self.job.pk, cancel_requested=True).exists()
+
+    def check_cancelled(self) -> None:
+        """Checkpoint: raise JobCancelled nếu job đã được yêu cầu hủy."""
+        if self.is_cancel_requested():
+            raise JobCancelled()
+
+
+# ========================= ENQUEUE / CANCEL =========================
+
+def enqueue(
+    task_name: str,
+    payload: Optional[Dict[str, Any]] = None,
+    priority: Optional[int] = None,
+    max_attempts: Optional[int] = None,
+    user=None,
+    unique: bool = False,
+    run_after=None,
+) -> BackgroundJob:
+    """
+    Thêm job vào hàng đợi.
+
+    Args:
+        task_name: Tên task đã đăng ký
+        payload: kwargs cho task (JSON-serializable)
+        priority: Ghi đè priority mặc định của task
+        max_attempts: Ghi đè số lần chạy tối đa
+        user: User tạo job (để hiển thị / kiểm tra quyền hủy)
+        unique: Nếu đã có job cùng task + payload đang chờ/chạy thì trả về job đó
+        run_after: Chỉ chạy sau thời điểm này
+
+    Returns:
+        BackgroundJob
+    """
+    spec = get_task(task_name)
+    payload = payload or {}
+    if unique:
+        existing = BackgroundJob.objects.filter(
+            task=task_name, payload=payload, status__in=BackgroundJob.ACTIVE_STATUSES,
+        ).order_by("created_at").first()
+        if existing:
+            return existing
+
+    job = BackgroundJob.objects.create(
+        task=task_name,
+        payload=payload,
+        priority=spec.priority if priority is None else priority,
+        max_attempts=spec.max_attempts if max_attempts is None else max_attempts,
+        run_after=run_after or timezone.now(),
+        created_by=user if getattr(user, "is_authenticated", False) else None,
+    )
+    logger.info(f"[JobQueue] Enqueued job #{job.id} {task_name}")
+
+    if _is_eager():
+        claimed = _claim(job.pk, "eager")
+        if claimed:
+            run_job(claimed, "eager")
+        job.refresh_from_db()
+    return job
+
+
+def cancel_job(job_id: int) -> Optional[BackgroundJob]:
+    """
+    Hủy job: đang chờ -> cancelled ngay; đang chạy -> cancel_requested (task dừng ở checkpoint kế tiếp).
+
+    Returns:
+        Job sau khi cập nhật, None nếu không tồn tại
+    """
+    now = timezone.now()
+    BackgroundJob.objects.filter(pk=job_id, status=BackgroundJob.STATUS_QUEUED).update(
+        status=BackgroundJob.STATUS_CANCELLED, cancel_requested=True, finished_at=now,
+    )
+    BackgroundJob.objects.filter(pk=job_id, status=BackgroundJob.STATUS_RUNNING).update(cancel_requested=True)
+    return BackgroundJob.objects.filter(pk=job_id).first()
+
+
+# ========================= WORKER =========================
+
+def _claim(job_id: int, worker_id: str) -> Optional[BackgroundJob]:
+    """Chuyển job queued -> running (UPDATE có điều kiện, chỉ 1 worker thắng)."""
+    now = timezone.now()
+    claimed = BackgroundJob.objects.filter(pk=job_id, status=BackgroundJob.STATUS_QUEUED).update(
+        status=BackgroundJob.STATUS_RUNNING,
+        locked_by=worker_id,
+        heartbeat_at=now,
+        started_at=now,
+        attempts=F("attempts") + 1,
+    )
+    if not claimed:
+        return None
+    return BackgroundJob.objects.get(pk=job_id)
+
+
+def claim_next(worker_id: str, tasks: Optional[Iterable[str]] = None) -> Optional[BackgroundJob]:
+    """
+    Lấy job kế tiếp (priority cao nhất, cũ nhất) đã tới hạn.
+    SKIP LOCKED để các worker không chờ nhau trên cùng 1 row.
+    """
+    for _ in range(3):
+        with transaction.atomic():
+            queryset = BackgroundJob.objects.select_for_update(skip_locked=True).filter(
+                status=BackgroundJob.STATUS_QUEUED, run_after__lte=timezone.now(),
+            )
+            if tasks:
+                queryset = queryset.filter(task__in=list(tasks))
+            job_id = queryset.order_by("-priority", "created_at").values_list("pk", flat=True).first()
+            if job_id is None:
+                return None
+            job = _claim(job_id, worker_id)
+        if job is not None:
+            return job
+    return None
+
+
+def _heartbeat_loop(job_id: int, worker_id: str, stop: threading.Event) -> None:
+    try:
+        while not stop.wait(HEARTBEAT_SECONDS):
+            BackgroundJob.objects.filter(
+                pk=job_id, status=BackgroundJob.STATUS_RUNNING, locked_by=worker_id,
+            ).update(heartbeat_at=timezone.now())
+    except Exception as e:
+        logger.warning(f"[JobQueue] Heartbeat for job #{job_id} failed: {e}")
+    finally:
+        connection.close()
+
+
+def _json_safe(value: Any) -> Any:
+    return json.loads(json.dumps(value, default=str))
+
+
+def run_job(job: BackgroundJob, worker_id: str) -> BackgroundJob:
+    """Chạy 1 job đã claim (status=running) và ghi kết quả / retry / hủy."""
+    running = BackgroundJob.objects.filter(pk=job.pk, status=BackgroundJob.STATUS_RUNNING, locked_by=worker_id)
+    stop = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat_loop, args=(job.pk, worker_id, stop), name=f"job-{job.pk}-heartbeat", daemon=True,
+    )
+    heartbeat.start()
+    started = time.monotonic()
+    logger.info(f"[JobQueue] {worker_id} running job #{job.id} {job.task} (attempt {job.attempts}/{job.max_attempts})")
+
+    try:
+        spec = get_task(job.task)
+        result = spec.func(JobContext(job), **(job.payload or {}))
+        running.update(
+            status=BackgroundJob.STATUS_SUCCEEDED, result=_json_safe(result), error="",
+            finished_at=timezone.now(), locked_by="",
+        )
+        logger.info(f"[JobQueue] Job #{job.id} {job.task} succeeded in {time.monotonic() - started:.1f}s")
+    except JobCancelled:
+        running.update(status=BackgroundJob.STATUS_CANCELLED, finished_at=timezone.now(), locked_by="")
+        logger.info(f"[JobQueue] Job #{job.id} {job.task} cancelled")
+    except Exception as e:
+        error = traceback.format_exc()[-MAX_ERROR_LENGTH:]
+        if job.attempts < job.max_attempts and not BackgroundJob.objects.filter(pk=job.pk, cancel_requested=True).exists():
+            delay = min(RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1), MAX_RETRY_BACKOFF_SECONDS)
+            running.update(
+                status=BackgroundJob.STATUS_QUEUED, error=error, locked_by="",
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+            logger.warning(f"[JobQueue] Job #{job.id} {job.task} failed ({e}), retry in {delay}s")
+        else:
+            running.update(status=BackgroundJob.STATUS_FAILED, error=error, finished_at=timezone.now(), locked_by="")
+            logger.error(f"[JobQueue] Job #{job.id} {job.task} failed: {e}")
+    finally:
+        stop.set()
+        heartbeat.join(timeout=5)
+
+    job.refresh_from_db()
+    return job
+
+
+def requeue_stale_jobs(stale_after: int = STALE_AFTER_SECONDS) -> int:
+    """
+    Job running mất heartbeat (worker chết / bị kill): đưa lại hàng đợi nếu còn lượt, không thì failed.
+
+    Returns:
+        Số job đã xử lý
+    """
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    stale = list(BackgroundJob.objects.filter(status=BackgroundJob.STATUS_RUNNING, heartbeat_at__lt=cutoff))
+    for job in stale:
+        lost = BackgroundJob.objects.filter(pk=job.pk, status=BackgroundJob.STATUS_RUNNING, heartbeat_at__lt=cutoff)
+        message = f"Worker {job.locked_by} lost heartbeat"
+        if job.attempts < job.max_attempts and not job.cancel_requested:
+            lost.update(status=BackgroundJob.STATUS_QUEUED, error=message, locked_by="", run_after=timezone.now())
+        else:
+            lost.update(status=BackgroundJob.STATUS_FAILED, error=message, locked_by="", finished_at=timezone.now())
+        logger.warning(f"[JobQueue] Job #{job.id} {job.task}: {message}")
+    return len(stale)
+
+
+def run_worker(
+    worker_id: Optional[str] = None,
+    poll_interval: float = POLL_INTERVAL_SECONDS,
+    stop_event: Optional[threading.Event] = None,
+    once: bool = False,
+    tasks: Optional[Iterable[str]] = None,
+) -> int:
+    """
+    Vòng lặp worker: lấy job và chạy cho tới khi stop_event được set.
+
+    Args:
+        once: Chạy hết các job đang tới hạn rồi thoát
+
+    Returns:
+        Số job đã chạy
+    """
+    autodiscover()
+    worker_id = worker_id or default_worker_id()
+    stop_event = stop_event or threading.Event()
+    processed = 0
+    last_stale_check = 0.0
+    logger.info(f"[JobQueue] Worker {worker_id} started")
+
+    while not stop_event.is_set():
+        close_old_connections()
+        try:
+            if time.monotonic() - last_stale_check >= STALE_CHECK_INTERVAL_SECONDS:
+                last_stale_check = time.monotonic()
+                requeue_stale_jobs()
+            job = claim_next(worker_id, tasks)
+        except Exception as e:
+            logger.error(f"[JobQueue] Worker {worker_id} cannot fetch jobs: {e}")
+            job = None
+        if job is None:
+            if once:
+                break
+            stop_event.wait(poll_interval)
+            continue
+        run_job(job, worker_id)
+        processed += 1
+
+    logger.info(f"[JobQueue] Worker {worker_id} stopped after {processed} jobs")
+    return processed
+
+
+# ========================= API HELPERS =========================
+
+def _error_message(error: str) -> str:
+    """Dòng cuối của traceback, bỏ tên exception ("RuntimeError: msg" -> "msg")."""
+    if not error:
+        return ""
+    last_line = error.strip().splitlines()[-1]
+    _, sep, message = last_line.partition(": ")
+    return message if sep else last_line
+
+
+def job_as_dict(job: BackgroundJob) -> Dict[str, Any]:
+    """Trạng thái job cho status API."""
+    return {
+        "id": job.id,
+        "task": job.task,
+        "status": job.status,
+        "finished": job.status in BackgroundJob.FINISHED_STATUSES,
+        "progress": job.progress,
+        "result": job.result,
+        "error": _error_message(job.error),
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "cancel_requested": job.cancel_requested,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def job_accepted_payload(job: BackgroundJob) -> Dict[str, Any]:
+    """Response của view sau khi enqueue (HTTP 202)."""
+    return {
+        "status": "queued",
+        "job_id": job.id,
+        "status_url": reverse("job_status_api", args=[job.id]),
+        "cancel_url": reverse("job_cancel_api", args=[job.id]),
+        "job": job_as_dict(job),
+    }
+
+
+# ========================= EXPORTS =========================
+
+__all__ = [
+    'JobCancelled',
+    'JobContext',
+    'task',
+    'autodiscover',
+    'get_task',
+    'enqueue',
+    'cancel_job',
+    'claim_next',
+    'run_job',
+    'requeue_stale_jobs',
+    'run_worker',
+    'job_as_dict',
+    'job_accepted_payload',
+]
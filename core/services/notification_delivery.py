@@ -5,16 +5,20 @@ Luồng:
 1. Đọc NotificationDelivery có status=pending
 2. Gửi qua channel tương ứng (web_push, in_app)
 3. Cập nhật status và metadata
+
+process_pending_deliveries xử lý theo lô: in-app đánh dấu sent bằng 1 UPDATE, web push của
+mọi user được gửi song song trên thread pool dùng chung (send_webpush_bulk) rồi bulk_update.
 """
 
 from __future__ import annotations
 
 import logging
-from typing import List, Optional
+from collections import defaultdict
+from typing import Dict, List, Optional
 from django.utils import timezone
 
-from core.models import Notification, NotificationDelivery
-from core.services.notifications import send_webpush_to_user
+from core.models import Notification, NotificationDelivery, WebPushSubscription
+from core.services.notifications import send_webpush_bulk, send_webpush_to_user
 
 logger = logging.getLogger(__name__)
 
@@ -44,18 +48,7 @@ class NotificationDeliveryWorker:
         user = delivery.user
 
         # Chuẩn bị data cho web push
-        data = {
-            "notification_id": notification.id,
-            "delivery_id": delivery.id,
-            "action": notification.action,
-            "tag": notification.tag or "",
-        }
-
-        if notification.link:
-            data["url"] = notification.link
-
-        if notification.count is not None:
-            data["count"] = notification.count
+        data = NotificationDeliveryWorker._web_push_data(delivery)
 
         # Gửi web push
         try:
@@ -133,6 +126,106 @@ class NotificationDeliveryWorker:
             logger.warning(f"Unknown channel: {delivery.channel}")
             return False
 
+    @staticmethod
+    def _web_push_data(delivery: NotificationDelivery) -> dict:
+        """Data gửi kèm web push của 1 delivery."""
+        notification = delivery.notification
+        data = {
+            "notification_id": notification.id,
+            "delivery_id": delivery.id,
+            "action": notification.action,
+            "tag": notification.tag or "",
+        }
+
+        if notification.link:
+            data["url"] = notification.link
+
+        if notification.count is not None:
+            data["count"] = notification.count
+        return data
+
+    @classmethod
+    def _send_web_push_batch(
+        cls,
+        deliveries: List[NotificationDelivery],
+        timeout: Optional[float] = None,
+    ) -> tuple:
+        """
+        Gửi web push cho nhiều deliveries cùng lúc.
+
+        - 1 query lấy subscriptions active của tất cả users
+        - Gửi song song (send_webpush_bulk)
+        - 1 bulk_update cập nhật status các deliveries
+
+        Delivery có push chưa xong khi hết timeout vẫn để pending (lần xử lý sau gửi tiếp).
+
+        Returns:
+            (success, failed, timed_out)
+        """
+        subscriptions: Dict[int, List[WebPushSubscription]] = defaultdict(list)
+        for sub in WebPushSubscription.objects.filter(
+            user_id__in={d.user_id for d in deliveries},
+            is_active=True,
+        ):
+            subscriptions[sub.user_id].append(sub)
+
+        messages = []
+        # delivery.id -> vị trí các message của delivery trong messages (kết quả trả theo thứ tự)
+        positions: Dict[int, List[int]] = defaultdict(list)
+        for delivery in deliveries:
+            notification = delivery.notification
+            message = {
+                "title": notification.title,
+                "body": notification.body,
+                "data": cls._web_push_data(delivery),
+                "icon": None,  # Có thể thêm icon sau
+                "url": notification.link,
+            }
+            for sub in subscriptions.get(delivery.user_id, []):
+                positions[delivery.id].append(len(messages))
+                messages.append((sub, message))
+
+        bulk_kwargs = {} if timeout is None else {"timeout": timeout}
+        results = send_webpush_bulk(messages, **bulk_kwargs) if messages else []
+
+        now = timezone.now()
+        success = failed = 0
+        timed_out = False
+        to_update = []
+        for delivery in deliveries:
+            outcomes = [results[index] for index in positions[delivery.id]]
+            sent_count = sum(1 for ok in outcomes if ok)
+            if sent_count:
+                delivery.status = NotificationDelivery.STATUS_SENT
+                delivery.sent_at = now
+                delivery.delivery_metadata = {
+                    "subscriptions_sent": sent_count,
+                    "method": "web_push",
+                }
+                success += 1
+            elif None in outcomes:
+                # Push chưa xong khi hết timeout
+                timed_out = True
+                continue
+            else:
+                delivery.status = NotificationDelivery.STATUS_FAILED
+                delivery.error_message = (
+                    "Không có subscription active" if not outcomes else "Gửi tới tất cả subscription thất bại"
+                )
+                failed += 1
+            to_update.append(delivery)
+
+        NotificationDelivery.objects.bulk_update(
+            to_update,
+            ["status", "sent_at", "delivery_metadata", "error_message"],
+            batch_size=500,
+        )
+        logger.info(
+            f"Web push batch: {success} sent, {failed} failed, "
+            f"{len(deliveries) - len(to_update)} still pending ({len(messages)} pushes)"
+        )
+        return success, failed, timed_out
+
     @classmethod
     def process_pending_deliveries(
         cls,
@@ -159,7 +252,11 @@ class NotificationDeliveryWorker:
         import time
         
         start_time = time.monotonic()
-        qs = NotificationDelivery.objects.filter(status=NotificationDelivery.STATUS_PENDING)
+        qs = (
+            NotificationDelivery.objects
+            .filter(status=NotificationDelivery.STATUS_PENDING)
+            .select_related("notification", "user")
+        )
 
         if notification_id:
             qs = qs.filter(notification_id=notification_id)
@@ -173,34 +270,34 @@ class NotificationDeliveryWorker:
         failed = 0
         timed_out = False
 
-        for delivery in deliveries:
-            # Kiểm tra timeout trước mỗi delivery
+        in_app = [d for d in deliveries if d.channel == NotificationDelivery.CHANNEL_IN_APP]
+        web_push = [d for d in deliveries if d.channel == NotificationDelivery.CHANNEL_WEB_PUSH]
+        unknown = [
+            d for d in deliveries
+            if d.channel not in (NotificationDelivery.CHANNEL_IN_APP, NotificationDelivery.CHANNEL_WEB_PUSH)
+        ]
+
+        # 1. In-app: chỉ cần đánh dấu sent (frontend tự đọc từ API)
+        if in_app:
+            NotificationDelivery.objects.filter(id__in=[d.id for d in in_app]).update(
+                status=NotificationDelivery.STATUS_SENT,
+                sent_at=timezone.now(),
+                delivery_metadata={"method": "in_app"},
+            )
+            success += len(in_app)
+
+        # 2. Web push: gửi song song mọi subscription của mọi user trong lô
+        if web_push:
+            bulk_timeout = None
             if timeout_seconds is not None:
-                elapsed = time.monotonic() - start_time
-                if elapsed >= timeout_seconds:
-                    logger.warning(
-                        f"Timeout sau {timeout_seconds}s khi xử lý deliveries "
-                        f"(đã xử lý {success + failed}/{total})"
-                    )
-                    timed_out = True
-                    break
-            
-            try:
-                if cls.process_delivery(delivery):
-                    success += 1
-                else:
-                    failed += 1
-            except Exception as exc:
-                # Bắt mọi exception để không làm gián đoạn toàn bộ quá trình
-                logger.exception(f"Lỗi không mong đợi khi xử lý delivery #{delivery.id}: {exc}")
-                failed += 1
-                # Đánh dấu delivery là failed
-                try:
-                    delivery.status = NotificationDelivery.STATUS_FAILED
-                    delivery.error_message = str(exc)[:500]  # Giới hạn độ dài error message
-                    delivery.save(update_fields=["status", "error_message"])
-                except Exception as save_exc:
-                    logger.exception(f"Lỗi khi lưu delivery #{delivery.id} sau khi xử lý lỗi: {save_exc}")
+                bulk_timeout = max(timeout_seconds - (time.monotonic() - start_time), 0)
+            sent, not_sent, timed_out = cls._send_web_push_batch(web_push, timeout=bulk_timeout)
+            success += sent
+            failed += not_sent
+
+        for delivery in unknown:
+            logger.warning(f"Unknown channel: {delivery.channel}")
+            failed += 1
 
         # Cập nhật status của notification nếu tất cả deliveries đã xử lý (và không bị timeout)
         if notification_id and not timed_out:
@@ -139,7 +139,7 @@ class NotificationEngine:
         channels: Optional[List[str]] = None,
     ) -> List[NotificationDelivery]:
         """
-        Tạo NotificationDelivery cho từng user và channel.
+        Tạo NotificationDelivery cho từng user và channel (bulk, bỏ qua cặp đã tồn tại).
 
         Args:
             notification: Notification instance
@@ -147,24 +147,32 @@ class NotificationEngine:
             channels: Danh sách channels (mặc định: [CHANNEL_IN_APP, CHANNEL_WEB_PUSH])
 
         Returns:
-            List[NotificationDelivery]: Danh sách deliveries đã tạo
+            List[NotificationDelivery]: Danh sách deliveries mới (có thể chưa có pk do ignore_conflicts)
         """
         if not channels:
             channels = [NotificationDelivery.CHANNEL_IN_APP, NotificationDelivery.CHANNEL_WEB_PUSH]
 
-        deliveries = []
-        for user in users:
-            for channel in channels:
-                delivery, created = NotificationDelivery.objects.get_or_create(
-                    notification=notification,
-                    user=user,
-                    channel=channel,
-                    defaults={
-                        "status": NotificationDelivery.STATUS_PENDING,
-                    },
-                )
-                if created:
-                    deliveries.append(delivery)
+        # 1 query lấy các delivery đã có + 1 bulk INSERT cho phần còn lại.
+        # Tiến trình khác có thể vừa tạo cùng (notification, user, channel): unique_together của
+        # NotificationDelivery (migration 0003) chặn bản trùng, ignore_conflicts bỏ qua lỗi đó.
+        existing = set(
+            NotificationDelivery.objects
+            .filter(notification=notification, user__in=users, channel__in=channels)
+            .order_by()
+            .values_list("user_id", "channel")
+        )
+        deliveries = [
+            NotificationDelivery(
+                notification=notification,
+                user=user,
+                channel=channel,
+                status=NotificationDelivery.STATUS_PENDING,
+            )
+            for user in users
+            for channel in channels
+            if (user.id, channel) not in existing
+        ]
+        NotificationDelivery.objects.bulk_create(deliveries, batch_size=1000, ignore_conflicts=True)
 
         logger.info(
             f"Created {len(deliveries)} deliveries for notification #{notification.id} "
@@ -4,20 +4,27 @@ Dịch vụ gửi Web Push Notification qua Firebase Cloud Messaging (FCM).
 Giả định:
 - Sử dụng FCM HTTP legacy API với SERVER KEY lưu trong biến môi trường FCM_SERVER_KEY.
 - Với Web (Chrome Android), ta gửi tới trường "to": <fcm_token>.
-- Với các subscription Web Push thuần (endpoint/keys) chưa được tích hợp đầy đủ ở đây.
+- Với các subscription Web Push thuần (endpoint/keys) dùng VAPID (pywebpush).
+
+Gửi hàng loạt (send_webpush_bulk) chạy trên 1 thread pool sống lâu (PUSH_MAX_WORKERS) dùng chung
+1 requests.Session (keep-alive tới FCM / push service), VAPID headers được ký 1 lần cho mỗi
+push service và dùng lại tới gần hết hạn. Subscription hỏng được deactivate bằng 1 UPDATE.
 """
 
 from __future__ import annotations
 
 import logging
 import os
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
 import json
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures import ThreadPoolExecutor, wait
 
 import requests
-from pywebpush import webpush, WebPushException
+from py_vapid import Vapid
+from pywebpush import WebPusher
 from django.conf import settings
 from django.contrib.auth import get_user_model
 
@@ -27,6 +34,28 @@ logger = logging.getLogger(__name__)
 
 FCM_LEGACY_ENDPOINT = "https://fcm.googleapis.com/fcm/send"
 
+# Timeout mỗi push (giây) và thời gian chờ tối đa cho 1 đợt gửi hàng loạt
+PUSH_TIMEOUT = 2.0
+BULK_PUSH_TIMEOUT = 10.0
+PUSH_MAX_WORKERS = 16
+
+# Email admin để identify sender trong VAPID (phải là dạng mailto:...)
+VAPID_SUB = "mailto:support@giadungplus.io.vn"
+VAPID_TTL_SECONDS = 12 * 60 * 60
+# Ký lại VAPID headers khi còn ít hơn khoảng này trước khi hết hạn
+VAPID_REFRESH_MARGIN_SECONDS = 60 * 60
+
+# Lỗi FCM cho biết token không còn hợp lệ
+FCM_INVALID_TOKEN_ERRORS = {"InvalidRegistration", "NotRegistered", "MismatchSenderId"}
+
+_pool_lock = threading.Lock()
+_push_pool: Optional[ThreadPoolExecutor] = None
+_http_session: Optional[requests.Session] = None
+
+_vapid_lock = threading.Lock()
+_vapid: Optional[Vapid] = None
+_vapid_headers: Dict[str, Tuple[int, Dict[str, str]]] = {}
+
 
 def _get_fcm_server_key() -> str:
     """
@@ -86,24 +115,64 @@ def _get_vapid_keys() -> Dict[str, str]:
     }
 
 
-def send_webpush_to_subscription(
+def _get_push_pool() -> ThreadPoolExecutor:
+    """Thread pool dùng chung cho mọi lần gửi push (tạo 1 lần / process)."""
+    global _push_pool
+    with _pool_lock:
+        if _push_pool is None:
+            _push_pool = ThreadPoolExecutor(max_workers=PUSH_MAX_WORKERS, thread_name_prefix="webpush")
+        return _push_pool
+
+
+def _get_http_session() -> requests.Session:
+    """requests.Session dùng chung (connection pool đủ cho PUSH_MAX_WORKERS thread)."""
+    global _http_session
+    with _pool_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=8, pool_maxsize=PUSH_MAX_WORKERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_session = session
+        return _http_session
+
+
+def _get_vapid_headers(endpoint: str) -> Dict[str, str]:
+    """
+    VAPID headers cho push service của endpoint (aud = scheme://host).
+    Key được parse 1 lần, headers được ký 1 lần cho mỗi aud và dùng lại tới gần hết hạn.
+    """
+    global _vapid
+    url = urlparse(endpoint)
+    aud = f"{url.scheme}://{url.netloc}"
+    now = int(time.time())
+    with _vapid_lock:
+        cached = _vapid_headers.get(aud)
+        if cached and cached[0] - VAPID_REFRESH_MARGIN_SECONDS > now:
+            return cached[1]
+        if _vapid is None:
+            _vapid = Vapid.from_string(private_key=_get_vapid_keys()["privateKey"])
+        exp = now + VAPID_TTL_SECONDS
+        headers = _vapid.sign({"sub": VAPID_SUB, "aud": aud, "exp": exp})
+        _vapid_headers[aud] = (exp, headers)
+        return headers
+
+
+def _push_to_subscription(
     subscription: WebPushSubscription,
     title: str,
     body: str,
     data: Optional[Dict[str, Any]] = None,
     icon: Optional[str] = None,
     url: Optional[str] = None,
-) -> bool:
+) -> Tuple[bool, bool]:
     """
-    Gửi 1 Web Push Notification tới 1 subscription cụ thể thông qua FCM.
+    Gửi 1 push (không ghi DB, an toàn để chạy trong thread pool).
 
-    Hiện tại hỗ trợ chính cho các subscription có fcm_token (Chrome Android).
-    Với subscription chỉ có endpoint/keys (Web Push thuần) cần tích hợp thêm webpush library.
+    Returns:
+        (ok, deactivate) - deactivate=True nếu subscription không còn hợp lệ
     """
-
-    if not subscription.is_active:
-        logger.info("Bỏ qua subscription không active: %s", subscription)
-        return False
+    session = _get_http_session()
 
     # Nhánh 1: dùng FCM legacy với fcm_token (Android Chrome, v.v.)
     if subscription.fcm_token:
@@ -131,60 +200,36 @@ def send_webpush_to_subscription(
         }
 
         try:
-            resp = requests.post(
-                FCM_LEGACY_ENDPOINT,
-                json=payload,
-                headers=headers,
-                timeout=2,  # giới hạn tối đa ~2 giây cho mỗi request tới FCM
-            )
-            if resp.status_code != 200:
-                logger.error(
-                    "Gửi FCM thất bại (%s): %s",
-                    resp.status_code,
-                    resp.text[:500],
-                )
-                # Kiểm tra nếu token không hợp lệ (401, 403) hoặc response có lỗi về token
-                if resp.status_code in (401, 403):
-                    logger.info("Đánh dấu subscription %s không active do FCM token không hợp lệ", subscription.id)
-                    subscription.is_active = False
-                    subscription.save(update_fields=["is_active"])
-                else:
-                    # Kiểm tra response JSON để xem có lỗi về registration token không
-                    try:
-                        resp_data = resp.json()
-                        if "results" in resp_data and resp_data.get("results"):
-                            result = resp_data["results"][0]
-                            error = result.get("error")
-                            # Các lỗi FCM cho biết token không hợp lệ
-                            invalid_errors = [
-                                "InvalidRegistration",
-                                "NotRegistered",
-                                "MismatchSenderId",
-                            ]
-                            if error in invalid_errors:
-                                logger.info(
-                                    "Đánh dấu subscription %s không active do FCM error: %s",
-                                    subscription.id,
-                                    error,
-                                )
-                                subscription.is_active = False
-                                subscription.save(update_fields=["is_active"])
-                    except (ValueError, KeyError, IndexError):
-                        pass  # Không parse được JSON, bỏ qua
-                return False
-
-            logger.info("Đã gửi WebPush (FCM) tới subscription %s", subscription.id)
-            return True
+            resp = session.post(FCM_LEGACY_ENDPOINT, json=payload, headers=headers, timeout=PUSH_TIMEOUT)
         except requests.Timeout:
             logger.warning("FCM request timeout cho subscription %s", subscription.id)
-            return False
+            return False, False
         except Exception as exc:
             logger.exception("Lỗi khi gửi FCM WebPush: %s", exc)
-            return False
+            return False, False
+
+        if resp.status_code != 200:
+            logger.error("Gửi FCM thất bại (%s): %s", resp.status_code, resp.text[:500])
+            # Token không hợp lệ (401, 403)
+            if resp.status_code in (401, 403):
+                logger.info("Đánh dấu subscription %s không active do FCM token không hợp lệ", subscription.id)
+                return False, True
+            # Kiểm tra response JSON để xem có lỗi về registration token không
+            try:
+                results = resp.json().get("results") or []
+                error = results[0].get("error") if results else None
+            except (ValueError, AttributeError, IndexError):
+                error = None  # Không parse được JSON, bỏ qua
+            if error in FCM_INVALID_TOKEN_ERRORS:
+                logger.info("Đánh dấu subscription %s không active do FCM error: %s", subscription.id, error)
+                return False, True
+            return False, False
+
+        logger.info("Đã gửi WebPush (FCM) tới subscription %s", subscription.id)
+        return True, False
 
     # Nhánh 2: Web Push thuần (desktop/iOS) với endpoint + keys
     if subscription.endpoint and subscription.p256dh and subscription.auth:
-        vapid = _get_vapid_keys()
         payload_data: Dict[str, Any] = {
             "title": title,
             "body": body,
@@ -196,49 +241,122 @@ def send_webpush_to_subscription(
             payload_data.update(data)
 
         try:
-            # Gửi webpush với timeout 2 giây để tránh treo
-            def _send_webpush():
-                webpush(
-                    subscription_info={
-                        "endpoint": subscription.endpoint,
-                        "keys": {"p256dh": subscription.p256dh, "auth": subscription.auth},
-                    },
-                    data=json.dumps(payload_data),
-                    vapid_private_key=vapid["privateKey"],
-                    vapid_claims={
-                        # Email admin để identify sender trong VAPID (phải là dạng mailto:...)
-                        "sub": "mailto:support@giadungplus.io.vn",
-                    },
-                )
-            
-            # Sử dụng ThreadPoolExecutor với timeout để tránh treo
-            with ThreadPoolExecutor(max_workers=1) as executor:
-                future = executor.submit(_send_webpush)
-                future.result(timeout=2.0)  # Timeout 2 giây
-            
-            logger.info("Đã gửi WebPush (endpoint) tới subscription %s", subscription.id)
-            return True
-        except FutureTimeoutError:
-            logger.warning("WebPush (endpoint) timeout cho subscription %s sau 2s", subscription.id)
-            return False
-        except WebPushException as exc:
-            logger.error("Lỗi WebPush (endpoint) cho subscription %s: %s", subscription.id, exc)
-            # Nếu subscription không hợp lệ (410 Gone, 404 Not Found), đánh dấu không active
-            error_str = str(exc).lower()
-            if "410" in error_str or "gone" in error_str or "404" in error_str or "not found" in error_str:
-                logger.info("Đánh dấu subscription %s không active do endpoint không hợp lệ", subscription.id)
-                subscription.is_active = False
-                subscription.save(update_fields=["is_active"])
-            return False
+            resp = WebPusher(
+                {
+                    "endpoint": subscription.endpoint,
+                    "keys": {"p256dh": subscription.p256dh, "auth": subscription.auth},
+                },
+                requests_session=session,
+            ).send(
+                json.dumps(payload_data),
+                dict(_get_vapid_headers(subscription.endpoint)),
+                timeout=PUSH_TIMEOUT,
+            )
+        except requests.Timeout:
+            logger.warning("WebPush (endpoint) timeout cho subscription %s sau %ss", subscription.id, PUSH_TIMEOUT)
+            return False, False
         except Exception as exc:
             logger.exception("Lỗi không xác định khi gửi WebPush (endpoint): %s", exc)
-            return False
+            return False, False
+
+        if resp.status_code > 202:
+            logger.error(
+                "Lỗi WebPush (endpoint) cho subscription %s: %s %s",
+                subscription.id,
+                resp.status_code,
+                resp.text[:200],
+            )
+            # Subscription không hợp lệ (410 Gone, 404 Not Found)
+            if resp.status_code in (404, 410):
+                logger.info("Đánh dấu subscription %s không active do endpoint không hợp lệ", subscription.id)
+                return False, True
+            return False, False
+
+        logger.info("Đã gửi WebPush (endpoint) tới subscription %s", subscription.id)
+        return True, False
 
     logger.warning(
         "Subscription %s không có fcm_token hoặc endpoint/keys đầy đủ, bỏ qua.",
         subscription.id,
     )
-    return False
+    return False, False
+
+
+def send_webpush_to_subscription(
+    subscription: WebPushSubscription,
+    title: str,
+    body: str,
+    data: Optional[Dict[str, Any]] = None,
+    icon: Optional[str] = None,
+    url: Optional[str] = None,
+) -> bool:
+    """
+    Gửi 1 Web Push Notification tới 1 subscription cụ thể (FCM token hoặc endpoint/keys).
+    """
+
+    if not subscription.is_active:
+        logger.info("Bỏ qua subscription không active: %s", subscription)
+        return False
+
+    ok, deactivate = _push_to_subscription(subscription, title, body, data=data, icon=icon, url=url)
+    if deactivate:
+        subscription.is_active = False
+        subscription.save(update_fields=["is_active"])
+    return ok
+
+
+def send_webpush_bulk(
+    messages: Iterable[Tuple[WebPushSubscription, Dict[str, Any]]],
+    timeout: float = BULK_PUSH_TIMEOUT,
+) -> List[Optional[bool]]:
+    """
+    Gửi song song nhiều push trên thread pool dùng chung.
+
+    1 subscription có thể xuất hiện nhiều lần (vd user có nhiều notification pending),
+    nên kết quả trả theo thứ tự messages chứ không theo subscription id.
+
+    Args:
+        messages: [(subscription, {"title", "body", "data", "icon", "url"}), ...]
+        timeout: Thời gian chờ tối đa cho cả đợt (giây)
+
+    Returns:
+        List cùng thứ tự messages: True/False, hoặc None nếu chưa xong khi hết timeout
+        (subscription không active: False)
+    """
+    messages = list(messages)
+    pool = _get_push_pool()
+    results: List[Optional[bool]] = [False] * len(messages)
+    futures = {}
+    for index, (subscription, message) in enumerate(messages):
+        if not subscription.is_active:
+            continue
+        results[index] = None
+        future = pool.submit(_push_to_subscription, subscription, **message)
+        futures[future] = index
+
+    done, not_done = wait(futures, timeout=timeout)
+    for future in not_done:
+        future.cancel()
+    if not_done:
+        logger.warning("WebPush bulk: %s/%s push chưa xong sau %ss", len(not_done), len(futures), timeout)
+
+    to_deactivate = set()
+    for future in done:
+        index = futures[future]
+        subscription_id = messages[index][0].id
+        try:
+            ok, deactivate = future.result()
+        except Exception as exc:
+            logger.exception("Lỗi khi gửi WebPush tới subscription %s: %s", subscription_id, exc)
+            ok, deactivate = False, False
+        results[index] = ok
+        if deactivate:
+            to_deactivate.add(subscription_id)
+
+    if to_deactivate:
+        WebPushSubscription.objects.filter(id__in=to_deactivate).update(is_active=False)
+        logger.info("Đã deactivate %s subscription không hợp lệ", len(to_deactivate))
+    return results
 
 
 def send_webpush_to_user(
@@ -250,7 +368,7 @@ def send_webpush_to_user(
     url: Optional[str] = None,
 ) -> int:
     """
-    Gửi notification tới tất cả subscription active của 1 user.
+    Gửi notification tới tất cả subscription active của 1 user (song song).
 
     Returns:
         Số subscription gửi thành công.
@@ -259,34 +377,11 @@ def send_webpush_to_user(
     if not user:
         return 0
 
-    qs = WebPushSubscription.objects.filter(user=user, is_active=True)
-    success_count = 0
-    start_time = time.monotonic()
-
-    for sub in qs:
-        # Nếu thời gian xử lý cho user này đã vượt quá 2 giây thì bỏ qua các subscription còn lại
-        elapsed = time.monotonic() - start_time
-        if elapsed > 2.0:
-            logger.warning(
-                "Dừng gửi WebPush cho user %s do vượt quá 2s (đã gửi thành công %s subscription)",
-                getattr(user, "id", None),
-                success_count,
-            )
-            break
-
-        try:
-            ok = send_webpush_to_subscription(sub, title, body, data=data, icon=icon, url=url)
-            if ok:
-                success_count += 1
-        except Exception as exc:
-            # Bắt mọi lỗi ở mức user để không làm hỏng toàn bộ luồng push-notification
-            logger.exception(
-                "Lỗi khi gửi WebPush cho user %s, subscription %s: %s",
-                getattr(user, "id", None),
-                sub.id,
-                exc,
-            )
-            continue
+    message = {"title": title, "body": body, "data": data, "icon": icon, "url": url}
+    results = send_webpush_bulk(
+        (sub, message) for sub in WebPushSubscription.objects.filter(user=user, is_active=True)
+    )
+    success_count = sum(1 for ok in results if ok)
 
     logger.info("Đã gửi WebPush tới %s subscription của user %s", success_count, user.id)
     return success_count
@@ -0,0 +1,161 @@
+# core/services/sapo_token_refresher.py
+"""
+Refresh Sapo token (core + marketplace) chủ động, trước khi SapoToken.expires_at tới.
+
+Trước đây token chỉ được làm mới khi 1 web request gặp 401: request đó invalidate token,
+trigger Selenium login rồi đợi tới 60 giây (SapoCoreRepository._handle_401,
+auto_xpress_push._handle_sapo_api_error). Worker `python manage.py refresh_sapo_tokens`
+chạy nền, login lại khi token còn dưới REFRESH_BEFORE_SECONDS; các web process nhận token mới
+qua SapoClient._check_token_rotation trước khi token cũ hết hạn.
+
+Metrics:
+- Thời gian refresh: ApiCallMetric client="SapoTokenRefresher", path "selenium/login"
+  (xem bằng `python manage.py api_metrics --client SapoTokenRefresher`)
+- Time-to-expiry: get_token_status() / `refresh_sapo_tokens --status`, log mỗi lần check
+"""
+
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+import logging
+import time
+
+from django.utils import timezone
+
+from core.models import SapoToken
+from core.sapo_client import SapoClient
+from core.sapo_client.client import TOKEN_DB_KEYS
+from core.sapo_client.exceptions import SeleniumLoginInProgressException
+
+logger = logging.getLogger(__name__)
+
+# Refresh khi token còn ít hơn 45 phút (token sống 6 giờ)
+REFRESH_BEFORE_SECONDS = 45 * 60
+CHECK_INTERVAL_SECONDS = 60
+# Login lỗi -> đợi lâu hơn trước khi thử lại (tránh mở Chrome mỗi phút)
+FAILURE_BACKOFF_SECONDS = 5 * 60
+
+METRIC_CLIENT = "SapoTokenRefresher"
+
+
+def get_token_status(now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Trạng thái token core / tmdt trong DB.
+
+    Returns:
+        [{"kind", "key", "expires_at", "seconds_left"}, ...] (expires_at/seconds_left = None nếu chưa có token)
+    """
+    now = now or timezone.now()
+    tokens = {
+        token.key: token.expires_at
+        for token in SapoToken.objects.filter(key__in=TOKEN_DB_KEYS.values()).only("key", "expires_at")
+    }
+    status = []
+    for kind, key in TOKEN_DB_KEYS.items():
+        expires_at = tokens.get(key)
+        status.append({
+            "kind": kind,
+            "key": key,
+            "expires_at": expires_at,
+            "seconds_left": int((expires_at - now).total_seconds()) if expires_at else None,
+        })
+    return status
+
+
+def tokens_due(
+    status: List[Dict[str, Any]],
+    refresh_before: int = REFRESH_BEFORE_SECONDS,
+) -> List[str]:
+    """Các loại token (core/tmdt) thiếu hoặc còn ít hơn refresh_before giây."""
+    return [
+        item["kind"] for item in status
+        if item["seconds_left"] is None or item["seconds_left"] < refresh_before
+    ]
+
+
+def refresh_tokens(force: bool = False, refresh_before: int = REFRESH_BEFORE_SECONDS) -> Dict[str, Any]:
+    """
+    Login lại (Selenium) nếu có token sắp hết hạn. 1 lần login lấy cả core + marketplace token.
+
+    Args:
+        force: Refresh kể cả khi token còn hạn
+        refresh_before: Ngưỡng (giây) còn lại để refresh
+
+    Returns:
+        {"refreshed": bool, "due": [...], "duration": float | None, "error": str | None, "status": [...]}
+    """
+    status = get_token_status()
+    logger.info("[TokenRefresher] Time to expiry: " + ", ".join(
+        f"{item['kind']}={item['seconds_left']}s" for item in status
+    ))
+
+    due = [item["kind"] for item in status] if force else tokens_due(status, refresh_before)
+    result: Dict[str, Any] = {"refreshed": False, "due": due, "duration": None, "error": None, "status": status}
+    if not due:
+        return result
+
+    logger.info(f"[TokenRefresher] Refreshing Sapo tokens (due: {', '.join(due)})")
+    client = SapoClient()
+    started = time.monotonic()
+    error = False
+    try:
+        # _login_via_browser giữ Selenium lock và tự lưu marketplace token
+        core_headers = client._login_via_browser()
+        client._save_token_to_db(core_headers)
+        result["refreshed"] = True
+    except SeleniumLoginInProgressException:
+        # Login khác (background login của web request) đang chạy, để nó làm
+        result["error"] = "login_in_progress"
+        logger.info("[TokenRefresher] Another Selenium login is in progress, skipping")
+    except Exception as e:
+        error = True
+        result["error"] = str(e)
+        logger.error(f"[TokenRefresher] Token refresh failed: {e}")
+    finally:
+        result["duration"] = time.monotonic() - started
+        if result["error"] != "login_in_progress":
+            _record_refresh(result["duration"], error)
+
+    if result["refreshed"]:
+        result["status"] = get_token_status()
+        logger.info(f"[TokenRefresher] Sapo tokens refreshed in {result['duration']:.1f}s")
+    return result
+
+
+def _record_refresh(duration: float, error: bool) -> None:
+    try:
+        from core.services.api_metrics import flush, record_api_call
+        record_api_call(METRIC_CLIENT, "LOGIN", "selenium/login", duration, error=error)
+        # Worker chạy lâu và hiếm khi có call khác -> ghi ngay
+        flush()
+    except Exception as e:
+        logger.debug(f"[TokenRefresher] Metrics error: {e}")
+
+
+def run_forever(
+    interval: int = CHECK_INTERVAL_SECONDS,
+    refresh_before: int = REFRESH_BEFORE_SECONDS,
+) -> None:
+    """Vòng lặp worker: check token mỗi `interval` giây, refresh khi sắp hết hạn."""
+    logger.info(f"[TokenRefresher] Started (interval={interval}s, refresh_before={refresh_before}s)")
+    while True:
+        delay = interval
+        try:
+            result = refresh_tokens(refresh_before=refresh_before)
+            if result["error"] and result["error"] != "login_in_progress":
+                delay = max(interval, FAILURE_BACKOFF_SECONDS)
+        except Exception as e:
+            logger.error(f"[TokenRefresher] Check failed: {e}")
+        time.sleep(delay)
+
+
+# ========================= EXPORTS =========================
+
+__all__ = [
+    'REFRESH_BEFORE_SECONDS',
+    'CHECK_INTERVAL_SECONDS',
+    'FAILURE_BACKOFF_SECONDS',
+    'get_token_status',
+    'tokens_due',
+    'refresh_tokens',
+    'run_forever',
+]
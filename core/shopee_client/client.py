@@ -9,6 +9,7 @@ import logging
 
 import requests
 
+from core.base.throttling import mount_throttled_adapter
 from core.system_settings import (
     get_shop_by_connection_id,
     load_shopee_shops_detail,
@@ -52,7 +53,8 @@ class ShopeeClient:
             shop_key: Shop name (str) hoặc connection_id (int)
         """
         self.cookie_manager = ShopeeCookieManager()
-        self.session = requests.Session()
+        # Rate limit + circuit breaker theo host cho cả repo và các call trực tiếp qua client.session
+        self.session = mount_throttled_adapter(requests.Session())
         self.repository: Optional[ShopeeRepository] = None
         
         # Current shop info
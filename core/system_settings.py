@@ -9,9 +9,10 @@ Cấu hình hệ thống nội bộ cho Gia Dụng Plus:
 
 import os
 import json
+import threading
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 # Đọc biến môi trường với default (anh có thể set trong .env, Docker, v.v.)
 # Ưu tiên đọc từ file settings/logs/sapo_config.env
@@ -109,6 +110,57 @@ HOATOC_HN_ON: bool = env("GDPLUS_HOATOC_HN_ON", "1") == "1"
 HOATOC_HCM_ON: bool = env("GDPLUS_HOATOC_HCM_ON", "1") == "1"
 
 
+# ================== CONFIG REGISTRY ==================
+
+class JsonConfigRegistry:
+    """
+    Cache in-process cho các file JSON cấu hình.
+
+    - Mỗi file chỉ json.load 1 lần, đọc lại khi mtime/size của file thay đổi
+      (sửa file trên server / qua trang settings không cần restart).
+    - Hàm build dựng sẵn các index tra cứu từ JSON -> các helper chỉ còn là lookup dict.
+    - File không tồn tại -> build({}).
+    """
+
+    def __init__(self):
+        # (path, build) -> (signature, value)
+        self._entries: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: Path, build: Callable[[Any], Any]) -> Any:
+        try:
+            st = os.stat(path)
+            signature = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            signature = None
+
+        key = (str(path), build)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+
+            if signature is None:
+                raw = {}
+            else:
+                with open(path, "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+            value = build(raw)
+            self._entries[key] = (signature, value)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+config_registry = JsonConfigRegistry()
+
+
 # ================== SHOPEE CONFIG ==================
 
 # Dùng absolute path để tránh lỗi khi Django chạy ở thư mục khác (Ubuntu server)
@@ -119,6 +171,49 @@ KHO_GELEXIMCO = 241737  # Hà Nội
 KHO_TOKY = 548744       # HCM
 
 
+def _build_shops_index(data: Dict[str, Any]) -> Dict[str, Dict[Any, Any]]:
+    """
+    Dựng các index từ shopee_shops.json:
+    - by_name: name -> shop config
+    - connect_ids: name -> shop_connect (int)
+    - by_connection: shop_connect -> shop config
+    - location_by_address: address_id -> location_id (KHO_GELEXIMCO / KHO_TOKY)
+    Trùng key thì shop đứng trước trong file được ưu tiên (giống vòng lặp cũ).
+    """
+    index: Dict[str, Dict[Any, Any]] = {
+        "by_name": {},
+        "connect_ids": {},
+        "by_connection": {},
+        "location_by_address": {},
+    }
+    for shop in (data or {}).get("shops", []):
+        name = shop.get("name")
+        if name:
+            index["by_name"][name] = shop
+
+        try:
+            connect_id = int(shop.get("shop_connect", 0) or 0)
+        except (TypeError, ValueError):
+            connect_id = 0
+        if name and connect_id:
+            index["connect_ids"][name] = connect_id
+        index["by_connection"].setdefault(connect_id, shop)
+
+        for key, location_id in (("address_geleximco", KHO_GELEXIMCO), ("address_toky", KHO_TOKY)):
+            addr_value = shop.get(key)
+            try:
+                if addr_value is not None:
+                    index["location_by_address"].setdefault(int(addr_value), location_id)
+            except (TypeError, ValueError):
+                # Nếu config sai kiểu thì bỏ qua address này
+                continue
+    return index
+
+
+def _shops_index() -> Dict[str, Dict[Any, Any]]:
+    return config_registry.get(SHOPEE_SHOPS_CONFIG, _build_shops_index)
+
+
 def load_shopee_shops() -> Dict[str, int]:
     """
     Đọc file settings/logs/shopee_shops.json và trả về map:
@@ -132,20 +227,7 @@ def load_shopee_shops() -> Dict[str, int]:
     Các field khác trong JSON (address_geleximco, address_toky, headers_file...)
     sẽ bị bỏ qua ở đây.
     """
-    if not SHOPEE_SHOPS_CONFIG.is_file():
-        return {}
-
-    with SHOPEE_SHOPS_CONFIG.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    shops_map: Dict[str, int] = {}
-    for shop in data.get("shops", []):
-        name = shop.get("name")
-        connect_id = shop.get("shop_connect")
-        if name and connect_id:
-            shops_map[name] = int(connect_id)
-
-    return shops_map
+    return dict(_shops_index()["connect_ids"])
 
 
 def get_connection_ids(shop_names: Optional[List[str]] = None) -> str:
@@ -155,7 +237,7 @@ def get_connection_ids(shop_names: Optional[List[str]] = None) -> str:
     - Nếu shop_names = ['giadungplus_official', 'lteng_vn'] -> chỉ lấy 2 shop này.
     Kết quả: "10925,155174,..."
     """
-    shops_map = load_shopee_shops()
+    shops_map = _shops_index()["connect_ids"]
 
     if not shop_names:
         ids = [str(v) for v in shops_map.values()]
@@ -182,20 +264,7 @@ def load_shopee_shops_detail() -> Dict[str, Dict[str, Any]]:
         ...
     }
     """
-    if not SHOPEE_SHOPS_CONFIG.is_file():
-        return {}
-
-    with SHOPEE_SHOPS_CONFIG.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    shops_detail: Dict[str, Dict[str, Any]] = {}
-    for shop in data.get("shops", []):
-        name = shop.get("name")
-        if not name:
-            continue
-        shops_detail[name] = shop
-
-    return shops_detail
+    return dict(_shops_index()["by_name"])
 
 
 def get_shop_config(shop_name: str) -> Optional[Dict[str, Any]]:
@@ -203,8 +272,7 @@ def get_shop_config(shop_name: str) -> Optional[Dict[str, Any]]:
     Lấy full config của 1 shop theo name.
     Dùng được chung cho nhiều mục đích (headers_file, address_id, v.v.)
     """
-    shops_detail = load_shopee_shops_detail()
-    return shops_detail.get(shop_name)
+    return _shops_index()["by_name"].get(shop_name)
 
 
 def resolve_pickup_address_id(shop_name: str, location_id: int) -> int:
@@ -266,27 +334,11 @@ def resolve_location_by_address(address_id: int) -> Optional[int]:
 
     => Mọi logic cần phân biệt HN / HCM từ address_id đều nên dùng hàm này.
     """
-    if not SHOPEE_SHOPS_CONFIG.is_file():
+    try:
+        return _shops_index()["location_by_address"].get(int(address_id))
+    except (TypeError, ValueError):
         return None
 
-    with SHOPEE_SHOPS_CONFIG.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    for shop in data.get("shops", []):
-        addr_hn = shop.get("address_geleximco")
-        addr_hcm = shop.get("address_toky")
-
-        try:
-            if addr_hn is not None and int(addr_hn) == address_id:
-                return KHO_GELEXIMCO
-            if addr_hcm is not None and int(addr_hcm) == address_id:
-                return KHO_TOKY
-        except (TypeError, ValueError):
-            # Nếu config sai kiểu thì bỏ qua shop này
-            continue
-
-    return None
-
 
 def is_geleximco_address(address_id: int) -> bool:
     """
@@ -299,14 +351,4 @@ def get_shop_by_connection_id(connection_id: int) -> Optional[Dict[str, Any]]:
     Tìm shop config theo connection_id (shop_connect).
     Dùng khi chỉ có connection_id từ Marketplace.
     """
-    if not SHOPEE_SHOPS_CONFIG.is_file():
-        return None
-
-    with SHOPEE_SHOPS_CONFIG.open("r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    for shop in data.get("shops", []):
-        if int(shop.get("shop_connect", 0) or 0) == int(connection_id):
-            return shop
-
-    return None
\ No newline at end of file
+    return _shops_index()["by_connection"].get(int(connection_id))
@@ -0,0 +1,43 @@
+# core/testing.py
+"""
+Helpers dùng chung cho tests.
+"""
+
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from core.base.perf_tracker import PerfTracker, track
+
+
+class PerfBudgetMixin:
+    """
+    Mixin cho TestCase: assert số SQL queries / outbound HTTP calls / thời gian của 1 khối code
+    (thường là self.client.get(...) của 1 view) để bắt N+1 mới.
+
+    Usage:
+        class MyViewTest(PerfBudgetMixin, TestCase):
+            def test_budget(self):
+                with self.assertPerfBudget(max_queries=12, max_external_calls=0):
+                    self.client.get(url)
+    """
+
+    @contextmanager
+    def assertPerfBudget(
+        self,
+        max_queries: Optional[int] = None,
+        max_sql_ms: Optional[float] = None,
+        max_external_calls: Optional[int] = None,
+        max_external_ms: Optional[float] = None,
+        max_total_ms: Optional[float] = None,
+    ) -> Iterator[PerfTracker]:
+        with track() as perf:
+            yield perf
+        violations = perf.over_budget({
+            "max_queries": max_queries,
+            "max_sql_ms": max_sql_ms,
+            "max_external_calls": max_external_calls,
+            "max_external_ms": max_external_ms,
+            "max_total_ms": max_total_ms,
+        })
+        if violations:
+            self.fail(f"Over performance budget: {', '.join(violations)} ({perf.as_dict()})")
@@ -1,3 +1,680 @@
-from django.test import TestCase
+"""
+Tests cho core app.
+"""
 
-# Create your tests here.
+import datetime
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+import requests
+from django.core.cache import caches
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from core import system_settings
+from core.base.paginator import paginate
+from core.base.perf_tracker import track
+from core.base.repository import BaseRepository, _response_cache
+from core.base.throttling import CircuitBreaker, CircuitOpenError, DatabaseRateStore, LocalRateStore, RateLimiter
+from core.cache_backends import SharedDatabaseCache
+from core.middleware.perf_budget_middleware import PerfBudgetMiddleware
+from core.models import ApiCallMetric, BackgroundJob, SapoToken, NotificationDelivery, WebPushSubscription
+from core.services import api_metrics, job_queue
+from core.services.notification_delivery import NotificationDeliveryWorker
+from core.services.notification_engine import NotificationEngine
+from core.services.sapo_token_refresher import get_token_status, tokens_due
+from core.sapo_client import get_sapo_client, token_state
+from core.sapo_client.repositories.core_repository import SapoCoreRepository
+
+
+class SharedDatabaseCacheTest(TestCase):
+    """
+    Test add() atomic của SharedDatabaseCache (dùng cho lock giữa các worker).
+    """
+
+    def setUp(self):
+        self.cache = caches['default']
+        self.assertIsInstance(self.cache, SharedDatabaseCache)
+        self.cache.clear()
+
+    def test_add_only_first_caller_wins(self):
+        self.assertTrue(self.cache.add('lock', 'worker-1', 60))
+        self.assertFalse(self.cache.add('lock', 'worker-2', 60))
+        self.assertEqual(self.cache.get('lock'), 'worker-1')
+
+    def test_add_reclaims_expired_key(self):
+        self.assertTrue(self.cache.add('lock', 'worker-1', 60))
+        # Giả lập thời điểm sau khi lock hết hạn
+        with mock.patch.object(SharedDatabaseCache, 'get_backend_timeout', return_value=4102444800):
+            with mock.patch('core.cache_backends.tz_now') as fake_now:
+                fake_now.return_value = datetime.datetime(2100, 1, 1, tzinfo=datetime.timezone.utc)
+                self.assertTrue(self.cache.add('lock', 'worker-2', 60))
+                self.assertFalse(self.cache.add('lock', 'worker-3', 60))
+
+    def test_add_after_delete(self):
+        self.assertTrue(self.cache.add('lock', 'worker-1', 60))
+        self.cache.delete('lock')
+        self.assertTrue(self.cache.add('lock', 'worker-2', 60))
+        self.assertEqual(self.cache.get('lock'), 'worker-2')
+
+
+class PaginatorTest(SimpleTestCase):
+    """
+    Test core.base.paginator.paginate (fetch pages song song).
+    """
+
+    def _fake_endpoint(self, total, limit, fail_once=None, status_code=503):
+        calls = []
+
+        def fetch_page(page):
+            calls.append(page)
+            if fail_once is not None and page == fail_once and calls.count(page) == 1:
+                response = requests.Response()
+                response.status_code = status_code
+                raise requests.HTTPError(f"{status_code} error", response=response)
+            start = (page - 1) * limit
+            items = [{"id": i} for i in range(start, min(start + limit, total))]
+            return {"items": items, "metadata": {"total": total}}
+
+        return fetch_page, calls
+
+    def test_fetches_all_pages(self):
+        fetch_page, calls = self._fake_endpoint(total=1030, limit=100)
+        stats = {}
+        pages = dict(paginate(fetch_page, items_key="items", limit=100, stats=stats))
+
+        self.assertEqual(sorted(pages), list(range(1, 12)))
+        ids = [item["id"] for page in sorted(pages) for item in pages[page]]
+        self.assertEqual(ids, list(range(1030)))
+        self.assertEqual(stats["pages"], 11)
+        self.assertFalse(stats["truncated"])
+
+    def test_retries_unavailable_page(self):
+        fetch_page, calls = self._fake_endpoint(total=500, limit=100, fail_once=3)
+        stats = {}
+        with mock.patch("core.base.paginator.time.sleep"):
+            pages = dict(paginate(fetch_page, items_key="items", limit=100, max_concurrency=4, stats=stats))
+
+        self.assertEqual(sorted(pages), [1, 2, 3, 4, 5])
+        self.assertEqual(calls.count(3), 2)
+        self.assertLessEqual(stats["concurrency"], 4)
+
+    def test_throttled_page_is_not_retried_again(self):
+        # 429 tới paginator nghĩa là _request đã retry theo Retry-After: không retry thêm tầng nữa
+        fetch_page, calls = self._fake_endpoint(total=500, limit=100, fail_once=3, status_code=429)
+        with mock.patch("core.base.paginator.time.sleep") as sleep:
+            with self.assertRaises(requests.HTTPError):
+                dict(paginate(fetch_page, items_key="items", limit=100, max_concurrency=4))
+
+        self.assertEqual(calls.count(3), 1)
+        sleep.assert_not_called()
+
+    def test_early_break_does_not_wait_for_in_flight_pages(self):
+        release = threading.Event()
+
+        def fetch_page(page):
+            if page > 2:
+                release.wait(5)
+            return {"items": [{"id": page}] * 100, "metadata": {"total": 1000}}
+
+        pages = paginate(fetch_page, items_key="items", limit=100)
+        started = time.monotonic()
+        for page, _ in pages:
+            if page == 2:
+                break
+        pages.close()
+        self.assertLess(time.monotonic() - started, 2)
+        release.set()
+
+    def test_max_pages_truncates(self):
+        fetch_page, calls = self._fake_endpoint(total=1000, limit=100)
+        stats = {}
+        pages = dict(paginate(fetch_page, items_key="items", limit=100, max_pages=3, stats=stats))
+
+        self.assertEqual(sorted(pages), [1, 2, 3])
+        self.assertTrue(stats["truncated"])
+
+
+class JsonConfigRegistryTest(SimpleTestCase):
+    """
+    Test config_registry: parse file 1 lần, đọc lại khi file đổi; helpers shopee_shops tra index.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = Path(self.tmpdir.name) / "shopee_shops.json"
+        self._write([{"name": "shop_a", "shop_connect": 10925, "address_geleximco": 111, "address_toky": 222}])
+        patcher = mock.patch.object(system_settings, "SHOPEE_SHOPS_CONFIG", self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _write(self, shops):
+        self.path.write_text(json.dumps({"shops": shops}), encoding="utf-8")
+
+    def test_lookups_use_index_and_parse_once(self):
+        with mock.patch("core.system_settings.json.load", wraps=json.load) as spy:
+            self.assertEqual(system_settings.load_shopee_shops(), {"shop_a": 10925})
+            self.assertEqual(system_settings.get_shop_by_connection_id(10925)["name"], "shop_a")
+            self.assertEqual(system_settings.resolve_location_by_address(222), system_settings.KHO_TOKY)
+            self.assertIsNone(system_settings.resolve_location_by_address(333))
+            self.assertEqual(spy.call_count, 1)
+
+    def test_reload_when_file_changes(self):
+        self.assertEqual(system_settings.get_connection_ids(), "10925")
+        self._write([
+            {"name": "shop_a", "shop_connect": 10925},
+            {"name": "shop_b", "shop_connect": 155174, "address_geleximco": 444},
+        ])
+        # Đảm bảo mtime khác lần ghi trước trên FS có độ phân giải thấp
+        stat = self.path.stat()
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        self.assertEqual(system_settings.get_connection_ids(), "10925,155174")
+        self.assertTrue(system_settings.is_geleximco_address(444))
+
+    def test_missing_file(self):
+        self.path.unlink()
+        self.assertEqual(system_settings.load_shopee_shops_detail(), {})
+        self.assertIsNone(system_settings.get_shop_config("shop_a"))
+
+
+class _SlowSession:
+    """requests.Session giả: GET chờ `release` để các thread kịp chồng lên nhau"""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def request(self, method, url, timeout=None, **kwargs):
+        with self._lock:
+            self.calls.append((method, url))
+        if method == 'GET':
+            self.release.wait(5)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps({"order": {"id": 1, "calls": len(self.calls)}}).encode()
+        return response
+
+
+class _CoalescingRepository(BaseRepository):
+    single_flight = True
+    cache_ttls = {"orders/": 60}
+    cache_invalidates = {"fulfillments": ["orders/"]}
+
+
+class RepositoryCoalescingTest(SimpleTestCase):
+    """
+    Test single-flight + TTL cache của BaseRepository.get.
+    """
+
+    def setUp(self):
+        _response_cache.clear()
+        self.session = _SlowSession()
+        self.repo = _CoalescingRepository(self.session, "https://example.test/admin")
+
+    def test_concurrent_gets_share_one_request(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.repo.get("orders/1.json")))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        while not self.session.calls:
+            pass
+        self.session.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.session.calls), 1)
+        self.assertEqual(len(results), 5)
+        # Mỗi caller nhận bản copy riêng
+        results[0]["order"]["id"] = 99
+        self.assertEqual(results[1]["order"]["id"], 1)
+
+    def test_cache_invalidated_after_write(self):
+        self.session.release.set()
+        self.repo.get("orders/1.json")
+        self.repo.get("orders/1.json")
+        self.repo.get("orders/2.json")
+        self.assertEqual(len(self.session.calls), 2)
+
+        self.repo.put("orders/1/fulfillments/5.json", json={})
+        self.repo.get("orders/1.json")
+        self.repo.get("orders/2.json")
+        self.assertEqual(len(self.session.calls), 4)
+
+        # Ghi fulfillment (collection khác) xóa cache cả collection orders
+        self.repo.put("fulfillments/5.json", json={})
+        self.repo.get("orders/2.json")
+        self.assertEqual(len(self.session.calls), 6)
+
+    def test_unshared_uncached_get_is_not_copied(self):
+        self.session.release.set()
+        with mock.patch("core.base.repository.copy.deepcopy", side_effect=lambda value: value) as deepcopy:
+            self.repo.get("products.json", params={"page": 1})
+            deepcopy.assert_not_called()
+            self.repo.get("orders/1.json")
+            deepcopy.assert_called_once()
+
+    def test_core_repository_does_not_cache_order_detail(self):
+        self.session.release.set()
+        repo = SapoCoreRepository(self.session, "https://example.test/admin")
+        repo.get("orders/1.json")
+        repo.get("orders/1.json")
+        repo.get("variants/7.json")
+        repo.get("variants/7.json")
+        # Order đọc lại mỗi lần (read-after-write), variant vẫn cache
+        self.assertEqual(len(self.session.calls), 3)
+
+
+class _MetricsRepository(BaseRepository):
+    pass
+
+
+class ApiMetricsTest(TestCase):
+    """
+    Test ghi metrics outbound API theo path template.
+    """
+
+    def setUp(self):
+        api_metrics.flush()
+        ApiCallMetric.objects.all().delete()
+        self.session = _SlowSession()
+        self.session.release.set()
+        self.repo = _MetricsRepository(self.session, "https://example.test/admin")
+
+    def test_records_per_path_template(self):
+        self.assertEqual(api_metrics.path_template("/orders/123/fulfillments/45.json?x=1"), "orders/{id}/fulfillments/{id}.json")
+
+        self.repo.get("orders/1.json")
+        self.repo.get("orders/2.json")
+        self.repo.put("orders/2.json", json={})
+        with mock.patch.object(self.session, "request", side_effect=requests.ConnectionError("down")):
+            with self.assertRaises(requests.ConnectionError):
+                self.repo.get("orders/3.json", retry=2, retry_delay=0)
+        api_metrics.flush()
+
+        rows = {
+            (row["method"], row["path_template"]): row
+            for row in api_metrics.get_endpoint_summary(hours=1, client="_MetricsRepository")
+        }
+        self.assertEqual(set(rows), {("GET", "orders/{id}.json"), ("PUT", "orders/{id}.json")})
+        get_row = rows[("GET", "orders/{id}.json")]
+        self.assertEqual((get_row["calls"], get_row["errors"], get_row["retries"]), (3, 1, 1))
+        self.assertEqual(rows[("PUT", "orders/{id}.json")]["calls"], 1)
+
+        # Flush lần 2 cộng dồn vào cùng bucket
+        self.repo.get("orders/4.json")
+        api_metrics.flush()
+        self.assertEqual(ApiCallMetric.objects.get(method="GET").calls, 4)
+
+    def test_periodic_flush_runs_off_the_caller_thread(self):
+        flush_threads = []
+        with mock.patch.object(api_metrics, "_last_flush", 0), \
+                mock.patch.object(api_metrics, "flush", side_effect=lambda: flush_threads.append(threading.current_thread())):
+            self.repo.get("orders/1.json")
+            api_metrics._flush_thread.join(5)
+
+        self.assertEqual(len(flush_threads), 1)
+        self.assertIsNot(flush_threads[0], threading.current_thread())
+
+
+def _fake_http_send(adapter, request, **kwargs):
+    response = requests.Response()
+    response.status_code = 200
+    response.request = request
+    response._content = b"{}"
+    return response
+
+
+@override_settings(PERF_BUDGET={"DEFAULT": {"max_queries": 1, "max_external_calls": 5}})
+class PerfBudgetMiddlewareTest(TestCase):
+    """
+    Test đếm SQL / outbound HTTP của PerfBudgetMiddleware.
+    """
+
+    def _view(self, request):
+        list(ApiCallMetric.objects.all())
+        list(ApiCallMetric.objects.all())
+        requests.get("https://example.test/ping")
+        return HttpResponse("ok")
+
+    @mock.patch("requests.adapters.HTTPAdapter.send", _fake_http_send)
+    def test_server_timing_and_budget_log(self):
+        middleware = PerfBudgetMiddleware(self._view)
+        with self.assertLogs("core.middleware.perf_budget_middleware", level="WARNING") as logs:
+            response = middleware(RequestFactory().get("/slow/"))
+
+        timing = response["Server-Timing"]
+        self.assertIn('desc="2 queries"', timing)
+        self.assertIn('desc="1 HTTP calls"', timing)
+        self.assertIn("queries 2 > 1", logs.output[0])
+        self.assertNotIn("external_calls", logs.output[0].split("|")[0])
+
+    @mock.patch("requests.adapters.HTTPAdapter.send", _fake_http_send)
+    def test_nested_trackers_count_http_calls(self):
+        with track() as outer:
+            PerfBudgetMiddleware(self._view)(RequestFactory().get("/slow/"))
+        self.assertEqual((outer.queries, outer.external_calls), (2, 1))
+
+
+class NotificationFanOutTest(TestCase):
+    """
+    Test tạo deliveries hàng loạt + gửi web push song song.
+    """
+
+    def setUp(self):
+        self.users = [User.objects.create_user(f"kho{i}", last_name="KHO_HN") for i in range(8)]
+        for i, user in enumerate(self.users):
+            WebPushSubscription.objects.create(
+                user=user, endpoint=f"https://push.example.test/{i}", p256dh="k", auth="a",
+            )
+
+    def _fake_push(self, subscription, **message):
+        time.sleep(0.2)
+        # Endpoint của user cuối đã hết hạn (410)
+        if subscription.endpoint.endswith("/7"):
+            return False, True
+        return True, False
+
+    def test_broadcast_sends_in_parallel(self):
+        # Savepoint + notification + users + deliveries đã có + 1 bulk INSERT + release
+        with self.assertNumQueries(6):
+            notification = NotificationEngine.emit_notification(
+                title="Đơn mới", body="Có đơn cần gói", departments=["KHO_HN"],
+            )
+        self.assertEqual(notification.deliveries.count(), 16)
+        # Gọi lại không tạo trùng
+        self.assertEqual(NotificationEngine.create_deliveries(notification, self.users), [])
+
+        started = time.monotonic()
+        with mock.patch("core.services.notifications._push_to_subscription", self._fake_push):
+            result = NotificationDeliveryWorker.process_pending_deliveries(notification_id=notification.id)
+        self.assertLess(time.monotonic() - started, 1.0)
+
+        self.assertEqual((result["success"], result["failed"], result["timeout"]), (15, 1, False))
+        self.assertEqual(WebPushSubscription.objects.filter(is_active=False).count(), 1)
+        failed = NotificationDelivery.objects.get(status=NotificationDelivery.STATUS_FAILED)
+        self.assertEqual((failed.user, failed.channel), (self.users[7], NotificationDelivery.CHANNEL_WEB_PUSH))
+
+    def test_concurrent_create_does_not_duplicate_deliveries(self):
+        notification = NotificationEngine.emit_notification(title="Đơn mới", body="", departments=["KHO_HN"])
+        # Giả lập tiến trình khác đã tạo cùng (notification, user, channel) sau khi đọc `existing`
+        duplicate = NotificationDelivery(
+            notification=notification, user=self.users[0], channel=NotificationDelivery.CHANNEL_WEB_PUSH,
+        )
+        NotificationDelivery.objects.bulk_create([duplicate], ignore_conflicts=True)
+        self.assertEqual(notification.deliveries.count(), 16)
+
+    def test_each_delivery_gets_its_own_push_outcome(self):
+        first = NotificationEngine.emit_notification(title="ok", body="", user_ids=[self.users[0].id])
+        second = NotificationEngine.emit_notification(title="fail", body="", user_ids=[self.users[0].id])
+
+        # Cùng 1 subscription nhận 2 push: push của notification "fail" lỗi
+        def fake_push(subscription, **message):
+            return message["title"] == "ok", False
+
+        with mock.patch("core.services.notifications._push_to_subscription", fake_push):
+            NotificationDeliveryWorker.process_pending_deliveries()
+
+        web_push = NotificationDelivery.objects.filter(channel=NotificationDelivery.CHANNEL_WEB_PUSH)
+        self.assertEqual(web_push.get(notification=first).status, NotificationDelivery.STATUS_SENT)
+        self.assertEqual(web_push.get(notification=second).status, NotificationDelivery.STATUS_FAILED)
+
+
+class SapoClientPoolTest(TestCase):
+    def setUp(self):
+        token_state.clear("core")
+
+    def tearDown(self):
+        token_state.clear("core")
+
+    def _client_in_thread(self):
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(client=get_sapo_client()))
+        thread.start()
+        thread.join()
+        return result["client"]
+
+    def test_one_client_per_thread(self):
+        self.assertIs(get_sapo_client(), get_sapo_client())
+        self.assertIsNot(get_sapo_client(), self._client_in_thread())
+
+    def test_thread_client_adopts_shared_token_without_db(self):
+        owner = get_sapo_client()
+        owner.core_session.headers["authorization"] = "token-1"
+        owner.core_session.cookies.set("sid", "abc")
+        owner._mark_token_valid("core")
+
+        other = self._client_in_thread()
+        with self.assertNumQueries(0):
+            other._ensure_logged_in()
+        self.assertTrue(other.core_valid)
+        self.assertEqual(other.core_session.headers["authorization"], "token-1")
+        self.assertEqual(other.core_session.cookies.get("sid"), "abc")
+
+    def test_invalidate_resets_other_clients(self):
+        owner = get_sapo_client()
+        owner.core_session.headers["authorization"] = "token-1"
+        owner._mark_token_valid("core")
+        other = self._client_in_thread()
+        other._ensure_logged_in()
+
+        owner._invalidate_token()
+        other._sync_shared_token("core")
+        self.assertFalse(other.core_valid)
+        self.assertFalse(other.core_initialized)
+
+    def test_refreshed_db_token_replaces_shared_token(self):
+        from django.utils import timezone
+
+        owner = get_sapo_client()
+        owner._token_expires["core"] = timezone.now() + datetime.timedelta(minutes=10)
+        owner._mark_token_valid("core")
+        SapoToken.objects.create(
+            key="loginss", headers={}, expires_at=timezone.now() + datetime.timedelta(hours=6),
+        )
+
+        with mock.patch("core.sapo_client.client.TOKEN_ROTATION_CHECK_SECONDS", 0):
+            owner._sync_shared_token("core")
+        self.assertFalse(owner.core_valid)
+        self.assertFalse(token_state.has_token("core"))
+
+
+class SapoTokenRefresherTest(TestCase):
+    def test_tokens_due(self):
+        from django.utils import timezone
+
+        now = timezone.now()
+        SapoToken.objects.create(key="loginss", headers={}, expires_at=now + datetime.timedelta(hours=5))
+        SapoToken.objects.create(key="tmdt", headers={}, expires_at=now + datetime.timedelta(minutes=10))
+
+        status = get_token_status(now)
+        self.assertEqual([item["seconds_left"] for item in status], [5 * 3600, 600])
+        self.assertEqual(tokens_due(status, refresh_before=1800), ["tmdt"])
+
+        SapoToken.objects.filter(key="tmdt").delete()
+        self.assertEqual(tokens_due(get_token_status(now), refresh_before=1800), ["tmdt"])
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(round(seconds, 3))
+        self.now += seconds
+
+
+@override_settings(API_RATE_LIMITS={"DEFAULT": {"rate": 10, "burst": 2}})
+class ThrottlingTest(SimpleTestCase):
+    def _limiter(self, clock):
+        return RateLimiter(store=LocalRateStore(), clock=clock, sleep=clock.sleep)
+
+    def test_rate_limiter_allows_burst_then_paces(self):
+        clock = _FakeClock()
+        limiter = self._limiter(clock)
+
+        waits = [round(limiter.acquire("api.example.test"), 3) for _ in range(4)]
+        self.assertEqual(waits, [0, 0, 0.1, 0.1])
+        # Host khác có bucket riêng
+        self.assertEqual(limiter.acquire("other.example.test"), 0)
+
+    def test_penalize_blocks_host(self):
+        clock = _FakeClock()
+        limiter = self._limiter(clock)
+
+        limiter.penalize("api.example.test", 5)
+        self.assertAlmostEqual(limiter.acquire("api.example.test"), 5, places=3)
+
+    @mock.patch("core.base.throttling.DB_LOCK_WAIT_SECONDS", 0.05)
+    def test_busy_db_store_falls_back_to_local_bucket(self):
+        clock = _FakeClock()
+        limiter = RateLimiter(clock=clock, sleep=clock.sleep)
+        limiter._db_store = DatabaseRateStore()
+        # Thread khác đang giữ connection (DB treo)
+        limiter._db_store._lock.acquire()
+        try:
+            started = time.monotonic()
+            self.assertEqual(limiter.acquire("api.example.test"), 0)
+            self.assertLess(time.monotonic() - started, 1)
+        finally:
+            limiter._db_store._lock.release()
+        self.assertGreater(limiter._db_disabled_until, time.monotonic())
+
+    def test_circuit_breaker_opens_and_recovers(self):
+        clock = _FakeClock()
+        breaker = CircuitBreaker("api.example.test", failure_threshold=2, reset_timeout=30, clock=clock)
+
+        breaker.before_call()
+        breaker.record(True)
+        breaker.before_call()
+        breaker.record(True)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+        clock.now += 31
+        breaker.before_call()  # probe
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()  # chỉ 1 probe tại 1 thời điểm
+        breaker.record(False)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.before_call()
+
+    def test_request_retries_after_429(self):
+        class _RateLimitedSession:
+            def __init__(self):
+                self.statuses = [429, 200]
+
+            def request(self, method, url, timeout=None, **kwargs):
+                response = requests.Response()
+                response.status_code = self.statuses.pop(0)
+                response.headers["Retry-After"] = "3"
+                response._content = b"{}"
+                return response
+
+        repo = _MetricsRepository(_RateLimitedSession(), "https://api.example.test")
+        with mock.patch("core.base.repository.time.sleep") as sleep, \
+                mock.patch.object(_MetricsRepository, "_record_call"):
+            response = repo._request("GET", "orders.json")
+        self.assertEqual(response.status_code, 200)
+        sleep.assert_called_once_with(3.0)
+
+
+@job_queue.task("tests.add", priority=1)
+def _add_task(ctx, a, b):
+    return {"sum": a + b}
+
+
+@job_queue.task("tests.flaky", max_attempts=2)
+def _flaky_task(ctx):
+    raise RuntimeError("boom")
+
+
+@job_queue.task("tests.cancellable")
+def _cancellable_task(ctx):
+    job_queue.cancel_job(ctx.job_id)
+    ctx.check_cancelled()
+    return "unreachable"
+
+
+class JobQueueTest(TestCase):
+    def _run_next(self):
+        job = job_queue.claim_next("test-worker")
+        return job_queue.run_job(job, "test-worker") if job else None
+
+    def test_priority_order_and_result(self):
+        low = job_queue.enqueue("tests.add", {"a": 1, "b": 2})
+        high = job_queue.enqueue("tests.add", {"a": 3, "b": 4}, priority=10)
+
+        job = self._run_next()
+        self.assertEqual(job.id, high.id)
+        self.assertEqual(job.status, BackgroundJob.STATUS_SUCCEEDED)
+        self.assertEqual(job.result, {"sum": 7})
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(self._run_next().id, low.id)
+        self.assertIsNone(job_queue.claim_next("test-worker"))
+
+    def test_unique_returns_active_job(self):
+        first = job_queue.enqueue("tests.add", {"a": 1, "b": 1}, unique=True)
+        self.assertEqual(job_queue.enqueue("tests.add", {"a": 1, "b": 1}, unique=True).id, first.id)
+        self.assertNotEqual(job_queue.enqueue("tests.add", {"a": 1, "b": 2}, unique=True).id, first.id)
+
+    def test_retry_with_backoff_then_fail(self):
+        from django.utils import timezone
+
+        job = job_queue.enqueue("tests.flaky")
+        job = self._run_next()
+        self.assertEqual(job.status, BackgroundJob.STATUS_QUEUED)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIsNone(job_queue.claim_next("test-worker"))  # chưa tới hạn retry
+
+        BackgroundJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        job = self._run_next()
+        self.assertEqual(job.status, BackgroundJob.STATUS_FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(job_queue.job_as_dict(job)["error"], "boom")
+
+    def test_cancel(self):
+        queued = job_queue.enqueue("tests.add", {"a": 1, "b": 1})
+        self.assertEqual(job_queue.cancel_job(queued.id).status, BackgroundJob.STATUS_CANCELLED)
+
+        job_queue.enqueue("tests.cancellable")
+        self.assertEqual(self._run_next().status, BackgroundJob.STATUS_CANCELLED)
+
+    def test_requeue_stale_jobs(self):
+        from django.utils import timezone
+
+        job = job_queue.enqueue("tests.add", {"a": 1, "b": 1}, max_attempts=2)
+        job = job_queue.claim_next("dead-worker")
+        BackgroundJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - datetime.timedelta(minutes=10))
+
+        self.assertEqual(job_queue.requeue_stale_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, BackgroundJob.STATUS_QUEUED)
+        self.assertEqual(self._run_next().status, BackgroundJob.STATUS_SUCCEEDED)
+
+    @override_settings(BACKGROUND_JOBS={"EAGER": True})
+    def test_eager_and_status_api(self):
+        user = User.objects.create_user(username="jobs", password="x")
+        job = job_queue.enqueue("tests.add", {"a": 2, "b": 2}, user=user)
+        self.assertEqual(job.status, BackgroundJob.STATUS_SUCCEEDED)
+
+        self.client.force_login(user)
+        response = self.client.get(f"/core/api/jobs/{job.id}/", SERVER_PORT="8000")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["result"], {"sum": 4})
+        self.assertTrue(response.json()["finished"])
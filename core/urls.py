@@ -17,6 +17,10 @@ urlpatterns = [
     path("api/notifications/<int:delivery_id>/mark-read/", views.mark_notification_read, name="mark_notification_read"),
     path("api/notifications/mark-all-read/", views.mark_all_notifications_read, name="mark_all_read"),
 
+    # Background jobs
+    path("api/jobs/<int:job_id>/", views.job_status_api, name="job_status_api"),
+    path("api/jobs/<int:job_id>/cancel/", views.job_cancel_api, name="job_cancel_api"),
+
     # Server logs (admin only)
     path("server-logs/", views.server_logs_view, name="server_logs_view"),
     path("api/server-logs/", views.server_logs_api, name="server_logs_api"),
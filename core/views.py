@@ -22,6 +22,7 @@ from django.contrib.auth import logout, get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import LoginView
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.permissions import AllowAny
@@ -29,7 +30,8 @@ from rest_framework.response import Response
 from rest_framework import status
 
 from core.sapo_client.client import SELENIUM_LOCK_KEY
-from .models import WebPushSubscription, NotificationDelivery
+from core.services.job_queue import cancel_job, job_as_dict
+from .models import BackgroundJob, WebPushSubscription, NotificationDelivery
 from .serializers import WebPushSubscriptionSerializer
 
 logger = logging.getLogger(__name__)
@@ -469,6 +471,44 @@ def server_logs_execute_cmd_api(request: HttpRequest) -> JsonResponse:
         )
 
 
+# ==================== BACKGROUND JOB APIs ====================
+
+def _can_manage_job(user, job: BackgroundJob) -> bool:
+    return user.is_staff or user.is_superuser or job.created_by_id in (None, user.id)
+
+
+@login_required
+def job_status_api(request: HttpRequest, job_id: int) -> JsonResponse:
+    """
+    API endpoint: /core/api/jobs/<job_id>/
+
+    Trạng thái job chạy nền (JS poll sau khi view trả về 202 + job_id).
+    """
+    job = BackgroundJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return JsonResponse({"detail": "Job không tồn tại."}, status=404)
+    if not _can_manage_job(request.user, job):
+        return JsonResponse({"detail": "Bạn không có quyền xem job này."}, status=403)
+    return JsonResponse(job_as_dict(job))
+
+
+@login_required
+@require_POST
+def job_cancel_api(request: HttpRequest, job_id: int) -> JsonResponse:
+    """
+    API endpoint: /core/api/jobs/<job_id>/cancel/
+
+    Hủy job: job đang chờ bị hủy ngay, job đang chạy dừng ở checkpoint kế tiếp.
+    """
+    job = BackgroundJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return JsonResponse({"detail": "Job không tồn tại."}, status=404)
+    if not _can_manage_job(request.user, job):
+        return JsonResponse({"detail": "Bạn không có quyền hủy job này."}, status=403)
+    job = cancel_job(job_id)
+    return JsonResponse(job_as_dict(job))
+
+
 @api_view(["POST"])
 @authentication_classes([])  # Tắt SessionAuthentication để DRF không bắt CSRF
 @permission_classes([AllowAny])
@@ -0,0 +1,72 @@
+# cskh/jobs.py
+"""
+Background jobs của app cskh (chạy bởi `python manage.py run_workers`).
+
+- cskh.feedback_sync: chạy FeedbackSyncJob (full / incremental) qua FeedbackSyncService.
+  Hủy background job -> FeedbackSyncJob chuyển 'paused', resume bằng
+  `sync_feedbacks_full --resume-job-id <id>` (hoặc --enqueue).
+- cskh.sync_feedbacks: sync nhanh N ngày gần nhất cho nút "Sync" trên UI (api_sync_feedbacks).
+"""
+
+from typing import Any, Dict, Optional
+import logging
+
+from core.sapo_client import get_sapo_client
+from core.services.job_queue import JobCancelled, JobContext, task
+from cskh.models import FeedbackSyncJob
+
+logger = logging.getLogger(__name__)
+
+
+# Full sync resume được từ page/cursor đã lưu -> retry an toàn
+@task("cskh.feedback_sync", max_attempts=3)
+def feedback_sync(ctx: JobContext, sync_job_id: int) -> Dict[str, Any]:
+    """Chạy FeedbackSyncJob; progress chi tiết vẫn ghi vào FeedbackSyncJob (trang sync-status)."""
+    from cskh.services.feedback_sync_service import FeedbackSyncService
+
+    job = FeedbackSyncJob.objects.get(id=sync_job_id)
+    ctx.set_progress(sync_job_id=job.id, sync_type=job.sync_type)
+    sync_service = FeedbackSyncService(get_sapo_client(), cancel_check=ctx.check_cancelled)
+
+    try:
+        if job.sync_type == 'full':
+            result = sync_service.run_full_sync(job)
+        else:
+            result = sync_service.run_incremental_sync(job)
+    except JobCancelled:
+        FeedbackSyncJob.objects.filter(id=job.id).update(status='paused')
+        logger.info(f"[feedback_sync] Sync job {job.id} paused (background job cancelled)")
+        raise
+
+    if not result['success']:
+        raise RuntimeError(f"Sync job {job.id} failed: {', '.join(result['errors'][:5])}")
+
+    return {
+        "sync_job_id": job.id,
+        "synced": result['synced'],
+        "updated": result['updated'],
+        "error_count": len(result['errors']),
+        "errors": result['errors'][:20],
+        "stopped_at_existing": result.get('stopped_at_existing', False),
+    }
+
+
+@task("cskh.sync_feedbacks", priority=5)
+def sync_feedbacks(
+    ctx: JobContext,
+    days: int = 30,
+    page_size: int = 50,
+    max_feedbacks_per_shop: Optional[int] = 100,
+) -> Dict[str, Any]:
+    """Sync feedbacks N ngày gần nhất từ Shopee API; kết quả giống response cũ của api_sync_feedbacks."""
+    from cskh.services.feedback_service import FeedbackService
+
+    feedback_service = FeedbackService(get_sapo_client())
+    logger.info(f"[sync_feedbacks] Starting sync: days={days}, page_size={page_size}, max_feedbacks_per_shop={max_feedbacks_per_shop}")
+    result = feedback_service.sync_feedbacks_from_shopee(
+        days=days,
+        page_size=page_size,
+        max_feedbacks_per_shop=max_feedbacks_per_shop,
+    )
+    logger.info(f"[sync_feedbacks] Sync completed: success={result.get('success')}, synced={result.get('synced')}, total_feedbacks={result.get('total_feedbacks')}")
+    return result
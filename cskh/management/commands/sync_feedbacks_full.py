@@ -45,6 +45,11 @@ class Command(BaseCommand):
             action='store_true',
             help='Tự động tính page/cursor từ database để tiếp tục (không bắt đầu lại từ đầu)'
         )
+        parser.add_argument(
+            '--enqueue',
+            action='store_true',
+            help='Đưa job vào hàng đợi background (manage.py run_workers) thay vì chạy ngay'
+        )
     
     def handle(self, *args, **options):
         days = options['days']
@@ -147,6 +152,10 @@ class Command(BaseCommand):
                 self.style.SUCCESS(f'Created full sync job {job.id}')
             )
         
+        if options['enqueue']:
+            self._enqueue(job)
+            return
+        
         # Chạy sync
         self.stdout.write(f'Starting full sync (job {job.id})...')
         self.stdout.write(f'  Days: {days}')
@@ -183,4 +192,14 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.ERROR(f'❌ Sync failed: {str(e)}')
             )
-
+    
+    def _enqueue(self, job: FeedbackSyncJob):
+        from core.services.job_queue import enqueue
+        
+        background_job = enqueue("cskh.feedback_sync", {"sync_job_id": job.id}, unique=True)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Enqueued sync job {job.id} as background job #{background_job.id} '
+                f'(status: {background_job.status})'
+            )
+        )
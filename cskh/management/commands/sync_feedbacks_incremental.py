@@ -23,6 +23,11 @@ class Command(BaseCommand):
             default=50,
             help='Số feedbacks mỗi batch (default: 50)'
         )
+        parser.add_argument(
+            '--enqueue',
+            action='store_true',
+            help='Đưa job vào hàng đợi background (manage.py run_workers) thay vì chạy ngay'
+        )
     
     def handle(self, *args, **options):
         batch_size = options['batch_size']
@@ -37,6 +42,10 @@ class Command(BaseCommand):
             self.style.SUCCESS(f'Created incremental sync job {job.id}')
         )
         
+        if options['enqueue']:
+            self._enqueue(job)
+            return
+        
         # Chạy sync
         self.stdout.write(f'Starting incremental sync (job {job.id})...')
         self.stdout.write(f'  Batch size: {batch_size}')
@@ -73,4 +82,14 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.ERROR(f'❌ Sync failed: {str(e)}')
             )
-
+    
+    def _enqueue(self, job: FeedbackSyncJob):
+        from core.services.job_queue import enqueue
+        
+        background_job = enqueue("cskh.feedback_sync", {"sync_job_id": job.id}, unique=True)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Enqueued sync job {job.id} as background job #{background_job.id} '
+                f'(status: {background_job.status})'
+            )
+        )
@@ -3,7 +3,7 @@
 Service để xử lý feedbacks/reviews từ Shopee API và Sapo Marketplace API.
 """
 
-from typing import Dict, Any, List, Optional, Callable
+from typing import Dict, Any, Iterable, List, Optional, Callable
 import logging
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
@@ -20,10 +20,22 @@ from core.shopee_client import ShopeeClient
 from core.system_settings import get_connection_ids, get_shop_by_connection_id, load_shopee_shops_detail
 from cskh.models import Feedback, FeedbackLog
 from orders.services.dto import OrderDTO
+from products.models import SapoVariantCache
 from products.services.sapo_product_service import SapoProductService
+from products.services.shopee_variant_index import get_variant_ids, get_variant_ids_many
 
 logger = logging.getLogger(__name__)
 
+# Các trường được cập nhật lại khi Shopee trả về feedback đã có trong DB
+SHOPEE_FEEDBACK_UPDATE_FIELDS = [
+    "rating", "comment", "reply", "reply_time", "user_portrait", "product_name",
+    "buyer_user_name", "channel_order_number", "product_image", "product_cover",
+    "is_hidden", "status", "can_follow_up", "follow_up", "submit_time", "ctime", "mtime", "images",
+]
+
+# Các trường Sapo được ghi khi link feedback với order/variant
+SAPO_LINK_FIELDS = ["sapo_order_id", "sapo_customer_id", "sapo_variant_id", "sapo_product_id", "updated_at"]
+
 # Path to log file for saving/loading page number
 FEEDBACK_LOG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'settings', 'log_feedback.log')
 
@@ -43,9 +55,8 @@ class FeedbackService:
         self.sapo_client = sapo_client
         self.mp_repo = sapo_client.marketplace
         self.product_service = SapoProductService(sapo_client)
-        # Cache index: (connection_id, item_id_str) -> List[variant_id]
-        # Được build 1 lần cho mỗi lần chạy sync Shopee để tránh gọi Sapo liên tục.
-        self._shopee_variant_index: Optional[Dict[tuple, List[int]]] = None
+        # Cache variant_id -> product_id (SapoVariantCache / Sapo API) dùng khi link feedbacks
+        self._variant_product_ids: Dict[int, int] = {}
     
     def _load_last_page(self) -> int:
         """
@@ -592,7 +603,13 @@ class FeedbackService:
         except Exception as e:
             logger.warning(f"Error linking Sapo data for feedback {feedback.feedback_id}: {e}")
     
-    def _find_variant_ids_from_order(self, raw_order: Dict[str, Any], item_id: int, connection_id: int) -> List[int]:
+    def _find_variant_ids_from_order(
+        self,
+        raw_order: Dict[str, Any],
+        item_id: int,
+        connection_id: int,
+        indexed_variant_ids: Optional[Iterable[int]] = None,
+    ) -> List[int]:
         """
         Tìm variant_ids từ order line items theo item_id.
         
@@ -606,6 +623,7 @@ class FeedbackService:
             raw_order: Raw order data từ Sapo API (có chứa line_items)
             item_id: Shopee item_id từ feedback
             connection_id: Shopee connection_id từ feedback
+            indexed_variant_ids: Variant IDs đã tra sẵn từ index (None = tự query index)
             
         Returns:
             List of variant_ids (có thể nhiều variants nếu nhiều sản phẩm trong đơn)
@@ -620,11 +638,10 @@ class FeedbackService:
             
             logger.debug(f"Searching variant in order for item_id={item_id}, connection_id={connection_id}, line_items_count={len(line_items)}")
             
-            # Đảm bảo đã có index Shopee (được build 1 lần cho mỗi lần sync)
-            self._ensure_shopee_variant_index()
-            index = self._shopee_variant_index or {}
-            key = (connection_id, item_id_str)
-            indexed_variants = set(index.get(key, []))
+            # Index Shopee item -> variant (bảng ShopeeItemVariantIndex, cập nhật khi sync products)
+            if indexed_variant_ids is None:
+                indexed_variant_ids = get_variant_ids(connection_id, item_id_str)
+            indexed_variants = set(indexed_variant_ids)
 
             for line_item in line_items:
                 variant_id = line_item.get('variant_id')
@@ -642,12 +659,12 @@ class FeedbackService:
                 if line_item_id == item_id_str:
                     variant_ids.append(variant_id)
                     logger.debug(f"Found variant {variant_id} in order line item for item_id={item_id} (direct match)")
-                # Nếu không khớp trực tiếp, fallback: dùng index đã build từ GDP_META
+                # Nếu không khớp trực tiếp, fallback: dùng index build từ GDP_META
                 elif indexed_variants and variant_id in indexed_variants:
                     variant_ids.append(variant_id)
                     logger.debug(
                         f"Found variant {variant_id} in order line item for item_id={item_id} "
-                        f"(via preloaded Shopee index)"
+                        f"(via Shopee variant index)"
                     )
             
             if variant_ids:
@@ -662,10 +679,10 @@ class FeedbackService:
     
     def _find_variant_ids_from_item_id(self, item_id: int, connection_id: int) -> List[int]:
         """
-        Tìm variant_ids từ item_id bằng cách đọc GDP_META từ products.
+        Tìm variant_ids từ item_id qua index GDP_META (ShopeeItemVariantIndex).
         
         Logic theo FEEDBACK_CENTER.md:
-        1. Đọc GDP_META từ product description
+        1. Đọc GDP_META từ product description (đã được index khi sync products / sửa metadata)
         2. Tìm trong shopee_connections của variants với connection_id và item_id khớp
         3. Trả về list variant_ids (có thể nhiều variants cùng item_id)
         
@@ -679,24 +696,16 @@ class FeedbackService:
         variant_ids: List[int] = []
         
         try:
-            # Đảm bảo index đã được build
-            self._ensure_shopee_variant_index()
-            if not self._shopee_variant_index:
-                logger.debug("Shopee variant index is empty; cannot resolve item_id → variant_id")
-                return []
-
-            item_id_str = str(item_id)
-            key = (connection_id, item_id_str)
-            variant_ids = list(self._shopee_variant_index.get(key, []))
+            variant_ids = get_variant_ids(connection_id, item_id)
 
             if variant_ids:
                 logger.info(
-                    f"Found {len(variant_ids)} variants in preloaded index "
+                    f"Found {len(variant_ids)} variants in Shopee variant index "
                     f"for item_id={item_id}, connection_id={connection_id}: {variant_ids}"
                 )
             else:
                 logger.debug(
-                    f"No variants found in preloaded index for item_id={item_id}, "
+                    f"No variants found in Shopee variant index for item_id={item_id}, "
                     f"connection_id={connection_id}"
                 )
             
@@ -704,61 +713,6 @@ class FeedbackService:
             logger.warning(f"Error finding variant from item_id {item_id} using index: {e}")
         
         return variant_ids
-
-    def _ensure_shopee_variant_index(self):
-        """
-        Build index (connection_id, item_id) -> [variant_id] từ toàn bộ products trên Sapo.
-        Chỉ chạy 1 lần cho mỗi vòng đời FeedbackService (hoặc mỗi lần sync), 
-        tránh việc gọi list_products / get_product lặp lại trong từng feedback.
-        """
-        if self._shopee_variant_index is not None:
-            return
-
-        logger.info("[FeedbackService] Building Shopee variant index from all Sapo products...")
-        index: Dict[tuple, List[int]] = {}
-
-        try:
-            start_time = time.time()
-            page = 1
-            limit = 250
-            total_products = 0
-
-            while True:
-                products = self.product_service.list_products(page=page, limit=limit, status='active')
-                if not products:
-                    break
-
-                total_products += len(products)
-
-                for product in products:
-                    if not product.gdp_metadata or not product.gdp_metadata.variants:
-                        continue
-
-                    for variant_meta in product.gdp_metadata.variants:
-                        if not variant_meta.shopee_connections:
-                            continue
-
-                        for conn in variant_meta.shopee_connections:
-                            conn_connection_id = conn.get('connection_id')
-                            conn_item_id = conn.get('item_id')
-                            if not conn_connection_id or not conn_item_id:
-                                continue
-
-                            key = (int(conn_connection_id), str(conn_item_id))
-                            index.setdefault(key, []).append(variant_meta.id)
-
-                page += 1
-
-            self._shopee_variant_index = index
-            duration = time.time() - start_time
-            logger.info(
-                f"[FeedbackService] Built Shopee variant index with {len(index)} keys "
-                f"from {total_products} products in {duration:.2f}s"
-            )
-        except Exception as e:
-            logger.error(f"[FeedbackService] Error building Shopee variant index: {e}", exc_info=True)
-            # Nếu lỗi, vẫn giữ index = {}, tránh None để không build lại liên tục
-            self._shopee_variant_index = self._shopee_variant_index or {}
     
     def _extract_reply_comment(self, reply_data: Any) -> str:
         """
@@ -1153,7 +1107,7 @@ class FeedbackService:
         base_url_params: Dict[str, Any],
         max_pages: int = 100,
         page_size: int = 50,
-        delay: float = 0.1,
+        delay: float = 0,
         max_feedbacks: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """
@@ -1164,7 +1118,7 @@ class FeedbackService:
             base_url_params: Dict chứa các params cơ bản (rating_star, time_start, time_end, language)
             max_pages: Số trang tối đa
             page_size: Số items mỗi trang
-            delay: Thời gian delay giữa các request (giây)
+            delay: Thời gian delay thêm giữa các request (giây, mặc định 0: ShopeeClient đã rate limit theo host)
             max_feedbacks: Số đánh giá tối đa cần lấy (None = không giới hạn)
             
         Returns:
@@ -1230,7 +1184,8 @@ class FeedbackService:
                 page_number += 1
                 from_page_number = page_number - 1
                 
-                time.sleep(delay)
+                if delay:
+                    time.sleep(delay)
                 
             except Exception as e:
                 logger.error(f"Error crawling page {page_number}: {e}", exc_info=True)
@@ -1567,8 +1522,6 @@ class FeedbackService:
                                     progress_update_callback(shop_name, page, cursor)
                                 except Exception as e:
                                     logger.warning(f"Error in progress_update_callback: {e}")
-                            
-                            time.sleep(0.1)  # Delay giữa các request
                         
                         if not batch_ratings:
                             shop_prog['done'] = True
@@ -1582,43 +1535,43 @@ class FeedbackService:
                         
                         # Xử lý batch này ngay
                         log_progress(f"🔄 Shop {shop_name}: Xử lý {len(batch_ratings)} feedbacks...")
-                        for idx, feedback_data in enumerate(batch_ratings, 1):
+                        # Upsert + link Sapo theo từng trang (1 lượt query DB mỗi trang thay vì mỗi feedback)
+                        for start in range(0, len(batch_ratings), page_size):
+                            page_ratings = batch_ratings[start:start + page_size]
                             try:
-                                comment_id = feedback_data.get("comment_id")
-                                if not comment_id:
-                                    continue
+                                t0 = time.time()
+                                page_stats = self.process_feedbacks_from_shopee_bulk(page_ratings)
+                                duration = time.time() - t0
                                 
-                                # Profile thời gian xử lý feedback đầu tiên
+                                # Profile thời gian xử lý trang đầu tiên
                                 if not first_profile_logged:
-                                    t0 = time.time()
-                                    updated = self._process_feedback_from_shopee(feedback_data)
-                                    duration = time.time() - t0
                                     first_profile_logged = True
                                     log_progress(
-                                        f"⏱ Thời gian xử lý feedback đầu tiên: "
+                                        f"⏱ Thời gian xử lý trang đầu tiên ({len(page_ratings)} feedbacks): "
                                         f"{duration:.3f}s (Shopee -> DB + link Sapo)"
                                     )
-                                else:
-                                    updated = self._process_feedback_from_shopee(feedback_data)
                                 
+                                page_processed = page_stats["created"] + page_stats["updated"] + page_stats["unchanged"]
                                 with lock:
-                                    synced_counter["value"] += 1
-                                    if updated:
-                                        updated_counter["value"] += 1
+                                    synced_counter["value"] += page_processed
+                                    updated_counter["value"] += page_stats["created"] + page_stats["updated"]
                                 
-                                total_processed += 1
+                                previous_processed = total_processed
+                                total_processed += page_processed
                                 
                                 # Log progress mỗi 50 items
-                                if total_processed % 50 == 0:
+                                if total_processed // 50 > previous_processed // 50:
                                     progress_msg = f"Đã xử lý {total_processed} feedbacks (synced: {synced_counter['value']}, updated: {updated_counter['value']})"
                                     log_progress(progress_msg)
-                                    logger.info(f"[FeedbackService] {progress_msg}")
                                 
                             except Exception as e:
-                                error_msg = f"Error processing feedback {comment_id}: {str(e)}"
+                                error_msg = (
+                                    f"Error processing feedbacks {start + 1}-{start + len(page_ratings)} "
+                                    f"of shop {shop_name}: {str(e)}"
+                                )
                                 logger.error(error_msg, exc_info=True)
                                 with lock:
-                                    synced_counter["value"] += 1
+                                    synced_counter["value"] += len(page_ratings)
                                     errors_list.append(error_msg)
                         
                         # Update shop progress
@@ -1712,38 +1665,18 @@ class FeedbackService:
             return value_str[:max_length]
         return value_str
     
-    def _process_feedback_from_shopee(self, feedback_data: Dict[str, Any]) -> bool:
+    def _shopee_feedback_fields(self, feedback_data: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Process một feedback từ Shopee API và lưu/update vào database.
+        Map 1 feedback từ Shopee API sang các trường của model Feedback (trừ feedback_id).
         
         Args:
-            feedback_data: Feedback data từ Shopee API
+            feedback_data: Feedback data từ Shopee API (đã gắn connection_id)
             
         Returns:
-            True nếu đã update, False nếu tạo mới
+            Dict field -> value
         """
-        comment_id = feedback_data.get("comment_id")
-        if not comment_id:
-            logger.warning("Feedback data missing comment_id, skipping")
-            return False
-        
-        # Set feedback_id = comment_id (dùng feedback_id làm key chính)
-        feedback_id = comment_id
-        
-        # Kiểm tra feedback_id đã tồn tại chưa để tránh trùng lặp
-        try:
-            existing_feedback = Feedback.objects.filter(feedback_id=feedback_id).first()
-            if existing_feedback:
-                logger.debug(f"Feedback với feedback_id {feedback_id} đã tồn tại, sẽ update thay vì tạo mới")
-        except Exception as e:
-            logger.warning(f"Error checking existing feedback_id {feedback_id}: {e}")
-        
-        # Map dữ liệu từ Shopee API sang model
-        connection_id = feedback_data.get("connection_id", 0)
-        
         # Truncate các trường có thể vượt quá max_length
         product_name = self._truncate_field(feedback_data.get("product_name", ""), 1000)
-        model_name = feedback_data.get("model_name", "")  # TextField, không cần truncate (nhưng sẽ không lưu theo yêu cầu)
         buyer_user_name = self._truncate_field(feedback_data.get("user_name", ""), 200)
         
         # user_portrait: Lưu chỉ ID (không có prefix URL)
@@ -1780,133 +1713,89 @@ class FeedbackService:
                 # Có thể là path khác, dùng trực tiếp
                 product_image = product_cover
         
+        return {
+            "connection_id": feedback_data.get("connection_id", 0),
+            # Set comment_id = feedback_id (giữ lại để tương thích)
+            "comment_id": feedback_data.get("comment_id"),
+            "tenant_id": None,  # Không có từ Shopee API
+            # Product info
+            "item_id": feedback_data.get("item_id"),
+            "product_id": feedback_data.get("product_id"),
+            "product_name": product_name,
+            "product_image": product_image,  # URL từ product_cover
+            "product_cover": product_cover,  # ID gốc từ Shopee
+            "model_id": feedback_data.get("model_id"),
+            "model_name": "",  # KHÔNG lưu model_name từ Shopee (để trống)
+            # Order info
+            "channel_order_number": channel_order_number,
+            "order_id": feedback_data.get("order_id"),
+            # Customer info
+            "buyer_user_name": buyer_user_name,
+            "user_portrait": user_portrait,
+            "user_id": feedback_data.get("user_id"),
+            # Rating & Comment
+            "rating": feedback_data.get("rating_star", 0),
+            "comment": feedback_data.get("comment", ""),
+            "images": self._normalize_media(feedback_data.get("images", [])),
+            # Reply info - Parse reply object từ Shopee API
+            "reply": self._extract_reply_comment(feedback_data.get("reply")),
+            "reply_time": self._extract_reply_time(feedback_data.get("reply")),
+            # Additional fields from Shopee
+            "is_hidden": feedback_data.get("is_hidden", False),
+            "status": feedback_data.get("status"),
+            "can_follow_up": feedback_data.get("can_follow_up"),
+            "follow_up": feedback_data.get("follow_up"),
+            "submit_time": feedback_data.get("submit_time"),
+            "low_rating_reasons": feedback_data.get("low_rating_reasons", []),
+            # Timestamps
+            "create_time": feedback_data.get("ctime", 0) or feedback_data.get("submit_time", 0),
+            "ctime": feedback_data.get("ctime"),
+            "mtime": feedback_data.get("mtime"),
+        }
+    
+    def _process_feedback_from_shopee(self, feedback_data: Dict[str, Any]) -> bool:
+        """
+        Process một feedback từ Shopee API và lưu/update vào database.
+        Sync hàng loạt nên dùng process_feedbacks_from_shopee_bulk (theo trang).
+        
+        Args:
+            feedback_data: Feedback data từ Shopee API
+            
+        Returns:
+            True nếu đã update, False nếu tạo mới
+        """
+        comment_id = feedback_data.get("comment_id")
+        if not comment_id:
+            logger.warning("Feedback data missing comment_id, skipping")
+            return False
+        
+        # Set feedback_id = comment_id (dùng feedback_id làm key chính)
+        feedback_id = comment_id
+        fields = self._shopee_feedback_fields(feedback_data)
+        
         # Get or create feedback (sử dụng feedback_id làm unique key)
         logger.debug(f"[_process_feedback_from_shopee] Getting or creating feedback {feedback_id}")
         try:
-            feedback, created = Feedback.objects.get_or_create(
-                feedback_id=feedback_id,
-                defaults={
-                    "connection_id": connection_id,
-                    # Set comment_id = feedback_id (giữ lại để tương thích)
-                    "comment_id": comment_id,
-                    "tenant_id": None,  # Không có từ Shopee API
-                    # Product info
-                    "item_id": feedback_data.get("item_id"),
-                    "product_id": feedback_data.get("product_id"),
-                    "product_name": product_name,
-                    "product_image": product_image,  # URL từ product_cover
-                    "product_cover": product_cover,  # ID gốc từ Shopee
-                    "model_id": feedback_data.get("model_id"),
-                    "model_name": "",  # KHÔNG lưu model_name từ Shopee (để trống)
-                    # Order info
-                    "channel_order_number": channel_order_number,
-                    "order_id": feedback_data.get("order_id"),
-                    # Customer info
-                    "buyer_user_name": buyer_user_name,
-                    "user_portrait": user_portrait,
-                    "user_id": feedback_data.get("user_id"),
-                    # Rating & Comment
-                    "rating": feedback_data.get("rating_star", 0),
-                    "comment": feedback_data.get("comment", ""),
-                    "images": self._normalize_media(feedback_data.get("images", [])),
-                    # Reply info - Parse reply object từ Shopee API
-                    "reply": self._extract_reply_comment(feedback_data.get("reply")),
-                    "reply_time": self._extract_reply_time(feedback_data.get("reply")),
-                    # Additional fields from Shopee
-                    "is_hidden": feedback_data.get("is_hidden", False),
-                    "status": feedback_data.get("status"),
-                    "can_follow_up": feedback_data.get("can_follow_up"),
-                    "follow_up": feedback_data.get("follow_up"),
-                    "submit_time": feedback_data.get("submit_time"),
-                    "low_rating_reasons": feedback_data.get("low_rating_reasons", []),
-                    # Timestamps
-                    "create_time": feedback_data.get("ctime", 0) or feedback_data.get("submit_time", 0),
-                    "ctime": feedback_data.get("ctime"),
-                    "mtime": feedback_data.get("mtime"),
-                }
-            )
+            feedback, created = Feedback.objects.get_or_create(feedback_id=feedback_id, defaults=fields)
             logger.debug(f"[_process_feedback_from_shopee] Got feedback: created={created}, id={feedback.id}")
         except Exception as e:
             logger.error(f"[_process_feedback_from_shopee] Error in get_or_create for feedback {feedback_id}: {e}", exc_info=True)
             raise
         
         if not created:
-            # Update existing feedback
+            # Update các trường có thể thay đổi (model_name: KHÔNG update theo yêu cầu)
             logger.debug(f"[_process_feedback_from_shopee] Updating existing feedback {feedback_id}")
             updated = False
-            
-            # Update các trường có thể thay đổi
-            if feedback.rating != feedback_data.get("rating_star", 0):
-                feedback.rating = feedback_data.get("rating_star", 0)
-                updated = True
-            if feedback.comment != feedback_data.get("comment", ""):
-                feedback.comment = feedback_data.get("comment", "")
-                updated = True
-            # Update reply và reply_time từ reply object
-            reply_comment = self._extract_reply_comment(feedback_data.get("reply"))
-            reply_time = self._extract_reply_time(feedback_data.get("reply"))
-            
-            if feedback.reply != reply_comment:
-                feedback.reply = reply_comment
-                updated = True
-            if feedback.reply_time != reply_time:
-                feedback.reply_time = reply_time
-                updated = True
-            if feedback.user_portrait != user_portrait:
-                feedback.user_portrait = user_portrait
-                updated = True
-            if feedback.product_name != product_name:
-                feedback.product_name = product_name
-                updated = True
-            # model_name: KHÔNG update theo yêu cầu (không lưu model_name)
-            if feedback.buyer_user_name != buyer_user_name:
-                feedback.buyer_user_name = buyer_user_name
-                updated = True
-            if feedback.channel_order_number != channel_order_number:
-                feedback.channel_order_number = channel_order_number
-                updated = True
-            # Update product_image từ product_cover
-            if feedback.product_image != product_image:
-                feedback.product_image = product_image
-                updated = True
-            if feedback.product_cover != product_cover:
-                feedback.product_cover = product_cover
-                updated = True
+            for field_name in SHOPEE_FEEDBACK_UPDATE_FIELDS:
+                if getattr(feedback, field_name) != fields[field_name]:
+                    setattr(feedback, field_name, fields[field_name])
+                    updated = True
             # Update comment_id nếu chưa có (giữ lại để tương thích)
             if not feedback.comment_id and comment_id:
                 feedback.comment_id = comment_id
                 updated = True
-            # Update các trường khác từ Shopee
-            if feedback.is_hidden != feedback_data.get("is_hidden", False):
-                feedback.is_hidden = feedback_data.get("is_hidden", False)
-                updated = True
-            if feedback.status != feedback_data.get("status"):
-                feedback.status = feedback_data.get("status")
-                updated = True
-            if feedback.can_follow_up != feedback_data.get("can_follow_up"):
-                feedback.can_follow_up = feedback_data.get("can_follow_up")
-                updated = True
-            if feedback.follow_up != feedback_data.get("follow_up"):
-                feedback.follow_up = feedback_data.get("follow_up")
-                updated = True
-            if feedback.submit_time != feedback_data.get("submit_time"):
-                feedback.submit_time = feedback_data.get("submit_time")
-                updated = True
-            if feedback.ctime != feedback_data.get("ctime"):
-                feedback.ctime = feedback_data.get("ctime")
-                updated = True
-            if feedback.mtime != feedback_data.get("mtime"):
-                feedback.mtime = feedback_data.get("mtime")
-                updated = True
-            
-            # Update images (normalize URLs)
-            normalized_images = self._normalize_media(feedback_data.get("images", []))
-            if feedback.images != normalized_images:
-                feedback.images = normalized_images
-                updated = True
             
             if updated:
-                logger.debug(f"[_process_feedback_from_shopee] Saving updated feedback {feedback_id}")
                 try:
                     feedback.save()
                     logger.debug(f"[_process_feedback_from_shopee] Saved updated feedback {feedback_id}")
@@ -1914,43 +1803,98 @@ class FeedbackService:
                     logger.error(f"[_process_feedback_from_shopee] Error saving updated feedback {feedback_id}: {e}", exc_info=True)
             
             # Vẫn cố gắng link với Sapo data nếu chưa có (có thể order mới được tạo trên Sapo)
-            logger.debug(f"[_process_feedback_from_shopee] Checking if need to link Sapo data: sapo_order_id={feedback.sapo_order_id}, sapo_variant_id={feedback.sapo_variant_id}")
             if not feedback.sapo_order_id or not feedback.sapo_variant_id:
-                logger.debug(f"[_process_feedback_from_shopee] Linking Sapo data for feedback {feedback_id}")
                 self._link_sapo_data_from_shopee(feedback, feedback_data)
-                logger.debug(f"[_process_feedback_from_shopee] Finished linking Sapo data for feedback {feedback_id}")
-            else:
-                logger.debug(f"[_process_feedback_from_shopee] Skipping Sapo link (already linked)")
             
-            logger.debug(f"[_process_feedback_from_shopee] Returning updated={updated} for feedback {feedback_id}")
             return updated
         
         # Try to link với Sapo data (order, customer, product)
-        logger.debug(f"[_process_feedback_from_shopee] Starting to link Sapo data for new feedback {feedback.comment_id}")
         try:
             self._link_sapo_data_from_shopee(feedback, feedback_data)
-            logger.debug(f"[_process_feedback_from_shopee] Finished linking Sapo data for new feedback {feedback.comment_id}")
         except Exception as e:
             logger.warning(f"[_process_feedback_from_shopee] Error linking Sapo data for new feedback {feedback.comment_id}: {e}")
         
-        # Push user_portrait lên Sapo customer note nếu có.
-        # Lưu ý: thao tác này gọi Sapo API và khá nặng, nên mặc định TẮT trong sync hàng loạt.
-        # Chỉ bật khi đặt biến môi trường CSKH_PUSH_USER_PORTRAIT=1 để tránh làm treo/buộc chờ lâu.
-        try:
-            if (
-                os.getenv("CSKH_PUSH_USER_PORTRAIT", "0") == "1"
-                and feedback.user_portrait
-                and feedback.sapo_customer_id
+        self._maybe_push_user_portrait(feedback)
+        return created
+    
+    def process_feedbacks_from_shopee_bulk(self, ratings: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Xử lý 1 trang/batch feedbacks từ Shopee API:
+        - 1 query lấy các feedbacks đã có
+        - 1 lệnh upsert (bulk_create update_conflicts) cho feedbacks mới/thay đổi
+        - Link Sapo order/variant theo batch (xem _link_sapo_data_bulk)
+        
+        Args:
+            ratings: List feedback data từ Shopee API (đã gắn connection_id)
+            
+        Returns:
+            {"created": int, "updated": int, "unchanged": int, "linked": int}
+        """
+        stats = {"created": 0, "updated": 0, "unchanged": 0, "linked": 0}
+        
+        fields_by_id = {}
+        for feedback_data in ratings:
+            comment_id = feedback_data.get("comment_id")
+            if comment_id:
+                fields_by_id[int(comment_id)] = self._shopee_feedback_fields(feedback_data)
+        if not fields_by_id:
+            return stats
+        
+        feedback_ids = list(fields_by_id)
+        existing = (
+            Feedback.objects
+            .only("feedback_id", "comment_id", *SHOPEE_FEEDBACK_UPDATE_FIELDS)
+            .in_bulk(feedback_ids, field_name="feedback_id")
+        )
+        
+        to_upsert = []
+        created_ids = set()
+        for feedback_id, fields in fields_by_id.items():
+            feedback = existing.get(feedback_id)
+            if feedback is None:
+                created_ids.add(feedback_id)
+            elif feedback.comment_id and all(
+                getattr(feedback, field_name) == fields[field_name]
+                for field_name in SHOPEE_FEEDBACK_UPDATE_FIELDS
             ):
-                logger.debug(f"[_process_feedback_from_shopee] Pushing user_portrait for feedback {feedback.comment_id}")
-                self._push_user_portrait_to_customer(feedback)
-        except Exception as e:
-            logger.warning(
-                f"Error pushing user_portrait to customer {feedback.sapo_customer_id}: {e}"
+                stats["unchanged"] += 1
+                continue
+            else:
+                stats["updated"] += 1
+            to_upsert.append(Feedback(feedback_id=feedback_id, **fields))
+        stats["created"] = len(created_ids)
+        
+        if to_upsert:
+            # Feedback đã có chỉ bị ghi đè các trường Shopee; link Sapo / AI / ticket giữ nguyên
+            Feedback.objects.bulk_create(
+                to_upsert,
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=["feedback_id"],
+                update_fields=["comment_id", *SHOPEE_FEEDBACK_UPDATE_FIELDS, "updated_at"],
             )
         
-        logger.debug(f"[_process_feedback_from_shopee] Returning created={created} for new feedback {feedback.comment_id}")
-        return created
+        # Link Sapo cho feedbacks chưa có order (kể cả feedback cũ: order có thể mới được tạo trên Sapo)
+        unlinked = list(
+            Feedback.objects
+            .filter(feedback_id__in=feedback_ids, sapo_order_id__isnull=True)
+            .exclude(channel_order_number="")
+        )
+        try:
+            stats["linked"] = self._link_sapo_data_bulk(unlinked)
+        except Exception as e:
+            logger.warning(f"[process_feedbacks_from_shopee_bulk] Error linking Sapo data: {e}", exc_info=True)
+        
+        for feedback in unlinked:
+            if feedback.feedback_id in created_ids:
+                self._maybe_push_user_portrait(feedback)
+        
+        logger.debug(
+            f"[process_feedbacks_from_shopee_bulk] {len(fields_by_id)} feedbacks: "
+            f"created={stats['created']}, updated={stats['updated']}, "
+            f"unchanged={stats['unchanged']}, linked={stats['linked']}"
+        )
+        return stats
     
     def _link_sapo_data_from_shopee(self, feedback: Feedback, feedback_data: Dict[str, Any]):
         """
@@ -1960,79 +1904,135 @@ class FeedbackService:
             feedback: Feedback instance
             feedback_data: Feedback data từ Shopee API
         """
+        if not feedback.channel_order_number or feedback.sapo_order_id:
+            logger.debug(f"[_link_sapo_data_from_shopee] Skipping link (channel_order_number={feedback.channel_order_number}, sapo_order_id={feedback.sapo_order_id})")
+            return
         try:
-            # 1. Link với Sapo order qua channel_order_number (order_sn)
-            if feedback.channel_order_number and not feedback.sapo_order_id:
-                logger.debug(f"[_link_sapo_data_from_shopee] Linking order for {feedback.channel_order_number}")
+            self._link_sapo_data_bulk([feedback])
+        except Exception as e:
+            logger.warning(f"Error linking Sapo data for feedback {feedback.comment_id}: {e}")
+    
+    def _link_sapo_data_bulk(self, feedbacks: List[Feedback]) -> int:
+        """
+        Link nhiều feedbacks với Sapo order/customer/variant/product theo batch.
+        
+        - Order: đọc SapoOrderCache theo reference_number (1 query); chỉ gọi Sapo API
+          cho các mã đơn chưa có trong cache, mỗi mã 1 lần
+        - Variant: tra index Shopee item -> variant cho cả batch (1 query)
+        - Product của variant: SapoVariantCache (1 query) + cache trong instance
+        
+        Args:
+            feedbacks: Feedback instances chưa có sapo_order_id
+            
+        Returns:
+            Số feedbacks đã link được order
+        """
+        feedbacks = [fb for fb in feedbacks if fb.channel_order_number and not fb.sapo_order_id]
+        if not feedbacks:
+            return 0
+        
+        from orders.services.order_cache_service import OrderCacheService
+        
+        references = {fb.channel_order_number for fb in feedbacks}
+        orders = OrderCacheService().get_orders_by_reference_raw(references)
+        for reference in references - orders.keys():
+            try:
+                raw_order = self.sapo_client.core.get_order_by_reference_number(reference)
+            except Exception as e:
+                logger.warning(f"Error getting raw order for {reference}: {e}")
+                raw_order = None
+            if raw_order:
+                orders[reference] = raw_order
+        
+        indexed_variants = get_variant_ids_many(
+            (fb.connection_id, fb.item_id)
+            for fb in feedbacks
+            if fb.item_id and fb.channel_order_number in orders
+        )
+        
+        now = timezone.now()
+        linked = []
+        for feedback in feedbacks:
+            raw_order = orders.get(feedback.channel_order_number)
+            if not raw_order:
+                continue
+            order_data = raw_order.get('order', raw_order)
+            if not order_data.get('id'):
+                continue
+            
+            feedback.sapo_order_id = order_data['id']
+            # Link với customer từ order
+            if order_data.get('customer_id') and not feedback.sapo_customer_id:
+                feedback.sapo_customer_id = order_data['customer_id']
+            # Link với variant từ order line items
+            if feedback.item_id:
+                variant_ids = self._find_variant_ids_from_order(
+                    raw_order=raw_order,
+                    item_id=feedback.item_id,
+                    connection_id=feedback.connection_id,
+                    indexed_variant_ids=indexed_variants.get(
+                        (int(feedback.connection_id), str(feedback.item_id)), []
+                    ),
+                )
+                if variant_ids:
+                    feedback.sapo_variant_id = variant_ids[0]
+            feedback.updated_at = now
+            linked.append(feedback)
+        
+        # Lấy product_id từ variant
+        product_ids = self._get_variant_product_ids(
+            {fb.sapo_variant_id for fb in linked if fb.sapo_variant_id}
+        )
+        for feedback in linked:
+            if feedback.sapo_variant_id and product_ids.get(feedback.sapo_variant_id):
+                feedback.sapo_product_id = product_ids[feedback.sapo_variant_id]
+        
+        if linked:
+            Feedback.objects.bulk_update(linked, SAPO_LINK_FIELDS, batch_size=500)
+            logger.debug(f"[_link_sapo_data_bulk] Linked {len(linked)}/{len(feedbacks)} feedbacks with Sapo orders")
+        return len(linked)
+    
+    def _get_variant_product_ids(self, variant_ids: Iterable[int]) -> Dict[int, int]:
+        """
+        Map variant_id -> product_id: ưu tiên cache trong instance, rồi SapoVariantCache (1 query),
+        cuối cùng mới gọi Sapo API cho variant chưa có trong cache.
+        """
+        variant_ids = {int(vid) for vid in variant_ids if vid}
+        missing = variant_ids - self._variant_product_ids.keys()
+        if missing:
+            self._variant_product_ids.update(
+                SapoVariantCache.objects
+                .filter(variant_id__in=missing, product_id__isnull=False)
+                .values_list('variant_id', 'product_id')
+            )
+            for variant_id in missing - self._variant_product_ids.keys():
                 try:
-                    from orders.services.sapo_order_service import SapoOrderService
-                    order_service = SapoOrderService(self.sapo_client)
-                    
-                    # Lấy raw order để có thông tin item_id trong line items (với timeout)
-                    logger.debug(f"[_link_sapo_data_from_shopee] Getting raw order for {feedback.channel_order_number}")
-                    try:
-                        raw_order = self.sapo_client.core.get_order_by_reference_number(feedback.channel_order_number)
-                        logger.debug(f"[_link_sapo_data_from_shopee] Got raw order: {raw_order is not None}")
-                    except Exception as e:
-                        logger.warning(f"Error getting raw order for {feedback.channel_order_number}: {e}")
-                        raw_order = None
-                    
-                    if raw_order:
-                        # Convert sang OrderDTO (với timeout)
-                        logger.debug(f"[_link_sapo_data_from_shopee] Getting order DTO for {feedback.channel_order_number}")
-                        try:
-                            order = order_service.get_order_by_reference(feedback.channel_order_number)
-                            logger.debug(f"[_link_sapo_data_from_shopee] Got order DTO: {order is not None}")
-                        except Exception as e:
-                            logger.warning(f"Error getting order DTO for {feedback.channel_order_number}: {e}")
-                            order = None
-                        
-                        if order:
-                            feedback.sapo_order_id = order.id
-                            
-                            # 2. Link với customer từ order và update username
-                            if order.customer_id and not feedback.sapo_customer_id:
-                                feedback.sapo_customer_id = order.customer_id
-                            
-                            # 3. Link với product và variant từ order line items
-                            if feedback.item_id:
-                                logger.debug(f"[_link_sapo_data_from_shopee] Finding variant for item_id {feedback.item_id}")
-                                try:
-                                    variant_ids = self._find_variant_ids_from_order(
-                                        raw_order=raw_order,
-                                        item_id=feedback.item_id,
-                                        connection_id=feedback.connection_id
-                                    )
-                                    logger.debug(f"[_link_sapo_data_from_shopee] Found {len(variant_ids)} variants")
-                                    
-                                    if variant_ids:
-                                        feedback.sapo_variant_id = variant_ids[0]
-                                        
-                                        # Lấy product_id từ variant (với timeout)
-                                        logger.debug(f"[_link_sapo_data_from_shopee] Getting variant {feedback.sapo_variant_id}")
-                                        try:
-                                            variant_data = self.sapo_client.core.get_variant_raw(feedback.sapo_variant_id)
-                                            if variant_data and variant_data.get('variant'):
-                                                feedback.sapo_product_id = variant_data['variant'].get('product_id')
-                                                logger.debug(f"[_link_sapo_data_from_shopee] Got product_id: {feedback.sapo_product_id}")
-                                        except Exception as e:
-                                            logger.warning(f"Error getting variant {feedback.sapo_variant_id}: {e}")
-                                except Exception as e:
-                                    logger.warning(f"Error finding variant for item_id {feedback.item_id}: {e}")
-                            
-                            logger.debug(f"[_link_sapo_data_from_shopee] Saving feedback {feedback.comment_id}")
-                            try:
-                                feedback.save()
-                                logger.debug(f"Linked feedback {feedback.comment_id} with order {order.id}")
-                            except Exception as e:
-                                logger.warning(f"Error saving feedback after linking: {e}")
+                    variant_data = self.sapo_client.core.get_variant_raw(variant_id)
+                    product_id = (variant_data or {}).get('variant', {}).get('product_id')
+                    if product_id:
+                        self._variant_product_ids[variant_id] = product_id
                 except Exception as e:
-                    logger.warning(f"Error linking order for feedback {feedback.comment_id}: {e}")
-            else:
-                logger.debug(f"[_link_sapo_data_from_shopee] Skipping link (channel_order_number={feedback.channel_order_number}, sapo_order_id={feedback.sapo_order_id})")
-            
+                    logger.warning(f"Error getting variant {variant_id}: {e}")
+        
+        return {vid: self._variant_product_ids[vid] for vid in variant_ids if vid in self._variant_product_ids}
+    
+    def _maybe_push_user_portrait(self, feedback: Feedback):
+        """
+        Push user_portrait lên Sapo customer note nếu có.
+        Lưu ý: thao tác này gọi Sapo API và khá nặng, nên mặc định TẮT trong sync hàng loạt.
+        Chỉ bật khi đặt biến môi trường CSKH_PUSH_USER_PORTRAIT=1 để tránh làm treo/buộc chờ lâu.
+        """
+        try:
+            if (
+                os.getenv("CSKH_PUSH_USER_PORTRAIT", "0") == "1"
+                and feedback.user_portrait
+                and feedback.sapo_customer_id
+            ):
+                self._push_user_portrait_to_customer(feedback)
         except Exception as e:
-            logger.warning(f"Error linking Sapo data for feedback {feedback.comment_id}: {e}")
+            logger.warning(
+                f"Error pushing user_portrait to customer {feedback.sapo_customer_id}: {e}"
+            )
     
     def _push_user_portrait_to_customer(self, feedback: Feedback):
         """
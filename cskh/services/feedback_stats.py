@@ -0,0 +1,78 @@
+# cskh/services/feedback_stats.py
+"""
+Thống kê Feedback cho dashboard bằng 1 query group by (connection_id, rating).
+
+Kết quả group chỉ có tối đa (số shop x 5) dòng; tổng, tốt/xấu, đã/chưa phản hồi,
+phân bố sao và thống kê theo shop đều cộng dồn từ đó thay vì count() riêng từng chỉ số.
+"""
+
+from typing import Any, Dict
+import logging
+
+from django.db.models import Count, Q, QuerySet
+
+logger = logging.getLogger(__name__)
+
+RATING_STARS = [5, 4, 3, 2, 1]
+
+# Feedback coi là "chưa phản hồi" khi reply NULL hoặc rỗng
+UNREPLIED_Q = Q(reply__isnull=True) | Q(reply="")
+
+
+def _empty_bucket() -> Dict[str, Any]:
+    return {"total": 0, "good": 0, "bad": 0, "replied": 0, "unreplied": 0, "rating_sum": 0, "avg_rating": 0}
+
+
+def _finish_bucket(bucket: Dict[str, Any]) -> Dict[str, Any]:
+    bucket["avg_rating"] = bucket["rating_sum"] / bucket["total"] if bucket["total"] else 0
+    return bucket
+
+
+def aggregate_feedback_stats(queryset: QuerySet) -> Dict[str, Any]:
+    """
+    Tính thống kê dashboard cho queryset Feedback (đã filter thời gian/shop) trong 1 query.
+
+    Returns:
+        {
+            "total", "good", "bad", "replied", "unreplied", "avg_rating": tổng hợp,
+            "by_rating": {stars: count} (đủ 5 -> 1 sao),
+            "by_shop": {connection_id: {"total", "good", "bad", "replied", "unreplied", "avg_rating"}},
+        }
+    """
+    rows = (
+        queryset
+        .order_by()
+        .values("connection_id", "rating")
+        .annotate(count=Count("id"), unreplied=Count("id", filter=UNREPLIED_Q))
+    )
+
+    overall = _empty_bucket()
+    by_rating = {stars: 0 for stars in RATING_STARS}
+    by_shop: Dict[int, Dict[str, Any]] = {}
+
+    for row in rows:
+        rating, count, unreplied = row["rating"], row["count"], row["unreplied"]
+        shop = by_shop.setdefault(row["connection_id"], _empty_bucket())
+        for bucket in (overall, shop):
+            bucket["total"] += count
+            bucket["rating_sum"] += rating * count
+            bucket["unreplied"] += unreplied
+            bucket["replied"] += count - unreplied
+            if rating == 5:
+                bucket["good"] += count
+            elif rating <= 4:
+                bucket["bad"] += count
+        if rating in by_rating:
+            by_rating[rating] += count
+
+    stats = _finish_bucket(overall)
+    stats["by_rating"] = by_rating
+    stats["by_shop"] = {connection_id: _finish_bucket(bucket) for connection_id, bucket in by_shop.items()}
+    return stats
+
+
+# ========================= EXPORTS =========================
+
+__all__ = [
+    'aggregate_feedback_stats',
+]
@@ -3,7 +3,7 @@
 Service để quản lý sync feedback jobs (full sync và incremental sync).
 """
 
-from typing import Dict, Any, List, Optional, Callable
+from typing import Dict, Any, List, Optional, Callable, Tuple
 import logging
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
@@ -26,9 +26,16 @@ class FeedbackSyncService:
     Service để quản lý sync feedback jobs (full sync và incremental sync).
     """
     
-    def __init__(self, sapo_client: SapoClient):
+    def __init__(self, sapo_client: SapoClient, cancel_check: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            sapo_client: SapoClient
+            cancel_check: Gọi mỗi lần update progress; raise để dừng sync
+                (vd JobContext.check_cancelled khi chạy trong background job)
+        """
         self.sapo_client = sapo_client
         self.feedback_service = FeedbackService(sapo_client)
+        self.cancel_check = cancel_check
     
     def create_full_sync_job(
         self,
@@ -107,6 +114,9 @@ class FeedbackSyncService:
             log_message: Log message để thêm vào logs
             error_message: Error message để thêm vào errors
         """
+        if self.cancel_check:
+            self.cancel_check()
+
         with transaction.atomic():
             job.refresh_from_db()
             
@@ -564,45 +574,14 @@ class FeedbackSyncService:
                         continue
                     
                     # Xử lý page 1
-                    page1_synced = 0
-                    for feedback_data in feedbacks_page1:
-                        comment_id = feedback_data.get("comment_id")
-                        if not comment_id:
-                            continue
-                        
-                        # Check xem đã có trong DB chưa
-                        if Feedback.objects.filter(feedback_id=comment_id).exists():
-                            found_existing_in_page1 = True
-                            self.update_job_progress(
-                                job,
-                                log_message=f"⚠️ Shop {shop_name}: Page 1 có feedback trùng (ID: {comment_id})"
-                            )
-                            break
-                        
-                        # Chưa có -> sync (tạo mới)
-                        try:
-                            feedback_data["connection_id"] = connection_id
-                            self.feedback_service._process_feedback_from_shopee(feedback_data)
-                            
-                            page1_synced += 1
-                            total_synced += 1
-                            result["synced"] += 1
-                            self.update_job_progress(
-                                job,
-                                processed=1,
-                                synced=1,
-                                updated=0
-                            )
-                            
-                        except Exception as e:
-                            error_msg = f"Error processing feedback {comment_id}: {str(e)}"
-                            logger.error(error_msg, exc_info=True)
-                            self.update_job_progress(
-                                job,
-                                errors=1,
-                                error_message=error_msg
-                            )
-                            result["errors"].append(error_msg)
+                    page1_synced, existing_id = self._sync_new_feedbacks(job, feedbacks_page1, connection_id, result)
+                    total_synced += page1_synced
+                    if existing_id:
+                        found_existing_in_page1 = True
+                        self.update_job_progress(
+                            job,
+                            log_message=f"⚠️ Shop {shop_name}: Page 1 có feedback trùng (ID: {existing_id})"
+                        )
                     
                     self.update_job_progress(
                         job,
@@ -650,46 +629,15 @@ class FeedbackSyncService:
                             continue
                         
                         # Xử lý page 2
-                        page2_synced = 0
-                        for feedback_data in feedbacks_page2:
-                            comment_id = feedback_data.get("comment_id")
-                            if not comment_id:
-                                continue
-                            
-                            # Check xem đã có trong DB chưa
-                            if Feedback.objects.filter(feedback_id=comment_id).exists():
-                                found_existing_in_page2 = True
-                                result["stopped_at_existing"] = True
-                                self.update_job_progress(
-                                    job,
-                                    log_message=f"⏹️ Shop {shop_name}: Page 2 có feedback trùng (ID: {comment_id}), dừng"
-                                )
-                                break
-                            
-                            # Chưa có -> sync (tạo mới)
-                            try:
-                                feedback_data["connection_id"] = connection_id
-                                self.feedback_service._process_feedback_from_shopee(feedback_data)
-                                
-                                page2_synced += 1
-                                total_synced += 1
-                                result["synced"] += 1
-                                self.update_job_progress(
-                                    job,
-                                    processed=1,
-                                    synced=1,
-                                    updated=0
-                                )
-                                
-                            except Exception as e:
-                                error_msg = f"Error processing feedback {comment_id}: {str(e)}"
-                                logger.error(error_msg, exc_info=True)
-                                self.update_job_progress(
-                                    job,
-                                    errors=1,
-                                    error_message=error_msg
-                                )
-                                result["errors"].append(error_msg)
+                        page2_synced, existing_id = self._sync_new_feedbacks(job, feedbacks_page2, connection_id, result)
+                        total_synced += page2_synced
+                        if existing_id:
+                            found_existing_in_page2 = True
+                            result["stopped_at_existing"] = True
+                            self.update_job_progress(
+                                job,
+                                log_message=f"⏹️ Shop {shop_name}: Page 2 có feedback trùng (ID: {existing_id}), dừng"
+                            )
                         
                         self.update_job_progress(
                             job,
@@ -740,3 +688,51 @@ class FeedbackSyncService:
         
         return result
 
+    
+    def _sync_new_feedbacks(
+        self,
+        job: FeedbackSyncJob,
+        feedbacks: List[Dict[str, Any]],
+        connection_id: int,
+        result: Dict[str, Any],
+    ) -> Tuple[int, Optional[int]]:
+        """
+        Sync các feedbacks mới của 1 trang (theo thứ tự mới -> cũ), dừng ở feedback đầu tiên đã có trong DB.
+        1 query kiểm tra tồn tại + 1 lượt upsert/link cho cả trang.
+        
+        Returns:
+            (số feedbacks đã sync, feedback_id trùng đầu tiên hoặc None)
+        """
+        comment_ids = [fb.get("comment_id") for fb in feedbacks if fb.get("comment_id")]
+        existing_ids = set(
+            Feedback.objects.filter(feedback_id__in=comment_ids).values_list("feedback_id", flat=True)
+        )
+        
+        new_feedbacks = []
+        existing_id = None
+        for feedback_data in feedbacks:
+            comment_id = feedback_data.get("comment_id")
+            if not comment_id:
+                continue
+            if int(comment_id) in existing_ids:
+                existing_id = comment_id
+                break
+            feedback_data["connection_id"] = connection_id
+            new_feedbacks.append(feedback_data)
+        
+        if not new_feedbacks:
+            return 0, existing_id
+        
+        try:
+            self.feedback_service.process_feedbacks_from_shopee_bulk(new_feedbacks)
+        except Exception as e:
+            error_msg = f"Error processing {len(new_feedbacks)} feedbacks: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            self.update_job_progress(job, errors=len(new_feedbacks), error_message=error_msg)
+            result["errors"].append(error_msg)
+            return 0, existing_id
+        
+        synced = len(new_feedbacks)
+        result["synced"] += synced
+        self.update_job_progress(job, processed=synced, synced=synced, updated=0)
+        return synced, existing_id
@@ -1,3 +1,137 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+
+from core.testing import PerfBudgetMixin
+from cskh.models import Feedback, Ticket
+from cskh.services.feedback_service import FeedbackService
+from cskh.services.feedback_stats import aggregate_feedback_stats
+from orders.models import SapoOrderCache
+from products.models import SapoVariantCache
+
+
+class _FakeCoreRepo:
+    """Sapo core repo giả: ghi lại các lần gọi API"""
+
+    def __init__(self):
+        self.calls = []
+
+    def get_order_by_reference_number(self, reference_number):
+        self.calls.append(reference_number)
+        if reference_number == "API-1":
+            return {"id": 900, "customer_id": 5, "line_items": [{"variant_id": 11, "item_id": 77}]}
+        return None
+
+    def get_variant_raw(self, variant_id):
+        self.calls.append(variant_id)
+        return {"variant": {"product_id": 2}}
+
+
+class _FakeSapoClient:
+    def __init__(self):
+        self.core = _FakeCoreRepo()
+
+
+def _rating(comment_id, order_sn, item_id, comment="ok"):
+    return {
+        "comment_id": comment_id, "connection_id": 1, "order_sn": order_sn, "item_id": item_id,
+        "rating_star": 5, "comment": comment, "ctime": 100,
+    }
+
+
+class TestProcessFeedbacksFromShopeeBulk(TestCase):
+    """Test upsert feedbacks theo trang + link Sapo theo batch"""
+
+    def setUp(self):
+        self.service = FeedbackService.__new__(FeedbackService)
+        self.service.sapo_client = _FakeSapoClient()
+        self.service._variant_product_ids = {}
+        SapoOrderCache.objects.create(
+            order_id=500, reference_number="CACHE-1",
+            data={"id": 500, "customer_id": 7, "line_items": [{"variant_id": 12, "item_id": 88}]},
+        )
+        SapoVariantCache.objects.create(variant_id=12, product_id=1, data={})
+        self.page = [
+            _rating(1, "CACHE-1", 88),
+            _rating(2, "API-1", 77),
+            _rating(3, "API-1", 77),
+        ]
+
+    def test_upsert_and_link_page(self):
+        stats = self.service.process_feedbacks_from_shopee_bulk(self.page)
+        self.assertEqual((stats["created"], stats["linked"]), (3, 3))
+        # Order trong cache không gọi API; mã đơn trùng chỉ gọi API 1 lần
+        self.assertEqual(self.service.sapo_client.core.calls, ["API-1", 11])
+        self.assertEqual(
+            list(Feedback.objects.order_by("feedback_id").values_list(
+                "sapo_order_id", "sapo_customer_id", "sapo_variant_id", "sapo_product_id"
+            )),
+            [(500, 7, 12, 1), (900, 5, 11, 2), (900, 5, 11, 2)],
+        )
+
+    def test_skips_unchanged_and_updates_changed(self):
+        self.service.process_feedbacks_from_shopee_bulk(self.page)
+        self.page[0]["comment"] = "changed"
+
+        stats = self.service.process_feedbacks_from_shopee_bulk(self.page)
+        self.assertEqual((stats["created"], stats["updated"], stats["unchanged"]), (0, 1, 2))
+        feedback = Feedback.objects.get(feedback_id=1)
+        self.assertEqual(feedback.comment, "changed")
+        self.assertEqual(feedback.sapo_order_id, 500)
+
+
+class TestAggregateFeedbackStats(TestCase):
+    """Test thống kê dashboard tính trong 1 query"""
+
+    def test_single_query_stats(self):
+        rows = [(1, 5, "cảm ơn"), (1, 5, ""), (1, 2, None), (2, 4, "xin lỗi")]
+        Feedback.objects.bulk_create([
+            Feedback(feedback_id=i, connection_id=conn, rating=rating, reply=reply, create_time=100)
+            for i, (conn, rating, reply) in enumerate(rows, 1)
+        ])
+
+        with self.assertNumQueries(1):
+            stats = aggregate_feedback_stats(Feedback.objects.filter(create_time__gte=100))
+
+        self.assertEqual(
+            (stats["total"], stats["good"], stats["bad"], stats["replied"], stats["unreplied"]),
+            (4, 2, 2, 2, 2),
+        )
+        self.assertEqual(stats["avg_rating"], 4)
+        self.assertEqual(stats["by_rating"], {5: 2, 4: 1, 3: 0, 2: 1, 1: 0})
+        self.assertEqual(stats["by_shop"][1]["total"], 3)
+        self.assertEqual(stats["by_shop"][2]["bad"], 1)
+
+
+class TestTicketOverviewBudget(PerfBudgetMixin, TestCase):
+    """Test số query của ticket_overview không tăng theo số ticket"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "x")
+        self.client.force_login(self.user)
+        # Context processor product_counts gọi Sapo (SapoClient + Selenium login): tách khỏi budget của view
+        patcher = mock.patch("products.context_processors.get_sapo_client")
+        sapo_client = patcher.start()
+        sapo_client.return_value.core.list_products_raw.return_value = {"metadata": {"total": 0}, "products": []}
+        self.addCleanup(patcher.stop)
+
+    def _create_ticket(self, i):
+        Ticket.objects.create(order_code=f"SON{i}", created_by=self.user, assigned_to=self.user)
+
+    def _get_overview(self):
+        # SERVER_PORT 80 bị PortRedirectMiddleware redirect
+        response = self.client.get(reverse("cskh:ticket_overview"), SERVER_PORT="8000")
+        self.assertEqual(response.status_code, 200)
+
+    def test_queries_do_not_grow_with_tickets(self):
+        self._create_ticket(1)
+        self._get_overview()  # Request đầu tạo session
+        with self.assertPerfBudget(max_queries=40, max_external_calls=0) as few:
+            self._get_overview()
 
-# Create your tests here.
+        for i in range(2, 12):
+            self._create_ticket(i)
+        with self.assertPerfBudget(max_queries=few.queries, max_external_calls=0):
+            self._get_overview()
@@ -20,6 +20,7 @@ from .models import (
     FeedbackLog,
     TrainingDocument,
 )
+from .services.feedback_stats import aggregate_feedback_stats
 from .services.ticket_service import TicketService
 from .settings import (
     get_reason_sources, get_reason_types_by_source, get_cost_types,
@@ -1425,21 +1426,18 @@ def feedback_overview(request):
                 'selected': shop_filter == str(connection_id)
             })
     
-    # Statistics
-    total_feedbacks = base_queryset.count()
-    good_reviews = base_queryset.filter(rating=5).count()
-    bad_reviews = base_queryset.filter(rating__lte=4).count()
-    unreplied = base_queryset.filter(Q(reply__isnull=True) | Q(reply="")).count()
-    replied = base_queryset.exclude(Q(reply__isnull=True) | Q(reply="")).count()
-    
-    # Average rating
-    avg_rating_result = base_queryset.aggregate(avg=Avg('rating'))
-    avg_rating = avg_rating_result['avg'] or 0
+    # Statistics: 1 query group by (shop, rating) cho toàn bộ chỉ số bên dưới
+    stats = aggregate_feedback_stats(base_queryset)
+    total_feedbacks = stats['total']
+    good_reviews = stats['good']
+    bad_reviews = stats['bad']
+    unreplied = stats['unreplied']
+    replied = stats['replied']
+    avg_rating = stats['avg_rating']
     
     # Rating breakdown
     rating_breakdown = []
-    for stars in [5, 4, 3, 2, 1]:
-        count = base_queryset.filter(rating=stars).count()
+    for stars, count in stats['by_rating'].items():
         percentage = (count / total_feedbacks * 100) if total_feedbacks > 0 else 0
         rating_breakdown.append({
             'stars': stars,
@@ -1452,20 +1450,14 @@ def feedback_overview(request):
     for shop_name, shop_info in shops_detail.items():
         connection_id = shop_info.get('shop_connect')
         if connection_id:
-            shop_feedbacks = base_queryset.filter(connection_id=connection_id)
-            shop_total = shop_feedbacks.count()
-            shop_good = shop_feedbacks.filter(rating=5).count()
-            shop_bad = shop_feedbacks.filter(rating__lte=4).count()
-            shop_avg_result = shop_feedbacks.aggregate(avg=Avg('rating'))
-            shop_avg = shop_avg_result['avg'] or 0
-            
+            shop_bucket = stats['by_shop'].get(connection_id, {})
             shop_stats.append({
                 'name': shop_name,
                 'connection_id': connection_id,
-                'total': shop_total,
-                'good': shop_good,
-                'bad': shop_bad,
-                'avg_rating': round(shop_avg, 2)
+                'total': shop_bucket.get('total', 0),
+                'good': shop_bucket.get('good', 0),
+                'bad': shop_bucket.get('bad', 0),
+                'avg_rating': round(shop_bucket.get('avg_rating', 0), 2)
             })
     
     # Top bad products (sản phẩm bị đánh giá xấu nhiều nhất) - Group theo Sapo variants
@@ -1477,29 +1469,6 @@ def feedback_overview(request):
         avg_rating=Avg('rating')
     ).order_by('-count')[:10])
     
-    # Lấy SKU từ variants
-    from core.sapo_client import get_sapo_client
-    sapo_client = get_sapo_client()
-    top_bad_products = []
-    for item in top_bad_products_raw:
-        variant_sku = ''
-        if item['sapo_variant_id']:
-            try:
-                variant_data = sapo_client.core.get_variant_raw(item['sapo_variant_id'])
-                if variant_data and variant_data.get('variant'):
-                    variant_sku = variant_data['variant'].get('sku', '')
-            except Exception:
-                pass
-        
-        top_bad_products.append({
-            'variant_id': item['sapo_variant_id'],
-            'product_id': item['sapo_product_id'],
-            'product_name': item['product_name'] or '(Chưa có tên)',
-            'sku': variant_sku,
-            'count': item['count'],
-            'avg_rating': round(item['avg_rating'] or 0, 2)
-        })
-    
     # Product statistics (tất cả sản phẩm với đánh giá trung bình) - Group theo Sapo variants
     product_stats_raw = list(base_queryset.filter(sapo_variant_id__isnull=False).values(
         'sapo_variant_id', 'sapo_product_id', 'product_name'
@@ -1510,23 +1479,32 @@ def feedback_overview(request):
         bad_reviews=Count('id', filter=Q(rating__lte=4))
     ).order_by('-total_reviews')[:20])  # Top 20 variants có nhiều reviews nhất
     
-    # Lấy SKU từ variants
+    # Lấy SKU từ variants (1 query vào product cache cho cả 2 bảng)
+    from products.services.product_cache_service import ProductCacheService
+    variant_ids = {item['sapo_variant_id'] for item in top_bad_products_raw + product_stats_raw}
+    variant_skus = {
+        variant_id: variant.sku or ''
+        for variant_id, variant in ProductCacheService().get_variants_many(variant_ids).items()
+    }
+    
+    top_bad_products = []
+    for item in top_bad_products_raw:
+        top_bad_products.append({
+            'variant_id': item['sapo_variant_id'],
+            'product_id': item['sapo_product_id'],
+            'product_name': item['product_name'] or '(Chưa có tên)',
+            'sku': variant_skus.get(item['sapo_variant_id'], ''),
+            'count': item['count'],
+            'avg_rating': round(item['avg_rating'] or 0, 2)
+        })
+    
     product_stats = []
     for item in product_stats_raw:
-        variant_sku = ''
-        if item['sapo_variant_id']:
-            try:
-                variant_data = sapo_client.core.get_variant_raw(item['sapo_variant_id'])
-                if variant_data and variant_data.get('variant'):
-                    variant_sku = variant_data['variant'].get('sku', '')
-            except Exception:
-                pass
-        
         product_stats.append({
             'variant_id': item['sapo_variant_id'],
             'product_id': item['sapo_product_id'],
             'product_name': item['product_name'] or '(Chưa có tên)',
-            'sku': variant_sku,
+            'sku': variant_skus.get(item['sapo_variant_id'], ''),
             'total_reviews': item['total_reviews'],
             'avg_rating': round(item['avg_rating'] or 0, 2),
             'good_reviews': item['good_reviews'],
@@ -1258,13 +1258,15 @@ def api_sync_feedbacks(request):
         "page_size": 50 (optional, default: 50) - Số items mỗi trang,
         "max_feedbacks_per_shop": 100 (optional, default: 100) - Số đánh giá tối đa mỗi shop
     }
+    
+    Returns:
+        202 JSON: {status: "queued", job_id, status_url} - kết quả sync ở /core/api/jobs/<job_id>/
     """
     import logging
     logger = logging.getLogger(__name__)
     
     try:
-        from .services.feedback_service import FeedbackService
-        from core.sapo_client import get_sapo_client
+        from core.services.job_queue import enqueue, job_accepted_payload
         
         data = json.loads(request.body) if request.body else {}
         
@@ -1273,26 +1275,15 @@ def api_sync_feedbacks(request):
         page_size = data.get("page_size", 50)  # Maximum page size
         max_feedbacks_per_shop = data.get("max_feedbacks_per_shop", 100)  # 100 đánh giá mỗi shop
         
-        sapo_client = get_sapo_client()
-        feedback_service = FeedbackService(sapo_client)
-        
-        logger.info(f"[api_sync_feedbacks] Starting sync: days={days}, page_size={page_size}, max_feedbacks_per_shop={max_feedbacks_per_shop}")
-        
-        result = feedback_service.sync_feedbacks_from_shopee(
-            days=days,
-            page_size=page_size,
-            max_feedbacks_per_shop=max_feedbacks_per_shop
+        # Sync chạy nền (cskh.jobs.sync_feedbacks), JS poll status_url lấy kết quả
+        job = enqueue(
+            "cskh.sync_feedbacks",
+            {"days": days, "page_size": page_size, "max_feedbacks_per_shop": max_feedbacks_per_shop},
+            user=request.user,
+            unique=True,
         )
-        
-        logger.info(f"[api_sync_feedbacks] Sync completed: success={result.get('success')}, synced={result.get('synced')}, total_feedbacks={result.get('total_feedbacks')}")
-        logger.info(f"[api_sync_feedbacks] Returning response with {len(result.get('logs', []))} log entries")
-        print(f"[api_sync_feedbacks] Sync completed, returning JsonResponse")
-        
-        response = JsonResponse(result)
-        logger.info(f"[api_sync_feedbacks] JsonResponse created, status_code will be 200")
-        print(f"[api_sync_feedbacks] JsonResponse created")
-        
-        return response
+        logger.info(f"[api_sync_feedbacks] Enqueued sync job #{job.id}: days={days}, page_size={page_size}, max_feedbacks_per_shop={max_feedbacks_per_shop}")
+        return JsonResponse(job_accepted_payload(job), status=202)
         
     except json.JSONDecodeError:
         return JsonResponse({
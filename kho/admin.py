@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Warehouse, UserProfile, Ticket, TicketComment
+from .models import Warehouse, UserProfile, Ticket, TicketComment, PackingEvent
 
 @admin.register(Warehouse)
 class WarehouseAdmin(admin.ModelAdmin):
@@ -26,3 +26,11 @@ class TicketCommentAdmin(admin.ModelAdmin):
     list_filter = ("created_at",)
     search_fields = ("content",)
     readonly_fields = ("created_at",)
+
+
+@admin.register(PackingEvent)
+class PackingEventAdmin(admin.ModelAdmin):
+    list_display = ("id", "order_id", "packing_status", "nguoi_goi", "location_id", "order_total", "event_time")
+    list_filter = ("packing_status", "location_id")
+    search_fields = ("order_id", "nguoi_goi")
+    readonly_fields = ("created_at",)
@@ -0,0 +1,30 @@
+# kho/jobs.py
+"""
+Background jobs của app kho (chạy bởi `python manage.py run_workers`).
+"""
+
+from typing import Any, Dict, List
+import json
+import logging
+
+from core.services.job_queue import JobContext, task
+
+logger = logging.getLogger(__name__)
+
+
+# Priority cao: nhân viên kho đang đứng đợi phiếu in.
+# Không retry: confirm đơn trên sàn không idempotent.
+@task("kho.print_now", priority=10)
+def print_now(ctx: JobContext, order_ids: List[int], do_print: bool = False, debug_mode: bool = True) -> Dict[str, Any]:
+    """Chuẩn bị hàng + tạo phiếu in; kết quả giống JSON của /kho/orders/print_now/?format=json trước đây."""
+    from kho.views.orders import _print_now_process
+
+    ctx.set_progress(total=len(order_ids))
+    response = _print_now_process(order_ids, do_print, debug_mode)
+    data = json.loads(response.content)
+    if response.status_code >= 400:
+        message = data.get("message") or data.get("error") or f"HTTP {response.status_code}"
+        if data.get("exception"):
+            message = f"{message}: {data['exception']}"
+        raise RuntimeError(message)
+    return data
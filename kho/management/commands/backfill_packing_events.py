@@ -0,0 +1,58 @@
+# kho/management/commands/backfill_packing_events.py
+"""
+Management command để seed log đóng gói (PackingEvent) từ shipment note của các đơn
+trong SapoOrderCache, sau đó tính lại rollup theo giờ.
+
+Chạy 1 lần sau khi deploy (các lần đóng gói sau đó được ghi trực tiếp khi cập nhật packing_status).
+
+Usage:
+    python manage.py backfill_packing_events --days 30
+    python manage.py backfill_packing_events --rebuild-only
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+import logging
+
+from kho.services.packing_event_service import backfill_from_orders, rebuild_rollups
+from orders.services.order_cache_service import OrderCacheService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Seed log đóng gói từ shipment note trong order cache và tính lại rollup theo giờ'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Lấy các đơn tạo trong N ngày gần nhất (default: 30)'
+        )
+        parser.add_argument(
+            '--rebuild-only',
+            action='store_true',
+            help='Chỉ tính lại rollup từ PackingEvent, không đọc order cache'
+        )
+
+    def handle(self, *args, **options):
+        start_time = timezone.now()
+
+        if not options.get('rebuild_only'):
+            orders = OrderCacheService().list_orders_raw(
+                created_on_min=start_time - timedelta(days=options['days'])
+            )
+            stats = backfill_from_orders(orders)
+            self.stdout.write(self.style.SUCCESS(
+                f'Backfilled {stats["events"]} packing events from {stats["orders"]} cached orders'
+            ))
+
+        buckets = rebuild_rollups()
+
+        elapsed_time = (timezone.now() - start_time).total_seconds()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {buckets} hourly rollup buckets in {elapsed_time:.2f}s'
+        ))
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kho', '0003_warehousepackingsetting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackingEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.BigIntegerField(db_index=True, help_text='Sapo order ID')),
+                ('fulfillment_id', models.BigIntegerField(blank=True, help_text='Sapo fulfillment ID', null=True)),
+                ('location_id', models.BigIntegerField(default=0, help_text='Kho (location) của đơn, 0 = chưa xác định')),
+                ('packing_status', models.SmallIntegerField(help_text='packing_status đã ghi (3 = đã in, 4 = đã đóng gói...)')),
+                ('nguoi_goi', models.CharField(blank=True, default='', help_text='Người gói (format: KHO_HN: Tên)', max_length=200)),
+                ('dvvc', models.CharField(blank=True, default='', help_text='Đơn vị vận chuyển', max_length=100)),
+                ('order_total', models.BigIntegerField(default=0, help_text='Giá trị đơn (order.total) tại thời điểm ghi')),
+                ('quantity', models.IntegerField(default=0, help_text='Tổng số lượng sản phẩm trong đơn')),
+                ('event_time', models.DateTimeField(help_text='Thời điểm ghi trạng thái (time_packing)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Packing Event',
+                'verbose_name_plural': 'Packing Events',
+                'db_table': 'kho_packing_event',
+                'indexes': [models.Index(fields=['location_id', 'packing_status', 'event_time'], name='kho_packing_locatio_77b31d_idx'), models.Index(fields=['order_id', 'packing_status', '-event_time'], name='kho_packing_order_i_797a4d_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PackingHourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location_id', models.BigIntegerField(default=0, help_text='Kho (location) của đơn, 0 = chưa xác định')),
+                ('hour', models.DateTimeField(help_text='Đầu giờ (UTC) của bucket')),
+                ('nguoi_goi', models.CharField(blank=True, default='', help_text='Người gói', max_length=200)),
+                ('packing_status', models.SmallIntegerField(help_text='packing_status của các event trong bucket')),
+                ('orders', models.IntegerField(default=0, help_text='Số đơn')),
+                ('amount', models.BigIntegerField(default=0, help_text='Tổng giá trị đơn')),
+                ('quantity', models.IntegerField(default=0, help_text='Tổng số lượng sản phẩm')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Packing Hourly Rollup',
+                'verbose_name_plural': 'Packing Hourly Rollups',
+                'db_table': 'kho_packing_hourly_rollup',
+                'indexes': [models.Index(fields=['location_id', 'packing_status', 'hour'], name='kho_packing_locatio_80e27a_idx')],
+                'constraints': [models.UniqueConstraint(fields=('location_id', 'hour', 'nguoi_goi', 'packing_status'), name='uniq_packing_rollup_bucket')],
+            },
+        ),
+    ]
@@ -180,4 +180,118 @@ class WarehousePackingSetting(models.Model):
             else:
                 return False, f"Tính năng đóng gói hàng đã bị tắt cho {warehouse_code}"
         
-        return False, "Không có quyền truy cập"
\ No newline at end of file
+        return False, "Không có quyền truy cập"
+
+class PackingEvent(models.Model):
+    """
+    Log append-only các lần ghi packing_status lên shipment note Sapo
+    (in đơn = 3, đóng gói xong = 4...). Chỉ INSERT, không sửa/xóa.
+
+    Dùng để thống kê kho bằng SQL local thay vì tải orders và parse note.
+    """
+    order_id = models.BigIntegerField(
+        db_index=True,
+        help_text="Sapo order ID"
+    )
+    fulfillment_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        help_text="Sapo fulfillment ID"
+    )
+    location_id = models.BigIntegerField(
+        default=0,
+        help_text="Kho (location) của đơn, 0 = chưa xác định"
+    )
+    packing_status = models.SmallIntegerField(
+        help_text="packing_status đã ghi (3 = đã in, 4 = đã đóng gói...)"
+    )
+    nguoi_goi = models.CharField(
+        max_length=200,
+        blank=True,
+        default="",
+        help_text="Người gói (format: KHO_HN: Tên)"
+    )
+    dvvc = models.CharField(
+        max_length=100,
+        blank=True,
+        default="",
+        help_text="Đơn vị vận chuyển"
+    )
+    order_total = models.BigIntegerField(
+        default=0,
+        help_text="Giá trị đơn (order.total) tại thời điểm ghi"
+    )
+    quantity = models.IntegerField(
+        default=0,
+        help_text="Tổng số lượng sản phẩm trong đơn"
+    )
+    event_time = models.DateTimeField(
+        help_text="Thời điểm ghi trạng thái (time_packing)"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "kho_packing_event"
+        verbose_name = "Packing Event"
+        verbose_name_plural = "Packing Events"
+        indexes = [
+            models.Index(fields=["location_id", "packing_status", "event_time"]),
+            models.Index(fields=["order_id", "packing_status", "-event_time"]),
+        ]
+
+    def __str__(self):
+        return f"Order {self.order_id} -> {self.packing_status} ({self.nguoi_goi})"
+
+
+class PackingHourlyRollup(models.Model):
+    """
+    Tổng hợp PackingEvent theo (kho, giờ, người gói, packing_status).
+    Mỗi đơn chỉ được tính ở event mới nhất của nó cho từng packing_status
+    (giống shipment note chỉ giữ lần gói cuối).
+    """
+    location_id = models.BigIntegerField(
+        default=0,
+        help_text="Kho (location) của đơn, 0 = chưa xác định"
+    )
+    hour = models.DateTimeField(
+        help_text="Đầu giờ (UTC) của bucket"
+    )
+    nguoi_goi = models.CharField(
+        max_length=200,
+        blank=True,
+        default="",
+        help_text="Người gói"
+    )
+    packing_status = models.SmallIntegerField(
+        help_text="packing_status của các event trong bucket"
+    )
+    orders = models.IntegerField(
+        default=0,
+        help_text="Số đơn"
+    )
+    amount = models.BigIntegerField(
+        default=0,
+        help_text="Tổng giá trị đơn"
+    )
+    quantity = models.IntegerField(
+        default=0,
+        help_text="Tổng số lượng sản phẩm"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "kho_packing_hourly_rollup"
+        verbose_name = "Packing Hourly Rollup"
+        verbose_name_plural = "Packing Hourly Rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["location_id", "hour", "nguoi_goi", "packing_status"],
+                name="uniq_packing_rollup_bucket",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["location_id", "packing_status", "hour"]),
+        ]
+
+    def __str__(self):
+        return f"{self.location_id} {self.hour:%Y-%m-%d %H}h {self.nguoi_goi}: {self.orders}"
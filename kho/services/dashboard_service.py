@@ -255,7 +255,8 @@ def calculate_dashboard_stats(
     location_id: int,
     start_date: datetime,
     end_date: datetime,
-    category_map: Optional[Dict[int, str]] = None
+    category_map: Optional[Dict[int, str]] = None,
+    packing_summary: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """
     Tính toán thống kê dashboard từ danh sách orders.
@@ -266,6 +267,9 @@ def calculate_dashboard_stats(
         start_date: Ngày bắt đầu (local time)
         end_date: Ngày kết thúc (local time)
         category_map: Dict mapping product_id -> category_name
+        packing_summary: Kết quả packing_event_service.get_packing_summary (optional).
+            Nếu có, số đơn đã gói / theo người / theo giờ / giờ làm lấy từ log đóng gói local
+            thay vì parse shipment note.
         
     Returns:
         Dict chứa các thống kê
@@ -537,6 +541,20 @@ def calculate_dashboard_stats(
                     except (ValueError, AttributeError):
                         pass
     
+    # Đơn đã gói / người gói / theo giờ: ưu tiên log đóng gói local (PackingEvent rollup)
+    if packing_summary is not None:
+        sum_data['sodonhang'] = packing_summary['total_orders']
+        sum_data['doanhso'] = packing_summary['total_amount']
+        sum_data['sosanpham'] = packing_summary['total_quantity']
+        doanhso_shipment = packing_summary['total_amount']
+        don_da_goi = {'sodonhang': packing_summary['total_orders'], 'doanhso': packing_summary['total_amount']}
+        hourly_totals = defaultdict(int, enumerate(packing_summary['hourly']))
+        nguoi_goi_set = {name for name in packing_summary['per_user'] if name != "NO-SCAN"}
+        per_user = {
+            name: {**user_data, 'cato': per_user.get(name, {}).get('cato', {})}
+            for name, user_data in packing_summary['per_user'].items()
+        }
+    
     # Log debug info
     logger.info(f"[Dashboard] Location filter: location_id={location_id}, orders_by_location={dict(orders_by_location)}")
     logger.info(f"[Dashboard] Orders processed: {orders_processed}, orders_packed: {orders_packed}")
@@ -640,10 +658,10 @@ def calculate_dashboard_stats(
         
         user_data['username'] = username or 'chuaco'  # Default avatar nếu không tìm thấy
         
-        # Tính giờ làm
-        packing_times = user_data.get('packing_times', [])
-        working_hours = _calculate_working_hours(packing_times, tz_vn)
-        user_data['working_hours'] = working_hours
+        # Tính giờ làm (packing_summary đã tính sẵn từ log đóng gói)
+        if 'working_hours' not in user_data:
+            user_data['working_hours'] = _calculate_working_hours(user_data.get('packing_times', []), tz_vn)
+        working_hours = user_data['working_hours']
         
         # Tính hiệu suất (doanh số/giờ)
         if working_hours > 0:
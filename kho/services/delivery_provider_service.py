@@ -7,10 +7,16 @@ Mapping delivery_service_provider_id -> provider_name để hiển thị trong 
 from typing import Dict, Optional
 import logging
 
+from django.core.cache import cache
+
 from core.sapo_client import get_sapo_client
 
 logger = logging.getLogger(__name__)
 
+# Shared cache (dùng chung giữa các worker) để chỉ 1 worker phải gọi Sapo API
+SHARED_CACHE_KEY = "kho_delivery_provider_names"
+SHARED_CACHE_TIMEOUT = 3600  # 1 hour
+
 # Cache mapping delivery_service_provider_id -> provider_name
 _provider_name_cache: Dict[int, str] = {}
 _providers_loaded: bool = False
@@ -81,6 +87,15 @@ def load_all_providers(force_reload: bool = False) -> Dict[int, str]:
     if _providers_loaded and not force_reload:
         return _provider_name_cache
     
+    # Worker khác đã load -> lấy từ shared cache
+    if not force_reload:
+        shared_map = cache.get(SHARED_CACHE_KEY)
+        if shared_map:
+            _provider_name_cache.update(shared_map)
+            _providers_loaded = True
+            logger.debug(f"[DeliveryProviderService] Loaded {len(shared_map)} delivery service providers from shared cache")
+            return _provider_name_cache
+    
     logger.info("[DeliveryProviderService] Loading all delivery service providers from Sapo API...")
     
     sapo = get_sapo_client()
@@ -135,6 +150,8 @@ def load_all_providers(force_reload: bool = False) -> Dict[int, str]:
     # Update cache
     _provider_name_cache.update(provider_name_map)
     _providers_loaded = True
+    if provider_name_map:
+        cache.set(SHARED_CACHE_KEY, provider_name_map, SHARED_CACHE_TIMEOUT)
     
     logger.info(f"[DeliveryProviderService] Loaded {total_providers} delivery service providers")
     
@@ -146,4 +163,5 @@ def clear_cache():
     global _provider_name_cache, _providers_loaded
     _provider_name_cache.clear()
     _providers_loaded = False
+    cache.delete(SHARED_CACHE_KEY)
 
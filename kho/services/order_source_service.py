@@ -7,10 +7,16 @@ Mapping source_id -> source_name để hiển thị trong đơn hàng.
 from typing import Dict, Optional
 import logging
 
+from django.core.cache import cache
+
 from core.sapo_client import get_sapo_client
 
 logger = logging.getLogger(__name__)
 
+# Shared cache (dùng chung giữa các worker) để chỉ 1 worker phải gọi Sapo API
+SHARED_CACHE_KEY = "kho_order_source_names"
+SHARED_CACHE_TIMEOUT = 3600  # 1 hour
+
 # Cache mapping source_id -> source_name
 _source_name_cache: Dict[int, str] = {}
 _sources_loaded: bool = False
@@ -36,6 +42,15 @@ def load_all_order_sources(force_reload: bool = False) -> Dict[int, str]:
     if _sources_loaded and not force_reload:
         return _source_name_cache
     
+    # Worker khác đã load -> lấy từ shared cache
+    if not force_reload:
+        shared_map = cache.get(SHARED_CACHE_KEY)
+        if shared_map:
+            _source_name_cache.update(shared_map)
+            _sources_loaded = True
+            logger.debug(f"[OrderSourceService] Loaded {len(shared_map)} order sources from shared cache")
+            return _source_name_cache
+    
     logger.info("[OrderSourceService] Loading all order sources from Sapo API...")
     
     sapo = get_sapo_client()
@@ -90,6 +105,8 @@ def load_all_order_sources(force_reload: bool = False) -> Dict[int, str]:
     # Update cache
     _source_name_cache.update(source_name_map)
     _sources_loaded = True
+    if source_name_map:
+        cache.set(SHARED_CACHE_KEY, source_name_map, SHARED_CACHE_TIMEOUT)
     
     logger.info(f"[OrderSourceService] Loaded {total_sources} order sources")
     
@@ -121,4 +138,5 @@ def clear_cache():
     global _source_name_cache, _sources_loaded
     _source_name_cache.clear()
     _sources_loaded = False
+    cache.delete(SHARED_CACHE_KEY)
 
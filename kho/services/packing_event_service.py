@@ -0,0 +1,314 @@
+# kho/services/packing_event_service.py
+"""
+Packing Event Service - log append-only trạng thái đóng gói + rollup theo giờ.
+
+Trước đây packing_status / nguoi_goi / time_packing chỉ nằm trong shipment note (JSON nén)
+nên dashboard phải tải toàn bộ orders rồi parse note. Giờ mỗi lần ghi packing_status lên Sapo
+(SapoCoreOrderService.update_fulfillment_packing_status) đồng thời:
+- INSERT 1 dòng PackingEvent
+- Cập nhật PackingHourlyRollup (kho, giờ, người gói, packing_status)
+
+Dashboard / thống kê / giờ làm đọc lại bằng SQL local.
+"""
+
+from typing import Any, Dict, Iterable, Optional
+from collections import defaultdict
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from kho.models import PackingEvent, PackingHourlyRollup
+
+logger = logging.getLogger(__name__)
+
+TZ_VN = ZoneInfo("Asia/Ho_Chi_Minh")
+
+# packing_status = 4: đã đóng gói
+PACKED_STATUS = 4
+
+
+def _order_totals(order_data: Dict[str, Any]) -> Dict[str, int]:
+    """Lấy location_id / total / tổng số lượng từ raw order JSON."""
+    return {
+        "location_id": order_data.get("location_id") or 0,
+        "order_total": int(order_data.get("total") or 0),
+        "quantity": sum(int(line.get("quantity") or 0) for line in order_data.get("order_line_items") or []),
+    }
+
+
+def _fulfillment_totals(fulfillment: Dict[str, Any]) -> Dict[str, int]:
+    """Lấy location_id / total / tổng số lượng từ raw fulfillment JSON (shipments/{id}.json)."""
+    return {
+        "location_id": fulfillment.get("stock_location_id") or 0,
+        "order_total": int(fulfillment.get("total") or 0),
+        "quantity": sum(
+            int(line.get("quantity") or 0) for line in fulfillment.get("fulfillment_line_items") or []
+        ),
+    }
+
+
+def _hour_bucket(event_time: datetime) -> datetime:
+    return event_time.astimezone(ZoneInfo("UTC")).replace(minute=0, second=0, microsecond=0)
+
+
+def _bump_rollup(event: PackingEvent, sign: int = 1):
+    """Cộng (sign=1) hoặc trừ (sign=-1) 1 event vào bucket rollup của nó."""
+    bucket = {
+        "location_id": event.location_id,
+        "hour": _hour_bucket(event.event_time),
+        "nguoi_goi": event.nguoi_goi,
+        "packing_status": event.packing_status,
+    }
+    deltas = {
+        "orders": F("orders") + sign,
+        "amount": F("amount") + sign * event.order_total,
+        "quantity": F("quantity") + sign * event.quantity,
+        "updated_at": timezone.now(),
+    }
+    if PackingHourlyRollup.objects.filter(**bucket).update(**deltas):
+        return
+    if sign < 0:
+        return
+    try:
+        with transaction.atomic():
+            PackingHourlyRollup.objects.create(
+                **bucket, orders=1, amount=event.order_total, quantity=event.quantity
+            )
+    except IntegrityError:
+        # Request khác vừa tạo bucket
+        PackingHourlyRollup.objects.filter(**bucket).update(**deltas)
+
+
+def record_packing_event(
+    order_id: int,
+    packing_status: int,
+    fulfillment_id: Optional[int] = None,
+    nguoi_goi: Optional[str] = None,
+    dvvc: Optional[str] = None,
+    event_time: Optional[datetime] = None,
+    order_data: Optional[Dict[str, Any]] = None,
+    fulfillment_data: Optional[Dict[str, Any]] = None,
+) -> PackingEvent:
+    """
+    Ghi 1 packing event và cập nhật rollup theo giờ.
+
+    Nếu đơn đã có event cùng packing_status (gói lại / in lại), event cũ được trừ khỏi rollup
+    để mỗi đơn chỉ được tính 1 lần theo lần ghi mới nhất.
+
+    Args:
+        order_id: Sapo order ID
+        packing_status: packing_status vừa ghi lên Sapo
+        fulfillment_id: Sapo fulfillment ID
+        nguoi_goi: Người gói
+        dvvc: Đơn vị vận chuyển
+        event_time: Thời điểm (mặc định: now)
+        order_data: Raw order JSON
+        fulfillment_data: Raw fulfillment JSON caller vừa đọc từ Sapo (dùng khi không có order_data)
+
+        Không có cả 2 thì đọc từ SapoOrderCache; đơn chưa có trong cache sẽ bị ghi location 0.
+
+    Returns:
+        PackingEvent đã tạo
+    """
+    if order_data is not None:
+        totals = _order_totals(order_data)
+    elif fulfillment_data and fulfillment_data.get("stock_location_id"):
+        totals = _fulfillment_totals(fulfillment_data)
+    else:
+        from orders.services.order_cache_service import OrderCacheService
+        totals = _order_totals(OrderCacheService().get_order_raw(order_id) or {})
+        if not totals["location_id"]:
+            logger.warning(f"[PackingEvent] Order {order_id} không có trong SapoOrderCache, event không có location")
+
+    event = PackingEvent(
+        order_id=order_id,
+        fulfillment_id=fulfillment_id,
+        packing_status=packing_status,
+        nguoi_goi=(nguoi_goi or "").strip(),
+        dvvc=(dvvc or "").strip()[:100],
+        event_time=event_time or timezone.now(),
+        **totals,
+    )
+
+    with transaction.atomic():
+        previous = (
+            PackingEvent.objects
+            .filter(order_id=order_id, packing_status=packing_status)
+            .order_by("-event_time", "-id")
+            .first()
+        )
+        if previous and previous.event_time > event.event_time:
+            # Event cũ hơn event đã có (backfill): chỉ lưu log, rollup giữ event mới nhất
+            event.save()
+            return event
+        if previous:
+            _bump_rollup(previous, sign=-1)
+        event.save()
+        _bump_rollup(event)
+
+    return event
+
+
+def packing_log_covers(location_id: int, start: datetime) -> bool:
+    """
+    True nếu log của kho `location_id` đã có dữ liệu từ trước `start` (đã backfill hoặc chạy đủ lâu),
+    tức là thống kê của kho đó từ `start` trở đi có thể đọc hoàn toàn từ log.
+    """
+    return PackingEvent.objects.filter(location_id=location_id, event_time__lte=start).exists()
+
+
+def get_packing_summary(
+    location_id: int,
+    start: datetime,
+    end: datetime,
+    packing_status: int = PACKED_STATUS,
+) -> Dict[str, Any]:
+    """
+    Thống kê đóng gói theo người và theo giờ từ rollup (1 query) + giờ làm từ log (1 query).
+
+    Returns:
+        {
+            "total_orders", "total_amount", "total_quantity": int,
+            "hourly": [24 số đơn theo giờ VN],
+            "per_user": {nguoi_goi: {"total_order", "total_money", "total_quantity", "working_hours"}},
+        }
+    """
+    from kho.services.dashboard_service import _calculate_working_hours
+
+    rows = (
+        PackingHourlyRollup.objects
+        .filter(
+            location_id=location_id,
+            packing_status=packing_status,
+            hour__gte=_hour_bucket(start),
+            hour__lte=end,
+        )
+        .values("nguoi_goi", "hour")
+        .annotate(orders_sum=Sum("orders"), amount_sum=Sum("amount"), quantity_sum=Sum("quantity"))
+    )
+
+    hourly = [0] * 24
+    per_user: Dict[str, Dict[str, Any]] = {}
+    totals = {"total_orders": 0, "total_amount": 0, "total_quantity": 0}
+    for row in rows:
+        if not row["orders_sum"]:
+            continue
+        hourly[row["hour"].astimezone(TZ_VN).hour] += row["orders_sum"]
+        user = per_user.setdefault(row["nguoi_goi"] or "NO-SCAN", {
+            "total_order": 0, "total_money": 0, "total_quantity": 0, "working_hours": 0.0,
+        })
+        user["total_order"] += row["orders_sum"]
+        user["total_money"] += row["amount_sum"]
+        user["total_quantity"] += row["quantity_sum"]
+        totals["total_orders"] += row["orders_sum"]
+        totals["total_amount"] += row["amount_sum"]
+        totals["total_quantity"] += row["quantity_sum"]
+
+    # Giờ làm: cần thời điểm từng lần gói của mỗi người
+    packing_times = defaultdict(list)
+    for nguoi_goi, event_time in (
+        PackingEvent.objects
+        .filter(
+            location_id=location_id,
+            packing_status=packing_status,
+            event_time__gte=start,
+            event_time__lte=end,
+        )
+        .values_list("nguoi_goi", "event_time")
+    ):
+        packing_times[nguoi_goi or "NO-SCAN"].append(event_time.astimezone(TZ_VN))
+    for user_name, user in per_user.items():
+        user["working_hours"] = _calculate_working_hours(packing_times.get(user_name, []), TZ_VN)
+
+    return {**totals, "hourly": hourly, "per_user": per_user}
+
+
+def backfill_from_orders(orders: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Seed log từ shipment note của các orders (raw JSON, thường lấy từ SapoOrderCache).
+    Bỏ qua đơn đã có event cùng packing_status.
+
+    Returns:
+        {"orders": int, "events": int}
+    """
+    from kho.services.dashboard_service import _get_packing_data, _parse_time_packing
+
+    stats = {"orders": 0, "events": 0}
+    candidates = []
+    for order in orders:
+        stats["orders"] += 1
+        packing_data = _get_packing_data(order)
+        packing_status = int(packing_data.get("packing_status") or 0)
+        if packing_status < 3 or not packing_data.get("time_packing") or not order.get("id"):
+            continue
+        fallback_str = order.get("modified_on") or order.get("created_on")
+        fallback = datetime.fromisoformat(fallback_str.replace("Z", "+00:00")) if fallback_str else timezone.now()
+        candidates.append((order, packing_data, packing_status, _parse_time_packing(packing_data["time_packing"], fallback)))
+
+    existing = set(
+        PackingEvent.objects
+        .filter(order_id__in=[order["id"] for order, *_ in candidates])
+        .values_list("order_id", "packing_status")
+    )
+    events = []
+    for order, packing_data, packing_status, event_time in candidates:
+        if (order["id"], packing_status) in existing:
+            continue
+        fulfillments = order.get("fulfillments") or []
+        events.append(PackingEvent(
+            order_id=order["id"],
+            fulfillment_id=fulfillments[-1].get("id") if fulfillments else None,
+            packing_status=packing_status,
+            nguoi_goi="" if packing_data.get("nguoi_goi") == "NO-SCAN" else packing_data.get("nguoi_goi", ""),
+            dvvc=(packing_data.get("dvvc") or "")[:100],
+            event_time=event_time,
+            **_order_totals(order),
+        ))
+    PackingEvent.objects.bulk_create(events, batch_size=1000)
+    stats["events"] = len(events)
+    return stats
+
+
+def rebuild_rollups() -> int:
+    """
+    Tính lại toàn bộ PackingHourlyRollup từ PackingEvent (event mới nhất của mỗi đơn / packing_status).
+
+    Returns:
+        Số bucket đã ghi
+    """
+    latest = {}
+    for event in PackingEvent.objects.order_by("event_time", "id").iterator(chunk_size=2000):
+        latest[(event.order_id, event.packing_status)] = event
+
+    buckets = {}
+    for event in latest.values():
+        key = (event.location_id, _hour_bucket(event.event_time), event.nguoi_goi, event.packing_status)
+        bucket = buckets.setdefault(key, PackingHourlyRollup(
+            location_id=key[0], hour=key[1], nguoi_goi=key[2], packing_status=key[3],
+        ))
+        bucket.orders += 1
+        bucket.amount += event.order_total
+        bucket.quantity += event.quantity
+
+    with transaction.atomic():
+        PackingHourlyRollup.objects.all().delete()
+        PackingHourlyRollup.objects.bulk_create(list(buckets.values()), batch_size=1000)
+
+    logger.info(f"[PackingEvent] Rebuilt {len(buckets)} rollup buckets from {len(latest)} orders")
+    return len(buckets)
+
+
+# ========================= EXPORTS =========================
+
+__all__ = [
+    'PACKED_STATUS',
+    'record_packing_event',
+    'packing_log_covers',
+    'get_packing_summary',
+    'backfill_from_orders',
+    'rebuild_rollups',
+]
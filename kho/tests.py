@@ -1,3 +1,131 @@
+from datetime import datetime
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+
+from core.testing import PerfBudgetMixin
+from kho.models import PackingEvent, PackingHourlyRollup
+from kho.services.packing_event_service import (
+    backfill_from_orders,
+    get_packing_summary,
+    packing_log_covers,
+    rebuild_rollups,
+    record_packing_event,
+)
+from products.services.product_sync_service import ProductSyncService
+
+TZ_VN = ZoneInfo("Asia/Ho_Chi_Minh")
+
+
+def _order(order_id, total=100000, quantity=2, location_id=241737):
+    return {
+        "id": order_id,
+        "location_id": location_id,
+        "total": total,
+        "order_line_items": [{"quantity": quantity}],
+    }
+
+
+class TestPackingEventLog(TestCase):
+    """Test log đóng gói + rollup theo giờ"""
+
+    def test_repack_counts_order_once(self):
+        first = datetime(2025, 1, 2, 9, 15, tzinfo=TZ_VN)
+        again = datetime(2025, 1, 2, 10, 5, tzinfo=TZ_VN)
+        record_packing_event(1, 4, nguoi_goi="KHO_HN: An", event_time=first, order_data=_order(1))
+        record_packing_event(1, 4, nguoi_goi="KHO_HN: Bình", event_time=again, order_data=_order(1))
+        record_packing_event(2, 4, nguoi_goi="KHO_HN: An", event_time=first, order_data=_order(2, total=50000))
+
+        self.assertEqual(PackingEvent.objects.count(), 3)
+        summary = get_packing_summary(
+            241737,
+            datetime(2025, 1, 2, tzinfo=TZ_VN),
+            datetime(2025, 1, 2, 23, 59, 59, tzinfo=TZ_VN),
+        )
+        self.assertEqual((summary["total_orders"], summary["total_amount"]), (2, 150000))
+        self.assertEqual(summary["per_user"]["KHO_HN: An"]["total_order"], 1)
+        self.assertEqual(summary["per_user"]["KHO_HN: Bình"]["total_money"], 100000)
+        self.assertEqual((summary["hourly"][9], summary["hourly"][10]), (1, 1))
+
+        # Rollup tính lại từ log phải khớp rollup cập nhật dần
+        before = set(PackingHourlyRollup.objects.filter(orders__gt=0).values_list("nguoi_goi", "orders", "amount"))
+        rebuild_rollups()
+        after = set(PackingHourlyRollup.objects.values_list("nguoi_goi", "orders", "amount"))
+        self.assertEqual(before, after)
+
+    def test_uncached_order_takes_totals_from_fulfillment(self):
+        fulfillment = {
+            "id": 90, "stock_location_id": 548744, "total": 75000,
+            "fulfillment_line_items": [{"quantity": 2}, {"quantity": 1}],
+        }
+        event_time = datetime(2025, 1, 2, 9, 0, tzinfo=TZ_VN)
+        event = record_packing_event(9, 4, fulfillment_id=90, event_time=event_time, fulfillment_data=fulfillment)
+
+        self.assertEqual((event.location_id, event.order_total, event.quantity), (548744, 75000, 3))
+        # Log chỉ phủ kho đã có event
+        self.assertTrue(packing_log_covers(548744, datetime(2025, 1, 3, tzinfo=TZ_VN)))
+        self.assertFalse(packing_log_covers(241737, datetime(2025, 1, 3, tzinfo=TZ_VN)))
+
+    def test_backfill_from_shipment_note(self):
+        order = _order(7)
+        order["modified_on"] = "2025-01-02T03:00:00Z"
+        order["fulfillments"] = [{"id": 70, "shipment": {"note": '{"pks": 4, "human": "KHO_HN: An", "tgoi": "09:30 02-01-2025"}'}}]
+
+        self.assertEqual(backfill_from_orders([order, _order(8)]), {"orders": 2, "events": 1})
+        self.assertEqual(backfill_from_orders([order])["events"], 0)
+
+        event = PackingEvent.objects.get(order_id=7)
+        self.assertEqual((event.fulfillment_id, event.nguoi_goi), (70, "KHO_HN: An"))
+        self.assertEqual(event.event_time, datetime(2025, 1, 2, 9, 30, tzinfo=TZ_VN))
+
+
+class TestProductListBudget(PerfBudgetMixin, TestCase):
+    """Test số query của kho:product không tăng theo số variants trong catalog"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "x"))
+        # Context processor product_counts gọi Sapo (SapoClient + Selenium login): tách khỏi budget của view
+        for target in ("products.context_processors.get_sapo_client", "kho.views.printing.get_sapo_client"):
+            patcher = mock.patch(target)
+            sapo_client = patcher.start()
+            sapo_client.return_value.core.list_products_raw.return_value = {"metadata": {"total": 0}, "products": []}
+            sapo_client.return_value.core.list_brands_search_raw.return_value = {"brands": []}
+            self.addCleanup(patcher.stop)
+
+    def _create_products(self, start, count):
+        ProductSyncService.__new__(ProductSyncService).save_products_bulk([
+            {
+                "id": product_id, "tenant_id": 1, "name": f"P{product_id}", "status": "active",
+                "brand_id": 833608,
+                "variants": [
+                    {
+                        "id": product_id * 10 + i, "tenant_id": 1, "product_id": product_id,
+                        "sku": f"SKU-{product_id}-{i}", "name": f"P{product_id} - {i}", "status": "active",
+                    }
+                    for i in range(2)
+                ],
+            }
+            for product_id in range(start, start + count)
+        ])
+
+    def _get_products(self):
+        # SERVER_PORT 80 bị PortRedirectMiddleware redirect
+        response = self.client.get(reverse("kho:product"), SERVER_PORT="8000")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context.get("error"))
+        return response
+
+    def test_queries_do_not_grow_with_catalog(self):
+        self._create_products(1, 1)
+        self._get_products()  # Request đầu tạo session
+        with self.assertPerfBudget(max_queries=20, max_external_calls=0) as few:
+            response = self._get_products()
+        self.assertEqual(response.context["total"], 2)
 
-# Create your tests here.
+        self._create_products(2, 20)
+        with self.assertPerfBudget(max_queries=few.queries, max_external_calls=0):
+            response = self._get_products()
+        self.assertEqual(response.context["total"], 42)
@@ -6,6 +6,8 @@ from django.views.decorators.csrf import csrf_exempt
 import json
 from kho.utils import group_required
 from kho.models import WarehousePackingSetting
+from kho.services.packing_event_service import get_packing_summary
+from kho.views.overview import LOCATION_BY_KHO
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
@@ -25,22 +27,36 @@ def stats(request):
     date_from = request.GET.get("date_from", today.strftime("%Y-%m-%d"))
     date_to = request.GET.get("date_to", today.strftime("%Y-%m-%d"))
     
-    # TODO: Query database for statistics
-    # - Total orders packed
-    # - Orders per employee
-    # - Error rate
-    # - Average packing time
-    # - Top performing employees
+    current_kho = request.session.get("current_kho", "geleximco")
+    location_id = LOCATION_BY_KHO.get(current_kho, 241737)
+    
+    # Số đơn đã gói / theo nhân viên / theo giờ: đọc từ log đóng gói local (PackingEvent rollup)
+    try:
+        start = datetime.strptime(date_from, "%Y-%m-%d").replace(tzinfo=tz_vn)
+        end = datetime.strptime(date_to, "%Y-%m-%d").replace(hour=23, minute=59, second=59, tzinfo=tz_vn)
+    except ValueError:
+        start = datetime.combine(today, datetime.min.time(), tzinfo=tz_vn)
+        end = start + timedelta(days=1) - timedelta(seconds=1)
+    summary = get_packing_summary(location_id, start, end)
+    
+    orders_by_employee = sorted(
+        (
+            {"name": name, **user_data}
+            for name, user_data in summary["per_user"].items()
+        ),
+        key=lambda item: item["total_order"],
+        reverse=True,
+    )
     
     stats_data = {
-        "total_orders": 0,
-        "packed_orders": 0,
+        "total_orders": summary["total_orders"],
+        "packed_orders": summary["total_orders"],
         "error_orders": 0,
         "error_rate": 0.0,
         "avg_packing_time": 0,
-        "orders_by_employee": [],
-        "orders_by_hour": [],
-        "top_performers": [],
+        "orders_by_employee": orders_by_employee,
+        "orders_by_hour": summary["hourly"],
+        "top_performers": orders_by_employee[:3],
     }
     
     context = {
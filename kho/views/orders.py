@@ -9,12 +9,15 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from kho.utils import group_required
 from core.sapo_client import BaseFilter
+from core.base.paginator import paginate
 from orders.services.sapo_service import (
     SapoMarketplaceService,
     SapoCoreOrderService,
 )
 from orders.services.dto import OrderDTO
-from orders.services.order_builder import build_order_from_sapo
+from orders.services.order_builder import build_order_from_sapo, OrderDTOFactory
+from orders.services.order_cache_service import OrderCacheService
+from orders.services.order_sync_service import OrderSyncService
 import os
 from io import BytesIO
 import time
@@ -32,6 +35,7 @@ from orders.services.shopee_print_service import (
 )
 from django.http import JsonResponse, HttpRequest, HttpResponse
 from django.views.decorators.http import require_GET
+from core.services.job_queue import enqueue, job_accepted_payload
 import json
 import logging
 import base64
@@ -44,6 +48,8 @@ LOCATION_BY_KHO = {
     "toky": 548744,       # HCM
 }
 BILL_DIR = "settings/logs/bill"
+# Số thread tối đa khi in hàng loạt (print_now / print_now_pdf), mỗi thread 1 SapoClient
+PRINT_MAX_THREADS = 24
 
 # Tắt debug print mặc định để tránh log nhiều trong module kho
 DEBUG_PRINT_ENABLED = False
@@ -200,6 +206,70 @@ def express_orders(request):
     return render(request, "kho/orders/order_express.html", context)
 
 
+def _prefetch_core_orders(
+    core_service: SapoCoreOrderService,
+    sapo_order_ids: set,
+    allowed_location_id: int,
+    max_pages: int,
+    log_tag: str,
+) -> tuple[Dict[int, Dict[str, Any]], int]:
+    """
+    Lấy raw Sapo Core orders cho các sapo_order_ids cần hiển thị.
+
+    Ưu tiên đọc từ SapoOrderCache (sau khi sync incremental theo modified_on).
+    Nếu order cache chưa được backfill (sync_sapo_orders --days), fallback
+    phân trang orders.json gần nhất từ Sapo API như trước.
+
+    Returns:
+        (orders_cache {order_id: raw_order_data}, số API calls đã dùng)
+    """
+    order_cache_service = OrderCacheService()
+    if order_cache_service.is_initialized():
+        sync_stats = OrderSyncService(core_service._sapo).sync_incremental()
+        orders_cache = order_cache_service.get_orders_raw(sapo_order_ids)
+        debug_print(f"{log_tag} Order cache: {len(orders_cache)}/{len(sapo_order_ids)} orders found "
+                    f"(sync: {sync_stats.get('skipped') or str(sync_stats['total_orders']) + ' orders'})")
+        return orders_cache, sync_stats["total_pages"]
+
+    orders_cache: Dict[int, Dict[str, Any]] = {}
+    limit = 250
+    filters = {
+        "status": "draft,finalized",  # Lấy cả draft và finalized
+        "limit": limit,
+    }
+    # Thêm location_id filter nếu có
+    if allowed_location_id:
+        filters["location_id"] = allowed_location_id
+
+    page_stats: Dict[str, Any] = {}
+    try:
+        for page, orders_data in core_service._core_api.paginate(
+            lambda page: core_service._core_api.list_orders_raw(page=page, **filters),
+            items_key="orders",
+            limit=limit,
+            max_pages=max_pages,
+            stats=page_stats,
+            log_tag=f"{log_tag} cache fetch",
+        ):
+            # Cache orders vào dict
+            for order_data in orders_data:
+                order_id = order_data.get("id")
+                if order_id and order_id in sapo_order_ids:
+                    orders_cache[order_id] = order_data
+
+            debug_print(f"{log_tag} Cache page {page}: {len(orders_data)} orders, matched {len(orders_cache)}/{len(sapo_order_ids)} needed orders")
+
+            # Check nếu đã cache đủ orders cần thiết
+            if len(orders_cache) >= len(sapo_order_ids):
+                debug_print(f"{log_tag} Cache complete: {len(orders_cache)}/{len(sapo_order_ids)} orders found")
+                break
+    except Exception as e:
+        logger.error(f"{log_tag} Error fetching cache pages: {e}", exc_info=True)
+
+    cache_api_calls = page_stats.get("pages", 0)
+    return orders_cache, cache_api_calls
+
+
 @group_required("WarehouseManager")
 def shopee_orders(request):
     """
@@ -211,6 +281,7 @@ def shopee_orders(request):
     # ========== DEBUG: Track thời gian ==========
     start_time = time.time()
     api_call_count = {"marketplace": 0, "get_order": 0, "get_variant": 0}
+    variant_cache_hits = 0
 
     context = {
         "title": "ĐƠN SHOPEE - GIA DỤNG PLUS",
@@ -232,13 +303,12 @@ def shopee_orders(request):
     # Filter cho Marketplace orders
     step_start = time.time()
     all_orders = []
-    page = 1
     limit = 250
     
     debug_print(f"shopee_orders Starting to fetch marketplace orders (limit {limit} per page)...")
     logger.info(f"[PERF] shopee_orders: Starting to fetch marketplace orders...")
     
-    while True:
+    def fetch_mp_page(page: int) -> Dict[str, Any]:
         mp_filter = BaseFilter(params={ 
             "connectionIds": connection_ids, 
             "page": page, 
@@ -248,24 +318,17 @@ def shopee_orders(request):
             "sortBy": "ISSUED_AT", 
             "orderBy": "desc", 
         })
-        
-        page_start = time.time()
-        mp_resp = mp_service.list_orders(mp_filter)
+        return mp_service.list_orders(mp_filter)
+    
+    mp_pages: Dict[int, List[Dict[str, Any]]] = {}
+    for page, orders in paginate(fetch_mp_page, items_key="orders", limit=limit, log_tag="shopee_orders marketplace"):
         api_call_count["marketplace"] += 1
-        page_time = time.time() - page_start
-        logger.info(f"[PERF] shopee_orders: Page {page} marketplace API call took {page_time:.2f}s")
-        
-        orders = mp_resp.get("orders", [])
-        metadata = mp_resp.get("metadata", {})
-        total = metadata.get("total", 0)
-        
-        all_orders.extend(orders)
-        debug_print(f"shopee_orders fetched page {page}: {len(orders)} orders in {page_time:.2f}s. Total so far: {len(all_orders)}/{total}")
-        
-        if not orders or len(all_orders) >= total:
-            break
-            
-        page += 1
+        mp_pages[page] = orders
+        debug_print(f"shopee_orders fetched page {page}: {len(orders)} orders")
+    
+    # Giữ thứ tự ISSUED_AT desc như khi fetch tuần tự
+    for page in sorted(mp_pages):
+        all_orders.extend(mp_pages[page])
         
     fetch_time = time.time() - step_start
     mp_orders = all_orders
@@ -286,64 +349,23 @@ def shopee_orders(request):
     
     debug_print(f"shopee_orders Need to fetch {len(sapo_order_ids)} unique orders")
     
-    # Fetch list orders từ Sapo Core API (1500 orders gần nhất = 6 pages)
-    orders_cache: Dict[int, Dict[str, Any]] = {}  # {order_id: raw_order_data}
+    # Lấy raw orders từ SapoOrderCache (sync incremental), fallback 1500 orders gần nhất = 6 pages
     cache_fetch_start = time.time()
-    page = 1
-    limit = 250
-    max_pages = 6  # 6 pages = 1500 orders
-    
-    cache_api_calls = 0
-    while page <= max_pages:
-        try:
-            filters = {
-                "status": "draft,finalized",  # Lấy cả draft và finalized
-                "limit": limit,
-                "page": page,
-            }
-            
-            # Thêm location_id filter nếu có
-            if allowed_location_id:
-                filters["location_id"] = allowed_location_id
-            
-            page_start = time.time()
-            raw_response = core_service._core_api.list_orders_raw(**filters)
-            cache_api_calls += 1
-            page_time = time.time() - page_start
-            logger.info(f"[PERF] shopee_orders: Cache fetch page {page} took {page_time:.2f}s")
-            
-            orders_data = raw_response.get("orders", [])
-            
-            if not orders_data:
-                break
-            
-            # Cache orders vào dict
-            for order_data in orders_data:
-                order_id = order_data.get("id")
-                if order_id and order_id in sapo_order_ids:
-                    orders_cache[order_id] = order_data
-            
-            debug_print(f"shopee_orders Cache page {page}: {len(orders_data)} orders, matched {len([o for o in orders_data if o.get('id') in sapo_order_ids])} needed orders")
-            
-            # Check nếu đã cache đủ orders cần thiết
-            if len(orders_cache) >= len(sapo_order_ids):
-                debug_print(f"shopee_orders Cache complete: {len(orders_cache)}/{len(sapo_order_ids)} orders found")
-                break
-            
-            # Check nếu hết orders
-            if len(orders_data) < limit:
-                break
-            
-            page += 1
-            
-        except Exception as e:
-            logger.error(f"shopee_orders Error fetching cache page {page}: {e}", exc_info=True)
-            break
+    orders_cache, cache_api_calls = _prefetch_core_orders(
+        core_service,
+        sapo_order_ids,
+        allowed_location_id,
+        max_pages=6,
+        log_tag="shopee_orders",
+    )
     
     cache_fetch_time = time.time() - cache_fetch_start
     debug_print(f"shopee_orders Cache fetch completed: {len(orders_cache)}/{len(sapo_order_ids)} orders in {cache_fetch_time:.2f}s ({cache_api_calls} API calls)")
     logger.info(f"[PERF] shopee_orders: Cache fetch completed: {len(orders_cache)}/{len(sapo_order_ids)} orders in {cache_fetch_time:.2f}s")
     
+    # Resolve trước variants (packsize/composite) của cả page để build DTO không gọi API lẻ
+    OrderDTOFactory().prefetch_variants(list(orders_cache.values()), sapo_client=core_service._sapo)
+    
     # Convert orders sang DTO và filter
     convert_start = time.time()
     filtered_orders = []
@@ -411,9 +433,12 @@ def shopee_orders(request):
             # Setup thread-local counter để track variant API calls
             if not hasattr(threading.current_thread(), 'variant_api_counter'):
                 threading.current_thread().variant_api_counter = 0
+            if not hasattr(threading.current_thread(), 'variant_cache_hit_counter'):
+                threading.current_thread().variant_cache_hit_counter = 0
             
             dto_start = time.time()
             variant_api_calls_before = threading.current_thread().variant_api_counter
+            variant_cache_hits_before = threading.current_thread().variant_cache_hit_counter
             
             # Check cache trước
             if sapo_order_id in orders_cache:
@@ -432,6 +457,7 @@ def shopee_orders(request):
             dto_time = time.time() - dto_start
             variant_api_calls_during = threading.current_thread().variant_api_counter - variant_api_calls_before
             api_call_count["get_variant"] += variant_api_calls_during
+            variant_cache_hits += threading.current_thread().variant_cache_hit_counter - variant_cache_hits_before
             
             # Log chi tiết cho mỗi order
             if variant_api_calls_during > 0:
@@ -515,12 +541,14 @@ def shopee_orders(request):
     # Tổng kết
     total_time = time.time() - start_time
     debug_print(f"shopee_orders TOTAL TIME: {total_time:.2f}s | "
-                f"API calls: marketplace={api_call_count['marketplace']}, cache_fetch={cache_api_calls}, get_order={api_call_count['get_order']} | "
+                f"API calls: marketplace={api_call_count['marketplace']}, cache_fetch={cache_api_calls}, get_order={api_call_count['get_order']}, "
+                f"get_variant={api_call_count['get_variant']} (variant cache hits={variant_cache_hits}) | "
                 f"Orders: fetched={len(mp_orders)}, converted={len(filtered_orders)}, "
                 f"cache_hits={cache_hits}, cache_misses={cache_misses}, "
                 f"errors={convert_errors}, skipped={skipped_no_sapo_id + skipped_location + skipped_packed}")
     logger.info(f"[PERF] shopee_orders: TOTAL TIME: {total_time:.2f}s | "
-                f"API calls: marketplace={api_call_count['marketplace']}, cache_fetch={cache_api_calls}, get_order={api_call_count['get_order']} | "
+                f"API calls: marketplace={api_call_count['marketplace']}, cache_fetch={cache_api_calls}, get_order={api_call_count['get_order']}, "
+                f"get_variant={api_call_count['get_variant']} (variant cache hits={variant_cache_hits}) | "
                 f"Orders: fetched={len(mp_orders)}, converted={len(filtered_orders)}, "
                 f"cache_hits={cache_hits}, cache_misses={cache_misses}, "
                 f"errors={convert_errors}, skipped={skipped_no_sapo_id + skipped_location + skipped_packed}")
@@ -600,50 +628,43 @@ def sapo_orders(request):
     # Lấy orders từ Sapo Core API với filter
     step_start = time.time()
     all_orders = []
-    page = 1
     limit = 250
     max_pages = 15  # Giới hạn 15 trang như user code
     
     logger.info(f"[PERF] sapo_orders: Starting to fetch orders (max {max_pages} pages, {limit} per page)...")
     debug_print(f"sapo_orders Starting to fetch orders (max {max_pages} pages, {limit} per page)...")
     
-    while page <= max_pages:
-        try:
-            # Filter theo yêu cầu: status=finalized, packed_status=processing,packed, composite_fulfillment_status=wait_to_pack,packed_processing,packed
-            filters = {
-                "status": "finalized",
-                "fulfillment_status":"unshipped",
-                "packed_status": "processing,packed",
-                "composite_fulfillment_status": "wait_to_pack,packed_processing,packed,packed_cancelled_client",
-                "limit": limit,
-                "page": page,
-            }
-            
-            # Thêm location_id filter nếu có
-            if allowed_location_id:
-                filters["location_id"] = allowed_location_id
-            
-            page_start = time.time()
-            logger.info(f"[PERF] sapo_orders: Fetching page {page} with filters: {filters}")
-            raw_response = core_repo.list_orders_raw(**filters)
+    # Filter theo yêu cầu: status=finalized, packed_status=processing,packed, composite_fulfillment_status=wait_to_pack,packed_processing,packed
+    filters = {
+        "status": "finalized",
+        "fulfillment_status":"unshipped",
+        "packed_status": "processing,packed",
+        "composite_fulfillment_status": "wait_to_pack,packed_processing,packed,packed_cancelled_client",
+        "limit": limit,
+    }
+    
+    # Thêm location_id filter nếu có
+    if allowed_location_id:
+        filters["location_id"] = allowed_location_id
+    
+    # Fetch song song (paginator), ghép lại theo thứ tự page
+    pages_data: Dict[int, List[Dict[str, Any]]] = {}
+    try:
+        for page, orders_data in core_repo.paginate(
+            lambda page: core_repo.list_orders_raw(page=page, **filters),
+            items_key="orders",
+            limit=limit,
+            max_pages=max_pages,
+            log_tag="sapo_orders",
+        ):
             api_call_count["list_orders"] += 1
-            page_time = time.time() - page_start
-            logger.info(f"[PERF] sapo_orders: Page {page} fetched in {page_time:.2f}s")
-            
-            orders_data = raw_response.get("orders", [])
-            
-            if not orders_data:
-                logger.info(f"[PERF] sapo_orders: Page {page} returned no orders, stopping pagination")
-                break
-            
-            all_orders.extend(orders_data)
-            debug_print(f"sapo_orders fetched page {page}: {len(orders_data)} orders in {page_time:.2f}s. Total so far: {len(all_orders)}")
-            
-            page += 1
-            
-        except Exception as e:
-            logger.error(f"sapo_orders Error fetching page {page}: {e}", exc_info=True)
-            break
+            pages_data[page] = orders_data
+            debug_print(f"sapo_orders fetched page {page}: {len(orders_data)} orders")
+    except Exception as e:
+        logger.error(f"sapo_orders Error fetching pages: {e}", exc_info=True)
+    
+    for page in sorted(pages_data):
+        all_orders.extend(pages_data[page])
     
     fetch_time = time.time() - step_start
     debug_print(f"sapo_orders finished fetching. Total: {len(all_orders)} orders in {fetch_time:.2f}s")
@@ -655,6 +676,9 @@ def sapo_orders(request):
     convert_errors = 0
     variant_api_calls_before = api_call_count["get_variant"]
     
+    # Resolve trước variants (packsize/composite) của tất cả orders trong 1 lần
+    factory.prefetch_variants(all_orders, sapo_client=sapo)
+    
     logger.info(f"[PERF] sapo_orders: Starting to convert {len(all_orders)} orders to DTO...")
     debug_print(f"sapo_orders Starting to convert {len(all_orders)} orders to DTO...")
 
@@ -903,10 +927,9 @@ def sos_shopee(request):
     # ========== 1. LẤY ĐƠN TỪ MARKETPLACE (SHOPEE) ==========
     debug_print("sos_shopee Fetching Marketplace orders...")
     mp_orders = []
-    page = 1
     limit = 250
     
-    while True:
+    def fetch_mp_page(page: int) -> Dict[str, Any]:
         mp_filter = BaseFilter(params={
             "connectionIds": connection_ids,
             "page": page,
@@ -916,19 +939,15 @@ def sos_shopee(request):
             "sortBy": "ISSUED_AT",
             "orderBy": "desc",
         })
-        
-        mp_resp = mp_service.list_orders(mp_filter)
+        return mp_service.list_orders(mp_filter)
+    
+    mp_pages: Dict[int, List[Dict[str, Any]]] = {}
+    for page, orders in paginate(fetch_mp_page, items_key="orders", limit=limit, log_tag="sos_shopee marketplace"):
         api_call_count["marketplace"] += 1
-        orders = mp_resp.get("orders", [])
-        metadata = mp_resp.get("metadata", {})
-        total = metadata.get("total", 0)
-        
-        mp_orders.extend(orders)
-        
-        if not orders or len(mp_orders) >= total:
-            break
-        
-        page += 1
+        mp_pages[page] = orders
+    
+    for page in sorted(mp_pages):
+        mp_orders.extend(mp_pages[page])
     
     debug_print(f"sos_shopee Fetched {len(mp_orders)} Marketplace orders")
     
@@ -946,97 +965,60 @@ def sos_shopee(request):
     
     debug_print(f"sos_shopee Need to fetch {len(sapo_order_ids)} unique orders")
     
-    # Fetch list orders từ Sapo Core API (1000 orders gần nhất = 4 pages)
-    orders_cache: Dict[int, Dict[str, Any]] = {}  # {order_id: raw_order_data}
+    # Lấy raw orders từ SapoOrderCache (sync incremental), fallback 1000 orders gần nhất = 4 pages
     cache_fetch_start = time.time()
-    page = 1
-    limit = 250
-    max_pages = 4  # 4 pages = 1000 orders
-    
-    cache_api_calls = 0
-    while page <= max_pages:
-        try:
-            filters = {
-                "status": "draft,finalized",  # Lấy cả draft và finalized
-                "limit": limit,
-                "page": page,
-            }
-            
-            # Thêm location_id filter nếu có
-            if allowed_location_id:
-                filters["location_id"] = allowed_location_id
-            
-            page_start = time.time()
-            raw_response = core_service._core_api.list_orders_raw(**filters)
-            cache_api_calls += 1
-            page_time = time.time() - page_start
-            logger.info(f"[PERF] sos_shopee: Cache fetch page {page} took {page_time:.2f}s")
-            
-            orders_data = raw_response.get("orders", [])
-            
-            if not orders_data:
-                break
-            
-            # Cache orders vào dict
-            for order_data in orders_data:
-                order_id = order_data.get("id")
-                if order_id and order_id in sapo_order_ids:
-                    orders_cache[order_id] = order_data
-            
-            debug_print(f"sos_shopee Cache page {page}: {len(orders_data)} orders, matched {len([o for o in orders_data if o.get('id') in sapo_order_ids])} needed orders")
-            
-            # Check nếu đã cache đủ orders cần thiết
-            if len(orders_cache) >= len(sapo_order_ids):
-                debug_print(f"sos_shopee Cache complete: {len(orders_cache)}/{len(sapo_order_ids)} orders found")
-                break
-            
-            page += 1
-        except Exception as e:
-            logger.error(f"sos_shopee Error fetching cache page {page}: {e}", exc_info=True)
-            break
+    orders_cache, cache_api_calls = _prefetch_core_orders(
+        core_service,
+        sapo_order_ids,
+        allowed_location_id,
+        max_pages=4,
+        log_tag="sos_shopee",
+    )
     
     cache_fetch_time = time.time() - cache_fetch_start
     cache_hits = len(orders_cache)
     cache_misses = len(sapo_order_ids) - cache_hits
     debug_print(f"sos_shopee Cache fetch complete: {cache_hits} hits, {cache_misses} misses in {cache_fetch_time:.2f}s ({cache_api_calls} API calls)")
     logger.info(f"[PERF] sos_shopee: Cache fetch complete: {cache_hits} hits, {cache_misses} misses in {cache_fetch_time:.2f}s")
-    
+
     # ========== 2. LẤY ĐƠN TỪ SAPO CORE (SAPO ORDERS) ==========
     debug_print("sos_shopee Fetching Sapo Core orders...")
     from core.sapo_client import get_sapo_client
     from orders.services.order_builder import OrderDTOFactory
-    
+
     sapo = get_sapo_client()
     factory = OrderDTOFactory()
+
+    # Resolve trước variants (packsize/composite) của các đơn đã có trong cache
+    factory.prefetch_variants(list(orders_cache.values()), sapo_client=sapo)
     
     sapo_orders_raw = []
-    page = 1
     max_pages = 10
     
-    while page <= max_pages:
-        try:
-            filters = {
-                "status": "finalized",
-                "composite_fulfillment_status": "wait_to_pack,packed_processing,packed",
-                "limit": limit,
-                "page": page,
-            }
-            
-            if allowed_location_id:
-                filters["location_id"] = allowed_location_id
-            
-            raw_response = sapo.core.list_orders_raw(**filters)
+    filters = {
+        "status": "finalized",
+        "composite_fulfillment_status": "wait_to_pack,packed_processing,packed",
+        "limit": limit,
+    }
+    if allowed_location_id:
+        filters["location_id"] = allowed_location_id
+    
+    core_pages: Dict[int, List[Dict[str, Any]]] = {}
+    try:
+        for page, orders_data in sapo.core.paginate(
+            lambda page: sapo.core.list_orders_raw(page=page, **filters),
+            items_key="orders",
+            limit=limit,
+            max_pages=max_pages,
+            log_tag="sos_shopee core",
+        ):
             api_call_count["sapo_core"] += 1
-            orders_data = raw_response.get("orders", [])
-            
-            if not orders_data:
-                break
-            
-            sapo_orders_raw.extend(orders_data)
-            page += 1
-        except Exception as e:
-            logger.error(f"sos_shopee Error fetching Sapo Core page {page}: {e}", exc_info=True)
-            break
+            core_pages[page] = orders_data
+    except Exception as e:
+        logger.error(f"sos_shopee Error fetching Sapo Core pages: {e}", exc_info=True)
+    
+    for page in sorted(core_pages):
+        sapo_orders_raw.extend(core_pages[page])
     
     debug_print(f"sos_shopee Fetched {len(sapo_orders_raw)} Sapo Core orders")
     
@@ -1982,10 +1964,10 @@ def _process_order_batch(
     batch_num: int,
 ) -> Dict[str, Any]:
     """
-    Xử lý một batch các đơn hàng (5 đơn).
+    Xử lý một batch các đơn hàng (5 đơn, tuần tự trong 1 thread).
     
-    LƯU Ý: Mỗi thread sẽ dùng chung core_service (có thể dùng chung SapoClient singleton).
-    Để tránh race conditions, mỗi thread sẽ tạo SapoCoreOrderService riêng nếu cần.
+    LƯU Ý: Mỗi thread tạo SapoCoreOrderService riêng; get_sapo_client() trả về SapoClient
+    riêng của thread (session riêng, token dùng chung trong process).
     
     Returns:
         Dict với keys:
@@ -1993,8 +1975,7 @@ def _process_order_batch(
             - "results": List[Dict] - kết quả từ _process_single_order
             - "errors": List[Dict] - các lỗi
     """
-    # Tạo core_service riêng cho thread này để tránh race conditions
-    # Mặc dù SapoClient là singleton, nhưng việc tạo service riêng giúp giảm conflicts
+    # Tạo core_service riêng cho thread này (dùng SapoClient của thread, không tranh session)
     try:
         thread_local_core_service = SapoCoreOrderService()
     except Exception as e:
@@ -2008,11 +1989,7 @@ def _process_order_batch(
         "errors": [],
     }
     
-    for idx, mp_order_id in enumerate(batch_order_ids):
-        # Thêm delay nhỏ giữa các đơn trong cùng một batch để tránh rate limiting
-        if idx > 0:
-            time.sleep(0.1)  # 100ms delay giữa các đơn
-        
+    for mp_order_id in batch_order_ids:
         meta = order_meta.get(mp_order_id)
         if not meta:
             # Nếu không có meta, vẫn cố gắng xử lý với meta mặc định
@@ -2091,9 +2068,9 @@ def print_now(request: HttpRequest):
     """
     /kho/orders/print_now/?ids=<list marketplace_id>&print=yes/no&debug=0/1&format=json
 
-    - Nếu có format=json: xử lý và trả JSON với kết quả
+    - Nếu có format=json: enqueue job kho.print_now, trả 202 + job_id / status_url
     - Nếu không có format=json: render template với progress bar
-    - JavaScript trong template sẽ gọi lại endpoint với format=json để lấy kết quả
+    - JavaScript trong template sẽ gọi lại endpoint với format=json rồi poll status_url lấy kết quả
     """
 
     ids_raw = request.GET.get("ids", "")
@@ -2123,6 +2100,25 @@ def print_now(request: HttpRequest):
     except ValueError:
         return JsonResponse({"error": "invalid ids"}, status=400)
 
+    # Chuẩn bị hàng + tạo phiếu in chạy nền (kho.jobs.print_now), JS poll status_url lấy kết quả
+    job = enqueue(
+        "kho.print_now",
+        {"order_ids": order_ids, "do_print": do_print, "debug_mode": debug_mode},
+        user=request.user,
+    )
+    return JsonResponse(job_accepted_payload(job), status=202)
+
+
+def _print_now_process(
+    order_ids: List[int],
+    do_print: bool,
+    debug_mode: bool,
+    format_json: bool = True,
+) -> HttpResponse:
+    """
+    Init confirm + confirm các đơn và tạo phiếu in, trả JSON thống kê (format_json)
+    hoặc PDF đã gộp. Chạy trong worker qua kho.jobs.print_now.
+    """
     mp_service = SapoMarketplaceService()
     core_service = SapoCoreOrderService()
 
@@ -2451,16 +2447,17 @@ def print_now(request: HttpRequest):
     debug_info["orders_per_batch"] = ORDERS_PER_BATCH
     
     # GIỚI HẠN SỐ LƯỢNG THREADS ĐỒNG THỜI để tránh:
-    # 1. Race conditions với singleton SapoClient
-    # 2. Rate limiting từ API
-    # 3. Memory issues
-    # 4. Session conflicts
-    MAX_CONCURRENT_THREADS = min(5, total_batches)  # Tối đa 5 threads đồng thời
+    # 1. Rate limiting từ API
+    # 2. Memory issues
+    # Mỗi thread có SapoClient riêng (get_sapo_client per-thread) nên không còn tranh session.
+    # Job vận đơn Shopee của các threads được gom chung qua ShopeeLabelBatcher,
+    # nên càng nhiều đơn chạy đồng thời thì càng ít request create_sd_jobs
+    MAX_CONCURRENT_THREADS = max(1, min(PRINT_MAX_THREADS, total_batches))
     debug_info["max_concurrent_threads"] = MAX_CONCURRENT_THREADS
     
     if debug_mode:
         debug_print(f"🚀 Starting multi-threaded processing: {len(order_ids)} orders in {total_batches} batches")
-        debug_print(f"   Max concurrent threads: {MAX_CONCURRENT_THREADS} (to avoid thread safety issues)")
+        debug_print(f"   Max concurrent threads: {MAX_CONCURRENT_THREADS} (PRINT_MAX_THREADS={PRINT_MAX_THREADS}, one SapoClient per thread)")
     
     # Thread-safe collections
     all_pdf_results = []  # List of successful PDF results
@@ -2471,12 +2468,6 @@ def print_now(request: HttpRequest):
     with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_THREADS) as executor:
         futures = {}
         for batch_num, batch_order_ids in batches:
-            # Thêm delay nhỏ giữa các batch để tránh tất cả threads cùng bắt đầu cùng lúc
-            # Delay tăng dần: batch 1 = 0s, batch 2 = 0.2s, batch 3 = 0.4s, ...
-            if batch_num > 1:
-                delay = (batch_num - 1) * 0.2
-                time.sleep(delay)
-            
             future = executor.submit(
                 _process_order_batch,
                 batch_order_ids,
@@ -2945,7 +2936,7 @@ def print_now_pdf(request: HttpRequest):
     debug_info["orders_per_batch"] = ORDERS_PER_BATCH
     
     # GIỚI HẠN SỐ LƯỢNG THREADS ĐỒNG THỜI (giống như print_now)
-    MAX_CONCURRENT_THREADS = min(5, total_batches)
+    MAX_CONCURRENT_THREADS = max(1, min(PRINT_MAX_THREADS, total_batches))
     debug_info["max_concurrent_threads"] = MAX_CONCURRENT_THREADS
     
     all_pdf_results = []
@@ -2955,11 +2946,6 @@ def print_now_pdf(request: HttpRequest):
     with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_THREADS) as executor:
         futures = {}
         for batch_num, batch_order_ids in batches:
-            # Thêm delay nhỏ giữa các batch để tránh tất cả threads cùng bắt đầu cùng lúc
-            if batch_num > 1:
-                delay = (batch_num - 1) * 0.2
-                time.sleep(delay)
-            
             future = executor.submit(
                 _process_order_batch,
                 batch_order_ids,
@@ -10,7 +10,10 @@ from kho.models import WarehousePackingSetting
 from core.system_settings import get_connection_ids, SAPO_TMDT, load_shopee_shops, load_shopee_shops_detail
 from core.sapo_client import get_sapo_client, BaseFilter
 from orders.services.sapo_service import SapoMarketplaceService, SapoCoreOrderService
+from orders.services.order_cache_service import OrderCacheService
+from orders.services.order_sync_service import OrderSyncService
 from kho.services.dashboard_service import calculate_dashboard_stats
+from kho.services.packing_event_service import get_packing_summary, packing_log_covers
 from core.shopee_client import ShopeeClient
 
 import logging
@@ -105,12 +108,55 @@ def _fetch_orders_page(
         return 0
 
 
+def _get_fetch_window(start_date: datetime, end_date: datetime) -> tuple[datetime, datetime]:
+    """
+    Mở rộng window để lấy đủ orders (có thể có time_packing trong khoảng nhưng created_on ngoài khoảng).
+    Khi time=today: lấy orders từ 2 ngày trước đến hôm nay (vì có thể có đơn tạo 2 ngày trước nhưng gói hôm nay).
+    """
+    return start_date - timedelta(days=2), end_date + timedelta(days=1)
+
+
+def _load_orders(
+    core_service: SapoCoreOrderService,
+    start_date: datetime,
+    end_date: datetime,
+    location_id: int,
+) -> List[Dict[str, Any]]:
+    """
+    Lấy orders cho dashboard.
+
+    Nếu SapoOrderCache đã có đầy đủ đơn cho window (đã backfill bằng sync_sapo_orders),
+    sync incremental theo modified_on rồi đọc từ DB. Ngược lại fallback fetch từ Sapo API.
+    """
+    window_start, window_end = _get_fetch_window(start_date, end_date)
+    order_cache_service = OrderCacheService()
+    
+    if order_cache_service.covers(window_start):
+        OrderSyncService(core_service._sapo).sync_incremental()
+        orders = order_cache_service.list_orders_raw(
+            created_on_min=window_start,
+            created_on_max=window_end,
+            location_id=location_id,
+            statuses=["draft", "finalized", "completed"],
+        )
+        logger.info(f"[Dashboard] Loaded {len(orders)} orders from order cache")
+        return orders
+    
+    return _fetch_orders_multi_thread(
+        core_service,
+        start_date,
+        end_date,
+        location_id,
+        max_workers=10
+    )
+
+
 def _fetch_orders_multi_thread(
     core_service: SapoCoreOrderService,
     start_date: datetime,
     end_date: datetime,
     location_id: int,
-    max_workers: int = 5
+    max_workers: int = 10
 ) -> List[Dict[str, Any]]:
     """
     Fetch orders với multi-threading để tăng tốc.
@@ -120,17 +166,14 @@ def _fetch_orders_multi_thread(
         start_date: Ngày bắt đầu
         end_date: Ngày kết thúc
         location_id: Location ID của kho
-        max_workers: Số thread tối đa
+        max_workers: Số thread tối đa (tốc độ thực tế do rate limiter theo host quyết định)
         
     Returns:
         List tất cả orders
     """
     tz_vn = ZoneInfo("Asia/Ho_Chi_Minh")
     
-    # Mở rộng window để lấy đủ orders (có thể có time_packing trong khoảng nhưng created_on ngoài khoảng)
-    # Khi time=today: lấy orders từ 2 ngày trước đến hôm nay (vì có thể có đơn tạo 2 ngày trước nhưng gói hôm nay)
-    window_start = start_date - timedelta(days=2)
-    window_end = end_date + timedelta(days=1)
+    window_start, window_end = _get_fetch_window(start_date, end_date)
     
     logger.info(f"[Dashboard] Fetch orders window: {window_start.strftime('%Y-%m-%d %H:%M:%S')} to {window_end.strftime('%Y-%m-%d %H:%M:%S')} (filter range: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')})")
     
@@ -213,13 +256,7 @@ def _load_category_map() -> Dict[int, str]:
         # Lấy từ database cache thay vì API
         from products.services.product_cache_service import ProductCacheService
         cache_service = ProductCacheService()
-        products_data = cache_service.list_products_raw()
-        
-        for product in products_data:
-            product_id = product.get("id")
-            category = product.get("category")
-            if product_id and category:
-                category_map[product_id] = category
+        category_map = cache_service.get_product_categories()
     except Exception as e:
         logger.error(f"[Dashboard] Error loading category map: {e}", exc_info=True)
     
@@ -280,14 +317,13 @@ def dashboard(request):
     # Service layer
     core_service = SapoCoreOrderService()
     
-    # Fetch orders với multi-threading
+    # Fetch orders (order cache nếu có, fallback multi-threading từ Sapo API)
     start_fetch = time.time()
-    orders = _fetch_orders_multi_thread(
+    orders = _load_orders(
         core_service,
         start_date,
         end_date,
         location_id,
-        max_workers=5
     )
     fetch_time = time.time() - start_fetch
     logger.info(f"[Dashboard] Fetched {len(orders)} orders in {fetch_time:.2f}s")
@@ -297,12 +333,18 @@ def dashboard(request):
     
     # Tính toán thống kê
     start_calc = time.time()
+    packing_start = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    packing_end = end_date.replace(hour=23, minute=59, second=59, microsecond=999999)
+    packing_summary = None
+    if packing_log_covers(location_id, packing_start):
+        packing_summary = get_packing_summary(location_id, packing_start, packing_end)
     stats = calculate_dashboard_stats(
         orders,
         location_id,
         start_date,
         end_date,
-        category_map
+        category_map,
+        packing_summary=packing_summary
     )
     calc_time = time.time() - start_calc
     logger.info(f"[Dashboard] Calculated stats in {calc_time:.2f}s")
@@ -14,7 +14,7 @@ from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from kho.utils import group_required
 
-from core.sapo_client import SapoClient
+from core.sapo_client import get_sapo_client
 from orders.services.sapo_service import SapoCoreOrderService, mo_rong_gon
 from orders.services.order_builder import OrderDTOFactory
 
@@ -28,6 +28,125 @@ def debug_print(*args, **kwargs):
         print("[DEBUG]", *args, **kwargs)
 
 
+def _match_order_by_code(orders_raw, tracking_code: str):
+    """
+    Tìm order khớp chính xác mã vận đơn trong list raw orders.
+    Fallback: reference_number (mã đơn Shopee) cho đơn Hoả Tốc.
+    
+    Returns:
+        (order_raw, fulfillment, error_message) - error_message khác None khi khớp đơn nhưng không hợp lệ
+    """
+    # Find order with matching tracking code
+    target_order_raw = None
+    target_fulfillment = None
+    
+    for order_raw in orders_raw:
+        fulfillments = order_raw.get('fulfillments', [])
+        for fulfillment in fulfillments:
+            shipment = fulfillment.get('shipment')
+            if shipment and shipment.get('tracking_code') == tracking_code:
+                target_order_raw = order_raw
+                target_fulfillment = fulfillment
+                break
+        if target_order_raw:
+            break
+    
+    if not target_order_raw:
+        # Fallback: Search by reference_number (Shopee ID)
+        # Only for Shopee source_id=1880152 and Hoả Tốc
+        debug_print(f"[PackingAPI] Checking fallback: reference_number match for Shopee Hoả Tốc")
+        
+        for order_raw in orders_raw:
+            # Check if reference_number matches input
+            ref_number = str(order_raw.get('reference_number', '')).strip()
+            if ref_number == tracking_code:
+                # Check source_id = 1880152 (Shopee)
+                if order_raw.get('source_id') != 1880152:
+                    debug_print(f"[PackingAPI] Match ref_number but not Shopee source: {order_raw.get('source_id')}")
+                    continue
+                    
+                # Check fulfillments
+                fulfillments = order_raw.get('fulfillments', [])
+                candidate_fulfillment = None
+                
+                # Find valid fulfillment (not cancelled)
+                for fulfillment in fulfillments:
+                    if fulfillment.get('status') != 'cancelled':
+                        candidate_fulfillment = fulfillment
+                        break
+                
+                if not candidate_fulfillment:
+                    debug_print(f"[PackingAPI] Match ref_number but no valid fulfillment")
+                    continue
+                    
+                # Check Hoả Tốc in shipment service_name
+                shipment = candidate_fulfillment.get('shipment', {})
+                service_name = str(shipment.get('service_name', '')).lower()
+                
+                # Check keywords for Hoả Tốc
+                is_hoatoc = any(keyword in service_name for keyword in [
+                    'hỏa tốc', 'hoatoc', 'now', 'grab', 'be', 'ahamove', 
+                    'instant', 'trong ngày'
+                ])
+                
+                if not is_hoatoc:
+                    debug_print(f"[PackingAPI] Match ref_number but not Hoả Tốc: {service_name}")
+                    continue
+                    
+                # Check if tracking_code exists
+                real_tracking_code = shipment.get('tracking_code')
+                if not real_tracking_code:
+                    return None, None, 'Đơn hàng chưa có mã vận đơn.'
+                    
+                # Found valid order
+                target_order_raw = order_raw
+                target_fulfillment = candidate_fulfillment
+                debug_print(f"[PackingAPI] Found order by reference_number: {ref_number}, tracking: {real_tracking_code}")
+                break
+
+    return target_order_raw, target_fulfillment, None
+
+
+def _load_indexed_orders(sapo, tracking_code: str):
+    """
+    Lấy orders (raw, mới nhất từ Sapo theo ID) mà index local trỏ tới mã vận đơn / reference_number.
+    Trả về [] nếu index không có hoặc lỗi (caller fallback search trên Sapo).
+    """
+    from orders.services.order_cache_service import OrderCacheService
+    
+    try:
+        order_ids = OrderCacheService().find_order_ids_by_code(tracking_code)
+    except Exception as e:
+        logger.warning(f"[PackingAPI] Tracking code index lookup failed: {e}")
+        return []
+    
+    orders_raw = []
+    for order_id in order_ids[:5]:
+        try:
+            response = sapo.core.get_order_raw(order_id)
+        except Exception as e:
+            logger.warning(f"[PackingAPI] Failed to get order {order_id} from index: {e}")
+            continue
+        order_raw = (response or {}).get('order')
+        if order_raw:
+            orders_raw.append(order_raw)
+    
+    if orders_raw:
+        _index_orders(sapo, orders_raw)
+    debug_print(f"[PackingAPI] Index lookup {tracking_code}: {len(order_ids)} ids, {len(orders_raw)} orders")
+    return orders_raw
+
+
+def _index_orders(sapo, orders_raw):
+    """Write-through SapoOrderCache + index mã vận đơn (không chặn luồng scan nếu lỗi)."""
+    from orders.services.order_sync_service import OrderSyncService
+    
+    try:
+        OrderSyncService(sapo_client=sapo).save_orders_raw(orders_raw)
+    except Exception as e:
+        logger.warning(f"[PackingAPI] Failed to index orders: {e}")
+
+
 @group_required("WarehousePacker", "WarehouseManager")
 @require_http_methods(["GET"])
 def get_order(request):
@@ -59,101 +178,36 @@ def get_order(request):
     debug_print(f"[PackingAPI] Getting order with tracking_code: {tracking_code}")
     
     try:
-        sapo = SapoClient()
+        sapo = get_sapo_client()
         order_service = SapoCoreOrderService()
         
-        # Search order by tracking code
-        # Tracking code is in fulfillment.shipment.tracking_code
-        orders_raw = sapo.core.list_orders_raw(
-            limit=250,
-            query=tracking_code  # Search in multiple fields including tracking_code
-        )
+        # 1. Index local (SapoOrderTrackingCode / reference_number) -> order_id,
+        #    lấy lại order theo ID để có trạng thái mới nhất
+        orders_raw = _load_indexed_orders(sapo, tracking_code)
+        target_order_raw, target_fulfillment, match_error = _match_order_by_code(orders_raw, tracking_code)
         
-        debug_print(f"[PackingAPI] orders_raw type: {type(orders_raw)}")
-        debug_print(f"[PackingAPI] orders_raw: {orders_raw}")
+        # 2. Miss index: search full-text trên Sapo như cũ
+        if not target_order_raw and not match_error:
+            debug_print(f"[PackingAPI] Index miss for {tracking_code}, searching Sapo")
+            orders_raw = sapo.core.list_orders_raw(
+                limit=250,
+                query=tracking_code  # Search in multiple fields including tracking_code
+            )
+            
+            # Handle if orders_raw is a dict with 'orders' key
+            if isinstance(orders_raw, dict):
+                orders_raw = orders_raw.get('orders') or []
+            debug_print(f"[PackingAPI] Remote search returned {len(orders_raw)} orders")
+            
+            target_order_raw, target_fulfillment, match_error = _match_order_by_code(orders_raw, tracking_code)
+            if target_order_raw:
+                _index_orders(sapo, [target_order_raw])
         
-        if not orders_raw:
-            debug_print(f"[PackingAPI] No orders found for tracking_code: {tracking_code}")
+        if match_error:
             return JsonResponse({
                 'success': False,
-                'error': f'Không tìm thấy đơn hàng với mã vận đơn: {tracking_code}'
+                'error': match_error
             })
-        
-        # Handle if orders_raw is a dict with 'orders' key
-        if isinstance(orders_raw, dict) and 'orders' in orders_raw:
-            orders_raw = orders_raw['orders']
-            debug_print(f"[PackingAPI] Extracted orders array, count: {len(orders_raw)}")
-        
-        # Find order with matching tracking code
-        target_order_raw = None
-        target_fulfillment = None
-        
-        for order_raw in orders_raw:
-            fulfillments = order_raw.get('fulfillments', [])
-            for fulfillment in fulfillments:
-                shipment = fulfillment.get('shipment')
-                if shipment and shipment.get('tracking_code') == tracking_code:
-                    target_order_raw = order_raw
-                    target_fulfillment = fulfillment
-                    break
-            if target_order_raw:
-                break
-        
-        if not target_order_raw:
-            # Fallback: Search by reference_number (Shopee ID)
-            # Only for Shopee source_id=1880152 and Hoả Tốc
-            debug_print(f"[PackingAPI] Checking fallback: reference_number match for Shopee Hoả Tốc")
-            
-            for order_raw in orders_raw:
-                # Check if reference_number matches input
-                ref_number = str(order_raw.get('reference_number', '')).strip()
-                if ref_number == tracking_code:
-                    # Check source_id = 1880152 (Shopee)
-                    if order_raw.get('source_id') != 1880152:
-                        debug_print(f"[PackingAPI] Match ref_number but not Shopee source: {order_raw.get('source_id')}")
-                        continue
-                        
-                    # Check fulfillments
-                    fulfillments = order_raw.get('fulfillments', [])
-                    candidate_fulfillment = None
-                    
-                    # Find valid fulfillment (not cancelled)
-                    for fulfillment in fulfillments:
-                        if fulfillment.get('status') != 'cancelled':
-                            candidate_fulfillment = fulfillment
-                            break
-                    
-                    if not candidate_fulfillment:
-                        debug_print(f"[PackingAPI] Match ref_number but no valid fulfillment")
-                        continue
-                        
-                    # Check Hoả Tốc in shipment service_name
-                    shipment = candidate_fulfillment.get('shipment', {})
-                    service_name = str(shipment.get('service_name', '')).lower()
-                    
-                    # Check keywords for Hoả Tốc
-                    is_hoatoc = any(keyword in service_name for keyword in [
-                        'hỏa tốc', 'hoatoc', 'now', 'grab', 'be', 'ahamove', 
-                        'instant', 'trong ngày'
-                    ])
-                    
-                    if not is_hoatoc:
-                        debug_print(f"[PackingAPI] Match ref_number but not Hoả Tốc: {service_name}")
-                        continue
-                        
-                    # Check if tracking_code exists
-                    real_tracking_code = shipment.get('tracking_code')
-                    if not real_tracking_code:
-                        return JsonResponse({
-                            'success': False,
-                            'error': 'Đơn hàng chưa có mã vận đơn.'
-                        })
-                        
-                    # Found valid order
-                    target_order_raw = order_raw
-                    target_fulfillment = candidate_fulfillment
-                    debug_print(f"[PackingAPI] Found order by reference_number: {ref_number}, tracking: {real_tracking_code}")
-                    break
 
         if not target_order_raw:
             debug_print(f"[PackingAPI] No order found with exact tracking_code match")
@@ -276,18 +330,19 @@ def get_order(request):
                 if shipment.get('weight'):
                     shipment_weight = float(shipment.get('weight', 0)) / 1000.0  # Chuyển từ gram sang kg
         
-        # Helper function to get variant image from cache
+        # Load ảnh của tất cả items + gifts từ database cache trong 1 lần
+        variant_image_map = {}
+        try:
+            from products.services.product_cache_service import ProductCacheService
+            variant_image_map = ProductCacheService().get_variant_images_many(
+                [item.variant_id for item in order_dto.real_items] + [gift.variant_id for gift in order_dto.gifts]
+            )
+        except Exception as e:
+            debug_print(f"[PackingAPI] Error fetching variant images: {e}")
+        
         def get_variant_image(variant_id):
-            """Fetch variant image from database cache"""
-            try:
-                from products.services.product_cache_service import ProductCacheService
-                cache_service = ProductCacheService()
-                image_url = cache_service.get_variant_image(variant_id)
-                return image_url if image_url else None
-            except Exception as e:
-                debug_print(f"[PackingAPI] Error fetching variant image for {variant_id}: {e}")
-            
-            return None
+            """Variant image từ map đã load (None nếu không có)"""
+            return variant_image_map.get(variant_id) or None
         
         # Prepare real_items data for JSON response
         real_items_data = []
@@ -414,7 +469,7 @@ def complete(request):
         time_goi = datetime.now().strftime("%H:%M %d-%m-%Y")
         
         # Update packing status to Sapo
-        sapo = SapoClient()
+        sapo = get_sapo_client()
         order_service = SapoCoreOrderService()
         
         # Update sẽ tự động lấy dvvc từ shipment nếu chưa có trong note
@@ -185,52 +185,18 @@ def product(request: HttpRequest):
         ]
         context["brands"] = sorted(enabled_brands, key=lambda x: x.get("name", ""))
         
-        # Lấy variants từ database cache (filter theo brand_id client-side)
+        # Lấy variants từ database cache (filter brand_id + bỏ packsize = true bằng SQL)
         logger.info(f"[kho:product] Starting to fetch variants from cache for brand_id={brand_id}")
         
         from products.services.product_cache_service import ProductCacheService
         cache_service = ProductCacheService()
-        all_products_data = cache_service.list_products_raw()
-        
-        # Extract variants từ products và filter theo brand_id
-        all_variants = []
-        for product_data in all_products_data:
-            product_brand_id = product_data.get("brand_id")
-            
-            # Filter theo brand_id
-            if product_brand_id != brand_id:
-                continue
-            
-            # Extract variants từ product (chỉ lấy variants không phải packsize)
-            variants = product_data.get("variants", [])
-            for variant_data in variants:
-                # Bỏ qua variant có packsize = true (combo)
-                packsize = variant_data.get("packsize", False)
-                if packsize is True:
-                    continue
-                
-                # Thêm product_id và brand_id vào variant_data để dùng sau
-                variant_data["_product_id"] = product_data.get("id")
-                variant_data["_brand_id"] = product_brand_id
-                all_variants.append(variant_data)
+        all_variants = cache_service.list_variants_raw(brand_id=brand_id, include_packsize=False)
         
         logger.info(f"[kho:product] Extracted {len(all_variants)} variants from cache for brand_id={brand_id}")
         
         # Lấy product metadata cho từng variant để có GDP metadata
-        # Tạo map product_id -> product để tránh gọi API nhiều lần
-        product_map = {}
-        product_ids = set(v.get("product_id") for v in all_variants if v.get("product_id"))
-        
-        # Lấy products từ cache (không gọi API)
-        product_ids_list = list(product_ids)
-        for product_id in product_ids_list:
-            try:
-                product = cache_service.get_product(product_id)
-                if product:
-                    product_map[product_id] = product
-            except Exception as e:
-                logger.warning(f"Failed to get product {product_id} from cache: {e}")
-                continue
+        # Map product_id -> product, 1 query từ cache (không gọi API)
+        product_map = cache_service.get_products_many(v.get("product_id") for v in all_variants)
         
         # Parse variants và lấy metadata
         variants_data = []
@@ -419,10 +419,11 @@ def ticket_detail(request, ticket_id):
             if missing_ids:
                 from products.services.product_cache_service import ProductCacheService
                 cache_service = ProductCacheService()
+                variant_dtos = cache_service.get_variants_many(missing_ids)
                 for vid in missing_ids:
                     try:
                         # Lấy variant từ cache
-                        variant_dto = cache_service.get_variant(vid)
+                        variant_dto = variant_dtos.get(vid)
                         if variant_dto and variant_dto.images:
                             url = variant_dto.images[0].full_path if variant_dto.images[0].full_path else variant_dto.images[0].path
                             if url:
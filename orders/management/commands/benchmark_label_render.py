@@ -0,0 +1,179 @@
+# orders/management/commands/benchmark_label_render.py
+"""
+Benchmark render label Shopee (cover + overlay MVD + merge) trước/sau khi cache
+cover page, font và template phần tĩnh của overlay. Không gọi Shopee/Sapo API.
+
+Usage:
+    python manage.py benchmark_label_render --file /tmp/label.pdf
+    python manage.py benchmark_label_render --shop giadungplus_official --carrier "SPX Express" --count 100
+"""
+
+from io import BytesIO
+from pathlib import Path
+from types import SimpleNamespace
+import os
+import time
+import logging
+
+import PyPDF2
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from reportlab.lib.units import inch
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from orders.services import shopee_print_service as sps
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark số label/giây khi render vận đơn Shopee (trước/sau cache cover + template)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            type=str,
+            default=None,
+            help='File PDF vận đơn mẫu (mặc định: tự tạo 1 trang label giả)'
+        )
+        parser.add_argument(
+            '--shop',
+            type=str,
+            default='giadungplus_official',
+            help='Thư mục shop trong settings/logs/print-cover (default: giadungplus_official)'
+        )
+        parser.add_argument(
+            '--carrier',
+            type=str,
+            default='SPX Express',
+            help='Tên DVVC để chọn cover (default: SPX Express)'
+        )
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=50,
+            help='Số label mỗi lần đo (default: 50)'
+        )
+
+    def handle(self, *args, **options):
+        count = max(1, options.get('count') or 1)
+        shop = options.get('shop')
+        carrier = options.get('carrier')
+
+        if options.get('file'):
+            label_path = Path(options['file'])
+            if not label_path.exists():
+                raise CommandError(f'Không tìm thấy file: {label_path}')
+            label_bytes = label_path.read_bytes()
+        else:
+            label_bytes = self._fake_label_pdf()
+
+        cover_path = sps._resolve_cover_path(shop, carrier)
+        if not cover_path.exists():
+            self.stdout.write(self.style.WARNING(f'Không có cover {cover_path}, đo không kèm cover'))
+
+        order = self._fake_order()
+
+        legacy_time = self._run(count, lambda: self._render_legacy(label_bytes, cover_path, carrier, order))
+        # Lần render đầu tiên của path mới có chi phí dựng cache, đo cả lần đó
+        sps._template_cache.clear()
+        cached_time = self._run(count, lambda: self._render_cached(label_bytes, cover_path, carrier, order))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n=== Label render benchmark ({count} labels) ===\n'
+            f'Cover: {cover_path}\n'
+            f'Before (parse cover + register font + full overlay): '
+            f'{legacy_time:.3f}s -> {count / legacy_time:.1f} labels/s\n'
+            f'After (cached cover/template + per-order overlay): '
+            f'{cached_time:.3f}s -> {count / cached_time:.1f} labels/s\n'
+            f'Speedup: {legacy_time / cached_time:.1f}x\n'
+        ))
+
+    @staticmethod
+    def _run(count, render):
+        start = time.perf_counter()
+        for _ in range(count):
+            render()
+        return time.perf_counter() - start
+
+    def _render_legacy(self, label_bytes, cover_path, carrier, order):
+        """Mô phỏng luồng cũ: mỗi label parse lại cover, đăng ký lại font, vẽ toàn bộ overlay."""
+        font_dir = os.path.join(settings.BASE_DIR, 'assets', 'font')
+        pdfmetrics.registerFont(TTFont('UTM Avo', os.path.join(font_dir, 'UTM_Avo.ttf')))
+        pdfmetrics.registerFont(TTFont('UTM Avo Bold', os.path.join(font_dir, 'UTM_AvoBold.ttf')))
+        pdfmetrics.registerFont(TTFont('Arial', os.path.join(font_dir, 'arial.ttf')))
+        pdfmetrics.registerFont(TTFont('ArialI', os.path.join(font_dir, 'ariali.ttf')))
+
+        cover_page = None
+        if cover_path.exists():
+            cover_page = PyPDF2.PdfReader(str(cover_path)).pages[0]
+
+        mvd_page = self._overlay_page(carrier, order, include_static=True)
+        return self._merge(label_bytes, cover_page, mvd_page)
+
+    def _render_cached(self, label_bytes, cover_path, carrier, order):
+        background = sps._get_label_background(cover_path, carrier, order.location_id)
+        mvd_page = self._overlay_page(carrier, order, include_static=False)
+        return self._merge(label_bytes, background, mvd_page)
+
+    @staticmethod
+    def _overlay_page(carrier, order, include_static):
+        sps._ensure_fonts()
+        buf = BytesIO()
+        c = canvas.Canvas(buf)
+        c.setPageSize((4.1 * inch, 5.8 * inch))
+        c.translate(inch, inch)
+        sps._render_mvd_overlay(
+            c,
+            channel_order_number=order.reference_number,
+            shipping_carrier_name=carrier,
+            order=order,
+            include_static=include_static,
+        )
+        c.showPage()
+        c.save()
+        buf.seek(0)
+        return PyPDF2.PdfReader(buf).pages[0]
+
+    @staticmethod
+    def _merge(label_bytes, background_page, mvd_page):
+        writer = PyPDF2.PdfWriter()
+        for page in PyPDF2.PdfReader(BytesIO(label_bytes), strict=False).pages:
+            if background_page:
+                page.merge_page(background_page)
+            page.merge_page(mvd_page)
+            writer.add_page(page)
+        output = BytesIO()
+        writer.write(output)
+        return output.getvalue()
+
+    @staticmethod
+    def _fake_label_pdf() -> bytes:
+        buf = BytesIO()
+        c = canvas.Canvas(buf, pagesize=(4.1 * inch, 5.8 * inch))
+        c.setFont('Helvetica', 9)
+        for i in range(30):
+            c.drawString(20, 400 - i * 12, f"FAKE LABEL LINE {i} - 0912345678 - Ha Noi")
+        c.showPage()
+        c.save()
+        return buf.getvalue()
+
+    @staticmethod
+    def _fake_order():
+        items = [
+            SimpleNamespace(
+                variant_id=1000 + i, old_id=0, sku=f"SKU-{i:03d}", quantity=i + 1,
+                unit="cái", variant_options="Trắng", product_name=f"Sản phẩm mẫu {i}/Phân loại",
+            )
+            for i in range(4)
+        ]
+        return SimpleNamespace(
+            reference_number="2501010ABCDEF",
+            real_items=items,
+            gifts=[],
+            note="",
+            location_id=241737,
+            ship_deadline_fast_str="10:00 01/01",
+        )
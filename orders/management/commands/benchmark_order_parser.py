@@ -0,0 +1,126 @@
+# orders/management/commands/benchmark_order_parser.py
+"""
+Benchmark fast-path parser (order_fast_parser) so với OrderDTOFactory trên 1 page orders.
+
+Usage:
+    python manage.py benchmark_order_parser --record /tmp/orders_page.json   # Ghi 1 page (250 đơn) từ Sapo
+    python manage.py benchmark_order_parser --file /tmp/orders_page.json     # Chạy benchmark trên page đã ghi
+"""
+
+import json
+import time
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.services.order_builder import OrderDTOFactory
+from orders.services.order_fast_parser import extract_real_items
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark fast-path order parser so với OrderDTOFactory (real_items)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            type=str,
+            default=None,
+            help='File JSON page orders đã ghi ({"orders": [...]})'
+        )
+        parser.add_argument(
+            '--record',
+            type=str,
+            default=None,
+            help='Ghi 1 page orders từ Sapo Core API ra file này rồi benchmark'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=250,
+            help='Số đơn khi --record (default: 250)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Số lần lặp mỗi parser (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        file_path = options.get('file')
+        record_path = options.get('record')
+        repeat = max(1, options.get('repeat') or 1)
+
+        if record_path:
+            from core.sapo_client import get_sapo_client
+            sapo = get_sapo_client()
+            response = sapo.core.list_orders_raw(
+                page=1,
+                limit=options.get('limit'),
+                status="finalized,completed"
+            )
+            with open(record_path, 'w', encoding='utf-8') as f:
+                json.dump({"orders": response.get("orders", [])}, f, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(
+                f'Recorded {len(response.get("orders", []))} orders to {record_path}'
+            ))
+            file_path = record_path
+
+        if not file_path:
+            raise CommandError('Cần --file hoặc --record')
+
+        with open(file_path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        orders_data = payload.get("orders", payload) if isinstance(payload, dict) else payload
+
+        # DTO path: không truyền sapo_client để không gọi API lấy variant (chỉ đo parse)
+        factory = OrderDTOFactory()
+
+        def run_dto():
+            result = []
+            for order_data in orders_data:
+                order = factory.from_sapo_json(order_data)
+                result.append({item.variant_id: int(item.quantity) for item in order.real_items})
+            return result
+
+        def run_fast():
+            return [
+                {variant_id: quantity for variant_id, quantity, _ in extract_real_items(order_data)}
+                for order_data in orders_data
+            ]
+
+        dto_times = []
+        fast_times = []
+        dto_result = fast_result = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            dto_result = run_dto()
+            dto_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            fast_result = run_fast()
+            fast_times.append(time.perf_counter() - start)
+
+        mismatches = [
+            order_data.get("id")
+            for order_data, dto_items, fast_items in zip(orders_data, dto_result, fast_result)
+            if dto_items != fast_items
+        ]
+
+        dto_best = min(dto_times)
+        fast_best = min(fast_times)
+        self.stdout.write(self.style.SUCCESS(
+            f'\n=== Order Parser Benchmark ({len(orders_data)} orders, best of {repeat}) ===\n'
+            f'OrderDTOFactory: {dto_best * 1000:.1f} ms\n'
+            f'Fast-path:       {fast_best * 1000:.1f} ms\n'
+            f'Speedup:         {dto_best / fast_best if fast_best else 0:.1f}x\n'
+        ))
+
+        if mismatches:
+            self.stdout.write(self.style.ERROR(
+                f'real_items mismatch on {len(mismatches)} orders: {mismatches[:10]}'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('real_items match on all orders'))
@@ -0,0 +1,96 @@
+# orders/management/commands/sync_sapo_orders.py
+"""
+Management command để sync orders từ Sapo Core API vào database cache (SapoOrderCache).
+
+Usage:
+    python manage.py sync_sapo_orders --days 90     # Backfill lần đầu (đơn tạo trong 90 ngày)
+    python manage.py sync_sapo_orders               # Sync incremental theo watermark modified_on
+"""
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+import logging
+
+from orders.services.order_sync_service import OrderSyncService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Sync orders từ Sapo Core API vào database cache (incremental theo modified_on)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Backfill toàn bộ đơn tạo trong N ngày gần nhất (bỏ qua để sync incremental)'
+        )
+        parser.add_argument(
+            '--max-pages',
+            type=int,
+            default=1000,
+            help='Giới hạn số page mỗi lần sync (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        days = options.get('days')
+        max_pages = options.get('max_pages')
+
+        start_time = timezone.now()
+        service = OrderSyncService()
+
+        try:
+            if days:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Starting backfill orders from Sapo API (days={days})...'
+                ))
+                stats = service.backfill(days=days, max_pages=max_pages)
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    'Starting incremental sync orders from Sapo API...'
+                ))
+                stats = service.sync_incremental(min_interval_seconds=0, max_pages=max_pages)
+
+            elapsed_time = (timezone.now() - start_time).total_seconds()
+
+            if stats.get("skipped") == "not_initialized":
+                self.stdout.write(self.style.WARNING(
+                    'Order cache chưa được khởi tạo. Chạy backfill trước: '
+                    'python manage.py sync_sapo_orders --days 90'
+                ))
+                return
+            if stats.get("skipped"):
+                self.stdout.write(self.style.WARNING(f'Skipped: {stats["skipped"]}'))
+                return
+
+            state = service.get_state()
+            self.stdout.write(self.style.SUCCESS(
+                f'\n=== Sync Completed ===\n'
+                f'Total pages: {stats["total_pages"]}\n'
+                f'Total orders: {stats["total_orders"]}\n'
+                f'Created: {stats["created"]}\n'
+                f'Updated: {stats["updated"]}\n'
+                f'Watermark (modified_on): {state.last_modified_on}\n'
+                f'Covered from (created_on): {state.covered_from}\n'
+                f'Time elapsed: {elapsed_time:.2f}s\n'
+            ))
+
+            if stats["truncated"]:
+                self.stdout.write(self.style.WARNING(
+                    f'Reached max pages ({max_pages}), watermark was not advanced. Re-run with a larger --max-pages.'
+                ))
+
+            if stats["errors"]:
+                self.stdout.write(self.style.WARNING(
+                    f'\nErrors ({len(stats["errors"])}):'
+                ))
+                for error in stats["errors"][:10]:
+                    self.stdout.write(self.style.ERROR(f'  - {error}'))
+
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(
+                f'Error syncing orders: {str(e)}'
+            ))
+            logger.error(f'Error in sync_sapo_orders command: {e}', exc_info=True)
+            raise
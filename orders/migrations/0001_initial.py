@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SapoOrderSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Tên luồng sync (vd: core_orders)', max_length=50, unique=True)),
+                ('last_modified_on', models.DateTimeField(blank=True, help_text='Watermark modified_on của lần sync thành công gần nhất', null=True)),
+                ('covered_from', models.DateTimeField(blank=True, help_text='Mốc created_on sớm nhất đã có đầy đủ trong cache', null=True)),
+                ('last_synced_at', models.DateTimeField(blank=True, help_text='Thời điểm chạy sync gần nhất', null=True)),
+                ('last_stats', models.JSONField(blank=True, default=dict, help_text='Thống kê lần sync gần nhất')),
+            ],
+            options={
+                'verbose_name': 'Sapo Order Sync State',
+                'verbose_name_plural': 'Sapo Order Sync States',
+                'db_table': 'orders_sapo_order_sync_state',
+            },
+        ),
+        migrations.CreateModel(
+            name='SapoOrderCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.BigIntegerField(db_index=True, help_text='Sapo order ID', unique=True)),
+                ('code', models.CharField(blank=True, db_index=True, default='', help_text='Mã đơn Sapo (SON...)', max_length=50)),
+                ('reference_number', models.CharField(blank=True, db_index=True, default='', help_text='Mã đơn sàn TMĐT', max_length=100)),
+                ('location_id', models.BigIntegerField(blank=True, db_index=True, help_text='Kho (location) của đơn', null=True)),
+                ('status', models.CharField(blank=True, db_index=True, default='', help_text='Trạng thái đơn (draft, finalized, completed, cancelled)', max_length=20)),
+                ('created_on', models.DateTimeField(blank=True, db_index=True, help_text='Thời điểm tạo đơn trên Sapo', null=True)),
+                ('modified_on', models.DateTimeField(blank=True, db_index=True, help_text='Thời điểm cập nhật cuối trên Sapo', null=True)),
+                ('data', models.JSONField(help_text='JSON data của order từ Sapo API (bao gồm fulfillments)')),
+                ('synced_at', models.DateTimeField(auto_now=True, help_text='Thời điểm sync cuối cùng')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Thời điểm tạo record')),
+            ],
+            options={
+                'verbose_name': 'Sapo Order Cache',
+                'verbose_name_plural': 'Sapo Order Cache',
+                'db_table': 'orders_sapo_order_cache',
+                'indexes': [models.Index(fields=['location_id', 'created_on'], name='orders_sapo_locatio_0c8908_idx'), models.Index(fields=['status', 'created_on'], name='orders_sapo_status_913eb0_idx'), models.Index(fields=['-modified_on'], name='orders_sapo_modifie_da12b5_idx')],
+            },
+        ),
+    ]
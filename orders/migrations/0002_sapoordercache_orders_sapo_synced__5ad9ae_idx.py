@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sapoordercache',
+            index=models.Index(fields=['synced_at'], name='orders_sapo_synced__5ad9ae_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:57
+
+from django.db import migrations, models
+
+
+def build_tracking_index(apps, schema_editor):
+    """Build index mã vận đơn từ các orders đã có trong SapoOrderCache."""
+    SapoOrderCache = apps.get_model('orders', 'SapoOrderCache')
+    SapoOrderTrackingCode = apps.get_model('orders', 'SapoOrderTrackingCode')
+
+    batch = []
+    for order_id, data in SapoOrderCache.objects.values_list('order_id', 'data').iterator(chunk_size=500):
+        seen = set()
+        for fulfillment in (data or {}).get('fulfillments') or []:
+            shipment = fulfillment.get('shipment') or {}
+            tracking_code = str(shipment.get('tracking_code') or '').strip()
+            if not tracking_code or len(tracking_code) > 100 or tracking_code in seen:
+                continue
+            seen.add(tracking_code)
+            batch.append(SapoOrderTrackingCode(
+                tracking_code=tracking_code,
+                order_id=order_id,
+                fulfillment_id=fulfillment.get('id'),
+                fulfillment_status=(fulfillment.get('status') or '')[:30],
+            ))
+        if len(batch) >= 1000:
+            SapoOrderTrackingCode.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        SapoOrderTrackingCode.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_sapoordercache_orders_sapo_synced__5ad9ae_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SapoOrderTrackingCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tracking_code', models.CharField(db_index=True, help_text='Mã vận đơn', max_length=100)),
+                ('order_id', models.BigIntegerField(db_index=True, help_text='Sapo order ID')),
+                ('fulfillment_id', models.BigIntegerField(blank=True, help_text='Sapo fulfillment ID chứa mã vận đơn', null=True)),
+                ('fulfillment_status', models.CharField(blank=True, default='', help_text='Trạng thái fulfillment (cancelled, ...)', max_length=30)),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Thời điểm cập nhật cuối')),
+            ],
+            options={
+                'verbose_name': 'Sapo Order Tracking Code',
+                'verbose_name_plural': 'Sapo Order Tracking Codes',
+                'db_table': 'orders_sapo_order_tracking_code',
+                'constraints': [models.UniqueConstraint(fields=('tracking_code', 'order_id'), name='uniq_orders_tracking_code_order')],
+            },
+        ),
+        migrations.RunPython(build_tracking_index, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,178 @@
+"""
+Django models cho orders app.
+"""
+
 from django.db import models
 
-# Create your models here.
+
+class SapoOrderCache(models.Model):
+    """
+    Cache JSON thông tin orders từ Sapo Core API.
+    Được fill bởi OrderSyncService (sync incremental theo modified_on),
+    các view đọc từ đây thay vì phân trang lại orders.json mỗi request.
+    """
+    order_id = models.BigIntegerField(
+        unique=True,
+        db_index=True,
+        help_text="Sapo order ID"
+    )
+    code = models.CharField(
+        max_length=50,
+        blank=True,
+        default="",
+        db_index=True,
+        help_text="Mã đơn Sapo (SON...)"
+    )
+    reference_number = models.CharField(
+        max_length=100,
+        blank=True,
+        default="",
+        db_index=True,
+        help_text="Mã đơn sàn TMĐT"
+    )
+    location_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="Kho (location) của đơn"
+    )
+    status = models.CharField(
+        max_length=20,
+        blank=True,
+        default="",
+        db_index=True,
+        help_text="Trạng thái đơn (draft, finalized, completed, cancelled)"
+    )
+    created_on = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="Thời điểm tạo đơn trên Sapo"
+    )
+    modified_on = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="Thời điểm cập nhật cuối trên Sapo"
+    )
+
+    # Lưu toàn bộ JSON data từ Sapo API
+    data = models.JSONField(
+        help_text="JSON data của order từ Sapo API (bao gồm fulfillments)"
+    )
+
+    # Metadata
+    synced_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Thời điểm sync cuối cùng"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Thời điểm tạo record"
+    )
+
+    class Meta:
+        db_table = 'orders_sapo_order_cache'
+        verbose_name = 'Sapo Order Cache'
+        verbose_name_plural = 'Sapo Order Cache'
+        indexes = [
+            models.Index(fields=['location_id', 'created_on']),
+            models.Index(fields=['status', 'created_on']),
+            models.Index(fields=['-modified_on']),
+            models.Index(fields=['synced_at']),
+        ]
+
+    def __str__(self):
+        return f"Order {self.order_id}: {self.code}"
+
+
+class SapoOrderSyncState(models.Model):
+    """
+    Trạng thái sync orders (watermark) cho OrderSyncService.
+
+    - last_modified_on: watermark, lần sync sau chỉ kéo đơn có modified_on >= watermark
+    - covered_from: mốc created_on sớm nhất đã backfill đầy đủ vào SapoOrderCache
+
+    Dòng key="variant_daily_sales" thuộc VariantDailySalesService (bảng VariantDailySales):
+    covered_from là ngày đầu đã dựng, last_synced_at là mốc SapoOrderCache.synced_at
+    của lần refresh trước; last_modified_on không dùng.
+    """
+    key = models.CharField(
+        max_length=50,
+        unique=True,
+        help_text="Tên luồng sync (vd: core_orders)"
+    )
+    last_modified_on = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Watermark modified_on của lần sync thành công gần nhất"
+    )
+    covered_from = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Mốc created_on sớm nhất đã có đầy đủ trong cache"
+    )
+    last_synced_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Thời điểm chạy sync gần nhất"
+    )
+    last_stats = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Thống kê lần sync gần nhất"
+    )
+
+    class Meta:
+        db_table = 'orders_sapo_order_sync_state'
+        verbose_name = 'Sapo Order Sync State'
+        verbose_name_plural = 'Sapo Order Sync States'
+
+    def __str__(self):
+        return f"{self.key} (watermark={self.last_modified_on})"
+
+
+class SapoOrderTrackingCode(models.Model):
+    """
+    Index mã vận đơn (fulfillment.shipment.tracking_code) -> order_id.
+    Được cập nhật cùng SapoOrderCache trong OrderSyncService.save_orders_raw,
+    dùng cho scanner đóng gói (kho packing get_order) thay vì search full-text trên Sapo.
+    """
+    tracking_code = models.CharField(
+        max_length=100,
+        db_index=True,
+        help_text="Mã vận đơn"
+    )
+    order_id = models.BigIntegerField(
+        db_index=True,
+        help_text="Sapo order ID"
+    )
+    fulfillment_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        help_text="Sapo fulfillment ID chứa mã vận đơn"
+    )
+    fulfillment_status = models.CharField(
+        max_length=30,
+        blank=True,
+        default="",
+        help_text="Trạng thái fulfillment (cancelled, ...)"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Thời điểm cập nhật cuối"
+    )
+
+    class Meta:
+        db_table = 'orders_sapo_order_tracking_code'
+        verbose_name = 'Sapo Order Tracking Code'
+        verbose_name_plural = 'Sapo Order Tracking Codes'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tracking_code', 'order_id'],
+                name='uniq_orders_tracking_code_order',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.tracking_code} -> {self.order_id}"
@@ -16,6 +16,7 @@ from .dto import (
 )
 # Import CustomerDTO from customers module (single source of truth)
 from customers.services.dto import CustomerDTO, CustomerGroupDTO, CustomerSaleOrderStatsDTO
+from .variant_resolver import get_variant_resolver
 
 logger = logging.getLogger(__name__)
 
@@ -413,35 +414,50 @@ class OrderDTOFactory:
     
     def _fetch_variant_info(self, variant_id: int, sapo_client: Optional[Any]) -> Dict[str, Any]:
         """
-        Fetch variant info từ Sapo API hoặc cache.
-        Fallback về empty dict nếu không fetch được.
+        Lấy variant info qua VariantResolver (LRU -> SapoVariantCache -> Sapo API).
+        Fallback về empty dict nếu không lấy được.
         
         Args:
             variant_id: Variant ID cần fetch
-            sapo_client: SapoClient instance (optional)
+            sapo_client: SapoClient instance (optional, chỉ dùng khi phải gọi API)
             
         Returns:
             Dict với keys: product_id, sku, barcode, opt1
         """
-        if not sapo_client:
-            return {}
+        return get_variant_resolver().resolve(variant_id, sapo_client)
+    
+    def prefetch_variants(
+        self,
+        payloads: List[Dict[str, Any]],
+        sapo_client: Optional[Any] = None
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        Resolve trước tất cả variants cần cho real_items của 1 page orders
+        (packsize root + thành phần composite) trong 1 lần, trước khi build DTO.
         
-        try:
-            # Sử dụng core repository để fetch variant (logging đã có trong get_variant_raw)
-            logger.debug(f"[OrderDTOFactory] Fetching variant {variant_id} from API...")
-            variant_data = sapo_client.core.get_variant_raw(variant_id)
-            variant = variant_data.get("variant", {})
+        Args:
+            payloads: List raw orders từ Sapo API
+            sapo_client: SapoClient instance (optional)
             
-            logger.debug(f"[OrderDTOFactory] Fetched variant {variant_id} successfully")
-            return {
-                "product_id": variant.get("product_id"),
-                "sku": variant.get("sku", ""),
-                "barcode": variant.get("barcode"),
-                "opt1": variant.get("opt1")
-            }
-        except Exception as e:
-            logger.warning(f"Failed to fetch variant {variant_id}: {e}")
+        Returns:
+            Dict {variant_id: variant_info}
+        """
+        variant_ids = set()
+        for payload in payloads:
+            raw_order = payload.get("order") or payload
+            for line in raw_order.get("order_line_items") or []:
+                product_type = line.get("product_type") or "normal"
+                if product_type == "normal" and line.get("is_packsize") and line.get("pack_size_root_id"):
+                    variant_ids.add(line.get("pack_size_root_id"))
+                elif product_type == "composite":
+                    for composite_item in line.get("composite_item_domains") or []:
+                        if composite_item.get("variant_id"):
+                            variant_ids.add(composite_item.get("variant_id"))
+        
+        variant_ids = {int(v) for v in variant_ids if str(v).isdigit()}
+        if not variant_ids:
             return {}
+        return get_variant_resolver().prefetch(variant_ids, sapo_client)
     
     def _get_sku_sort_key(self, sku: str) -> float:
         """
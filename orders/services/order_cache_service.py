@@ -0,0 +1,153 @@
+# orders/services/order_cache_service.py
+"""
+Service để lấy orders (raw JSON) từ database cache (SapoOrderCache).
+Thay thế việc phân trang orders.json từ Sapo API trong các view.
+"""
+
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Iterable
+import logging
+
+from orders.models import SapoOrderCache, SapoOrderSyncState, SapoOrderTrackingCode
+from orders.services.order_sync_service import SYNC_KEY_CORE_ORDERS
+
+logger = logging.getLogger(__name__)
+
+
+class OrderCacheService:
+    """
+    Service để đọc orders từ database cache.
+    """
+
+    def is_initialized(self) -> bool:
+        """
+        True nếu cache đã được backfill ít nhất 1 lần (có watermark để sync incremental).
+        """
+        state = SapoOrderSyncState.objects.filter(key=SYNC_KEY_CORE_ORDERS).first()
+        return bool(state and state.last_modified_on)
+
+    def covers(self, created_on_min: datetime) -> bool:
+        """
+        True nếu cache có đầy đủ orders tạo từ created_on_min tới hiện tại.
+
+        Args:
+            created_on_min: Mốc created_on sớm nhất mà caller cần
+        """
+        state = SapoOrderSyncState.objects.filter(key=SYNC_KEY_CORE_ORDERS).first()
+        if not state or not state.last_modified_on or not state.covered_from:
+            return False
+        return state.covered_from <= created_on_min
+
+    def get_order_raw(self, order_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Lấy 1 order (raw JSON) từ cache.
+
+        Returns:
+            Order dict hoặc None nếu không có trong cache
+        """
+        return (
+            SapoOrderCache.objects.filter(order_id=order_id)
+            .values_list("data", flat=True)
+            .first()
+        )
+
+    def find_order_ids_by_code(self, code: str) -> List[int]:
+        """
+        Tìm order_id theo mã vận đơn (SapoOrderTrackingCode) hoặc mã đơn sàn (reference_number).
+        Mã vận đơn được ưu tiên; reference_number chỉ dùng khi không khớp mã vận đơn nào.
+
+        Returns:
+            List order_id (rỗng nếu không có trong index)
+        """
+        code = (code or "").strip()
+        if not code:
+            return []
+
+        order_ids = list(
+            SapoOrderTrackingCode.objects.filter(tracking_code=code)
+            .values_list("order_id", flat=True)
+            .distinct()
+        )
+        if order_ids:
+            return order_ids
+
+        return list(
+            SapoOrderCache.objects.filter(reference_number=code)
+            .values_list("order_id", flat=True)
+        )
+
+    def get_orders_raw(self, order_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Lấy nhiều orders (raw JSON) từ cache trong 1 query.
+
+        Returns:
+            Dict mapping {order_id: order_data} (chỉ gồm các order có trong cache)
+        """
+        order_ids = [order_id for order_id in order_ids if order_id]
+        if not order_ids:
+            return {}
+
+        rows = SapoOrderCache.objects.filter(order_id__in=order_ids).values_list("order_id", "data")
+        return {order_id: data for order_id, data in rows}
+
+    def get_orders_by_reference_raw(self, reference_numbers: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Lấy orders (raw JSON) theo mã đơn sàn (reference_number) trong 1 query.
+
+        Returns:
+            Dict mapping {reference_number: order_data} (chỉ gồm các mã có trong cache,
+            nhiều order cùng mã thì lấy order mới nhất)
+        """
+        reference_numbers = {ref for ref in reference_numbers if ref}
+        if not reference_numbers:
+            return {}
+
+        rows = (
+            SapoOrderCache.objects.filter(reference_number__in=reference_numbers)
+            .order_by("order_id")
+            .values_list("reference_number", "data")
+        )
+        return {reference_number: data for reference_number, data in rows}
+
+    def list_orders_raw(
+        self,
+        created_on_min: Optional[datetime] = None,
+        created_on_max: Optional[datetime] = None,
+        location_id: Optional[int] = None,
+        statuses: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Lấy danh sách orders (raw JSON) từ cache, tương tự list_orders_raw từ API.
+
+        Args:
+            created_on_min: created_on >= (datetime aware)
+            created_on_max: created_on <= (datetime aware)
+            location_id: Filter theo kho
+            statuses: Filter theo status (vd: ["finalized", "completed"])
+
+        Returns:
+            List of order dicts (sắp xếp created_on giảm dần như Sapo API)
+        """
+        queryset = SapoOrderCache.objects.all()
+
+        if created_on_min:
+            queryset = queryset.filter(created_on__gte=created_on_min)
+        if created_on_max:
+            queryset = queryset.filter(created_on__lte=created_on_max)
+        if location_id:
+            queryset = queryset.filter(location_id=location_id)
+        if statuses:
+            queryset = queryset.filter(status__in=statuses)
+
+        orders = list(
+            queryset.order_by("-created_on").values_list("data", flat=True).iterator(chunk_size=500)
+        )
+        logger.debug(f"Fetched {len(orders)} orders from cache")
+        return orders
+
+
+# ========================= EXPORTS =========================
+
+__all__ = [
+    'OrderCacheService',
+]
@@ -0,0 +1,125 @@
+# orders/services/order_fast_parser.py
+"""
+Fast-path parser cho thống kê hàng loạt (dự báo bán hàng, daily sales, báo cáo).
+
+Đọc trực tiếp raw order JSON từ Sapo và trả về tuples (variant_id, qty, amount)
+đã qui đổi real_items, không dựng OrderDTO (Pydantic) và không gọi API lấy variant.
+
+Quy tắc qui đổi giống OrderDTOFactory._build_real_items:
+1. Normal + is_packsize=False: giữ nguyên variant_id
+2. Normal + is_packsize=True: qui về pack_size_root_id, qty * pack_size_quantity
+3. Composite: tách theo composite_item_domains
+
+amount = tổng line_amount của các line items có variant_id nằm trong real_items
+(giống cách SalesForecastService tính revenue từ OrderDTO).
+"""
+
+from typing import Dict, Any, List, Tuple, Iterable, Iterator
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (variant_id, quantity, amount)
+RealItemTuple = Tuple[int, int, float]
+
+
+def _to_int(value: Any, default: int = 0) -> int:
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return default
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def extract_real_items(payload: Dict[str, Any]) -> List[RealItemTuple]:
+    """
+    Qui đổi 1 raw order thành list (variant_id, qty, amount), gộp theo variant_id.
+
+    Args:
+        payload: Raw JSON order từ Sapo ({"order": {...}} hoặc {...})
+
+    Returns:
+        List tuples theo thứ tự variant xuất hiện trong đơn
+    """
+    raw_order = payload.get("order") or payload
+    line_items = raw_order.get("order_line_items") or []
+
+    quantities: Dict[int, float] = {}
+    line_amounts: Dict[int, float] = {}
+
+    for line in line_items:
+        product_type = line.get("product_type") or "normal"
+        variant_id = line.get("variant_id")
+
+        # Doanh thu theo variant_id của line (chỉ line sản phẩm, line_amount > 0)
+        if variant_id and line.get("product_id"):
+            line_amount = _to_float(line.get("line_amount"))
+            if line_amount > 0:
+                line_amounts[variant_id] = line_amounts.get(variant_id, 0.0) + line_amount
+
+        if product_type == "normal":
+            quantity = _to_float(line.get("quantity"))
+
+            if not line.get("is_packsize", False):
+                # Case 1: Normal + is_packsize=False
+                if variant_id:
+                    quantities[variant_id] = quantities.get(variant_id, 0.0) + quantity
+                continue
+
+            # Case 2: Normal + is_packsize=True
+            root_variant_id = line.get("pack_size_root_id")
+            root_variant_id = _to_int(root_variant_id, 0) if root_variant_id is not None else 0
+            if not root_variant_id:
+                logger.warning(f"Packsize item {line.get('id')} missing pack_size_root_id")
+                continue
+            pack_size_quantity = line.get("pack_size_quantity")
+            pack_qty = _to_int(pack_size_quantity, 0) if pack_size_quantity is not None else 0
+            converted_quantity = int(quantity * (pack_qty or 1))
+            quantities[root_variant_id] = quantities.get(root_variant_id, 0.0) + converted_quantity
+
+        elif product_type == "composite":
+            # Case 3: Composite
+            composite_item_domains = line.get("composite_item_domains") or []
+            if not isinstance(composite_item_domains, list):
+                continue
+            for composite_item in composite_item_domains:
+                comp_variant_id = composite_item.get("variant_id")
+                if not comp_variant_id:
+                    continue
+                comp_quantity = _to_int(composite_item.get("quantity", 0))
+                if comp_quantity <= 0:
+                    continue
+                quantities[comp_variant_id] = quantities.get(comp_variant_id, 0.0) + comp_quantity
+
+    return [
+        (variant_id, int(quantity), line_amounts.get(variant_id, 0.0))
+        for variant_id, quantity in quantities.items()
+    ]
+
+
+def iter_real_items(orders_data: Iterable[Dict[str, Any]]) -> Iterator[Tuple[Dict[str, Any], List[RealItemTuple]]]:
+    """
+    Duyệt list raw orders, trả về (raw_order, real_items) cho từng đơn.
+    Đơn lỗi được log và bỏ qua (không làm hỏng cả batch).
+    """
+    for order_data in orders_data:
+        try:
+            yield order_data, extract_real_items(order_data)
+        except Exception as e:
+            logger.warning(f"[order_fast_parser] Error processing order {order_data.get('id')}: {e}")
+            continue
+
+
+# ========================= EXPORTS =========================
+
+__all__ = [
+    'RealItemTuple',
+    'extract_real_items',
+    'iter_real_items',
+]
@@ -0,0 +1,375 @@
+# orders/services/order_sync_service.py
+"""
+Service để sync orders từ Sapo Core API vào database cache (SapoOrderCache).
+
+- backfill(days): kéo toàn bộ đơn tạo trong N ngày gần nhất (chạy 1 lần / khi cần mở rộng).
+- sync_incremental(): chỉ kéo các đơn có modified_on sau watermark lần trước.
+
+Các view (shopee_orders, sos_shopee, dashboard kho, dự báo bán hàng) gọi
+sync_incremental() rồi đọc từ DB qua OrderCacheService.
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Any, List, Optional
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.sapo_client import get_sapo_client
+from orders.models import SapoOrderCache, SapoOrderSyncState, SapoOrderTrackingCode
+
+logger = logging.getLogger(__name__)
+
+SYNC_KEY_CORE_ORDERS = "core_orders"
+
+# Lock để nhiều request không cùng sync một lúc
+SYNC_LOCK_KEY = "sapo_order_sync_lock"
+SYNC_LOCK_TIMEOUT = 300  # 5 minutes
+
+# Kéo lùi watermark một chút để không sót đơn cập nhật cùng thời điểm
+WATERMARK_OVERLAP_SECONDS = 120
+
+# Không sync lại nếu lần sync trước mới chạy trong khoảng này
+DEFAULT_MIN_INTERVAL_SECONDS = 30
+
+PAGE_LIMIT = 250  # Max limit theo Sapo API
+
+
+def parse_sapo_datetime(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parse datetime string từ Sapo ("2025-07-18T13:13:14Z") sang datetime aware (UTC).
+    """
+    if not value:
+        return None
+    try:
+        dt = parse_datetime(value)
+    except (ValueError, TypeError):
+        return None
+    if dt is None:
+        return None
+    if timezone.is_naive(dt):
+        dt = dt.replace(tzinfo=dt_timezone.utc)
+    return dt
+
+
+def format_sapo_datetime(dt: datetime) -> str:
+    """
+    Format datetime sang string filter của Sapo API (UTC, "%Y-%m-%dT%H:%M:%SZ").
+    """
+    if timezone.is_naive(dt):
+        dt = dt.replace(tzinfo=dt_timezone.utc)
+    return dt.astimezone(dt_timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class OrderSyncService:
+    """
+    Service để sync orders từ Sapo Core API vào database.
+    """
+
+    def __init__(self, sapo_client=None):
+        self.sapo_client = sapo_client or get_sapo_client()
+        self.core_api = self.sapo_client.core
+
+    # ==================== PUBLIC API ====================
+
+    def sync_incremental(
+        self,
+        min_interval_seconds: int = DEFAULT_MIN_INTERVAL_SECONDS,
+        max_pages: int = 200
+    ) -> Dict[str, Any]:
+        """
+        Kéo các orders có modified_on >= watermark và upsert vào SapoOrderCache.
+
+        Args:
+            min_interval_seconds: Bỏ qua nếu lần sync trước chạy cách đây chưa đủ N giây
+            max_pages: Giới hạn số page mỗi lần sync
+
+        Returns:
+            Dict thống kê (xem _pull_orders), có thêm key "skipped" nếu không chạy
+        """
+        state = self.get_state()
+
+        if state.last_modified_on is None:
+            # Chưa backfill lần nào -> không có watermark để sync incremental
+            return self._skipped_stats("not_initialized")
+
+        now = timezone.now()
+        if (
+            min_interval_seconds
+            and state.last_synced_at
+            and (now - state.last_synced_at).total_seconds() < min_interval_seconds
+        ):
+            return self._skipped_stats("fresh")
+
+        if not cache.add(SYNC_LOCK_KEY, now.isoformat(), SYNC_LOCK_TIMEOUT):
+            # Request khác đang sync, đọc DB luôn
+            return self._skipped_stats("locked")
+
+        try:
+            since = state.last_modified_on - timedelta(seconds=WATERMARK_OVERLAP_SECONDS)
+            stats = self._pull_orders(
+                {"modified_on_min": format_sapo_datetime(since)},
+                max_pages=max_pages
+            )
+
+            # Chỉ tiến watermark khi đã kéo hết, không lỗi. Không vượt quá thời điểm
+            # bắt đầu pull: đơn cập nhật trong lúc đang phân trang sẽ được kéo lần sau.
+            if not stats["errors"] and not stats["truncated"] and stats["max_modified_on"]:
+                state.last_modified_on = max(
+                    state.last_modified_on,
+                    min(stats["max_modified_on"], now)
+                )
+
+            self._save_state(state, stats, now)
+            logger.info(
+                f"[OrderSyncService] Incremental sync: {stats['total_orders']} orders "
+                f"({stats['created']} created, {stats['updated']} updated) in {stats['total_pages']} pages"
+            )
+            return stats
+        finally:
+            cache.delete(SYNC_LOCK_KEY)
+
+    def backfill(self, days: int, max_pages: int = 1000) -> Dict[str, Any]:
+        """
+        Kéo toàn bộ orders tạo trong `days` ngày gần nhất vào cache.
+
+        Args:
+            days: Số ngày cần backfill
+            max_pages: Giới hạn số page
+
+        Returns:
+            Dict thống kê
+        """
+        created_on_min = (timezone.now() - timedelta(days=days)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        return self.sync_created_range(created_on_min, max_pages=max_pages)
+
+    def sync_created_range(
+        self,
+        created_on_min: datetime,
+        created_on_max: Optional[datetime] = None,
+        max_pages: int = 1000
+    ) -> Dict[str, Any]:
+        """
+        Kéo toàn bộ orders có created_on trong khoảng [created_on_min, created_on_max].
+        Nếu created_on_max=None (tới hiện tại) và thành công, cập nhật covered_from
+        và khởi tạo watermark cho sync incremental.
+
+        Returns:
+            Dict thống kê
+        """
+        started_at = timezone.now()
+        filters = {"created_on_min": format_sapo_datetime(created_on_min)}
+        if created_on_max:
+            filters["created_on_max"] = format_sapo_datetime(created_on_max)
+
+        logger.info(f"[OrderSyncService] Syncing orders created in range: {filters}")
+        stats = self._pull_orders(filters, max_pages=max_pages)
+
+        state = self.get_state()
+        if not stats["errors"] and not stats["truncated"] and created_on_max is None:
+            if state.covered_from is None or created_on_min < state.covered_from:
+                state.covered_from = created_on_min
+            if state.last_modified_on is None:
+                state.last_modified_on = started_at
+
+        self._save_state(state, stats, started_at)
+        logger.info(
+            f"[OrderSyncService] Range sync completed: {stats['total_orders']} orders "
+            f"({stats['created']} created, {stats['updated']} updated) in {stats['total_pages']} pages"
+        )
+        return stats
+
+    def save_orders_raw(self, orders_data: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Upsert một list raw orders (JSON từ Sapo) vào SapoOrderCache
+        và cập nhật index mã vận đơn (SapoOrderTrackingCode).
+        Dùng để write-through khi view phải gọi API lẻ (cache miss).
+
+        Returns:
+            {"created": int, "updated": int}
+        """
+        rows = []
+        for order_data in orders_data or []:
+            row = self._build_cache_row(order_data)
+            if row is not None:
+                rows.append(row)
+
+        if not rows:
+            return {"created": 0, "updated": 0}
+
+        order_ids = [row.order_id for row in rows]
+        existing_ids = set(
+            SapoOrderCache.objects.filter(order_id__in=order_ids).values_list("order_id", flat=True)
+        )
+
+        tracking_rows = []
+        for row in rows:
+            tracking_rows.extend(self._build_tracking_rows(row.data))
+
+        with transaction.atomic():
+            SapoOrderCache.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["order_id"],
+                update_fields=[
+                    "code", "reference_number", "location_id", "status",
+                    "created_on", "modified_on", "data", "synced_at",
+                ],
+            )
+            # Fulfillments có thể bị huỷ/tạo lại -> thay toàn bộ mã vận đơn của các đơn này
+            SapoOrderTrackingCode.objects.filter(order_id__in=order_ids).delete()
+            SapoOrderTrackingCode.objects.bulk_create(tracking_rows, ignore_conflicts=True)
+
+        updated = len(existing_ids)
+        return {"created": len(rows) - updated, "updated": updated}
+
+    @staticmethod
+    def get_state() -> SapoOrderSyncState:
+        state, _ = SapoOrderSyncState.objects.get_or_create(key=SYNC_KEY_CORE_ORDERS)
+        return state
+
+    # ==================== PRIVATE HELPERS ====================
+
+    def _pull_orders(self, filters: Dict[str, Any], max_pages: int) -> Dict[str, Any]:
+        """
+        Phân trang orders.json với filters và upsert từng page vào DB.
+
+        Returns:
+            {
+                "total_pages": int,
+                "total_orders": int,
+                "created": int,
+                "updated": int,
+                "max_modified_on": datetime | None,
+                "truncated": bool (dừng vì chạm max_pages),
+                "errors": list
+            }
+        """
+        stats = {
+            "total_pages": 0,
+            "total_orders": 0,
+            "created": 0,
+            "updated": 0,
+            "max_modified_on": None,
+            "truncated": False,
+            "errors": [],
+        }
+
+        # Fetch pages song song (paginator), upsert tuần tự ở thread hiện tại
+        page_stats_meta: Dict[str, Any] = {}
+        pages = self.core_api.paginate(
+            lambda page: self.core_api.list_orders_raw(page=page, limit=PAGE_LIMIT, **filters),
+            items_key="orders",
+            limit=PAGE_LIMIT,
+            max_pages=max_pages,
+            stats=page_stats_meta,
+            log_tag="OrderSyncService",
+        )
+        try:
+            for page, orders_data in pages:
+                if not orders_data:
+                    continue
+
+                try:
+                    page_stats = self.save_orders_raw(orders_data)
+                except Exception as e:
+                    error_msg = f"Error saving orders page {page}: {str(e)}"
+                    logger.error(f"[OrderSyncService] {error_msg}", exc_info=True)
+                    stats["errors"].append(error_msg)
+                    break
+
+                stats["total_orders"] += len(orders_data)
+                stats["created"] += page_stats["created"]
+                stats["updated"] += page_stats["updated"]
+
+                for order_data in orders_data:
+                    modified_on = parse_sapo_datetime(order_data.get("modified_on"))
+                    if modified_on and (stats["max_modified_on"] is None or modified_on > stats["max_modified_on"]):
+                        stats["max_modified_on"] = modified_on
+        except Exception as e:
+            error_msg = f"Error fetching orders pages: {str(e)}"
+            logger.error(f"[OrderSyncService] {error_msg}", exc_info=True)
+            stats["errors"].append(error_msg)
+        finally:
+            pages.close()
+
+        stats["total_pages"] = page_stats_meta.get("pages", 0)
+        stats["truncated"] = bool(page_stats_meta.get("truncated"))
+
+        return stats
+
+    def _build_cache_row(self, order_data: Dict[str, Any]) -> Optional[SapoOrderCache]:
+        """Build SapoOrderCache instance (chưa save) từ raw order JSON."""
+        raw_order = order_data.get("order") or order_data
+        order_id = raw_order.get("id")
+        if not order_id:
+            return None
+
+        return SapoOrderCache(
+            order_id=order_id,
+            code=(raw_order.get("code") or "")[:50],
+            reference_number=(raw_order.get("reference_number") or "")[:100],
+            location_id=raw_order.get("location_id"),
+            status=(raw_order.get("status") or "")[:20],
+            created_on=parse_sapo_datetime(raw_order.get("created_on")),
+            modified_on=parse_sapo_datetime(raw_order.get("modified_on")),
+            data=raw_order,
+        )
+
+    @staticmethod
+    def _build_tracking_rows(raw_order: Dict[str, Any]) -> List[SapoOrderTrackingCode]:
+        """Build các SapoOrderTrackingCode (chưa save) từ fulfillments[].shipment.tracking_code."""
+        tracking_rows = []
+        seen = set()
+        for fulfillment in raw_order.get("fulfillments") or []:
+            shipment = fulfillment.get("shipment") or {}
+            tracking_code = str(shipment.get("tracking_code") or "").strip()
+            if not tracking_code or len(tracking_code) > 100 or tracking_code in seen:
+                continue
+            seen.add(tracking_code)
+            tracking_rows.append(SapoOrderTrackingCode(
+                tracking_code=tracking_code,
+                order_id=raw_order["id"],
+                fulfillment_id=fulfillment.get("id"),
+                fulfillment_status=(fulfillment.get("status") or "")[:30],
+            ))
+        return tracking_rows
+
+    def _save_state(self, state: SapoOrderSyncState, stats: Dict[str, Any], synced_at: datetime):
+        state.last_synced_at = synced_at
+        state.last_stats = {
+            "total_pages": stats["total_pages"],
+            "total_orders": stats["total_orders"],
+            "created": stats["created"],
+            "updated": stats["updated"],
+            "truncated": stats["truncated"],
+            "errors": stats["errors"][:10],
+        }
+        state.save()
+
+    @staticmethod
+    def _skipped_stats(reason: str) -> Dict[str, Any]:
+        return {
+            "skipped": reason,
+            "total_pages": 0,
+            "total_orders": 0,
+            "created": 0,
+            "updated": 0,
+            "max_modified_on": None,
+            "truncated": False,
+            "errors": [],
+        }
+
+
+# ========================= EXPORTS =========================
+
+__all__ = [
+    'OrderSyncService',
+    'parse_sapo_datetime',
+    'format_sapo_datetime',
+]
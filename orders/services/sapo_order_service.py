@@ -106,6 +106,7 @@ class SapoOrderService:
         raw = self.sapo.core.list_orders_raw(**filters)
         orders_data = raw.get("orders", [])
         
+        self.factory.prefetch_variants(orders_data, sapo_client=self.sapo)
         orders = [self.factory.from_sapo_json(o, sapo_client=self.sapo) for o in orders_data]
         
         logger.info(f"[SapoOrderService] Retrieved {len(orders)} orders")
@@ -78,6 +78,31 @@ class SapoCoreOrderService:
     def list_orders(self, flt: BaseFilter) -> Dict[str, Any]:
         return self._core_api.list_orders_raw(**flt.to_params())
 
+    def _record_packing_event(
+        self,
+        order_id: int,
+        fulfillment_id: int,
+        note_data: Dict[str, Any],
+        fulfillment: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Ghi packing event vào log local (kho.PackingEvent) sau khi đã cập nhật note trên Sapo.
+        Kho / tiền / số lượng lấy từ fulfillment vừa đọc (không phụ thuộc SapoOrderCache).
+        Lỗi ở đây không được làm hỏng thao tác đóng gói.
+        """
+        try:
+            from kho.services.packing_event_service import record_packing_event
+            record_packing_event(
+                order_id=order_id,
+                fulfillment_id=fulfillment_id,
+                packing_status=note_data["packing_status"],
+                nguoi_goi=note_data.get("nguoi_goi"),
+                dvvc=note_data.get("dvvc"),
+                fulfillment_data=fulfillment,
+            )
+        except Exception as e:
+            debug_print(f"Failed to record packing event for order {order_id}: {e}")
+
     def update_fulfillment_packing_status(
         self, 
         order_id: int, 
@@ -179,6 +204,7 @@ class SapoCoreOrderService:
                 )
                 
                 if update_result:
+                    self._record_packing_event(order_id, fulfillment_id, note_data, fulfillment)
                     return True
                 else:
                     if attempt < max_retries - 1:
@@ -0,0 +1,324 @@
+# orders/services/shopee_label_batcher.py
+"""
+Gom job tạo vận đơn Shopee (create_sd_jobs / download_sd_job) của nhiều đơn in cùng lúc.
+
+- submit(): đăng ký các package của 1 đơn, trả về Future[bytes] cho từng package.
+  Các package được gom theo shop trong LINGER_SECONDS rồi gửi 1 request create_sd_jobs
+  (nhiều group trong group_list, tối đa MAX_GROUPS_PER_JOB mỗi request).
+- 1 poller thread download tất cả jobs đang chờ theo từng vòng, backoff tăng dần
+  giữa các vòng (thay cho 10 lần time.sleep(2) cho từng package).
+
+Caller (generate_label_pdf_for_channel_order) dựng overlay trong lúc chờ Future,
+nên render/merge PDF chạy song song với download.
+"""
+
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CREATE_SD_JOBS_URL = "https://banhang.shopee.vn/api/v3/logistics/create_sd_jobs"
+DOWNLOAD_SD_JOB_URL = "https://banhang.shopee.vn/api/v3/logistics/download_sd_job"
+
+LINGER_SECONDS = 0.3  # Thời gian chờ gom thêm package trước khi tạo job
+MAX_GROUPS_PER_JOB = 50  # Số package tối đa trong 1 request create_sd_jobs
+DOWNLOAD_WORKERS = 6  # Số request download đồng thời mỗi vòng poll
+POLL_BACKOFF_SECONDS = [0.5, 1.0, 1.5, 2.0, 3.0]  # Delay giữa các vòng poll
+JOB_TIMEOUT_SECONDS = 30.0  # Job chưa có file sau thời gian này -> lỗi
+MIN_PDF_BYTES = 1000  # Response nhỏ hơn = job chưa xong
+
+
+def _entry_package_number(entry: Dict[str, Any]) -> Optional[str]:
+    """Package number của 1 entry trong data.list của create_sd_jobs."""
+    package_number = entry.get("primary_package_number") or entry.get("package_number")
+    if not package_number:
+        package_list = entry.get("package_list") or []
+        if package_list:
+            package_number = package_list[0].get("package_number")
+    return package_number or None
+
+
+def _resolve(future: Future, result: Any = None, exception: Optional[BaseException] = None) -> None:
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class _PendingJob:
+    def __init__(self, client, job_id: str, future: Future):
+        self.client = client
+        self.job_id = job_id
+        self.future = future
+        self.created_at = time.time()
+        self.attempts = 0
+
+
+class ShopeeLabelBatcher:
+    """
+    Batch create_sd_jobs theo shop + poll download_sd_job chung cho mọi đơn đang in.
+    Thread-safe, dùng chung 1 instance qua get_label_batcher().
+    """
+
+    def __init__(
+        self,
+        linger_seconds: float = LINGER_SECONDS,
+        max_groups_per_job: int = MAX_GROUPS_PER_JOB,
+        job_timeout: float = JOB_TIMEOUT_SECONDS,
+    ):
+        self.linger_seconds = linger_seconds
+        self.max_groups_per_job = max_groups_per_job
+        self.job_timeout = job_timeout
+
+        self._lock = threading.Lock()
+        self._poll_cond = threading.Condition(self._lock)
+        # seller_shop_id -> list (client, order_id, package_number, future) chờ tạo job
+        self._queued: Dict[int, List[tuple]] = {}
+        self._jobs: List[_PendingJob] = []
+        self._poller: Optional[threading.Thread] = None
+        self._download_pool = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix="sd-download")
+
+        self.stats = {"create_calls": 0, "download_calls": 0, "packages": 0}
+
+    # ==================== PUBLIC API ====================
+
+    def submit(
+        self,
+        client,
+        seller_shop_id: int,
+        shopee_order_id: int,
+        package_numbers: List[str],
+    ) -> List[Future]:
+        """
+        Đăng ký các package của 1 đơn để lấy file THERMAL_PDF.
+
+        Returns:
+            List Future (cùng thứ tự package_numbers), result() = PDF bytes
+        """
+        futures = []
+        with self._lock:
+            queue = self._queued.setdefault(seller_shop_id, [])
+            start_flush = not queue
+            for package_number in package_numbers:
+                future: Future = Future()
+                queue.append((client, shopee_order_id, package_number, future))
+                futures.append(future)
+            self.stats["packages"] += len(package_numbers)
+
+        if start_flush:
+            timer = threading.Timer(self.linger_seconds, self._flush_shop, args=(seller_shop_id,))
+            timer.daemon = True
+            timer.start()
+        return futures
+
+    # ==================== PRIVATE HELPERS ====================
+
+    def _flush_shop(self, seller_shop_id: int):
+        """Tạo jobs cho các package đang chờ của 1 shop (1 request / MAX_GROUPS_PER_JOB package)."""
+        with self._lock:
+            queue = self._queued.pop(seller_shop_id, [])
+
+        for i in range(0, len(queue), self.max_groups_per_job):
+            self._submit_chunk(seller_shop_id, queue[i:i + self.max_groups_per_job], retry_unmatched=True)
+
+    def _submit_chunk(self, seller_shop_id: int, chunk: List[tuple], retry_unmatched: bool):
+        """
+        Tạo job cho 1 chunk và đưa các package đã có job vào hàng đợi poll.
+
+        Package không ghép được job (response thiếu / lệch) không làm hỏng cả chunk: tạo lại
+        riêng từng package 1 lần, vẫn lỗi thì chỉ fail Future của package đó.
+        """
+        try:
+            job_ids = self._create_jobs(seller_shop_id, chunk)
+        except Exception as e:
+            logger.error(f"[ShopeeLabelBatcher] create_sd_jobs failed for shop {seller_shop_id}: {e}")
+            for _, _, _, future in chunk:
+                _resolve(future, exception=e)
+            return
+
+        matched = [item for item in chunk if item[2] in job_ids]
+        unmatched = [item for item in chunk if item[2] not in job_ids]
+
+        if matched:
+            with self._poll_cond:
+                for client, _, package_number, future in matched:
+                    self._jobs.append(_PendingJob(client, job_ids[package_number], future))
+                self._ensure_poller()
+                self._poll_cond.notify()
+
+        if not unmatched:
+            return
+        if retry_unmatched:
+            by_package: Dict[str, List[tuple]] = {}
+            for item in unmatched:
+                by_package.setdefault(item[2], []).append(item)
+            logger.warning(
+                f"[ShopeeLabelBatcher] Shop {seller_shop_id}: {len(by_package)} package chưa có job, "
+                f"tạo lại từng package: {list(by_package)}"
+            )
+            for items in by_package.values():
+                self._submit_chunk(seller_shop_id, items, retry_unmatched=False)
+            return
+
+        error = RuntimeError(f"create_sd_jobs không trả job cho package {unmatched[0][2]}")
+        for _, _, _, future in unmatched:
+            _resolve(future, exception=error)
+
+    def _create_jobs(self, seller_shop_id: int, chunk: List[tuple]) -> Dict[str, str]:
+        """
+        Gọi create_sd_jobs cho 1 chunk package.
+
+        Returns:
+            {package_number: job_id}, ghép theo package number trong từng entry của response
+            (không dựa vào thứ tự của data.list). Package không ghép được job không có trong dict.
+        """
+        client = chunk[0][0]
+        package_numbers = list(dict.fromkeys(package_number for _, _, package_number, _ in chunk))
+        order_ids = {package_number: shopee_order_id for _, shopee_order_id, package_number, _ in chunk}
+        json_body: Dict[str, Any] = {
+            "group_list": [
+                {
+                    "primary_package_number": package_number,
+                    "group_shipment_id": 0,
+                    "package_list": [
+                        {"order_id": order_ids[package_number], "package_number": package_number}
+                    ],
+                }
+                for package_number in package_numbers
+            ],
+            "region_id": "VN",
+            "shop_id": seller_shop_id,
+            # cái này là "schema in" trên Shopee cho thermal PDF
+            "channel_id": 50021,
+            "record_generate_schema": False,
+            "generate_file_details": [
+                {
+                    "file_type": "THERMAL_PDF",
+                    "file_name": "Phiếu gửi hàng",
+                    "file_contents": [3],
+                }
+            ],
+        }
+
+        resp = client.session.post(CREATE_SD_JOBS_URL, json=json_body)
+        resp.raise_for_status()
+        with self._lock:
+            self.stats["create_calls"] += 1
+
+        job_data = resp.json()
+        job_list = ((job_data or {}).get("data") or {}).get("list") or []
+
+        job_ids: Dict[str, str] = {}
+        unnamed_job_ids = []
+        for entry in job_list:
+            job_id = entry.get("job_id")
+            if not job_id:
+                continue
+            package_number = _entry_package_number(entry)
+            if package_number is None:
+                unnamed_job_ids.append(job_id)
+            elif package_number in order_ids and package_number not in job_ids:
+                job_ids[package_number] = job_id
+            else:
+                logger.warning(f"[ShopeeLabelBatcher] create_sd_jobs: bỏ qua entry không khớp package: {entry}")
+
+        missing = [package_number for package_number in package_numbers if package_number not in job_ids]
+        if len(missing) == 1 and len(unnamed_job_ids) == 1:
+            # Còn đúng 1 package và 1 job không ghi package number: không thể nhầm
+            job_ids[missing[0]] = unnamed_job_ids[0]
+        elif missing:
+            logger.warning(
+                f"[ShopeeLabelBatcher] create_sd_jobs trả {len(job_list)} entry cho {len(package_numbers)} package, "
+                f"không ghép được: {missing}"
+            )
+        return job_ids
+
+    def _ensure_poller(self):
+        # Gọi khi đang giữ self._lock
+        if self._poller is None or not self._poller.is_alive():
+            self._poller = threading.Thread(target=self._poll_loop, name="sd-job-poller", daemon=True)
+            self._poller.start()
+
+    def _poll_loop(self):
+        round_idx = 0
+        while True:
+            with self._poll_cond:
+                while not self._jobs:
+                    round_idx = 0
+                    self._poll_cond.wait()
+                jobs = list(self._jobs)
+
+            try:
+                pending = self._poll_round(jobs)
+            except Exception as e:
+                # Poller là thread duy nhất resolve các Future: không được chết
+                logger.exception(f"[ShopeeLabelBatcher] Poll round failed: {e}")
+                pending = True
+
+            if pending:
+                time.sleep(POLL_BACKOFF_SECONDS[min(round_idx, len(POLL_BACKOFF_SECONDS) - 1)])
+                round_idx += 1
+
+    def _poll_round(self, jobs: List[_PendingJob]) -> bool:
+        """Download 1 vòng các job đang chờ. Returns: còn job chờ hay không."""
+        results = list(self._download_pool.map(self._download_job, jobs))
+
+        done = set()
+        now = time.time()
+        for job, pdf_bytes in zip(jobs, results):
+            if job.future.done():
+                done.add(id(job))
+            elif pdf_bytes:
+                _resolve(job.future, result=pdf_bytes)
+                done.add(id(job))
+            elif now - job.created_at > self.job_timeout:
+                _resolve(job.future, exception=RuntimeError("Download SD job thất bại."))
+                done.add(id(job))
+
+        with self._poll_cond:
+            self._jobs = [job for job in self._jobs if id(job) not in done]
+            return bool(self._jobs)
+
+    def _download_job(self, job: _PendingJob) -> Optional[bytes]:
+        job.attempts += 1
+        with self._lock:
+            self.stats["download_calls"] += 1
+        try:
+            resp = job.client.session.get(
+                DOWNLOAD_SD_JOB_URL,
+                params={"job_id": job.job_id, "is_first_time": 1},
+            )
+        except Exception as e:
+            logger.warning(f"[ShopeeLabelBatcher] download_sd_job {job.job_id} error: {e}")
+            return None
+        if resp.status_code == 200 and len(resp.content) > MIN_PDF_BYTES:
+            return resp.content
+        return None
+
+
+_batcher: Optional[ShopeeLabelBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_label_batcher() -> ShopeeLabelBatcher:
+    """Singleton ShopeeLabelBatcher dùng chung cho các request in trong process."""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = ShopeeLabelBatcher()
+    return _batcher
+
+
+# ========================= EXPORTS =========================
+
+__all__ = [
+    'ShopeeLabelBatcher',
+    'get_label_batcher',
+]
@@ -1,8 +1,7 @@
 # File: orders/services/shopee_print_service.py
 
-import json
-import time
 import logging
+import threading
 from io import BytesIO
 from typing import Any, Dict, List, Optional
 from pathlib import Path
@@ -17,7 +16,7 @@ from reportlab.lib import colors
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 
-from core.system_settings import get_shop_by_connection_id
+from core.system_settings import config_registry, get_shop_by_connection_id
 from core.shopee_client import ShopeeClient
 from core.sapo_client import get_sapo_client
 from orders.services.sapo_service import (
@@ -25,10 +24,14 @@ from orders.services.sapo_service import (
     SapoCoreOrderService,
 )
 from orders.services.dto import OrderDTO, RealItemDTO
+from orders.services.shopee_label_batcher import get_label_batcher
 
 # Logger
 logger = logging.getLogger(__name__)
 
+# Thời gian chờ thêm (ngoài job_timeout của batcher) cho 1 file vận đơn: linger + create_sd_jobs
+LABEL_WAIT_MARGIN_SECONDS = 30
+
 # =========================
 # DEBUG CONFIG
 # =========================
@@ -53,6 +56,20 @@ def debug(*args):
 CHANNELS_FILE = Path("settings") / "logs/dvvc_shopee.json"
 
 
+def _build_channels_map(raw: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
+    channels_map: Dict[int, Dict[str, Any]] = {}
+    for item in (raw or {}).get("data", []):
+        cid = item.get("channel_id")
+        if cid is not None:
+            try:
+                channels_map[int(cid)] = item
+            except Exception:
+                pass
+
+    debug("→ Loaded shipping channels:", len(channels_map))
+    return channels_map
+
+
 def _load_shipping_channels() -> Dict[int, Dict[str, Any]]:
     """
     Đọc file JSON chứa list kênh vận chuyển của Shopee:
@@ -64,30 +81,14 @@ def _load_shipping_channels() -> Dict[int, Dict[str, Any]]:
         ]
     }
     Trả về map: channel_id -> dict(channel_info)
+    File chỉ được parse lại khi mtime thay đổi (config_registry).
     """
-    if not CHANNELS_FILE.is_file():
-        debug("→ Không tìm thấy file kênh DVVC:", CHANNELS_FILE)
-        return {}
-
     try:
-        with CHANNELS_FILE.open("r", encoding="utf-8") as f:
-            raw = json.load(f)
+        return config_registry.get(CHANNELS_FILE, _build_channels_map)
     except Exception as e:
         debug("→ Lỗi đọc file kênh DVVC:", e)
         return {}
 
-    channels_map: Dict[int, Dict[str, Any]] = {}
-    for item in raw.get("data", []):
-        cid = item.get("channel_id")
-        if cid is not None:
-            try:
-                channels_map[int(cid)] = item
-            except Exception:
-                pass
-
-    debug("→ Loaded shipping channels:", len(channels_map))
-    return channels_map
-
 
 # ===================================================================
 # BUILD MVD PAGE
@@ -136,6 +137,7 @@ def _build_mvd_overlay_page(
     shopee_order_id: int | None = None,  # NEW: Shopee order ID
     seller_shop_id: int | None = None,  # NEW: Seller shop ID
     connection_id: int | None = None,  # NEW: Connection ID for MP order
+    include_static: bool = True,
 ):
     """
     Tạo trang MVD overlay – in mã đơn + shop lên trên label.
@@ -144,6 +146,8 @@ def _build_mvd_overlay_page(
         order_dto: OrderDTO with gifts already applied (optional, will fetch if not provided)
         current_package: Current package dict with package_number
         total_packages: Total number of packages (DON_TACH_FLAG)
+        include_static: Vẽ cả phần tĩnh (địa chỉ kho). False khi đã dùng background
+                        từ _get_label_background (cover + phần tĩnh render sẵn)
     """
     # DEBUG removed - chỉ giữ debug cho extract customer info
     
@@ -164,13 +168,8 @@ def _build_mvd_overlay_page(
 
     # Build MVD overlay
 
-    # Đăng ký font (lý tưởng là làm 1 lần global, nhưng tạm giữ như mày)
-    font_dir = os.path.join(settings.BASE_DIR, 'assets', 'font')
-    
-    pdfmetrics.registerFont(TTFont('UTM Avo', os.path.join(font_dir, 'UTM_Avo.ttf')))
-    pdfmetrics.registerFont(TTFont('UTM Avo Bold', os.path.join(font_dir, 'UTM_AvoBold.ttf')))
-    pdfmetrics.registerFont(TTFont('Arial', os.path.join(font_dir, 'arial.ttf')))
-    pdfmetrics.registerFont(TTFont('ArialI', os.path.join(font_dir, 'ariali.ttf')))
+    # Đăng ký font (1 lần / process)
+    _ensure_fonts()
 
     # Chỉ cần 1 buffer
     buf = BytesIO()
@@ -190,6 +189,7 @@ def _build_mvd_overlay_page(
         shopee_order_id=shopee_order_id,
         seller_shop_id=seller_shop_id,
         connection_id=connection_id,
+        include_static=include_static,
     )
 
     # Kết thúc vẽ
@@ -275,6 +275,7 @@ def _render_mvd_overlay(
     shopee_order_id: int | None = None,
     seller_shop_id: int | None = None,
     connection_id: int | None = None,
+    include_static: bool = True,
 ):
     # Render MVD overlay
 
@@ -296,7 +297,7 @@ def _render_mvd_overlay(
 
     config = {
         "spx": {
-            "y_start_1": 168, "kho_11":-35,"kho_12":255,"kho_21":-35,"kho_22":245,"kho_31":-35,"kho_32":213,
+            "y_start_1": 168,
             "deadline1": 87, "deadline2": 212, "total_11":-25, "total_12": 23, "total_21": 0, "total_22": 23
         },
         "jnt": {
@@ -308,7 +309,7 @@ def _render_mvd_overlay(
             "deadline1": -5, "deadline2": 50, "total_11":-25, "total_12": 15, "total_21": 0, "total_22": 15
         },
         "ghn": {
-            "y_start_1": 185, "kho_11":-35,"kho_12":265,"kho_21":-35,"kho_22":255,"kho_31":-35,"kho_32":231,
+            "y_start_1": 185,
             "deadline1": 87, "deadline2": 230,"total_11":-25, "total_12": 15, "total_21": 0, "total_22": 15
         },
         "hoatoc": {
@@ -438,18 +439,8 @@ def _render_mvd_overlay(
         c.setFont('UTM Avo Bold', 8)
         c.drawString(-32, y_value, "** ĐƠN DÀI - QUÉT SAPO để xem thêm.")
         y_value -= 10
-    if sc in ["spx","ghn"]:
-        c.setFont('Arial', 8)
-        if order.location_id == 241737:
-            c.drawString(config[sc]["kho_11"], config[sc]["kho_12"], f"C21-02 KĐ Geleximco")
-            c.drawString(config[sc]["kho_21"], config[sc]["kho_22"], f"Hà Đông, Hà Nội")
-            c.setFont('UTM Avo Bold', 10)
-            c.drawString(config[sc]["kho_31"], config[sc]["kho_32"], f"KHO HÀ NỘI: GELE")
-        else:
-            c.drawString(config[sc]["kho_11"], config[sc]["kho_12"], f"B76a Tô Ký, Q.12")
-            c.drawString(config[sc]["kho_21"], config[sc]["kho_22"], f"Thành phố Hồ Chí Minh")
-            c.setFont('UTM Avo Bold', 10)
-            c.drawString(config[sc]["kho_31"], config[sc]["kho_32"], f"KHO SÀI GÒN: TOKY")
+    if include_static:
+        _render_static_overlay(c, sc, order.location_id)
 
     if sc not in ["hoatoc","khac"]:
         SHIP_CONTENT = f"KPI: {order.ship_deadline_fast_str}"
@@ -479,6 +470,36 @@ def _render_mvd_overlay(
     return c
 
 
+# Vị trí block địa chỉ kho (phần tĩnh của overlay) theo loại DVVC
+STATIC_OVERLAY_CONFIG = {
+    "spx": {"kho_11": -35, "kho_12": 255, "kho_21": -35, "kho_22": 245, "kho_31": -35, "kho_32": 213},
+    "ghn": {"kho_11": -35, "kho_12": 265, "kho_21": -35, "kho_22": 255, "kho_31": -35, "kho_32": 231},
+}
+
+GELEXIMCO_LOCATION_ID = 241737
+
+
+def _render_static_overlay(c, sc: str, location_id: int | None):
+    """
+    Vẽ phần tĩnh của overlay (chỉ phụ thuộc DVVC + kho, không phụ thuộc đơn):
+    block địa chỉ kho cho SPX / GHN.
+    """
+    cfg = STATIC_OVERLAY_CONFIG.get(sc)
+    if not cfg:
+        return
+    c.setFont('Arial', 8)
+    if location_id == GELEXIMCO_LOCATION_ID:
+        c.drawString(cfg["kho_11"], cfg["kho_12"], f"C21-02 KĐ Geleximco")
+        c.drawString(cfg["kho_21"], cfg["kho_22"], f"Hà Đông, Hà Nội")
+        c.setFont('UTM Avo Bold', 10)
+        c.drawString(cfg["kho_31"], cfg["kho_32"], f"KHO HÀ NỘI: GELE")
+    else:
+        c.drawString(cfg["kho_11"], cfg["kho_12"], f"B76a Tô Ký, Q.12")
+        c.drawString(cfg["kho_21"], cfg["kho_22"], f"Thành phố Hồ Chí Minh")
+        c.setFont('UTM Avo Bold', 10)
+        c.drawString(cfg["kho_31"], cfg["kho_32"], f"KHO SÀI GÒN: TOKY")
+
+
 # ===================================================================
 # HELPER FUNCTIONS FOR SPLIT ORDERS
 # ===================================================================
@@ -786,6 +807,157 @@ def _resolve_cover_path(shop_name: str, shipping_carrier: str) -> Path:
     return path
 
 
+# ===================================================================
+# CACHE: FONT / COVER / OVERLAY TEMPLATE (per-process)
+# ===================================================================
+
+_fonts_registered = False
+_render_cache_lock = threading.Lock()
+# (str(cover_path), mtime, carrier_type, location_key) -> PageObject (cover + phần tĩnh, Form XObject)
+_template_cache: Dict[tuple, Any] = {}
+
+
+def _ensure_fonts():
+    """Đăng ký font reportlab 1 lần / process (TTFont parse file .ttf khá nặng)."""
+    global _fonts_registered
+    if _fonts_registered:
+        return
+    with _render_cache_lock:
+        if _fonts_registered:
+            return
+        font_dir = os.path.join(settings.BASE_DIR, 'assets', 'font')
+        pdfmetrics.registerFont(TTFont('UTM Avo', os.path.join(font_dir, 'UTM_Avo.ttf')))
+        pdfmetrics.registerFont(TTFont('UTM Avo Bold', os.path.join(font_dir, 'UTM_AvoBold.ttf')))
+        pdfmetrics.registerFont(TTFont('Arial', os.path.join(font_dir, 'arial.ttf')))
+        pdfmetrics.registerFont(TTFont('ArialI', os.path.join(font_dir, 'ariali.ttf')))
+        _fonts_registered = True
+
+
+def _resolve_pdf_objects(obj, seen: set):
+    """
+    Resolve toàn bộ indirect objects của 1 page khi load vào cache, để các thread
+    merge_page sau đó không đọc lại stream của reader cùng lúc.
+    """
+    if isinstance(obj, PyPDF2.generic.IndirectObject):
+        key = (obj.idnum, obj.generation)
+        if key in seen:
+            return
+        seen.add(key)
+        obj = obj.get_object()
+    if isinstance(obj, dict):
+        for value in obj.values():
+            _resolve_pdf_objects(value, seen)
+    elif isinstance(obj, list):
+        for value in obj:
+            _resolve_pdf_objects(value, seen)
+
+
+def _load_single_page(pdf_bytes: bytes):
+    reader = PyPDF2.PdfReader(BytesIO(pdf_bytes), strict=False)
+    page = reader.pages[0]
+    _resolve_pdf_objects(page, set())
+    return page
+
+
+def _wrap_page_as_form(page):
+    """
+    Đóng gói nội dung 1 page thành Form XObject, trả về page mới chỉ gồm lệnh vẽ XObject đó.
+
+    merge_page() parse lại toàn bộ content stream của page được merge mỗi lần gọi;
+    cover là hình vector nặng nên mỗi label tốn hàng trăm ms. Page dạng "q /GdpBg Do Q"
+    gần như không tốn chi phí parse, nội dung cover chỉ được tham chiếu.
+    """
+    from PyPDF2.generic import (
+        ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject,
+    )
+
+    writer = PyPDF2.PdfWriter()
+    writer.add_page(page)
+    new_page = writer.pages[0]
+    box = new_page.mediabox
+
+    form = DecodedStreamObject()
+    form.set_data(new_page.get_contents().get_data())
+    form.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Form"),
+        NameObject("/BBox"): ArrayObject([FloatObject(v) for v in (box.left, box.bottom, box.right, box.top)]),
+        NameObject("/Resources"): new_page.raw_get("/Resources") if "/Resources" in new_page else DictionaryObject(),
+    })
+
+    content = DecodedStreamObject()
+    content.set_data(b"q /GdpBg Do Q")
+
+    new_page[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/XObject"): DictionaryObject({NameObject("/GdpBg"): writer._add_object(form)}),
+    })
+    new_page[NameObject("/Contents")] = writer._add_object(content)
+
+    out = BytesIO()
+    writer.write(out)
+    return _load_single_page(out.getvalue())
+
+
+def _get_label_background(cover_path: Path, shipping_carrier_name: str, location_id: int | None):
+    """
+    Template tĩnh của label: cover + phần tĩnh overlay (địa chỉ kho) render sẵn thành 1 trang
+    (Form XObject). Cache theo (cover = shop + DVVC, mtime của file cover, loại DVVC, kho),
+    sửa file cover thì tự build lại. Mỗi label chỉ còn stamp phần theo đơn.
+
+    Returns:
+        PageObject hoặc None (không có cover và không có phần tĩnh)
+    """
+    sc = detect_carrier_type(shipping_carrier_name)
+    has_static = sc in STATIC_OVERLAY_CONFIG
+
+    try:
+        mtime = cover_path.stat().st_mtime
+    except OSError:
+        mtime = None
+    if mtime is None and not has_static:
+        return None
+
+    location_key = GELEXIMCO_LOCATION_ID if location_id == GELEXIMCO_LOCATION_ID else None
+    key = (str(cover_path), mtime, sc if has_static else None, location_key if has_static else None)
+    cached = _template_cache.get(key)
+    if cached is not None:
+        return cached
+
+    base_page = None
+    if mtime is not None:
+        try:
+            base_page = PyPDF2.PdfReader(BytesIO(cover_path.read_bytes()), strict=False).pages[0]
+        except Exception as e:
+            logger.warning(f"[ShopeePrintService] Cannot read cover {cover_path}: {e}")
+
+    if has_static:
+        _ensure_fonts()
+        buf = BytesIO()
+        c = canvas.Canvas(buf)
+        c.setPageSize((4.1 * inch, 5.8 * inch))
+        c.translate(inch, inch)
+        _render_static_overlay(c, sc, location_id)
+        c.showPage()
+        c.save()
+
+        static_page = PyPDF2.PdfReader(BytesIO(buf.getvalue())).pages[0]
+        if base_page is not None:
+            base_page.merge_page(static_page)
+        else:
+            base_page = static_page
+
+    if base_page is None:
+        return None
+    template = _wrap_page_as_form(base_page)
+
+    with _render_cache_lock:
+        # File cover đã đổi -> bỏ các template dựng từ bản cũ
+        for old_key in [k for k in _template_cache if k[0] == key[0] and k[1] != mtime]:
+            _template_cache.pop(old_key, None)
+        _template_cache[key] = template
+    return template
+
+
 # ===================================================================
 # MAIN SERVICE: GENERATE LABEL PDF
 # ===================================================================
@@ -801,7 +973,7 @@ def generate_label_pdf_for_channel_order(
     - Dò order_id từ channel_order_number qua /get_order_list_search_bar_hint
     - Gọi /get_package để lấy danh sách package + fulfillment_channel_id
     - Map fulfillment_channel_id -> tên DVVC từ file kênh
-    - Gọi /logistics/create_sd_jobs + /download_sd_job để lấy file PDF vận đơn
+    - Gọi /logistics/create_sd_jobs + /download_sd_job (qua ShopeeLabelBatcher) để lấy file PDF vận đơn
     - Đắp cover + MVD custom (overlay) lên
     - Trả về bytes PDF cuối cùng
     
@@ -865,15 +1037,19 @@ def generate_label_pdf_for_channel_order(
     # ----------------------------------------------------------
     # COVER + MVD
     # ----------------------------------------------------------
-    cover_path = _resolve_cover_path(shop_name, resolved_carrier or "")
-    cover_page = None
+    # Lấy DTO 1 lần cho cả đơn (overlay của từng package + chọn background theo kho)
+    if order_dto is None:
+        order_dto = SapoCoreOrderService().get_order_dto_from_shopee_sn(channel_order_number)
+        if order_dto is None:
+            raise RuntimeError(f"get_order_dto_from_shopee_sn returned None for {channel_order_number}")
 
-    if cover_path.exists():
-        try:
-            cover_reader = PyPDF2.PdfReader(str(cover_path))
-            cover_page = cover_reader.pages[0]
-        except Exception as e:
-            pass
+    # Cover + phần tĩnh của overlay lấy từ cache (parse / render 1 lần / process)
+    cover_path = _resolve_cover_path(shop_name, resolved_carrier or "")
+    background_page = _get_label_background(
+        cover_path,
+        resolved_carrier or "",
+        order_dto.location_id,
+    )
 
     # ----------------------------------------------------------
     # 5. LOOP PACKAGE → GET LABEL → MERGE
@@ -881,70 +1057,35 @@ def generate_label_pdf_for_channel_order(
     final_writer = PyPDF2.PdfWriter()
     DON_TACH_FLAG = len(package_list)  # Số kiện hàng của đơn hàng
 
-    for pack in package_list:
-        package_number = pack["package_number"]
-
-        create_job_url = "https://banhang.shopee.vn/api/v3/logistics/create_sd_jobs"
-
-        json_body: Dict[str, Any] = {
-            "group_list": [
-                {
-                    "primary_package_number": package_number,
-                    "group_shipment_id": 0,
-                    "package_list": [
-                        {"order_id": SHOPEE_ID, "package_number": package_number}
-                    ],
-                }
-            ],
-            "region_id": "VN",
-            "shop_id": seller_shop_id,
-            # cái này là "schema in" trên Shopee cho thermal PDF
-            "channel_id": 50021,
-            "record_generate_schema": False,
-            "generate_file_details": [
-                {
-                    "file_type": "THERMAL_PDF",
-                    "file_name": "Phiếu gửi hàng",
-                    "file_contents": [3],
-                }
-            ],
-        }
-
-        resp = client.session.post(create_job_url, json=json_body)
-        resp.raise_for_status()
-        
-        job_data = resp.json()
-        try:
-            # Kiểm tra cấu trúc response
-            if "data" not in job_data:
-                raise RuntimeError(f"Response không có 'data': {job_data}")
-            
-            data = job_data["data"]
-            if "list" not in data or not data["list"]:
-                raise RuntimeError(f"Response 'data.list' rỗng: {job_data}")
-            
-            job_id = data["list"][0]["job_id"]
-            if not job_id:
-                raise RuntimeError(f"job_id rỗng trong response: {job_data}")
-        except (KeyError, IndexError, TypeError) as e:
-            raise RuntimeError(f"Không lấy được job_id từ response: {e}. Response: {job_data}")
-
-        # Download job
-        dl_url = (
-            "https://banhang.shopee.vn/api/v3/logistics/download_sd_job"
-            f"?job_id={job_id}&is_first_time=1"
-        )
+    # Gửi tất cả packages vào batcher (create_sd_jobs gom chung với các đơn đang in khác),
+    # dựng overlay MVD trong lúc chờ download
+    label_batcher = get_label_batcher()
+    label_futures = label_batcher.submit(
+        client,
+        seller_shop_id=seller_shop_id,
+        shopee_order_id=SHOPEE_ID,
+        package_numbers=[pack["package_number"] for pack in package_list],
+    )
 
-        pdf_bytes = None
-        for i in range(10):
-            dl_resp = client.session.get(dl_url)
-            if dl_resp.status_code == 200 and len(dl_resp.content) > 1000:
-                pdf_bytes = dl_resp.content
-                break
-            time.sleep(2)
+    mvd_pages = []
+    for pack in package_list:
+        # Build MVD overlay cho từng package (mỗi package có overlay riêng với parcel_no)
+        mvd_pages.append(_build_mvd_overlay_page(
+            channel_order_number, 
+            resolved_carrier,
+            order_dto=order_dto,  # Pass OrderDTO với gifts
+            current_package=pack,  # Pass package hiện tại
+            total_packages=DON_TACH_FLAG,  # Pass tổng số package
+            client=client,  # Pass ShopeeClient
+            shopee_order_id=SHOPEE_ID,  # Pass Shopee order ID
+            seller_shop_id=seller_shop_id,  # Pass seller shop ID
+            connection_id=connection_id,  # Pass connection ID
+            include_static=False,  # Địa chỉ kho đã có trong background_page
+        ))
 
-        if not pdf_bytes:
-            raise RuntimeError("Download SD job thất bại.")
+    for pack, label_future, mvd_page in zip(package_list, label_futures, mvd_pages):
+        # Batcher tự fail job sau job_timeout; margin cho linger + create_sd_jobs
+        pdf_bytes = label_future.result(timeout=label_batcher.job_timeout + LABEL_WAIT_MARGIN_SECONDS)
 
         # Extract customer info from PDF and update customer
         try:
@@ -974,27 +1115,13 @@ def generate_label_pdf_for_channel_order(
         except Exception as e:
             logger.warning(f"Failed to update customer from PDF: {e}")
 
-        # Build MVD overlay cho package hiện tại (mỗi package có overlay riêng với parcel_no)
-        mvd_page = _build_mvd_overlay_page(
-            channel_order_number, 
-            resolved_carrier,
-            order_dto=order_dto,  # Pass OrderDTO với gifts
-            current_package=pack,  # Pass package hiện tại
-            total_packages=DON_TACH_FLAG,  # Pass tổng số package
-            client=client,  # Pass ShopeeClient
-            shopee_order_id=SHOPEE_ID,  # Pass Shopee order ID
-            seller_shop_id=seller_shop_id,  # Pass seller shop ID
-            connection_id=connection_id,  # Pass connection ID
-        )
-        # MVD overlay built
-
         # Merge cover + MVD
         base_reader = PyPDF2.PdfReader(BytesIO(pdf_bytes), strict=False)
         for page in base_reader.pages:
             merged = page
 
-            if cover_page:
-                merged.merge_page(cover_page)
+            if background_page:
+                merged.merge_page(background_page)
 
             merged.merge_page(mvd_page)
 
@@ -0,0 +1,212 @@
+# orders/services/variant_resolver.py
+"""
+VariantResolver - lấy thông tin variant (product_id, sku, barcode, opt1) cho
+OrderDTOFactory._build_real_items theo 3 tầng:
+
+1. LRU in-process (có TTL)
+2. SapoVariantCache (database, fill bởi ProductSyncService)
+3. Sapo API get_variant_raw (cuối cùng, write-through lại row SapoVariantCache đã có)
+
+prefetch(variant_ids) resolve cả page trong 1 query DB trước khi build DTO.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 5000
+DEFAULT_TTL_SECONDS = 600  # 10 minutes
+
+
+def _variant_info(variant: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "product_id": variant.get("product_id"),
+        "sku": variant.get("sku", ""),
+        "barcode": variant.get("barcode"),
+        "opt1": variant.get("opt1"),
+    }
+
+
+def _bump_thread_counter(name: str):
+    """Tăng counter trên thread hiện tại nếu caller đã khởi tạo (vd: shopee_orders)."""
+    current = threading.current_thread()
+    if hasattr(current, name):
+        setattr(current, name, getattr(current, name) + 1)
+
+
+class VariantResolver:
+    """
+    Resolver thông tin variant dùng chung trong process (thread-safe).
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, ttl_seconds: int = DEFAULT_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._lru: "OrderedDict[int, tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"lru_hits": 0, "db_hits": 0, "api_calls": 0, "api_errors": 0}
+
+    # ==================== PUBLIC API ====================
+
+    def resolve(self, variant_id: int, sapo_client: Optional[Any] = None) -> Dict[str, Any]:
+        """
+        Lấy variant info. Fallback về {} nếu không có ở đâu.
+
+        Returns:
+            Dict với keys: product_id, sku, barcode, opt1
+        """
+        info = self._lru_get(variant_id)
+        if info is not None:
+            self._count("lru_hits")
+            _bump_thread_counter("variant_cache_hit_counter")
+            return info
+
+        info = self._load_from_db([variant_id]).get(variant_id)
+        if info is not None:
+            self._count("db_hits")
+            _bump_thread_counter("variant_cache_hit_counter")
+            self._lru_set(variant_id, info)
+            return info
+
+        return self._fetch_from_api(variant_id, sapo_client)
+
+    def prefetch(self, variant_ids: Iterable[int], sapo_client: Optional[Any] = None) -> Dict[int, Dict[str, Any]]:
+        """
+        Resolve nhiều variants cùng lúc: LRU -> 1 query SapoVariantCache -> API cho phần còn thiếu.
+
+        Returns:
+            Dict {variant_id: variant_info}
+        """
+        result: Dict[int, Dict[str, Any]] = {}
+        missing = []
+        for variant_id in set(v for v in variant_ids if v):
+            info = self._lru_get(variant_id)
+            if info is not None:
+                result[variant_id] = info
+            else:
+                missing.append(variant_id)
+
+        if missing:
+            db_infos = self._load_from_db(missing)
+            for variant_id, info in db_infos.items():
+                self._lru_set(variant_id, info)
+                result[variant_id] = info
+            self._count("db_hits", len(db_infos))
+
+            for variant_id in missing:
+                if variant_id not in result:
+                    result[variant_id] = self._fetch_from_api(variant_id, sapo_client)
+
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+
+    # ==================== PRIVATE HELPERS ====================
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _lru_get(self, variant_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._lru.get(variant_id)
+            if entry is None:
+                return None
+            expires_at, info = entry
+            if expires_at < time.monotonic():
+                del self._lru[variant_id]
+                return None
+            self._lru.move_to_end(variant_id)
+            return info
+
+    def _lru_set(self, variant_id: int, info: Dict[str, Any]):
+        with self._lock:
+            self._lru[variant_id] = (time.monotonic() + self.ttl_seconds, info)
+            self._lru.move_to_end(variant_id)
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+
+    def _load_from_db(self, variant_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        try:
+            from products.models import SapoVariantCache
+            rows = SapoVariantCache.objects.filter(variant_id__in=list(variant_ids)).values_list("variant_id", "data")
+            return {variant_id: _variant_info(data or {}) for variant_id, data in rows}
+        except Exception as e:
+            logger.warning(f"[VariantResolver] Failed to load variants from SapoVariantCache: {e}")
+            return {}
+
+    def _fetch_from_api(self, variant_id: int, sapo_client: Optional[Any]) -> Dict[str, Any]:
+        if not sapo_client:
+            return {}
+
+        try:
+            # get_variant_raw tự tăng thread.variant_api_counter
+            logger.debug(f"[VariantResolver] Fetching variant {variant_id} from API...")
+            variant = sapo_client.core.get_variant_raw(variant_id).get("variant", {})
+            self._count("api_calls")
+        except Exception as e:
+            self._count("api_errors")
+            logger.warning(f"Failed to fetch variant {variant_id}: {e}")
+            return {}
+
+        info = _variant_info(variant)
+        self._lru_set(variant_id, info)
+        self._write_through(variant_id, variant)
+        return info
+
+    def _write_through(self, variant_id: int, variant: Dict[str, Any]):
+        """
+        Cập nhật variant vừa fetch vào SapoVariantCache để process khác dùng lại.
+
+        Chỉ update row đã có: variant JSON đơn lẻ không có description/brand của product nên
+        không materialize được brand_id, gdp_metadata -> giữ nguyên giá trị cũ, tạo row mới
+        để ProductSyncService làm (đủ cột). payload_hash reset để lần sync sau ghi lại đầy đủ.
+        """
+        if not variant or not variant.get("product_id"):
+            return
+        try:
+            from django.utils import timezone
+            from products.models import SapoVariantCache
+            from products.services.product_sync_service import materialize_product_fields
+
+            _, variant_fields = materialize_product_fields({"variants": [variant]})
+            fields = variant_fields.get(variant_id) or {}
+            fields.pop("brand_id", None)
+            fields.pop("gdp_metadata", None)
+            SapoVariantCache.objects.filter(variant_id=variant_id).update(
+                product_id=variant["product_id"],
+                data=variant,
+                payload_hash="",
+                synced_at=timezone.now(),
+                **fields,
+            )
+        except Exception as e:
+            logger.debug(f"[VariantResolver] Write-through variant {variant_id} failed: {e}")
+
+
+_resolver: Optional[VariantResolver] = None
+_resolver_lock = threading.Lock()
+
+
+def get_variant_resolver() -> VariantResolver:
+    """Singleton VariantResolver cho cả process."""
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                _resolver = VariantResolver()
+    return _resolver
+
+
+# ========================= EXPORTS =========================
+
+__all__ = [
+    'VariantResolver',
+    'get_variant_resolver',
+]
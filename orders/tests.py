@@ -0,0 +1,221 @@
+"""
+Tests cho orders app.
+"""
+
+import threading
+
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from orders.services.order_builder import OrderDTOFactory
+from orders.services.order_fast_parser import extract_real_items, iter_real_items
+from orders.services.shopee_label_batcher import ShopeeLabelBatcher
+from orders.services.variant_resolver import VariantResolver
+from products.models import SapoVariantCache
+
+
+class _FakeResponse:
+    def __init__(self, status_code=200, payload=None, content=b""):
+        self.status_code = status_code
+        self._payload = payload
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+class _FakeShopeeSession:
+    """create_sd_jobs trả job theo thứ tự đảo ngược; download trả PDF chứa job_id."""
+
+    def __init__(self, ready=True, drop_jobs=0, with_package_numbers=True):
+        self.ready = ready
+        self.drop_jobs = drop_jobs
+        self.with_package_numbers = with_package_numbers
+        self.create_bodies = []
+        self._lock = threading.Lock()
+
+    def post(self, url, json=None):
+        with self._lock:
+            self.create_bodies.append(json)
+        entries = []
+        for group in reversed(json["group_list"]):
+            entry = {"job_id": f"job-{group['primary_package_number']}"}
+            if self.with_package_numbers:
+                entry["primary_package_number"] = group["primary_package_number"]
+            entries.append(entry)
+        entries = entries[self.drop_jobs:]
+        return _FakeResponse(payload={"data": {"list": entries}})
+
+    def get(self, url, params=None):
+        if not self.ready:
+            return _FakeResponse(content=b"pending")
+        return _FakeResponse(content=f"%PDF {params['job_id']} ".encode() + b"x" * 2000)
+
+
+class _FakeShopeeClient:
+    def __init__(self, session):
+        self.session = session
+
+
+class ShopeeLabelBatcherTest(SimpleTestCase):
+    def _batcher(self, **kwargs):
+        kwargs.setdefault("linger_seconds", 0.05)
+        return ShopeeLabelBatcher(**kwargs)
+
+    def test_packages_of_several_orders_share_one_create_call(self):
+        session = _FakeShopeeSession()
+        client = _FakeShopeeClient(session)
+        batcher = self._batcher()
+
+        futures_a = batcher.submit(client, seller_shop_id=1, shopee_order_id=100, package_numbers=["PA1", "PA2"])
+        futures_b = batcher.submit(client, seller_shop_id=1, shopee_order_id=200, package_numbers=["PB1"])
+
+        results = [future.result(timeout=5) for future in futures_a + futures_b]
+        self.assertEqual(len(session.create_bodies), 1)
+        self.assertEqual(len(session.create_bodies[0]["group_list"]), 3)
+        # Response đảo thứ tự nhưng mỗi package vẫn nhận đúng file của mình
+        for package_number, pdf_bytes in zip(["PA1", "PA2", "PB1"], results):
+            self.assertIn(f"job-{package_number} ".encode(), pdf_bytes)
+        self.assertEqual(batcher.stats["create_calls"], 1)
+        self.assertEqual(batcher.stats["packages"], 3)
+
+    def test_missing_job_fails_only_its_package(self):
+        session = _FakeShopeeSession(drop_jobs=1)
+        client = _FakeShopeeClient(session)
+        batcher = self._batcher()
+
+        # Response đảo thứ tự rồi bỏ entry đầu -> thiếu job của P3
+        futures = batcher.submit(client, seller_shop_id=1, shopee_order_id=100, package_numbers=["P1", "P2", "P3"])
+        self.assertIn(b"job-P1 ", futures[0].result(timeout=5))
+        self.assertIn(b"job-P2 ", futures[1].result(timeout=5))
+        with self.assertRaisesMessage(RuntimeError, "P3"):
+            futures[2].result(timeout=5)
+        # Chỉ P3 được tạo lại riêng
+        self.assertEqual([len(body["group_list"]) for body in session.create_bodies], [3, 1])
+
+    def test_unnamed_job_entries_are_retried_per_package(self):
+        session = _FakeShopeeSession(with_package_numbers=False)
+        client = _FakeShopeeClient(session)
+        batcher = self._batcher()
+
+        futures = batcher.submit(client, seller_shop_id=1, shopee_order_id=100, package_numbers=["P1", "P2"])
+        self.assertIn(b"job-P1 ", futures[0].result(timeout=5))
+        self.assertIn(b"job-P2 ", futures[1].result(timeout=5))
+        self.assertEqual(sorted(len(body["group_list"]) for body in session.create_bodies), [1, 1, 2])
+
+    def test_download_timeout(self):
+        client = _FakeShopeeClient(_FakeShopeeSession(ready=False))
+        batcher = self._batcher(job_timeout=0.2)
+
+        futures = batcher.submit(client, seller_shop_id=1, shopee_order_id=100, package_numbers=["P1"])
+        with self.assertRaisesMessage(RuntimeError, "Download SD job thất bại."):
+            futures[0].result(timeout=5)
+        self.assertGreaterEqual(batcher.stats["download_calls"], 1)
+
+
+class VariantResolverWriteThroughTest(TestCase):
+    def _client(self, variant):
+        client = mock.Mock()
+        client.core.get_variant_raw.return_value = {"variant": variant}
+        return client
+
+    def test_api_fetch_updates_existing_row_and_keeps_product_level_fields(self):
+        SapoVariantCache.objects.create(
+            variant_id=11, product_id=1, data={"id": 11, "sku": "OLD"},
+            payload_hash="abc", sku="OLD", brand_id=7, gdp_metadata={"id": 11, "box_info": {}},
+        )
+        variant = {"id": 11, "product_id": 1, "sku": "NEW", "barcode": "893", "status": "active", "packsize": True}
+
+        info = VariantResolver()._fetch_from_api(11, self._client(variant))
+
+        self.assertEqual(info["sku"], "NEW")
+        row = SapoVariantCache.objects.get(variant_id=11)
+        self.assertEqual((row.sku, row.barcode, row.status, row.packsize), ("NEW", "893", "active", True))
+        self.assertEqual(row.brand_id, 7)
+        self.assertEqual(row.gdp_metadata, {"id": 11, "box_info": {}})
+        self.assertEqual(row.payload_hash, "")
+
+    def test_api_fetch_does_not_create_partial_row(self):
+        variant = {"id": 12, "product_id": 1, "sku": "A-12"}
+
+        info = VariantResolver()._fetch_from_api(12, self._client(variant))
+
+        self.assertEqual(info["sku"], "A-12")
+        self.assertFalse(SapoVariantCache.objects.filter(variant_id=12).exists())
+
+
+def _line(line_id, variant_id, quantity, line_amount=0, product_type="normal", **extra):
+    return {
+        "id": line_id, "product_id": variant_id and variant_id * 10, "variant_id": variant_id,
+        "product_name": "Sản phẩm/Mẫu", "sku": f"{variant_id}-A", "price": line_amount,
+        "quantity": quantity, "line_amount": line_amount, "product_type": product_type, **extra,
+    }
+
+
+_FIXTURE_ORDERS = [
+    {
+        "id": 1, "tenant_id": 1, "location_id": 241737, "code": "SON1",
+        "order_line_items": [
+            _line(11, 101, 2, 200000),
+            # Packsize 6 cái -> qui về variant gốc 101, gộp với line lẻ
+            _line(12, 102, 3, 540000, is_packsize=True, pack_size_quantity=6, pack_size_root_id=101),
+            # Phí vận chuyển: không có product / variant
+            {"id": 13, "product_id": None, "variant_id": None, "price": 30000, "quantity": 1, "line_amount": 30000},
+        ],
+    },
+    {
+        "id": 2, "tenant_id": 1, "location_id": 548744, "code": "SON2",
+        "order_line_items": [
+            _line(21, 201, 1, 300000, product_type="composite", composite_item_domains=[
+                {"variant_id": 301, "quantity": 2},
+                {"variant_id": 302, "quantity": "1"},
+                {"variant_id": 303, "quantity": 0},
+            ]),
+            _line(22, 301, 4, 80000),
+            # Packsize thiếu pack_size_root_id -> bỏ qua
+            _line(23, 104, 1, 50000, is_packsize=True, pack_size_quantity=2),
+        ],
+    },
+]
+
+
+class OrderFastParserTest(SimpleTestCase):
+    """extract_real_items phải qui đổi giống OrderDTOFactory._build_real_items."""
+
+    def setUp(self):
+        patcher = mock.patch("orders.services.order_builder.get_variant_resolver")
+        patcher.start().return_value.resolve.return_value = {}
+        self.addCleanup(patcher.stop)
+
+    def test_matches_order_dto_real_items(self):
+        factory = OrderDTOFactory()
+        for payload in _FIXTURE_ORDERS:
+            order = factory.from_sapo_json({"order": payload})
+            expected = {item.variant_id: int(item.quantity) for item in order.real_items}
+            real_items = extract_real_items({"order": payload})
+
+            self.assertEqual({variant_id: qty for variant_id, qty, _ in real_items}, expected)
+            # amount = tổng line_amount của line sản phẩm có variant_id nằm trong real_items
+            for variant_id, _, amount in real_items:
+                self.assertEqual(amount, sum(
+                    line.line_amount for line in order.order_line_items
+                    if line.variant_id == variant_id and line.product_id
+                ))
+
+        self.assertEqual(extract_real_items(_FIXTURE_ORDERS[0]), [(101, 20, 200000.0)])
+        self.assertEqual(
+            sorted(extract_real_items(_FIXTURE_ORDERS[1])),
+            [(301, 6, 80000.0), (302, 1, 0.0)],
+        )
+
+    def test_iter_real_items_skips_broken_orders(self):
+        broken = {"id": 3, "order_line_items": ["not-a-line"]}
+
+        results = list(iter_real_items([_FIXTURE_ORDERS[0], broken, _FIXTURE_ORDERS[1]]))
+
+        self.assertEqual([order["id"] for order, _ in results], [1, 2])
+        self.assertEqual(results[0][1], extract_real_items(_FIXTURE_ORDERS[0]))
@@ -0,0 +1,165 @@
+# products/jobs.py
+"""
+Background jobs của app products (chạy bởi `python manage.py run_workers`).
+
+Các view tương ứng chỉ enqueue job và trả về 202 + job_id; kết quả (cùng format JSON
+view trả về trước đây) nằm trong BackgroundJob.result.
+"""
+
+from typing import Any, Dict
+import logging
+
+from core.sapo_client import get_sapo_client
+from core.services.job_queue import JobContext, task
+
+logger = logging.getLogger(__name__)
+
+
+@task("products.refresh_sales_forecast", priority=5)
+def refresh_sales_forecast(ctx: JobContext) -> Dict[str, Any]:
+    """Tính lại dự báo bán hàng 30 ngày và 10 ngày (force_refresh)."""
+    from products.services.sales_forecast_service import SalesForecastService
+
+    forecast_service = SalesForecastService(get_sapo_client())
+    logger.info("[refresh_sales_forecast] Refreshing forecast for 30 days and 10 days")
+
+    try:
+        ctx.set_progress(percent=10, message="Đang tính dự báo 30 ngày...")
+        forecast_map_30, _, _ = forecast_service.calculate_sales_forecast(days=30, force_refresh=True)
+        ctx.check_cancelled()
+
+        ctx.set_progress(percent=55, message="Đang tính dự báo 10 ngày...")
+        forecast_map_10, _, _ = forecast_service.calculate_sales_forecast(days=10, force_refresh=True)
+    except Exception as e:
+        error_msg = str(e)
+        # Xử lý lỗi Bad Gateway hoặc JSON parsing
+        if "Bad Gateway" in error_msg or "502" in error_msg:
+            error_msg = "Lỗi kết nối tới Sapo (Bad Gateway). Vui lòng thử lại sau vài giây."
+        elif "JSON" in error_msg or "json" in error_msg.lower() or "Unexpected token" in error_msg:
+            error_msg = "Lỗi xử lý dữ liệu từ Sapo. Vui lòng thử lại."
+        logger.error(f"Error in refresh_sales_forecast: {e}", exc_info=True)
+        raise RuntimeError(error_msg) from e
+
+    return {
+        "status": "success",
+        "message": f"Đã tính toán lại dự báo cho {len(forecast_map_30)} variants (30 ngày) và {len(forecast_map_10)} variants (10 ngày)",
+        "count_30": len(forecast_map_30),
+        "count_10": len(forecast_map_10),
+    }
+
+
+@task("products.resync_container_template_stats", priority=5)
+def resync_container_template_stats(ctx: JobContext, template_id: int) -> Dict[str, Any]:
+    """Tính lại avg_total_amount và avg_import_cycle_days của container template từ các SPO completed."""
+    from products.services.container_template_service import ContainerTemplateService
+
+    template_service = ContainerTemplateService(get_sapo_client())
+    result = template_service.resync_template_stats(template_id)
+
+    if result['status'] == 'success':
+        return {
+            "status": "success",
+            "message": result['message'],
+            "avg_total_amount": result['avg_total_amount'],
+            "avg_import_cycle_days": result['avg_import_cycle_days'],
+            "spo_count": result['spo_count'],
+        }
+    return {
+        "status": "warning",
+        "message": result['message'],
+        "spo_count": result['spo_count'],
+    }
+
+
+@task("products.init_all_products_metadata")
+def init_all_products_metadata(ctx: JobContext, test_mode: bool = False) -> Dict[str, Any]:
+    """
+    Init metadata cho sản phẩm active.
+
+    Args:
+        test_mode: True: init tất cả sản phẩm (kể cả đã có metadata); False: chỉ sản phẩm chưa có
+    """
+    from products.services.metadata_helper import init_empty_metadata
+    from products.services.sapo_product_service import SapoProductService
+
+    product_service = SapoProductService(get_sapo_client())
+
+    # Lấy tất cả products (active)
+    all_products = []
+    page = 1
+    limit = 250
+    max_pages = 100  # Giới hạn để tránh quá tải
+
+    while page <= max_pages:
+        products = product_service.list_products(page=page, limit=limit, status="active")
+        if not products:
+            break
+        all_products.extend(products)
+        if len(products) < limit:
+            break
+        page += 1
+
+    # Xác định products cần init
+    products_to_init = []
+    products_already_have = []
+
+    for product in all_products:
+        if test_mode or not product.gdp_metadata:
+            products_to_init.append(product.id)
+        else:
+            products_already_have.append(product.id)
+
+    # Init metadata cho các products
+    success_count = 0
+    error_count = 0
+    errors = []
+
+    for index, product_id in enumerate(products_to_init):
+        if index % 20 == 0:
+            ctx.check_cancelled()
+            ctx.set_progress(done=index, total=len(products_to_init))
+        try:
+            if test_mode:
+                # Test mode: force init bằng cách update trực tiếp metadata mới với structure đầy đủ
+                product = product_service.get_product(product_id)
+                if product:
+                    variant_ids = [v.id for v in product.variants]
+                    metadata = init_empty_metadata(product_id, variant_ids)
+                    # Update metadata (preserve description nếu có)
+                    success = product_service.update_product_metadata(
+                        product_id,
+                        metadata,
+                        preserve_description=True
+                    )
+                    if success:
+                        success_count += 1
+                    else:
+                        error_count += 1
+                        errors.append(f"Product {product_id}: Failed to update")
+                else:
+                    error_count += 1
+                    errors.append(f"Product {product_id}: Not found")
+            else:
+                # Normal mode: dùng init_product_metadata (chỉ init nếu chưa có)
+                success = product_service.init_product_metadata(product_id)
+                if success:
+                    success_count += 1
+                else:
+                    error_count += 1
+                    errors.append(f"Product {product_id}: Failed to init")
+        except Exception as e:
+            error_count += 1
+            errors.append(f"Product {product_id}: {str(e)}")
+            logger.error(f"Error init metadata for product {product_id}: {e}", exc_info=True)
+
+    ctx.set_progress(done=len(products_to_init), total=len(products_to_init))
+    return {
+        "status": "success",
+        "test_mode": test_mode,
+        "total_products": len(all_products),
+        "products_to_init": len(products_to_init),
+        "products_already_have": len(products_already_have),
+        "success_count": success_count,
+        "error_count": error_count,
+        "errors": errors[:10],  # Chỉ trả về 10 lỗi đầu
+    }
@@ -0,0 +1,74 @@
+# products/management/commands/build_variant_daily_sales.py
+"""
+Management command để dựng / cập nhật bảng VariantDailySales từ SapoOrderCache.
+
+Usage:
+    python manage.py build_variant_daily_sales --days 60   # Dựng lại toàn bộ 60 ngày gần nhất
+    python manage.py build_variant_daily_sales             # Chỉ cập nhật các ngày có đơn thay đổi
+"""
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+import logging
+
+from products.services.variant_daily_sales_service import VariantDailySalesService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Dựng / cập nhật bảng tổng lượt bán theo variant theo ngày (VariantDailySales)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Dựng lại toàn bộ N ngày gần nhất (bỏ qua để chỉ cập nhật incremental)'
+        )
+
+    def handle(self, *args, **options):
+        days = options.get('days')
+
+        start_time = timezone.now()
+        service = VariantDailySalesService()
+
+        try:
+            if days:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Building variant daily sales (days={days})...'
+                ))
+                stats = service.build(days=days)
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    'Refreshing variant daily sales...'
+                ))
+                stats = service.refresh()
+
+            elapsed_time = (timezone.now() - start_time).total_seconds()
+
+            if stats.get("skipped") == "not_initialized":
+                self.stdout.write(self.style.WARNING(
+                    'Bảng daily sales chưa được khởi tạo. Chạy trước: '
+                    'python manage.py build_variant_daily_sales --days 60'
+                ))
+                return
+            if stats.get("skipped"):
+                self.stdout.write(self.style.WARNING(f'Skipped: {stats["skipped"]}'))
+                return
+
+            state = service.get_state()
+            self.stdout.write(self.style.SUCCESS(
+                f'\n=== Build Completed ===\n'
+                f'Days rebuilt: {stats["days"]}\n'
+                f'Rows written: {stats["rows"]}\n'
+                f'Covered from: {state.covered_from}\n'
+                f'Time elapsed: {elapsed_time:.2f}s\n'
+            ))
+
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(
+                f'Error building variant daily sales: {str(e)}'
+            ))
+            logger.error(f'Error in build_variant_daily_sales command: {e}', exc_info=True)
+            raise
@@ -0,0 +1,31 @@
+# products/management/commands/rebuild_shopee_variant_index.py
+"""
+Management command để build lại index Shopee item -> Sapo variant từ SapoProductCache.
+Không gọi Sapo API; chạy sau sync_sapo_products nếu index bị lệch.
+
+Usage:
+    python manage.py rebuild_shopee_variant_index
+"""
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+import logging
+
+from products.services.shopee_variant_index import rebuild_index
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Build lại index (connection_id, Shopee item_id) -> variant_id từ SapoProductCache'
+
+    def handle(self, *args, **options):
+        start_time = timezone.now()
+
+        stats = rebuild_index()
+
+        elapsed_time = (timezone.now() - start_time).total_seconds()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt Shopee variant index: {stats["links"]} links '
+            f'from {stats["products"]} products in {elapsed_time:.2f}s'
+        ))
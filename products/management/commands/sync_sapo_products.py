@@ -50,8 +50,10 @@ class Command(BaseCommand):
                 f'Total variants: {stats["total_variants"]}\n'
                 f'Created products: {stats["created_products"]}\n'
                 f'Updated products: {stats["updated_products"]}\n'
+                f'Unchanged products: {stats["unchanged_products"]}\n'
                 f'Created variants: {stats["created_variants"]}\n'
                 f'Updated variants: {stats["updated_variants"]}\n'
+                f'Unchanged variants: {stats["unchanged_variants"]}\n'
                 f'Time elapsed: {elapsed_time:.2f}s\n'
             ))
             
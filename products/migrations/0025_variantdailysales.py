@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0024_sapoproductcache_sapovariantcache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VariantDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('variant_id', models.BigIntegerField(db_index=True, help_text='Variant ID từ Sapo (variant 1 pcs sau qui đổi)')),
+                ('date', models.DateField(db_index=True, help_text='Ngày bán (UTC, theo created_on của đơn)')),
+                ('quantity', models.IntegerField(default=0, help_text='Tổng số lượng bán trong ngày')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, help_text='Tổng doanh thu (line_amount) trong ngày', max_digits=15)),
+                ('order_count', models.IntegerField(default=0, help_text='Số đơn có variant trong ngày')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Thời điểm cập nhật cuối')),
+            ],
+            options={
+                'verbose_name': 'Variant Daily Sales',
+                'verbose_name_plural': 'Variant Daily Sales',
+                'db_table': 'products_variant_daily_sales',
+                'indexes': [models.Index(fields=['date', 'variant_id'], name='products_va_date_11a10c_idx')],
+                'unique_together': {('variant_id', 'date')},
+            },
+        ),
+    ]
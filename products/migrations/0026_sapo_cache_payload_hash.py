@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0025_variantdailysales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sapoproductcache',
+            name='payload_hash',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 của data, dùng để bỏ qua ghi lại khi sync mà product không đổi', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='sapovariantcache',
+            name='payload_hash',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 của data, dùng để bỏ qua ghi lại khi sync mà variant không đổi', max_length=64),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:07
+
+import json
+import re
+
+from django.db import migrations, models
+
+
+GDP_META_PATTERN = re.compile(r'\[GDP_META\](.*?)\[/GDP_META\]', re.DOTALL)
+
+
+def build_shopee_variant_index(apps, schema_editor):
+    """Build index (connection_id, item_id) -> variant_id từ GDP_META trong SapoProductCache."""
+    SapoProductCache = apps.get_model('products', 'SapoProductCache')
+    ShopeeItemVariantIndex = apps.get_model('products', 'ShopeeItemVariantIndex')
+
+    batch = []
+    for product_id, data in SapoProductCache.objects.values_list('product_id', 'data').iterator(chunk_size=500):
+        data = data or {}
+        if (data.get('status') or 'active') != 'active':
+            continue
+        match = GDP_META_PATTERN.search(data.get('description') or '')
+        if not match:
+            continue
+        try:
+            meta = json.loads(match.group(1).strip())
+        except ValueError:
+            continue
+        for variant_meta in meta.get('variants') or []:
+            variant_id = variant_meta.get('id')
+            for conn in variant_meta.get('shopee_connections') or []:
+                if not variant_id or not conn.get('connection_id') or not conn.get('item_id'):
+                    continue
+                batch.append(ShopeeItemVariantIndex(
+                    connection_id=int(conn['connection_id']),
+                    item_id=str(conn['item_id']),
+                    variant_id=int(variant_id),
+                    product_id=product_id,
+                ))
+        if len(batch) >= 1000:
+            ShopeeItemVariantIndex.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        ShopeeItemVariantIndex.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0026_sapo_cache_payload_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopeeItemVariantIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('connection_id', models.BigIntegerField(help_text='Sapo MP connection ID của shop Shopee')),
+                ('item_id', models.CharField(help_text='Shopee item_id', max_length=50)),
+                ('variant_id', models.BigIntegerField(help_text='Sapo variant ID')),
+                ('product_id', models.BigIntegerField(db_index=True, help_text='Sapo product ID (parent) - dùng để build lại index theo product')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Thời điểm cập nhật cuối')),
+            ],
+            options={
+                'verbose_name': 'Shopee Item Variant Index',
+                'verbose_name_plural': 'Shopee Item Variant Index',
+                'db_table': 'products_shopee_item_variant_index',
+                'indexes': [models.Index(fields=['connection_id', 'item_id'], name='products_sh_connect_b0c52b_idx')],
+                'constraints': [models.UniqueConstraint(fields=('connection_id', 'item_id', 'variant_id'), name='uniq_products_shopee_item_variant')],
+            },
+        ),
+        migrations.RunPython(build_shopee_variant_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,148 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:09
+
+import json
+import re
+
+from django.db import migrations, models
+
+
+GDP_META_PATTERN = re.compile(r'\[GDP_META\](.*?)\[/GDP_META\]', re.DOTALL)
+
+
+def backfill_materialized_fields(apps, schema_editor):
+    """Điền các cột materialize (status, brand_id, sku, gdp_metadata, ...) từ data JSON đã cache."""
+    SapoProductCache = apps.get_model('products', 'SapoProductCache')
+    SapoVariantCache = apps.get_model('products', 'SapoVariantCache')
+
+    variant_fields = {}
+    products = []
+    for cache in SapoProductCache.objects.all().iterator(chunk_size=500):
+        data = cache.data or {}
+        metadata = None
+        match = GDP_META_PATTERN.search(data.get('description') or '')
+        if match:
+            try:
+                metadata = json.loads(match.group(1).strip())
+            except ValueError:
+                metadata = None
+        if not isinstance(metadata, dict):
+            metadata = None
+        variant_meta_map = {
+            vm.get('id'): vm for vm in (metadata or {}).get('variants') or [] if isinstance(vm, dict)
+        }
+
+        cache.status = (data.get('status') or '')[:30]
+        cache.brand_id = data.get('brand_id')
+        cache.brand = (data.get('brand') or '')[:255]
+        cache.category_id = data.get('category_id')
+        cache.category = (data.get('category') or '')[:255]
+        cache.gdp_metadata = metadata
+        products.append(cache)
+
+        for variant_data in data.get('variants') or []:
+            if variant_data.get('id'):
+                variant_fields[variant_data['id']] = (data.get('brand_id'), variant_meta_map.get(variant_data['id']))
+
+        if len(products) >= 500:
+            SapoProductCache.objects.bulk_update(
+                products, ['status', 'brand_id', 'brand', 'category_id', 'category', 'gdp_metadata']
+            )
+            products = []
+    if products:
+        SapoProductCache.objects.bulk_update(
+            products, ['status', 'brand_id', 'brand', 'category_id', 'category', 'gdp_metadata']
+        )
+
+    variants = []
+    for cache in SapoVariantCache.objects.all().iterator(chunk_size=500):
+        data = cache.data or {}
+        brand_id, metadata = variant_fields.get(cache.variant_id, (None, None))
+        cache.sku = (data.get('sku') or '')[:100]
+        cache.barcode = (data.get('barcode') or '')[:100]
+        cache.status = (data.get('status') or '')[:30]
+        cache.brand_id = brand_id
+        cache.packsize = data.get('packsize') is True
+        cache.gdp_metadata = metadata
+        # Hash variant giờ gồm cả các cột materialize -> để sync sau ghi lại 1 lần
+        cache.payload_hash = ''
+        variants.append(cache)
+        if len(variants) >= 500:
+            SapoVariantCache.objects.bulk_update(
+                variants, ['sku', 'barcode', 'status', 'brand_id', 'packsize', 'gdp_metadata', 'payload_hash']
+            )
+            variants = []
+    if variants:
+        SapoVariantCache.objects.bulk_update(
+            variants, ['sku', 'barcode', 'status', 'brand_id', 'packsize', 'gdp_metadata', 'payload_hash']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0027_shopeeitemvariantindex'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sapoproductcache',
+            name='brand',
+            field=models.CharField(blank=True, default='', help_text='Tên nhãn hiệu', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='sapoproductcache',
+            name='brand_id',
+            field=models.BigIntegerField(blank=True, db_index=True, help_text='Sapo brand ID', null=True),
+        ),
+        migrations.AddField(
+            model_name='sapoproductcache',
+            name='category',
+            field=models.CharField(blank=True, default='', help_text='Tên loại sản phẩm', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='sapoproductcache',
+            name='category_id',
+            field=models.BigIntegerField(blank=True, help_text='Sapo category ID', null=True),
+        ),
+        migrations.AddField(
+            model_name='sapoproductcache',
+            name='gdp_metadata',
+            field=models.JSONField(blank=True, help_text='JSON [GDP_META] đã parse từ description (null nếu product chưa có metadata)', null=True),
+        ),
+        migrations.AddField(
+            model_name='sapoproductcache',
+            name='status',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='Trạng thái product (active, inactive, ...)', max_length=30),
+        ),
+        migrations.AddField(
+            model_name='sapovariantcache',
+            name='barcode',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='Barcode variant', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='sapovariantcache',
+            name='brand_id',
+            field=models.BigIntegerField(blank=True, db_index=True, help_text='Sapo brand ID của product cha', null=True),
+        ),
+        migrations.AddField(
+            model_name='sapovariantcache',
+            name='gdp_metadata',
+            field=models.JSONField(blank=True, help_text='JSON metadata của variant trong [GDP_META] của product cha', null=True),
+        ),
+        migrations.AddField(
+            model_name='sapovariantcache',
+            name='packsize',
+            field=models.BooleanField(default=False, help_text='Variant combo/packsize (True) hay variant lẻ 1 pcs (False)'),
+        ),
+        migrations.AddField(
+            model_name='sapovariantcache',
+            name='sku',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='SKU variant', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='sapovariantcache',
+            name='status',
+            field=models.CharField(blank=True, default='', help_text='Trạng thái variant (active, inactive, ...)', max_length=30),
+        ),
+        migrations.RunPython(backfill_materialized_fields, migrations.RunPython.noop),
+    ]
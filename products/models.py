@@ -163,6 +163,54 @@ class VariantSalesForecast(models.Model):
         return self.growth_percentage
 
 
+class VariantDailySales(models.Model):
+    """
+    Tổng lượt bán theo variant theo ngày (ngày UTC theo created_on của đơn).
+    Đã qui đổi qua real_items (combo/packsize -> variant 1 pcs).
+
+    Được cập nhật incremental bởi VariantDailySalesService từ SapoOrderCache,
+    SalesForecastService tính kỳ N ngày bằng SUM trên khoảng ngày.
+    """
+    variant_id = models.BigIntegerField(
+        db_index=True,
+        help_text="Variant ID từ Sapo (variant 1 pcs sau qui đổi)"
+    )
+    date = models.DateField(
+        db_index=True,
+        help_text="Ngày bán (UTC, theo created_on của đơn)"
+    )
+    quantity = models.IntegerField(
+        default=0,
+        help_text="Tổng số lượng bán trong ngày"
+    )
+    revenue = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=0,
+        help_text="Tổng doanh thu (line_amount) trong ngày"
+    )
+    order_count = models.IntegerField(
+        default=0,
+        help_text="Số đơn có variant trong ngày"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Thời điểm cập nhật cuối"
+    )
+
+    class Meta:
+        db_table = 'products_variant_daily_sales'
+        verbose_name = 'Variant Daily Sales'
+        verbose_name_plural = 'Variant Daily Sales'
+        unique_together = [['variant_id', 'date']]
+        indexes = [
+            models.Index(fields=['date', 'variant_id']),
+        ]
+
+    def __str__(self):
+        return f"Variant {self.variant_id} - {self.date} - Sold: {self.quantity}"
+
+
 class ContainerTemplate(models.Model):
     """
     Template container (INIT CONTAINER) - Mẫu container để tái sử dụng.
@@ -1660,6 +1708,50 @@ class SapoProductCache(models.Model):
         help_text="JSON data của product từ Sapo API (bao gồm variants)"
     )
     
+    payload_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default="",
+        help_text="SHA-256 của data, dùng để bỏ qua ghi lại khi sync mà product không đổi"
+    )
+    
+    # Các field materialize từ data lúc sync (không parse lại JSON/GDP_META khi đọc)
+    status = models.CharField(
+        max_length=30,
+        blank=True,
+        default="",
+        db_index=True,
+        help_text="Trạng thái product (active, inactive, ...)"
+    )
+    brand_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="Sapo brand ID"
+    )
+    brand = models.CharField(
+        max_length=255,
+        blank=True,
+        default="",
+        help_text="Tên nhãn hiệu"
+    )
+    category_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        help_text="Sapo category ID"
+    )
+    category = models.CharField(
+        max_length=255,
+        blank=True,
+        default="",
+        help_text="Tên loại sản phẩm"
+    )
+    gdp_metadata = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="JSON [GDP_META] đã parse từ description (null nếu product chưa có metadata)"
+    )
+    
     # Metadata
     synced_at = models.DateTimeField(
         auto_now=True,
@@ -1705,6 +1797,50 @@ class SapoVariantCache(models.Model):
         help_text="JSON data của variant từ Sapo API"
     )
     
+    payload_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default="",
+        help_text="SHA-256 của data, dùng để bỏ qua ghi lại khi sync mà variant không đổi"
+    )
+    
+    # Các field materialize từ data lúc sync (không parse lại JSON/GDP_META khi đọc)
+    sku = models.CharField(
+        max_length=100,
+        blank=True,
+        default="",
+        db_index=True,
+        help_text="SKU variant"
+    )
+    barcode = models.CharField(
+        max_length=100,
+        blank=True,
+        default="",
+        db_index=True,
+        help_text="Barcode variant"
+    )
+    status = models.CharField(
+        max_length=30,
+        blank=True,
+        default="",
+        help_text="Trạng thái variant (active, inactive, ...)"
+    )
+    brand_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="Sapo brand ID của product cha"
+    )
+    packsize = models.BooleanField(
+        default=False,
+        help_text="Variant combo/packsize (True) hay variant lẻ 1 pcs (False)"
+    )
+    gdp_metadata = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="JSON metadata của variant trong [GDP_META] của product cha"
+    )
+    
     # Metadata
     synced_at = models.DateTimeField(
         auto_now=True,
@@ -1729,3 +1865,46 @@ class SapoVariantCache(models.Model):
         variant_name = self.data.get('name', 'N/A') if isinstance(self.data, dict) else 'N/A'
         return f"Variant {self.variant_id}: {variant_name}"
 
+
+class ShopeeItemVariantIndex(models.Model):
+    """
+    Index (connection_id, Shopee item_id) -> Sapo variant_id.
+    Build từ shopee_connections trong GDP_META của products, cập nhật khi sync products
+    hoặc khi sửa metadata, để tra cứu item Shopee không phải quét toàn bộ catalog.
+    """
+    connection_id = models.BigIntegerField(
+        help_text="Sapo MP connection ID của shop Shopee"
+    )
+    item_id = models.CharField(
+        max_length=50,
+        help_text="Shopee item_id"
+    )
+    variant_id = models.BigIntegerField(
+        help_text="Sapo variant ID"
+    )
+    product_id = models.BigIntegerField(
+        db_index=True,
+        help_text="Sapo product ID (parent) - dùng để build lại index theo product"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Thời điểm cập nhật cuối"
+    )
+    
+    class Meta:
+        db_table = 'products_shopee_item_variant_index'
+        verbose_name = 'Shopee Item Variant Index'
+        verbose_name_plural = 'Shopee Item Variant Index'
+        indexes = [
+            models.Index(fields=['connection_id', 'item_id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['connection_id', 'item_id', 'variant_id'],
+                name='uniq_products_shopee_item_variant',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.connection_id}/{self.item_id} -> {self.variant_id}"
+
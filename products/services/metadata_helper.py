@@ -10,7 +10,7 @@ This allows us to store extended custom fields without modifying Sapo's database
 
 import re
 import json
-from typing import Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
 import logging
 
 from products.services.dto import (
@@ -27,6 +27,10 @@ logger = logging.getLogger(__name__)
 # Markers for GDP metadata in description field
 GDP_META_START = "[GDP_META]"
 GDP_META_END = "[/GDP_META]"
+GDP_META_PATTERN = re.compile(
+    rf'{re.escape(GDP_META_START)}(.*?){re.escape(GDP_META_END)}',
+    re.DOTALL
+)
 
 
 def extract_gdp_metadata(description: Optional[str]) -> Tuple[Optional[ProductMetadataDTO], str]:
@@ -84,6 +88,27 @@ def extract_gdp_metadata(description: Optional[str]) -> Tuple[Optional[ProductMe
         return None, original_desc
 
 
+def parse_gdp_metadata_json(description: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Lấy JSON thô trong [GDP_META]...[/GDP_META] (không validate thành DTO).
+    Dùng khi sync để lưu sẵn metadata vào SapoProductCache.gdp_metadata.
+    
+    Returns:
+        Dict JSON hoặc None nếu không có metadata / JSON lỗi
+    """
+    if not description:
+        return None
+    match = GDP_META_PATTERN.search(description)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(1).strip())
+    except json.JSONDecodeError as e:
+        logger.warning(f"Invalid GDP_META JSON: {e}")
+        return None
+    return data if isinstance(data, dict) else None
+
+
 def inject_gdp_metadata(
     original_description: str, 
     metadata: ProductMetadataDTO
@@ -2,6 +2,8 @@
 """
 Service để lấy products và variants từ database cache.
 Thay thế việc request từ Sapo API.
+
+GDP metadata đọc từ cột gdp_metadata (đã parse lúc sync), không regex/json.loads lại description.
 """
 
 from typing import Optional, List, Dict, Any
@@ -12,8 +14,8 @@ from products.services.dto import (
     ProductDTO,
     ProductVariantDTO,
     ProductMetadataDTO,
+    VariantMetadataDTO,
 )
-from products.services.metadata_helper import extract_gdp_metadata
 
 logger = logging.getLogger(__name__)
 
@@ -41,37 +43,7 @@ class ProductCacheService:
                 logger.debug(f"Product {product_id} not found in cache")
                 return None
             
-            product_data = cache.data
-            
-            # Normalize data: convert None lists to empty lists
-            if 'variants' in product_data and product_data['variants']:
-                for variant_data in product_data['variants']:
-                    # Fix images field: None -> []
-                    if 'images' in variant_data and variant_data['images'] is None:
-                        variant_data['images'] = []
-                    # Fix variant_prices field: None -> []
-                    if 'variant_prices' in variant_data and variant_data['variant_prices'] is None:
-                        variant_data['variant_prices'] = []
-                    # Fix inventories field: None -> []
-                    if 'inventories' in variant_data and variant_data['inventories'] is None:
-                        variant_data['inventories'] = []
-            
-            # Fix product images field: None -> []
-            if 'images' in product_data and product_data['images'] is None:
-                product_data['images'] = []
-            
-            # Parse product DTO
-            product_dto = ProductDTO.from_dict(product_data)
-            
-            # Extract GDP metadata from description field
-            metadata, original_desc = extract_gdp_metadata(product_dto.description)
-            product_dto.gdp_metadata = metadata
-            
-            # Assign metadata to each variant
-            if metadata and metadata.variants:
-                variant_meta_map = {vm.id: vm for vm in metadata.variants}
-                for variant in product_dto.variants:
-                    variant.gdp_metadata = variant_meta_map.get(variant.id)
+            product_dto = self._build_product_dto(cache)
             
             logger.debug(f"Fetched product {product_id} from cache: {product_dto.name} ({len(product_dto.variants)} variants)")
             return product_dto
@@ -98,18 +70,7 @@ class ProductCacheService:
                 logger.debug(f"Variant {variant_id} not found in cache")
                 return None
             
-            variant_data = cache.data
-            
-            # Normalize data
-            if 'images' in variant_data and variant_data['images'] is None:
-                variant_data['images'] = []
-            if 'variant_prices' in variant_data and variant_data['variant_prices'] is None:
-                variant_data['variant_prices'] = []
-            if 'inventories' in variant_data and variant_data['inventories'] is None:
-                variant_data['inventories'] = []
-            
-            # Parse variant DTO
-            variant_dto = ProductVariantDTO.from_dict(variant_data)
+            variant_dto = self._build_variant_dto(cache)
             
             logger.debug(f"Fetched variant {variant_id} from cache: {variant_dto.name}")
             return variant_dto
@@ -129,27 +90,7 @@ class ProductCacheService:
             Image URL hoặc empty string nếu không tìm thấy
         """
         try:
-            cache = SapoVariantCache.objects.filter(variant_id=variant_id).first()
-            
-            if not cache:
-                return ""
-            
-            variant_data = cache.data
-            images = variant_data.get("images", [])
-            
-            if images and len(images) > 0:
-                return images[0].get("full_path") or images[0].get("path") or ""
-            
-            # Nếu variant không có image, thử lấy từ product
-            product_id = variant_data.get("product_id")
-            if product_id:
-                product_cache = SapoProductCache.objects.filter(product_id=product_id).first()
-                if product_cache:
-                    product_images = product_cache.data.get("images", [])
-                    if product_images and len(product_images) > 0:
-                        return product_images[0].get("full_path") or product_images[0].get("path") or ""
-            
-            return ""
+            return self.get_variant_images_many([variant_id]).get(variant_id, "")
             
         except Exception as e:
             logger.error(f"Error fetching variant image {variant_id} from cache: {e}", exc_info=True)
@@ -163,32 +104,7 @@ class ProductCacheService:
             Dict mapping {variant_id: image_url}
         """
         try:
-            variant_images = {}
-            
-            # Get all variants from cache
-            variants = SapoVariantCache.objects.all()
-            
-            for cache in variants:
-                variant_id = cache.variant_id
-                variant_data = cache.data
-                
-                # Lấy image từ variant
-                image_url = None
-                images = variant_data.get("images", [])
-                if images and len(images) > 0:
-                    image_url = images[0].get("full_path") or images[0].get("path")
-                
-                # Nếu variant không có image, thử lấy từ product
-                if not image_url:
-                    product_id = cache.product_id
-                    product_cache = SapoProductCache.objects.filter(product_id=product_id).first()
-                    if product_cache:
-                        product_images = product_cache.data.get("images", [])
-                        if product_images and len(product_images) > 0:
-                            image_url = product_images[0].get("full_path") or product_images[0].get("path")
-                
-                if image_url:
-                    variant_images[variant_id] = image_url
+            variant_images = self._variant_images(SapoVariantCache.objects.all())
             
             logger.info(f"Loaded {len(variant_images)} variant images from cache")
             return variant_images
@@ -197,6 +113,73 @@ class ProductCacheService:
             logger.error(f"Error fetching all variant images from cache: {e}", exc_info=True)
             return {}
     
+    # ==================== BATCH READ ====================
+    
+    def get_products_many(self, product_ids) -> Dict[int, ProductDTO]:
+        """
+        Lấy nhiều products từ cache trong 1 query (thay cho gọi get_product trong vòng lặp).
+        
+        Args:
+            product_ids: Iterable Sapo product IDs
+            
+        Returns:
+            Dict {product_id: ProductDTO}; ID không có trong cache thì không có key
+        """
+        ids = {int(pid) for pid in product_ids if pid}
+        if not ids:
+            return {}
+        
+        products = {}
+        for product_id, cache in SapoProductCache.objects.in_bulk(list(ids), field_name='product_id').items():
+            try:
+                products[product_id] = self._build_product_dto(cache)
+            except Exception as e:
+                logger.warning(f"Error parsing product {product_id}: {e}")
+        return products
+    
+    def get_variants_many(self, variant_ids) -> Dict[int, ProductVariantDTO]:
+        """
+        Lấy nhiều variants từ cache trong 1 query.
+        
+        Args:
+            variant_ids: Iterable Sapo variant IDs
+            
+        Returns:
+            Dict {variant_id: ProductVariantDTO}; ID không có trong cache thì không có key
+        """
+        ids = {int(vid) for vid in variant_ids if vid}
+        if not ids:
+            return {}
+        
+        variants = {}
+        for variant_id, cache in SapoVariantCache.objects.in_bulk(list(ids), field_name='variant_id').items():
+            try:
+                variants[variant_id] = self._build_variant_dto(cache)
+            except Exception as e:
+                logger.warning(f"Error parsing variant {variant_id}: {e}")
+        return variants
+    
+    def get_variant_images_many(self, variant_ids) -> Dict[int, str]:
+        """
+        Lấy image URL cho nhiều variants (variant không có ảnh thì lấy ảnh product cha).
+        Tối đa 2 query bất kể số variants.
+        
+        Returns:
+            Dict {variant_id: image_url}; variant không có ảnh thì không có key
+        """
+        ids = {int(vid) for vid in variant_ids if vid}
+        if not ids:
+            return {}
+        return self._variant_images(SapoVariantCache.objects.filter(variant_id__in=ids))
+    
+    def get_product_categories(self) -> Dict[int, str]:
+        """
+        Mapping product_id -> category (cột materialize, 1 query).
+        """
+        return dict(
+            SapoProductCache.objects.exclude(category="").values_list('product_id', 'category')
+        )
+    
     def list_products(self, status: Optional[str] = None) -> List[ProductDTO]:
         """
         Lấy danh sách tất cả products từ database cache.
@@ -208,50 +191,15 @@ class ProductCacheService:
             List of ProductDTO
         """
         try:
-            # Query từ cache
+            # Query từ cache (status đã materialize thành cột)
             queryset = SapoProductCache.objects.all()
-            
-            # Filter theo status nếu có (status được lưu trong data JSON)
             if status:
-                # Note: Status filter sẽ được apply sau khi parse data
-                pass
+                queryset = queryset.filter(status=status)
             
             products = []
             for cache in queryset:
                 try:
-                    product_data = cache.data
-                    
-                    # Filter theo status nếu có
-                    if status and product_data.get('status') != status:
-                        continue
-                    
-                    # Normalize data
-                    if 'variants' in product_data and product_data['variants']:
-                        for variant_data in product_data['variants']:
-                            if 'images' in variant_data and variant_data['images'] is None:
-                                variant_data['images'] = []
-                            if 'variant_prices' in variant_data and variant_data['variant_prices'] is None:
-                                variant_data['variant_prices'] = []
-                            if 'inventories' in variant_data and variant_data['inventories'] is None:
-                                variant_data['inventories'] = []
-                    
-                    if 'images' in product_data and product_data['images'] is None:
-                        product_data['images'] = []
-                    
-                    # Parse product DTO
-                    product_dto = ProductDTO.from_dict(product_data)
-                    
-                    # Extract GDP metadata (silent - không log cho từng product)
-                    metadata, _ = extract_gdp_metadata(product_dto.description)
-                    product_dto.gdp_metadata = metadata
-                    
-                    # Assign metadata to variants
-                    if metadata and metadata.variants:
-                        variant_meta_map = {vm.id: vm for vm in metadata.variants}
-                        for variant in product_dto.variants:
-                            variant.gdp_metadata = variant_meta_map.get(variant.id)
-                    
-                    products.append(product_dto)
+                    products.append(self._build_product_dto(cache))
                 except Exception as parse_error:
                     logger.warning(f"Error parsing product {cache.product_id}: {parse_error}")
                     continue
@@ -279,16 +227,10 @@ class ProductCacheService:
         """
         try:
             queryset = SapoProductCache.objects.all()
+            if status:
+                queryset = queryset.filter(status=status)
             
-            products_data = []
-            for cache in queryset:
-                product_data = cache.data
-                
-                # Filter theo status nếu có
-                if status and product_data.get('status') != status:
-                    continue
-                
-                products_data.append(product_data)
+            products_data = list(queryset.values_list('data', flat=True))
             
             logger.debug(f"Fetched {len(products_data)} products (raw) from cache")
             return products_data
@@ -297,6 +239,137 @@ class ProductCacheService:
             logger.error(f"Error listing products (raw) from cache: {e}", exc_info=True)
             return []
 
+    
+    def list_variants_raw(
+        self,
+        brand_id: Optional[int] = None,
+        product_status: Optional[str] = None,
+        include_packsize: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        Lấy variants (raw dict) từ cache, filter bằng SQL trên các cột materialize.
+        
+        Args:
+            brand_id: Chỉ lấy variants thuộc brand này (optional)
+            product_status: Chỉ lấy variants của products có status này (optional)
+            include_packsize: False để bỏ variants combo (packsize = true)
+            
+        Returns:
+            List of variant dicts, mỗi dict có thêm "_gdp_metadata" (JSON metadata của variant hoặc None)
+        """
+        try:
+            queryset = SapoVariantCache.objects.all()
+            if brand_id is not None:
+                queryset = queryset.filter(brand_id=brand_id)
+            if not include_packsize:
+                queryset = queryset.filter(packsize=False)
+            if product_status:
+                queryset = queryset.filter(
+                    product_id__in=SapoProductCache.objects.filter(status=product_status).values('product_id')
+                )
+            
+            variants_data = []
+            for variant_data, metadata in queryset.order_by('product_id', 'variant_id').values_list('data', 'gdp_metadata'):
+                variant_data["_gdp_metadata"] = metadata
+                variants_data.append(variant_data)
+            
+            logger.debug(f"Fetched {len(variants_data)} variants (raw) from cache")
+            return variants_data
+            
+        except Exception as e:
+            logger.error(f"Error listing variants (raw) from cache: {e}", exc_info=True)
+            return []
+    
+    @staticmethod
+    def _first_image_url(images) -> str:
+        if images and len(images) > 0:
+            return images[0].get("full_path") or images[0].get("path") or ""
+        return ""
+    
+    def _variant_images(self, variant_queryset) -> Dict[int, str]:
+        """
+        Map variant_id -> image_url cho queryset variants: 1 query variants +
+        1 query ảnh products cha cho các variant không có ảnh.
+        """
+        variant_images = {}
+        missing = {}  # variant_id -> product_id
+        for variant_id, product_id, images in variant_queryset.values_list('variant_id', 'product_id', 'data__images'):
+            image_url = self._first_image_url(images)
+            if image_url:
+                variant_images[variant_id] = image_url
+            elif product_id:
+                missing[variant_id] = product_id
+        
+        if missing:
+            product_images = {
+                product_id: self._first_image_url(images)
+                for product_id, images in SapoProductCache.objects.filter(
+                    product_id__in=set(missing.values())
+                ).values_list('product_id', 'data__images')
+            }
+            for variant_id, product_id in missing.items():
+                image_url = product_images.get(product_id)
+                if image_url:
+                    variant_images[variant_id] = image_url
+        
+        return variant_images
+    
+    @staticmethod
+    def _build_variant_dto(cache: SapoVariantCache) -> ProductVariantDTO:
+        """Dựng ProductVariantDTO từ cache row, gắn GDP metadata từ cột gdp_metadata."""
+        variant_data = cache.data
+        
+        # Normalize data
+        if 'images' in variant_data and variant_data['images'] is None:
+            variant_data['images'] = []
+        if 'variant_prices' in variant_data and variant_data['variant_prices'] is None:
+            variant_data['variant_prices'] = []
+        if 'inventories' in variant_data and variant_data['inventories'] is None:
+            variant_data['inventories'] = []
+        
+        variant_dto = ProductVariantDTO.from_dict(variant_data)
+        if cache.gdp_metadata:
+            try:
+                variant_dto.gdp_metadata = VariantMetadataDTO.from_dict(cache.gdp_metadata)
+            except Exception as e:
+                logger.warning(f"Invalid GDP metadata for variant {cache.variant_id}: {e}")
+        return variant_dto
+    
+    @staticmethod
+    def _build_product_dto(cache: SapoProductCache) -> ProductDTO:
+        """Dựng ProductDTO từ cache row, gắn GDP metadata từ cột gdp_metadata."""
+        product_data = cache.data
+        
+        # Normalize data: convert None lists to empty lists
+        if 'variants' in product_data and product_data['variants']:
+            for variant_data in product_data['variants']:
+                if 'images' in variant_data and variant_data['images'] is None:
+                    variant_data['images'] = []
+                if 'variant_prices' in variant_data and variant_data['variant_prices'] is None:
+                    variant_data['variant_prices'] = []
+                if 'inventories' in variant_data and variant_data['inventories'] is None:
+                    variant_data['inventories'] = []
+        
+        if 'images' in product_data and product_data['images'] is None:
+            product_data['images'] = []
+        
+        product_dto = ProductDTO.from_dict(product_data)
+        
+        metadata = None
+        if cache.gdp_metadata:
+            try:
+                metadata = ProductMetadataDTO.from_dict(cache.gdp_metadata)
+            except Exception as e:
+                logger.warning(f"Invalid GDP metadata for product {cache.product_id}: {e}")
+        product_dto.gdp_metadata = metadata
+        
+        # Assign metadata to each variant
+        if metadata and metadata.variants:
+            variant_meta_map = {vm.id: vm for vm in metadata.variants}
+            for variant in product_dto.variants:
+                variant.gdp_metadata = variant_meta_map.get(variant.id)
+        
+        return product_dto
 
 # ========================= EXPORTS =========================
 
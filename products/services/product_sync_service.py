@@ -2,19 +2,79 @@
 """
 Service để sync products và variants từ Sapo API vào database cache.
 Sử dụng pagination với limit=250 để tối ưu performance.
+
+sync_all_products ghi mỗi page bằng bulk upsert (save_products_bulk) trong 1 transaction,
+bỏ qua các product/variant có payload_hash không đổi.
+
+Lúc ghi, GDP_META và các field hay filter (status, brand_id, sku, barcode, packsize, ...)
+được materialize vào cột riêng để ProductCacheService / views không phải parse lại.
 """
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
+import hashlib
+import json
 import logging
 from django.utils import timezone
 from django.db import transaction
 
 from core.sapo_client import get_sapo_client
 from products.models import SapoProductCache, SapoVariantCache
+from products.services.metadata_helper import parse_gdp_metadata_json
+from products.services.shopee_variant_index import reindex_products
 
 logger = logging.getLogger(__name__)
 
 
+def payload_hash(data: Any) -> str:
+    """SHA-256 của JSON (sort_keys) - so sánh payload Sapo giữa các lần sync."""
+    raw = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def materialize_product_fields(product_data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[int, Dict[str, Any]]]:
+    """
+    Tách các cột materialize của product và variants từ raw product JSON.
+    
+    Returns:
+        (product_fields, {variant_id: variant_fields})
+    """
+    metadata = parse_gdp_metadata_json(product_data.get("description"))
+    variant_meta_map = {
+        vm.get("id"): vm
+        for vm in (metadata or {}).get("variants") or []
+        if isinstance(vm, dict)
+    }
+    brand_id = product_data.get("brand_id")
+    
+    product_fields = {
+        "status": (product_data.get("status") or "")[:30],
+        "brand_id": brand_id,
+        "brand": (product_data.get("brand") or "")[:255],
+        "category_id": product_data.get("category_id"),
+        "category": (product_data.get("category") or "")[:255],
+        "gdp_metadata": metadata,
+    }
+    
+    variant_fields = {}
+    for variant_data in product_data.get("variants") or []:
+        variant_id = variant_data.get("id")
+        if not variant_id:
+            continue
+        variant_fields[variant_id] = {
+            "sku": (variant_data.get("sku") or "")[:100],
+            "barcode": (variant_data.get("barcode") or "")[:100],
+            "status": (variant_data.get("status") or "")[:30],
+            "brand_id": brand_id,
+            "packsize": variant_data.get("packsize") is True,
+            "gdp_metadata": variant_meta_map.get(variant_id),
+        }
+    return product_fields, variant_fields
+
+
+PRODUCT_MATERIALIZED_FIELDS = ["status", "brand_id", "brand", "category_id", "category", "gdp_metadata"]
+VARIANT_MATERIALIZED_FIELDS = ["sku", "barcode", "status", "brand_id", "packsize", "gdp_metadata"]
+
+
 class ProductSyncService:
     """
     Service để sync products và variants từ Sapo API vào database.
@@ -41,6 +101,8 @@ class ProductSyncService:
                 "created_products": int,
                 "updated_variants": int,
                 "created_variants": int,
+                "unchanged_products": int,
+                "unchanged_variants": int,
                 "errors": list
             }
         """
@@ -54,69 +116,209 @@ class ProductSyncService:
             "created_products": 0,
             "updated_variants": 0,
             "created_variants": 0,
+            "unchanged_products": 0,
+            "unchanged_variants": 0,
             "errors": []
         }
         
-        page = 1
         limit = 250  # Max limit theo Sapo API
         max_pages = 1000  # Giới hạn an toàn
         
-        while page <= max_pages:
-            try:
-                # Fetch products với pagination
-                logger.debug(f"[ProductSyncService] Fetching page {page}...")
-                response = self.core_api.list_products_raw(
+        # Fetch pages song song (paginator), ghi DB tuần tự ở thread hiện tại
+        page_meta: Dict[str, Any] = {}
+        try:
+            for page, products_data in self.core_api.paginate(
+                lambda page: self.core_api.list_products_raw(
                     page=page,
                     limit=limit,
                     status=status
-                )
-                
-                products_data = response.get("products", [])
+                ),
+                items_key="products",
+                limit=limit,
+                max_pages=max_pages,
+                stats=page_meta,
+                log_tag="ProductSyncService",
+            ):
+                logger.debug(f"[ProductSyncService] Processing page {page} ({len(products_data)} products)...")
                 
-                if not products_data:
-                    logger.info(f"[ProductSyncService] Page {page} returned no products, stopping pagination")
-                    break
+                # Ghi cả page bằng bulk upsert; lỗi thì fallback từng product để khoanh vùng product lỗi
+                try:
+                    page_stats = self.save_products_bulk(products_data)
+                except Exception as e:
+                    logger.warning(f"[ProductSyncService] Bulk save page {page} failed, fallback per product: {e}")
+                    page_stats = self._save_products_one_by_one(products_data, stats["errors"])
                 
-                # Process từng product
-                for product_data in products_data:
-                    try:
-                        product_stats = self._sync_product(product_data)
-                        stats["total_products"] += 1
-                        stats["total_variants"] += product_stats["variants_count"]
-                        stats["updated_products"] += product_stats["updated"]
-                        stats["created_products"] += product_stats["created"]
-                        stats["updated_variants"] += product_stats["variants_updated"]
-                        stats["created_variants"] += product_stats["variants_created"]
-                    except Exception as e:
-                        product_id = product_data.get("id", "unknown")
-                        error_msg = f"Error syncing product {product_id}: {str(e)}"
-                        logger.error(error_msg, exc_info=True)
-                        stats["errors"].append(error_msg)
-                
-                stats["total_pages"] = page
-                
-                # Check nếu hết products (ít hơn limit)
-                if len(products_data) < limit:
-                    break
-                
-                page += 1
-                
-            except Exception as e:
-                error_msg = f"Error fetching page {page}: {str(e)}"
-                logger.error(error_msg, exc_info=True)
-                stats["errors"].append(error_msg)
-                break
+                for key in (
+                    "total_products", "total_variants",
+                    "created_products", "updated_products", "unchanged_products",
+                    "created_variants", "updated_variants", "unchanged_variants",
+                ):
+                    stats[key] += page_stats[key]
+        except Exception as e:
+            error_msg = f"Error fetching products pages: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            stats["errors"].append(error_msg)
+        
+        stats["total_pages"] = page_meta.get("pages", 0)
         
         logger.info(
             f"[ProductSyncService] Sync completed: "
             f"{stats['total_products']} products, "
             f"{stats['total_variants']} variants, "
             f"{stats['created_products']} created, "
-            f"{stats['updated_products']} updated"
+            f"{stats['updated_products']} updated, "
+            f"{stats['unchanged_products']} unchanged"
+        )
+        
+        return stats
+    
+    def save_products_bulk(self, products_data: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Upsert 1 page products (và variants) bằng bulk_create(update_conflicts=True)
+        trong 1 transaction. Product/variant có payload_hash trùng DB thì bỏ qua.
+        
+        Returns:
+            {
+                "total_products", "total_variants",
+                "created_products", "updated_products", "unchanged_products",
+                "created_variants", "updated_variants", "unchanged_variants"
+            }
+        """
+        stats = {
+            "total_products": 0,
+            "total_variants": 0,
+            "created_products": 0,
+            "updated_products": 0,
+            "unchanged_products": 0,
+            "created_variants": 0,
+            "updated_variants": 0,
+            "unchanged_variants": 0,
+        }
+        
+        # product_id -> (data, fields, hash), variant_id -> (product_id, data, fields, hash)
+        # Trùng ID thì bản sau thắng
+        products: Dict[int, tuple] = {}
+        variants: Dict[int, tuple] = {}
+        for product_data in products_data or []:
+            product_id = product_data.get("id")
+            if not product_id:
+                continue
+            self._normalize_product(product_data)
+            product_fields, variant_fields = materialize_product_fields(product_data)
+            products[product_id] = (product_data, product_fields, payload_hash(product_data))
+            for variant_data in product_data["variants"]:
+                variant_id = variant_data.get("id")
+                if variant_id:
+                    # Metadata variant nằm trong description của product cha -> đưa vào hash của variant
+                    fields = variant_fields[variant_id]
+                    variants[variant_id] = (product_id, variant_data, fields, payload_hash([variant_data, fields]))
+        
+        stats["total_products"] = len(products)
+        stats["total_variants"] = len(variants)
+        if not products:
+            return stats
+        
+        existing_products = dict(
+            SapoProductCache.objects.filter(product_id__in=list(products)).values_list("product_id", "payload_hash")
         )
+        existing_variants = dict(
+            SapoVariantCache.objects.filter(variant_id__in=list(variants)).values_list("variant_id", "payload_hash")
+        )
+        
+        product_rows = []
+        for product_id, (data, fields, digest) in products.items():
+            if product_id not in existing_products:
+                stats["created_products"] += 1
+            elif existing_products[product_id] == digest:
+                stats["unchanged_products"] += 1
+                continue
+            else:
+                stats["updated_products"] += 1
+            product_rows.append(SapoProductCache(product_id=product_id, data=data, payload_hash=digest, **fields))
+        
+        variant_rows = []
+        for variant_id, (product_id, data, fields, digest) in variants.items():
+            if variant_id not in existing_variants:
+                stats["created_variants"] += 1
+            elif existing_variants[variant_id] == digest:
+                stats["unchanged_variants"] += 1
+                continue
+            else:
+                stats["updated_variants"] += 1
+            variant_rows.append(SapoVariantCache(
+                variant_id=variant_id, product_id=product_id, data=data, payload_hash=digest, **fields
+            ))
+        
+        with transaction.atomic():
+            if product_rows:
+                SapoProductCache.objects.bulk_create(
+                    product_rows,
+                    batch_size=500,
+                    update_conflicts=True,
+                    unique_fields=["product_id"],
+                    update_fields=["data", "payload_hash", "synced_at"] + PRODUCT_MATERIALIZED_FIELDS,
+                )
+            if variant_rows:
+                SapoVariantCache.objects.bulk_create(
+                    variant_rows,
+                    batch_size=500,
+                    update_conflicts=True,
+                    unique_fields=["variant_id"],
+                    update_fields=["product_id", "data", "payload_hash", "synced_at"] + VARIANT_MATERIALIZED_FIELDS,
+                )
+            # Chỉ product thay đổi mới có thể đổi shopee_connections trong GDP_META
+            if product_rows:
+                reindex_products(row.data for row in product_rows)
         
         return stats
     
+    def _save_products_one_by_one(self, products_data: List[Dict[str, Any]], errors: List[str]) -> Dict[str, int]:
+        """Fallback khi bulk lỗi: ghi từng product (update_or_create), gom lỗi vào errors."""
+        stats = {
+            "total_products": 0,
+            "total_variants": 0,
+            "created_products": 0,
+            "updated_products": 0,
+            "unchanged_products": 0,
+            "created_variants": 0,
+            "updated_variants": 0,
+            "unchanged_variants": 0,
+        }
+        for product_data in products_data:
+            try:
+                product_stats = self._sync_product(product_data)
+                stats["total_products"] += 1
+                stats["total_variants"] += product_stats["variants_count"]
+                stats["updated_products"] += product_stats["updated"]
+                stats["created_products"] += product_stats["created"]
+                stats["updated_variants"] += product_stats["variants_updated"]
+                stats["created_variants"] += product_stats["variants_created"]
+            except Exception as e:
+                product_id = product_data.get("id", "unknown")
+                error_msg = f"Error syncing product {product_id}: {str(e)}"
+                logger.error(error_msg, exc_info=True)
+                errors.append(error_msg)
+        return stats
+    
+    @staticmethod
+    def _normalize_product(product_data: Dict[str, Any]):
+        """Normalize data: convert None lists to empty lists (in-place)."""
+        if product_data.get("variants") is None:
+            product_data["variants"] = []
+        
+        # Normalize variant data
+        for variant_data in product_data["variants"]:
+            if variant_data.get("images") is None:
+                variant_data["images"] = []
+            if variant_data.get("variant_prices") is None:
+                variant_data["variant_prices"] = []
+            if variant_data.get("inventories") is None:
+                variant_data["inventories"] = []
+        
+        # Normalize product images
+        if product_data.get("images") is None:
+            product_data["images"] = []
+    
     def _sync_product(self, product_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Sync một product và các variants của nó vào database.
@@ -147,28 +349,19 @@ class ProductSyncService:
         }
         
         # Normalize data: convert None lists to empty lists
-        variants_data = product_data.get("variants", []) or []
+        self._normalize_product(product_data)
+        variants_data = product_data["variants"]
         stats["variants_count"] = len(variants_data)
-        
-        # Normalize variant data
-        for variant_data in variants_data:
-            if variant_data.get("images") is None:
-                variant_data["images"] = []
-            if variant_data.get("variant_prices") is None:
-                variant_data["variant_prices"] = []
-            if variant_data.get("inventories") is None:
-                variant_data["inventories"] = []
-        
-        # Normalize product images
-        if product_data.get("images") is None:
-            product_data["images"] = []
+        product_fields, variant_fields = materialize_product_fields(product_data)
         
         # Save/update product cache
         with transaction.atomic():
             product_cache, created = SapoProductCache.objects.update_or_create(
                 product_id=product_id,
                 defaults={
-                    "data": product_data
+                    "data": product_data,
+                    "payload_hash": payload_hash(product_data),
+                    **product_fields,
                 }
             )
             
@@ -177,6 +370,8 @@ class ProductSyncService:
             else:
                 stats["updated"] = 1
             
+            reindex_products([product_data])
+            
             # Save/update variants
             for variant_data in variants_data:
                 variant_id = variant_data.get("id")
@@ -187,7 +382,9 @@ class ProductSyncService:
                     variant_id=variant_id,
                     defaults={
                         "product_id": product_id,
-                        "data": variant_data
+                        "data": variant_data,
+                        "payload_hash": payload_hash([variant_data, variant_fields[variant_id]]),
+                        **variant_fields[variant_id],
                     }
                 )
                 
@@ -230,4 +427,6 @@ class ProductSyncService:
 
 __all__ = [
     'ProductSyncService',
+    'payload_hash',
+    'materialize_product_fields',
 ]
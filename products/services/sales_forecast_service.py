@@ -18,6 +18,10 @@ from products.services.dto import SalesForecastDTO, VariantMetadataDTO, ProductM
 from products.services.metadata_helper import extract_gdp_metadata, inject_gdp_metadata, update_variant_metadata
 from products.services.sapo_product_service import SapoProductService
 from products.models import VariantSalesForecast
+from orders.services.order_cache_service import OrderCacheService
+from orders.services.order_sync_service import OrderSyncService, parse_sapo_datetime
+from orders.services.order_fast_parser import iter_real_items
+from products.services.variant_daily_sales_service import VariantDailySalesService
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +46,8 @@ class SalesForecastService:
         self.sapo_client = sapo_client
         self.order_service = SapoOrderService(sapo_client)
         self.product_service = SapoProductService(sapo_client)
+        self._order_cache = OrderCacheService()
+        self._daily_sales = VariantDailySalesService(sapo_client)
     
     def calculate_sales_forecast(
         self, 
@@ -121,14 +127,24 @@ class SalesForecastService:
             print(f"[DEBUG] [BƯỚC 4] 🔄 FORCE REFRESH: Tính toán từ orders (2 kỳ)...")
             logger.info("[SalesForecastService] Force refresh: Calculating from orders...")
             step_start = time.time()
-            self._calculate_from_orders(
-                forecast_map, 
-                created_on_min_current, 
-                created_on_max_current,
-                created_on_min_previous,
-                created_on_max_previous,
+            calculated = self._calculate_from_daily_sales(
+                forecast_map,
+                start_date_current,
+                end_date,
+                start_date_previous,
+                end_date_previous,
+                now_iso,
                 days
             )
+            if not calculated:
+                self._calculate_from_orders(
+                    forecast_map, 
+                    created_on_min_current, 
+                    created_on_max_current,
+                    created_on_min_previous,
+                    created_on_max_previous,
+                    days
+                )
             print(f"[DEBUG] [BƯỚC 4] ✅ Hoàn thành ({time.time() - step_start:.2f}s)\n")
             
             # Tính ABC analysis nếu days=30
@@ -192,25 +208,21 @@ class SalesForecastService:
         all_products = []
         all_variants_map: Dict[int, Dict[str, Any]] = {}
         skipped_packsize_count = 0  # Đếm số variants packsize bị bỏ qua
-        page = 1
         limit = 250  # Tăng limit lên 250
         
-        while True:
-            if page == 1 or page % 5 == 0:
-                print(f"[DEBUG]        └─ Đang lấy products page {page}...")
-            
-            page_start = time.time()
-            response = self.sapo_client.core.list_products_raw(
+        pages = self.sapo_client.core.paginate(
+            lambda page: self.sapo_client.core.list_products_raw(
                 page=page,
                 limit=limit,
                 status="active",
                 product_types="normal"  # Chỉ lấy products có type = normal (loại bỏ packed, combo)
-            )
-            
-            products_data = response.get("products", [])
-            if not products_data:
-                break
-            
+            ),
+            items_key="products",
+            limit=limit,
+            max_pages=100,  # Safety limit
+            log_tag="SalesForecastService products",
+        )
+        for page, products_data in pages:
             all_products.extend(products_data)
             
             # Extract variants từ products và tạo map
@@ -229,23 +241,68 @@ class SalesForecastService:
                         all_variants_map[variant_id] = variant
             
             if page == 1 or page % 5 == 0:
-                print(f"[DEBUG]        └─ Page {page}: {len(products_data)} products, tổng: {len(all_products)} products, {len(all_variants_map)} variants ({time.time() - page_start:.2f}s)")
-            
-            if len(products_data) < limit:
-                break
-            
-            page += 1
-            
-            # Safety limit
-            if page > 100:
-                logger.warning("[SalesForecastService] Reached max pages limit (100)")
-                break
+                print(f"[DEBUG]        └─ Page {page}: {len(products_data)} products, tổng: {len(all_products)} products, {len(all_variants_map)} variants")
         
         print(f"[DEBUG]        └─ ✅ Tổng cộng {len(all_products)} products, {len(all_variants_map)} variants (1 pcs), đã bỏ qua {skipped_packsize_count} variants packsize (combo) ({time.time() - step_start:.2f}s)")
         if skipped_packsize_count > 0:
             logger.info(f"[SalesForecastService] Skipped {skipped_packsize_count} packsize variants (combo)")
         return all_products, all_variants_map
     
+    def _calculate_from_daily_sales(
+        self,
+        forecast_map: Dict[int, SalesForecastDTO],
+        start_date_current: datetime,
+        end_date_current: datetime,
+        start_date_previous: datetime,
+        end_date_previous: datetime,
+        now_iso: str,
+        days: int
+    ) -> bool:
+        """
+        Tính 2 kỳ bằng SUM trên bảng VariantDailySales (thay vì tải lại toàn bộ orders).
+        
+        Returns:
+            False nếu bảng chưa có đủ dữ liệu cho kỳ trước (caller fallback về _calculate_from_orders)
+        """
+        import time
+        step_start = time.time()
+        
+        try:
+            OrderSyncService(self.sapo_client).sync_incremental()
+            self._daily_sales.refresh()
+        except Exception as e:
+            logger.warning(f"[SalesForecastService] Daily sales refresh failed, fallback to orders: {e}")
+            return False
+        
+        if not self._daily_sales.covers(start_date_previous.date()):
+            logger.debug("[SalesForecastService] Daily sales table does not cover previous period, using orders")
+            return False
+        
+        current_totals = self._daily_sales.get_window_totals(start_date_current.date(), end_date_current.date())
+        previous_totals = self._daily_sales.get_window_totals(start_date_previous.date(), end_date_previous.date())
+        
+        for variant_id in set(current_totals) | set(previous_totals):
+            if variant_id not in forecast_map:
+                forecast_map[variant_id] = SalesForecastDTO(
+                    variant_id=variant_id,
+                    period_days=days,
+                    calculated_at=now_iso
+                )
+        
+        for variant_id, totals in current_totals.items():
+            forecast = forecast_map[variant_id]
+            forecast.total_sold += totals["quantity"]
+            # Revenue chỉ dùng cho days=30 hoặc 10 (giống _merge_page_result)
+            if days == 30 or days == 10:
+                forecast.revenue = (forecast.revenue or 0.0) + float(totals["revenue"])
+        
+        for variant_id, totals in previous_totals.items():
+            forecast_map[variant_id].total_sold_previous_period += totals["quantity"]
+        
+        self._calculate_rates(forecast_map, days)
+        logger.debug(f"[SalesForecastService] Computed 2 periods from daily sales in {time.time() - step_start:.2f}s")
+        return True
+    
     def _calculate_from_orders(
         self,
         forecast_map: Dict[int, SalesForecastDTO],
@@ -261,7 +318,13 @@ class SalesForecastService:
         from concurrent.futures import ThreadPoolExecutor, as_completed
         
         step_start = time.time()
-        
+
+        # Cập nhật order cache (incremental theo modified_on) trước khi đọc 2 kỳ
+        try:
+            OrderSyncService(self.sapo_client).sync_incremental()
+        except Exception as e:
+            logger.warning(f"[SalesForecastService] Order cache sync failed, fallback to Sapo API: {e}")
+
         # Dùng ThreadPoolExecutor để xử lý song song 2 kỳ
         print(f"[DEBUG]        └─ Bắt đầu lấy orders 2 kỳ song song từ Sapo...")
         
@@ -317,6 +380,17 @@ class SalesForecastService:
         
         print(f"[DEBUG]        └─ ✅ Đã hoàn thành cả 2 kỳ song song trong {time.time() - step_start:.2f}s")
         
+        self._calculate_rates(forecast_map, days)
+        logger.debug(f"[SalesForecastService] Computed rates in {time.time() - step_start:.2f}s")
+    
+    def _calculate_rates(
+        self,
+        forecast_map: Dict[int, SalesForecastDTO],
+        days: int
+    ):
+        """Tính tốc độ bán và % tăng trưởng từ total_sold/total_sold_previous_period"""
+        import time
+        
         # Tính tốc độ bán và % tăng trưởng
         print(f"[DEBUG]        └─ Tính tốc độ bán và % tăng trưởng cho {len(forecast_map)} variants...")
         calc_start = time.time()
@@ -346,69 +420,11 @@ class SalesForecastService:
             print(f"[DEBUG]        └─ Mẫu variants có bán: {', '.join(sample_variants)}")
         
         print(f"[DEBUG]        └─ ✅ {variants_with_sales} variants có lượt bán ({time.time() - calc_start:.2f}s)")
-        print(f"[DEBUG]        └─ ✅ Đã tính toán xong trong {time.time() - step_start:.2f}s")
         logger.info(f"[SalesForecastService] Calculated sales for {variants_with_sales} variants (period_days={days})")
     
-    def _fetch_orders_page_with_retry(
+    def _process_orders_data(
         self,
-        page: int,
-        limit: int,
-        created_on_min: str,
-        created_on_max: str,
-        max_retries: int = 3,
-        retry_delay: float = 1.0
-    ) -> Optional[Dict[str, Any]]:
-        """
-        Fetch một page orders với retry logic.
-        
-        Args:
-            page: Số trang
-            limit: Số lượng orders mỗi trang
-            created_on_min: Ngày bắt đầu
-            created_on_max: Ngày kết thúc
-            max_retries: Số lần retry tối đa
-            retry_delay: Thời gian chờ giữa các lần retry (giây)
-            
-        Returns:
-            Response dict hoặc None nếu lỗi
-        """
-        import time
-        
-        for attempt in range(max_retries):
-            try:
-                response = self.sapo_client.core.list_orders_raw(
-                    page=page,
-                    limit=limit,
-                    created_on_min=created_on_min,
-                    created_on_max=created_on_max,
-                    status=",".join(VALID_ORDER_STATUSES)
-                )
-                return response
-            except Exception as e:
-                error_msg = str(e)
-                # Kiểm tra nếu là lỗi Bad Gateway hoặc timeout
-                if "Bad Gateway" in error_msg or "502" in error_msg or "timeout" in error_msg.lower():
-                    if attempt < max_retries - 1:
-                        wait_time = retry_delay * (attempt + 1)  # Exponential backoff
-                        logger.warning(f"[SalesForecastService] Bad Gateway/Timeout on page {page}, retry {attempt + 1}/{max_retries} after {wait_time}s")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        logger.error(f"[SalesForecastService] Failed to fetch page {page} after {max_retries} retries: {e}")
-                        return None
-                else:
-                    # Lỗi khác, không retry
-                    logger.error(f"[SalesForecastService] Error fetching page {page}: {e}")
-                    return None
-        
-        return None
-    
-    def _process_orders_page(
-        self,
-        page: int,
-        limit: int,
-        created_on_min: str,
-        created_on_max: str,
+        orders_data: List[Dict[str, Any]],
         is_current_period: bool,
         forecast_map: Dict[int, SalesForecastDTO],
         lock: Optional[threading.Lock],
@@ -416,112 +432,84 @@ class SalesForecastService:
         days: int
     ) -> Dict[str, Any]:
         """
-        Xử lý một page orders (dùng trong thread).
+        Cộng dồn số lượng (real_items) và doanh thu từ list raw orders.
+        Dùng chung cho orders fetch từ Sapo API và orders đọc từ SapoOrderCache.
         
         Returns:
-            Dict với keys: orders_count, items_count, accumulator, revenue_accumulator (nếu days=30)
+            Dict với keys: orders_count, items_count, accumulator, revenue_accumulator
         """
-        from datetime import datetime
-        from zoneinfo import ZoneInfo
-        from decimal import Decimal
-        
         local_accumulator: Dict[int, int] = {}
-        local_revenue_accumulator: Dict[int, Decimal] = {}  # Chỉ dùng khi days=30
+        local_revenue_accumulator: Dict[int, Decimal] = {}  # Chỉ dùng khi days=30 hoặc 10
         orders_count = 0
         items_count = 0
         
-        # Fetch page với retry
-        response = self._fetch_orders_page_with_retry(
-            page=page,
-            limit=limit,
-            created_on_min=created_on_min,
-            created_on_max=created_on_max
-        )
-        
-        if not response:
-            return {"orders_count": 0, "items_count": 0, "accumulator": {}}
-        
-        orders_data = response.get("orders", [])
-        if not orders_data:
-            return {"orders_count": 0, "items_count": 0, "accumulator": {}}
-        
-        # Process orders
-        for order_data in orders_data:
-            try:
-                order = self.order_service.factory.from_sapo_json(
-                    order_data,
-                    sapo_client=self.sapo_client
-                )
-                
-                if not order.real_items:
-                    continue
-                
-                # Tạo set các variant_ids có trong real_items để chỉ tính revenue cho những variant này
-                real_variant_ids = set()
-                for real_item in order.real_items:
-                    if real_item.variant_id:
-                        real_variant_ids.add(real_item.variant_id)
-                
-                # Xử lý quantity từ real_items (đã qui đổi)
-                for real_item in order.real_items:
-                    variant_id = real_item.variant_id
-                    if not variant_id:
-                        continue
-                    
-                    # Tạo forecast entry nếu chưa có
-                    if variant_id not in forecast_map:
-                        if lock:
-                            with lock:
-                                if variant_id not in forecast_map:
-                                    forecast_map[variant_id] = SalesForecastDTO(
-                                        variant_id=variant_id,
-                                        period_days=days,
-                                        calculated_at=now_iso if is_current_period else None
-                                    )
-                        else:
+        # Process orders (fast-path parser, không dựng OrderDTO)
+        for order_data, real_items in iter_real_items(orders_data):
+            if not real_items:
+                continue
+            
+            for variant_id, quantity, amount in real_items:
+                # Tạo forecast entry nếu chưa có
+                if variant_id not in forecast_map:
+                    if lock:
+                        with lock:
                             if variant_id not in forecast_map:
                                 forecast_map[variant_id] = SalesForecastDTO(
                                     variant_id=variant_id,
                                     period_days=days,
                                     calculated_at=now_iso if is_current_period else None
                                 )
-                    
-                    # Accumulate quantity
-                    if variant_id not in local_accumulator:
-                        local_accumulator[variant_id] = 0
-                    local_accumulator[variant_id] += int(real_item.quantity)
-                    items_count += 1
+                    else:
+                        forecast_map[variant_id] = SalesForecastDTO(
+                            variant_id=variant_id,
+                            period_days=days,
+                            calculated_at=now_iso if is_current_period else None
+                        )
                 
-                # Tính revenue từ order_line_items (cho period_days=30 hoặc 10 và is_current_period)
-                if (days == 30 or days == 10) and is_current_period:
-                    for line_item in order.order_line_items:
-                        variant_id = line_item.variant_id
-                        if not variant_id or variant_id not in real_variant_ids:
-                            continue
-                        
-                        # Bỏ qua các line items không phải sản phẩm
-                        if not line_item.product_id or not line_item.variant_id:
-                            continue
-                        
-                        line_amount = float(line_item.line_amount or 0)
-                        if line_amount > 0:
-                            if variant_id not in local_revenue_accumulator:
-                                local_revenue_accumulator[variant_id] = Decimal("0")
-                            local_revenue_accumulator[variant_id] += Decimal(str(line_amount))
+                # Accumulate quantity (real_items đã qui đổi)
+                local_accumulator[variant_id] = local_accumulator.get(variant_id, 0) + quantity
+                items_count += 1
                 
-                orders_count += 1
-            except Exception as e:
-                logger.warning(f"[SalesForecastService] Error processing order {order_data.get('id')}: {e}")
-                continue
+                # Tính revenue (cho period_days=30 hoặc 10 và is_current_period)
+                if (days == 30 or days == 10) and is_current_period and amount > 0:
+                    if variant_id not in local_revenue_accumulator:
+                        local_revenue_accumulator[variant_id] = Decimal("0")
+                    local_revenue_accumulator[variant_id] += Decimal(str(amount))
+            
+            orders_count += 1
         
         return {
             "orders_count": orders_count,
             "items_count": items_count,
             "accumulator": local_accumulator,
             "revenue_accumulator": local_revenue_accumulator if (days == 30 or days == 10) else {},
-            "has_more": len(orders_data) >= limit
         }
     
+    def _merge_page_result(
+        self,
+        forecast_map: Dict[int, SalesForecastDTO],
+        result: Dict[str, Any],
+        is_current_period: bool,
+        lock: threading.Lock,
+        days: int
+    ):
+        """Cộng kết quả 1 page (accumulator/revenue_accumulator) vào forecast_map (thread-safe)."""
+        with lock:
+            for variant_id, quantity in result["accumulator"].items():
+                if variant_id in forecast_map:
+                    if is_current_period:
+                        forecast_map[variant_id].total_sold += quantity
+                    else:
+                        forecast_map[variant_id].total_sold_previous_period += quantity
+            
+            # Update revenue accumulator (cho days=30 hoặc 10 và is_current_period)
+            if (days == 30 or days == 10) and is_current_period and "revenue_accumulator" in result:
+                for variant_id, revenue in result["revenue_accumulator"].items():
+                    if variant_id in forecast_map:
+                        if forecast_map[variant_id].revenue is None:
+                            forecast_map[variant_id].revenue = 0.0
+                        forecast_map[variant_id].revenue += float(revenue)
+    
     def _calculate_period(
         self,
         forecast_map: Dict[int, SalesForecastDTO],
@@ -532,12 +520,11 @@ class SalesForecastService:
         now_iso: Optional[str] = None,
         days: int = 7
     ):
-        """Tính toán cho một kỳ cụ thể (thread-safe, multi-threaded pages)"""
+        """Tính toán cho một kỳ cụ thể (thread-safe, pages fetch song song qua paginator)"""
         import time
         import threading
         from datetime import datetime
         from zoneinfo import ZoneInfo
-        from concurrent.futures import ThreadPoolExecutor, as_completed
         
         period_start = time.time()
         
@@ -553,138 +540,65 @@ class SalesForecastService:
         if lock is None:
             lock = threading.Lock()
         
-        # Tìm số pages đầu tiên để xác định phạm vi
-        # Fetch page 1 để biết có bao nhiêu pages
-        first_page_result = self._process_orders_page(
-            page=1,
-            limit=limit,
-            created_on_min=created_on_min,
-            created_on_max=created_on_max,
-            is_current_period=is_current_period,
-            forecast_map=forecast_map,
-            lock=lock,
-            now_iso=now_iso,
-            days=days
-        )
+        # Ưu tiên đọc từ order cache (SapoOrderCache) nếu đã backfill đủ khoảng thời gian
+        period_min_dt = parse_sapo_datetime(created_on_min)
+        if period_min_dt and self._order_cache.covers(period_min_dt):
+            orders_data = self._order_cache.list_orders_raw(
+                created_on_min=period_min_dt,
+                created_on_max=parse_sapo_datetime(created_on_max),
+                statuses=VALID_ORDER_STATUSES
+            )
+            result = self._process_orders_data(
+                orders_data,
+                is_current_period=is_current_period,
+                forecast_map=forecast_map,
+                lock=lock,
+                now_iso=now_iso,
+                days=days
+            )
+            total_orders += result["orders_count"]
+            total_items_processed += result["items_count"]
+            self._merge_page_result(forecast_map, result, is_current_period, lock, days)
+            
+            period_name = "hiện tại" if is_current_period else "trước"
+            thread_id = threading.current_thread().name
+            print(f"[DEBUG]        └─ [{thread_id}] ✅ Kỳ {period_name} (order cache): {total_orders} orders, {total_items_processed} items trong {time.time() - period_start:.2f}s")
+            logger.info(f"[SalesForecastService] Processed {total_orders} orders from order cache for {'current' if is_current_period else 'previous'} period")
+            return
         
-        if not first_page_result.get("has_more", False):
-            # Chỉ có 1 page
-            total_orders += first_page_result["orders_count"]
-            total_items_processed += first_page_result["items_count"]
-            # Update accumulator
-            with lock:
-                for variant_id, quantity in first_page_result["accumulator"].items():
-                    if variant_id in forecast_map:
-                        if is_current_period:
-                            forecast_map[variant_id].total_sold += quantity
-                        else:
-                            forecast_map[variant_id].total_sold_previous_period += quantity
-                
-                # Update revenue accumulator (cho days=30 hoặc 10 và is_current_period)
-                if (days == 30 or days == 10) and is_current_period and "revenue_accumulator" in first_page_result:
-                    for variant_id, revenue in first_page_result["revenue_accumulator"].items():
-                        if variant_id in forecast_map:
-                            if forecast_map[variant_id].revenue is None:
-                                forecast_map[variant_id].revenue = 0.0
-                            forecast_map[variant_id].revenue += float(revenue)
-                
-                # Update revenue accumulator (cho days=30 hoặc 10 và is_current_period)
-                if (days == 30 or days == 10) and is_current_period and "revenue_accumulator" in first_page_result:
-                    for variant_id, revenue in first_page_result["revenue_accumulator"].items():
-                        if variant_id in forecast_map:
-                            if forecast_map[variant_id].revenue is None:
-                                forecast_map[variant_id].revenue = 0.0
-                            forecast_map[variant_id].revenue += float(revenue)
-        else:
-            # Có nhiều pages, xử lý song song
-            # Sử dụng ThreadPoolExecutor với 4-8 workers để fetch pages song song
-            max_workers = 6  # Số threads song song cho mỗi kỳ
-            page = 2  # Bắt đầu từ page 2 (page 1 đã xử lý)
-            max_pages = 1000  # Safety limit
-            
-            # Update accumulator từ page 1
-            total_orders += first_page_result["orders_count"]
-            total_items_processed += first_page_result["items_count"]
-            with lock:
-                for variant_id, quantity in first_page_result["accumulator"].items():
-                    if variant_id in forecast_map:
-                        if is_current_period:
-                            forecast_map[variant_id].total_sold += quantity
-                        else:
-                            forecast_map[variant_id].total_sold_previous_period += quantity
-                
-                # Update revenue accumulator (cho days=30 hoặc 10 và is_current_period)
-                if (days == 30 or days == 10) and is_current_period and "revenue_accumulator" in first_page_result:
-                    for variant_id, revenue in first_page_result["revenue_accumulator"].items():
-                        if variant_id in forecast_map:
-                            if forecast_map[variant_id].revenue is None:
-                                forecast_map[variant_id].revenue = 0.0
-                            forecast_map[variant_id].revenue += float(revenue)
-            
-            # Xử lý các pages còn lại song song
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = {}
-                has_more = True
+        # Fetch pages song song qua paginator (concurrency tự điều chỉnh theo 429/5xx/latency)
+        core_api = self.sapo_client.core
+        try:
+            for page_num, orders_data in core_api.paginate(
+                lambda page: core_api.list_orders_raw(
+                    page=page,
+                    limit=limit,
+                    created_on_min=created_on_min,
+                    created_on_max=created_on_max,
+                    status=",".join(VALID_ORDER_STATUSES)
+                ),
+                items_key="orders",
+                limit=limit,
+                log_tag="SalesForecastService",
+            ):
+                result = self._process_orders_data(
+                    orders_data,
+                    is_current_period=is_current_period,
+                    forecast_map=forecast_map,
+                    lock=lock,
+                    now_iso=now_iso,
+                    days=days
+                )
+                total_orders += result["orders_count"]
+                total_items_processed += result["items_count"]
+                self._merge_page_result(forecast_map, result, is_current_period, lock, days)
                 
-                while has_more and page <= max_pages:
-                    # Submit các pages để xử lý song song
-                    while len(futures) < max_workers and page <= max_pages:
-                        future = executor.submit(
-                            self._process_orders_page,
-                            page=page,
-                            limit=limit,
-                            created_on_min=created_on_min,
-                            created_on_max=created_on_max,
-                            is_current_period=is_current_period,
-                            forecast_map=forecast_map,
-                            lock=lock,
-                            now_iso=now_iso,
-                            days=days
-                        )
-                        futures[future] = page
-                        page += 1
-                    
-                    # Xử lý các futures hoàn thành
-                    for future in as_completed(futures):
-                        page_num = futures.pop(future)
-                        try:
-                            result = future.result()
-                            total_orders += result["orders_count"]
-                            total_items_processed += result["items_count"]
-                            
-                            # Update accumulator
-                            with lock:
-                                for variant_id, quantity in result["accumulator"].items():
-                                    if variant_id in forecast_map:
-                                        if is_current_period:
-                                            forecast_map[variant_id].total_sold += quantity
-                                        else:
-                                            forecast_map[variant_id].total_sold_previous_period += quantity
-                                
-                                # Update revenue accumulator (cho days=30 hoặc 10 và is_current_period)
-                                if (days == 30 or days == 10) and is_current_period and "revenue_accumulator" in result:
-                                    for variant_id, revenue in result["revenue_accumulator"].items():
-                                        if variant_id in forecast_map:
-                                            if forecast_map[variant_id].revenue is None:
-                                                forecast_map[variant_id].revenue = 0.0
-                                            forecast_map[variant_id].revenue += float(revenue)
-                            
-                            # Kiểm tra xem còn pages không
-                            if not result.get("has_more", False):
-                                has_more = False
-                                # Cancel các futures còn lại
-                                for f in list(futures.keys()):
-                                    f.cancel()
-                                futures.clear()
-                                break
-                            
-                            if page_num % 20 == 0:
-                                period_name = "hiện tại" if is_current_period else "trước"
-                                thread_id = threading.current_thread().name
-                                print(f"[DEBUG]        └─ [{thread_id}] Đã xử lý page {page_num} (kỳ {period_name}): {total_orders} orders")
-                        except Exception as e:
-                            logger.error(f"[SalesForecastService] Error processing page {page_num}: {e}", exc_info=True)
-                            continue
+                if page_num % 20 == 0:
+                    period_name = "hiện tại" if is_current_period else "trước"
+                    thread_id = threading.current_thread().name
+                    print(f"[DEBUG]        └─ [{thread_id}] Đã xử lý page {page_num} (kỳ {period_name}): {total_orders} orders")
+        except Exception as e:
+            logger.error(f"[SalesForecastService] Error fetching orders pages: {e}", exc_info=True)
         
         period_name = "hiện tại" if is_current_period else "trước"
         thread_id = threading.current_thread().name
@@ -23,6 +23,7 @@ from products.services.metadata_helper import (
     update_variant_metadata
 )
 from products.services.product_cache_service import ProductCacheService
+from products.services.shopee_variant_index import reindex_product_metadata
 
 logger = logging.getLogger(__name__)
 
@@ -260,6 +261,11 @@ class SapoProductService:
                 
                 if response.get('product'):
                     logger.info(f"Updated GDP metadata for product {product_id}")
+                    # Đồng bộ index Shopee item -> variant (update_variant_metadata_only cũng đi qua đây)
+                    try:
+                        reindex_product_metadata(product_id, metadata)
+                    except Exception as index_error:
+                        logger.warning(f"Failed to update Shopee variant index for product {product_id}: {index_error}")
                     return True
                 else:
                     logger.error(f"Failed to update product {product_id}: No product in response")
@@ -0,0 +1,178 @@
+# products/services/shopee_variant_index.py
+"""
+Index bền vững (connection_id, Shopee item_id) -> [Sapo variant_id].
+
+Trước đây FeedbackService phải list toàn bộ products trên Sapo và parse [GDP_META]
+mỗi lần khởi tạo. Index giờ nằm trong bảng ShopeeItemVariantIndex và được cập nhật:
+- Khi sync products vào cache (ProductSyncService)
+- Khi sửa metadata (SapoProductService.update_product_metadata)
+
+Tra cứu = 1 query theo index (connection_id, item_id).
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+from django.db import transaction
+
+from products.models import SapoProductCache, ShopeeItemVariantIndex
+from products.services.dto import ProductMetadataDTO
+from products.services.metadata_helper import extract_gdp_metadata
+
+logger = logging.getLogger(__name__)
+
+
+def links_from_metadata(metadata: Optional[ProductMetadataDTO]) -> List[Tuple[int, str, int]]:
+    """
+    Lấy các cặp (connection_id, item_id, variant_id) từ shopee_connections trong GDP metadata.
+    """
+    links = []
+    if not metadata or not metadata.variants:
+        return links
+
+    for variant_meta in metadata.variants:
+        for conn in variant_meta.shopee_connections or []:
+            connection_id = conn.get('connection_id')
+            item_id = conn.get('item_id')
+            if not connection_id or not item_id or not variant_meta.id:
+                continue
+            links.append((int(connection_id), str(item_id), int(variant_meta.id)))
+    return links
+
+
+def links_from_product_data(product_data: Dict[str, Any]) -> List[Tuple[int, str, int]]:
+    """
+    Lấy links từ raw product JSON (Sapo API / SapoProductCache.data).
+    Chỉ index products đang active (giống index cũ build từ list_products(status='active')).
+    """
+    if (product_data.get('status') or 'active') != 'active':
+        return []
+    metadata, _ = extract_gdp_metadata(product_data.get('description'))
+    return links_from_metadata(metadata)
+
+
+def _replace_product_links(product_links: Dict[int, List[Tuple[int, str, int]]]) -> int:
+    """Xóa index cũ của các products và ghi lại links mới. Trả về số dòng đã ghi."""
+    if not product_links:
+        return 0
+
+    rows = []
+    for product_id, links in product_links.items():
+        for connection_id, item_id, variant_id in set(links):
+            rows.append(ShopeeItemVariantIndex(
+                connection_id=connection_id,
+                item_id=item_id,
+                variant_id=variant_id,
+                product_id=product_id,
+            ))
+
+    with transaction.atomic():
+        ShopeeItemVariantIndex.objects.filter(product_id__in=list(product_links)).delete()
+        # ignore_conflicts: cùng (connection, item, variant) có thể nằm trong 2 products khác nhau
+        ShopeeItemVariantIndex.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+    return len(rows)
+
+
+def reindex_products(products_data: Iterable[Dict[str, Any]]) -> int:
+    """
+    Build lại index cho các products (raw JSON) vừa được sync.
+
+    Returns:
+        Số dòng index đã ghi
+    """
+    product_links = {}
+    for product_data in products_data:
+        product_id = product_data.get('id')
+        if product_id:
+            product_links[int(product_id)] = links_from_product_data(product_data)
+    return _replace_product_links(product_links)
+
+
+def reindex_product_metadata(product_id: int, metadata: Optional[ProductMetadataDTO]) -> int:
+    """
+    Build lại index cho 1 product sau khi GDP metadata được cập nhật.
+
+    Returns:
+        Số dòng index đã ghi
+    """
+    return _replace_product_links({int(product_id): links_from_metadata(metadata)})
+
+
+def get_variant_ids(connection_id: int, item_id: Any) -> List[int]:
+    """
+    Tra cứu variant_ids theo (connection_id, Shopee item_id).
+    """
+    if not connection_id or not item_id:
+        return []
+    return list(
+        ShopeeItemVariantIndex.objects
+        .filter(connection_id=int(connection_id), item_id=str(item_id))
+        .order_by('variant_id')
+        .values_list('variant_id', flat=True)
+    )
+
+
+def get_variant_ids_many(keys: Iterable[Tuple[Any, Any]]) -> Dict[Tuple[int, str], List[int]]:
+    """
+    Tra cứu nhiều cặp (connection_id, item_id) trong 1 query.
+
+    Returns:
+        Dict {(connection_id, item_id_str): [variant_id, ...]} (chỉ gồm các cặp có trong index)
+    """
+    pairs = {(int(c), str(i)) for c, i in keys if c and i}
+    if not pairs:
+        return {}
+
+    result: Dict[Tuple[int, str], List[int]] = {}
+    rows = (
+        ShopeeItemVariantIndex.objects
+        .filter(
+            connection_id__in={c for c, _ in pairs},
+            item_id__in={i for _, i in pairs},
+        )
+        .order_by('variant_id')
+        .values_list('connection_id', 'item_id', 'variant_id')
+    )
+    for connection_id, item_id, variant_id in rows:
+        if (connection_id, item_id) in pairs:
+            result.setdefault((connection_id, item_id), []).append(variant_id)
+    return result
+
+
+def rebuild_index(batch_size: int = 500) -> Dict[str, int]:
+    """
+    Build lại toàn bộ index từ SapoProductCache (không gọi Sapo API).
+
+    Returns:
+        {"products": int, "links": int}
+    """
+    stats = {"products": 0, "links": 0}
+    product_links = {}
+
+    with transaction.atomic():
+        ShopeeItemVariantIndex.objects.all().delete()
+        for product_id, data in SapoProductCache.objects.values_list('product_id', 'data').iterator(chunk_size=batch_size):
+            stats["products"] += 1
+            product_links[product_id] = links_from_product_data(data or {})
+            if len(product_links) >= batch_size:
+                stats["links"] += _replace_product_links(product_links)
+                product_links = {}
+        stats["links"] += _replace_product_links(product_links)
+
+    logger.info(
+        f"[ShopeeVariantIndex] Rebuilt index: {stats['links']} links from {stats['products']} products"
+    )
+    return stats
+
+
+# ========================= EXPORTS =========================
+
+__all__ = [
+    'links_from_metadata',
+    'links_from_product_data',
+    'reindex_products',
+    'reindex_product_metadata',
+    'get_variant_ids',
+    'get_variant_ids_many',
+    'rebuild_index',
+]
@@ -0,0 +1,234 @@
+# products/services/variant_daily_sales_service.py
+"""
+Service để duy trì bảng tổng lượt bán theo variant theo ngày (VariantDailySales).
+
+- build(days): dựng lại toàn bộ N ngày gần nhất từ SapoOrderCache (chạy 1 lần).
+- refresh(): chỉ dựng lại các ngày có đơn thay đổi kể từ lần trước
+  (dựa vào SapoOrderCache.synced_at), gồm cả đơn bị huỷ/sửa.
+- get_window_totals(date_from, date_to): tổng kỳ bất kỳ bằng 1 query SUM.
+"""
+
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from typing import Dict, Any, Iterable, Optional
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from core.sapo_client import get_sapo_client
+from orders.models import SapoOrderCache, SapoOrderSyncState
+from orders.services.order_cache_service import OrderCacheService
+from orders.services.order_fast_parser import iter_real_items
+from products.models import VariantDailySales
+
+logger = logging.getLogger(__name__)
+
+# Dòng riêng trong SapoOrderSyncState: covered_from = ngày đầu đã dựng,
+# last_synced_at = mốc (SapoOrderCache.synced_at) của lần refresh trước
+SYNC_KEY_DAILY_SALES = "variant_daily_sales"
+
+REFRESH_LOCK_KEY = "variant_daily_sales_refresh_lock"
+REFRESH_LOCK_TIMEOUT = 600  # 10 minutes
+
+# Kéo lùi mốc synced_at để không sót đơn được ghi cùng lúc với lần refresh trước
+DIRTY_OVERLAP_SECONDS = 60
+
+# Status orders được tính là đã bán (giống SalesForecastService)
+SOLD_ORDER_STATUSES = ["finalized", "completed"]
+
+
+def day_bounds(day: date) -> tuple[datetime, datetime]:
+    """Trả về (00:00:00, 23:59:59.999999) UTC của ngày."""
+    start = datetime.combine(day, dt_time.min, tzinfo=dt_timezone.utc)
+    return start, start + timedelta(days=1) - timedelta(microseconds=1)
+
+
+class VariantDailySalesService:
+    """
+    Service để cập nhật và truy vấn VariantDailySales.
+    """
+
+    def __init__(self, sapo_client=None):
+        self.sapo_client = sapo_client or get_sapo_client()
+        self.order_cache = OrderCacheService()
+
+    # ==================== PUBLIC API ====================
+
+    @staticmethod
+    def get_state() -> SapoOrderSyncState:
+        state, _ = SapoOrderSyncState.objects.get_or_create(key=SYNC_KEY_DAILY_SALES)
+        return state
+
+    def covers(self, date_from: date) -> bool:
+        """True nếu bảng đã có đầy đủ dữ liệu từ ngày date_from tới hiện tại."""
+        state = SapoOrderSyncState.objects.filter(key=SYNC_KEY_DAILY_SALES).first()
+        if not state or not state.covered_from:
+            return False
+        return state.covered_from.astimezone(dt_timezone.utc).date() <= date_from
+
+    def build(self, days: int) -> Dict[str, Any]:
+        """
+        Dựng lại toàn bộ N ngày gần nhất từ SapoOrderCache.
+        Yêu cầu order cache đã backfill đủ N ngày (sync_sapo_orders --days N).
+
+        Returns:
+            Dict thống kê {"days": int, "rows": int}
+        """
+        started_at = timezone.now()
+        today = started_at.astimezone(dt_timezone.utc).date()
+        first_day = today - timedelta(days=days)
+        first_day_start, _ = day_bounds(first_day)
+
+        if not self.order_cache.covers(first_day_start):
+            raise ValueError(
+                f"Order cache chưa có đủ dữ liệu từ {first_day}. "
+                f"Chạy: python manage.py sync_sapo_orders --days {days + 1}"
+            )
+
+        all_days = [first_day + timedelta(days=i) for i in range((today - first_day).days + 1)]
+        rows = self.rebuild_days(all_days)
+
+        state = self.get_state()
+        if state.covered_from is None or first_day_start < state.covered_from:
+            state.covered_from = first_day_start
+        state.last_synced_at = started_at
+        state.last_stats = {"days": len(all_days), "rows": rows}
+        state.save()
+
+        logger.info(f"[VariantDailySalesService] Built {len(all_days)} days ({rows} rows)")
+        return {"days": len(all_days), "rows": rows}
+
+    def refresh(self) -> Dict[str, Any]:
+        """
+        Dựng lại các ngày có đơn thay đổi (SapoOrderCache.synced_at >= mốc lần trước).
+
+        Returns:
+            Dict thống kê {"days": int, "rows": int}, có key "skipped" nếu không chạy
+        """
+        state = self.get_state()
+        if state.covered_from is None or state.last_synced_at is None:
+            return {"skipped": "not_initialized", "days": 0, "rows": 0}
+
+        started_at = timezone.now()
+        if not cache.add(REFRESH_LOCK_KEY, started_at.isoformat(), REFRESH_LOCK_TIMEOUT):
+            return {"skipped": "locked", "days": 0, "rows": 0}
+
+        try:
+            since = state.last_synced_at - timedelta(seconds=DIRTY_OVERLAP_SECONDS)
+            created_on_values = (
+                SapoOrderCache.objects
+                .filter(synced_at__gte=since, created_on__gte=state.covered_from)
+                .values_list("created_on", flat=True)
+            )
+            dirty_days = sorted({
+                created_on.astimezone(dt_timezone.utc).date()
+                for created_on in created_on_values
+                if created_on
+            })
+
+            rows = self.rebuild_days(dirty_days) if dirty_days else 0
+
+            state.last_synced_at = started_at
+            state.last_stats = {"days": len(dirty_days), "rows": rows}
+            state.save()
+
+            if dirty_days:
+                logger.info(f"[VariantDailySalesService] Refreshed {len(dirty_days)} days ({rows} rows)")
+            return {"days": len(dirty_days), "rows": rows}
+        finally:
+            cache.delete(REFRESH_LOCK_KEY)
+
+    def rebuild_days(self, days: Iterable[date]) -> int:
+        """
+        Tính lại VariantDailySales cho từng ngày từ SapoOrderCache (xoá + ghi lại).
+
+        Returns:
+            Tổng số rows đã ghi
+        """
+        total_rows = 0
+        for day in days:
+            day_start, day_end = day_bounds(day)
+            orders_data = self.order_cache.list_orders_raw(
+                created_on_min=day_start,
+                created_on_max=day_end,
+                statuses=SOLD_ORDER_STATUSES
+            )
+            totals = self.aggregate_orders(orders_data)
+
+            rows = [
+                VariantDailySales(
+                    variant_id=variant_id,
+                    date=day,
+                    quantity=values["quantity"],
+                    revenue=values["revenue"],
+                    order_count=values["order_count"],
+                )
+                for variant_id, values in totals.items()
+            ]
+            with transaction.atomic():
+                VariantDailySales.objects.filter(date=day).delete()
+                VariantDailySales.objects.bulk_create(rows, batch_size=1000)
+            total_rows += len(rows)
+        return total_rows
+
+    def aggregate_orders(self, orders_data: Iterable[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        """
+        Cộng dồn quantity (real_items, đã qui đổi) và revenue (line_amount) theo variant.
+        Dùng fast-path parser (order_fast_parser), không dựng OrderDTO.
+
+        Returns:
+            Dict {variant_id: {"quantity": int, "revenue": Decimal, "order_count": int}}
+        """
+        totals: Dict[int, Dict[str, Any]] = {}
+
+        for order_data, real_items in iter_real_items(orders_data):
+            for variant_id, quantity, amount in real_items:
+                entry = totals.setdefault(
+                    variant_id,
+                    {"quantity": 0, "revenue": Decimal("0"), "order_count": 0}
+                )
+                entry["quantity"] += quantity
+                entry["order_count"] += 1
+                if amount > 0:
+                    entry["revenue"] += Decimal(str(amount))
+
+        return totals
+
+    def get_window_totals(
+        self,
+        date_from: date,
+        date_to: date,
+        variant_ids: Optional[Iterable[int]] = None
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        Tổng quantity/revenue theo variant trong khoảng ngày [date_from, date_to].
+
+        Returns:
+            Dict {variant_id: {"quantity": int, "revenue": Decimal}}
+        """
+        queryset = VariantDailySales.objects.filter(date__gte=date_from, date__lte=date_to)
+        if variant_ids is not None:
+            queryset = queryset.filter(variant_id__in=list(variant_ids))
+
+        rows = queryset.values("variant_id").annotate(
+            total_quantity=Sum("quantity"),
+            total_revenue=Sum("revenue"),
+        )
+        return {
+            row["variant_id"]: {
+                "quantity": row["total_quantity"] or 0,
+                "revenue": row["total_revenue"] or Decimal("0"),
+            }
+            for row in rows
+        }
+
+
+# ========================= EXPORTS =========================
+
+__all__ = [
+    'VariantDailySalesService',
+    'day_bounds',
+]
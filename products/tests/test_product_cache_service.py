@@ -0,0 +1,59 @@
+# products/tests/test_product_cache_service.py
+"""
+Tests for ProductCacheService batch reads - số query cố định bất kể số products/variants.
+"""
+
+from django.test import TestCase
+
+from products.services.product_cache_service import ProductCacheService
+from products.services.product_sync_service import ProductSyncService
+
+
+def _image(path):
+    return {"id": 1, "path": path, "full_path": f"https://cdn/{path}", "file_name": path}
+
+
+class TestProductCacheBatchReads(TestCase):
+    """Test get_products_many / get_variants_many / get_variant_images_many"""
+
+    def setUp(self):
+        products = []
+        for product_id in range(1, 6):
+            products.append({
+                "id": product_id, "tenant_id": 1, "name": f"P{product_id}", "status": "active",
+                "images": [_image(f"p{product_id}.jpg")],
+                "variants": [
+                    # Variant chẵn có ảnh riêng, variant lẻ dùng ảnh product
+                    {
+                        "id": product_id * 10 + i, "tenant_id": 1, "product_id": product_id,
+                        "sku": f"SKU-{product_id}-{i}", "name": f"P{product_id} - {i}",
+                        "images": [_image(f"v{product_id}{i}.jpg")] if i % 2 == 0 else [],
+                    }
+                    for i in range(2)
+                ],
+            })
+        ProductSyncService.__new__(ProductSyncService).save_products_bulk(products)
+        self.service = ProductCacheService()
+
+    def test_get_products_many(self):
+        with self.assertNumQueries(1):
+            products = self.service.get_products_many([1, 2, 3, 99, None])
+        self.assertEqual(sorted(products), [1, 2, 3])
+        self.assertEqual(products[2].name, "P2")
+
+    def test_get_variants_many(self):
+        with self.assertNumQueries(1):
+            variants = self.service.get_variants_many([10, 11, 51, 999])
+        self.assertEqual(sorted(variants), [10, 11, 51])
+        self.assertEqual(variants[51].sku, "SKU-5-1")
+
+    def test_get_variant_images_many_falls_back_to_product_image(self):
+        with self.assertNumQueries(2):
+            images = self.service.get_variant_images_many([10, 11, 20, 21, 31])
+        self.assertEqual(images[10], "https://cdn/v10.jpg")
+        self.assertEqual(images[11], "https://cdn/p1.jpg")
+        self.assertEqual(images[31], "https://cdn/p3.jpg")
+
+        with self.assertNumQueries(2):
+            all_images = self.service.get_all_variant_images()
+        self.assertEqual(len(all_images), 10)
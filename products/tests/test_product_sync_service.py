@@ -0,0 +1,110 @@
+# products/tests/test_product_sync_service.py
+"""
+Tests for ProductSyncService.save_products_bulk - bulk upsert + bỏ qua payload không đổi,
+các cột materialize và index Shopee item -> variant cập nhật theo.
+"""
+
+import copy
+
+from django.test import TestCase
+
+from products.models import SapoProductCache, SapoVariantCache, ShopeeItemVariantIndex
+from products.services.product_cache_service import ProductCacheService
+from products.services.product_sync_service import ProductSyncService
+from products.services.shopee_variant_index import get_variant_ids, rebuild_index
+
+
+class TestSaveProductsBulk(TestCase):
+    """Test bulk upsert products/variants vào cache"""
+
+    def setUp(self):
+        # Không cần Sapo client cho phần ghi DB
+        self.service = ProductSyncService.__new__(ProductSyncService)
+        self.page = [
+            {"id": 1, "name": "A", "variants": [{"id": 11, "sku": "A-1"}, {"id": 12, "sku": "A-2", "images": None}]},
+            {"id": 2, "name": "B", "variants": None},
+        ]
+
+    def test_creates_then_skips_unchanged(self):
+        stats = self.service.save_products_bulk(copy.deepcopy(self.page))
+        self.assertEqual(stats["created_products"], 2)
+        self.assertEqual(stats["created_variants"], 2)
+        self.assertEqual(SapoVariantCache.objects.get(variant_id=12).data["images"], [])
+
+        stats = self.service.save_products_bulk(copy.deepcopy(self.page))
+        self.assertEqual(stats["unchanged_products"], 2)
+        self.assertEqual(stats["unchanged_variants"], 2)
+        self.assertEqual(stats["updated_products"] + stats["created_products"], 0)
+
+    def test_updates_only_changed_rows(self):
+        self.service.save_products_bulk(copy.deepcopy(self.page))
+        changed = copy.deepcopy(self.page)
+        changed[0]["variants"][0]["sku"] = "A-1-NEW"
+
+        stats = self.service.save_products_bulk(changed)
+        self.assertEqual(stats["updated_products"], 1)
+        self.assertEqual(stats["unchanged_products"], 1)
+        self.assertEqual(stats["updated_variants"], 1)
+        self.assertEqual(stats["unchanged_variants"], 1)
+        self.assertEqual(SapoVariantCache.objects.get(variant_id=11).data["sku"], "A-1-NEW")
+        self.assertEqual(SapoProductCache.objects.count(), 2)
+
+
+class TestShopeeVariantIndex(TestCase):
+    """Test index Shopee item -> variant được cập nhật khi sync products"""
+
+    def setUp(self):
+        self.service = ProductSyncService.__new__(ProductSyncService)
+
+    @staticmethod
+    def _product(item_id):
+        meta = (
+            '[GDP_META]{"variants": [{"id": 11, "shopee_connections": '
+            '[{"connection_id": 134366, "variation_id": "1", "item_id": "%s"}]}]}[/GDP_META]' % item_id
+        )
+        return {"id": 1, "status": "active", "description": "Mô tả\n" + meta, "variants": [{"id": 11}]}
+
+    def test_sync_updates_index(self):
+        self.service.save_products_bulk([self._product("555")])
+        self.assertEqual(get_variant_ids(134366, "555"), [11])
+
+        self.service.save_products_bulk([self._product("777")])
+        self.assertEqual(get_variant_ids(134366, "555"), [])
+        self.assertEqual(get_variant_ids(134366, 777), [11])
+
+    def test_rebuild_from_cache(self):
+        self.service.save_products_bulk([self._product("555")])
+        ShopeeItemVariantIndex.objects.all().delete()
+
+        stats = rebuild_index()
+        self.assertEqual(stats, {"products": 1, "links": 1})
+        self.assertEqual(get_variant_ids(134366, "555"), [11])
+
+
+class TestMaterializedFields(TestCase):
+    """Test các cột materialize (brand_id, sku, packsize, gdp_metadata) được ghi lúc sync"""
+
+    def test_materialized_columns_and_cache_reads(self):
+        service = ProductSyncService.__new__(ProductSyncService)
+        meta = '[GDP_META]{"variants": [{"id": 11, "sku_tq": "TQ-11"}]}[/GDP_META]'
+        service.save_products_bulk([{
+            "id": 1, "tenant_id": 1, "name": "A", "status": "active", "brand_id": 833608, "brand": "GDP",
+            "description": meta,
+            "variants": [
+                {"id": 11, "tenant_id": 1, "product_id": 1, "sku": "A-1", "name": "A - 1", "packsize": False},
+                {"id": 12, "tenant_id": 1, "product_id": 1, "sku": "A-2", "name": "A - 2", "packsize": True},
+            ],
+        }])
+
+        variant = SapoVariantCache.objects.get(variant_id=11)
+        self.assertEqual((variant.sku, variant.brand_id, variant.packsize), ("A-1", 833608, False))
+        self.assertEqual(variant.gdp_metadata["sku_tq"], "TQ-11")
+        self.assertEqual(SapoProductCache.objects.get(product_id=1).status, "active")
+
+        cache_service = ProductCacheService()
+        variants = cache_service.list_variants_raw(brand_id=833608, product_status="active", include_packsize=False)
+        self.assertEqual([v["id"] for v in variants], [11])
+
+        product = cache_service.get_product(1)
+        self.assertEqual(product.variants[0].gdp_metadata.sku_tq, "TQ-11")
+        self.assertEqual(cache_service.get_variant(11).gdp_metadata.sku_tq, "TQ-11")
@@ -0,0 +1,124 @@
+# products/tests/test_views_budget.py
+"""
+Tests performance budget của các view products - số query không tăng theo dữ liệu.
+"""
+
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from core.testing import PerfBudgetMixin
+from products.models import (
+    ContainerTemplate,
+    PurchaseOrder,
+    PurchaseOrderCost,
+    PurchaseOrderPayment,
+    SPOPurchaseOrder,
+    SumPurchaseOrder,
+)
+from products.services.product_sync_service import ProductSyncService
+
+BRAND_ID = 833608
+
+
+class ViewBudgetTestCase(PerfBudgetMixin, TestCase):
+    """Login admin + stub Sapo cho view và context processor"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "x")
+        self.client.force_login(self.user)
+        # Context processor product_counts gọi Sapo (SapoClient + Selenium login): tách khỏi budget của view
+        patcher = mock.patch("products.context_processors.get_sapo_client")
+        sapo_client = patcher.start()
+        sapo_client.return_value.core.list_products_raw.return_value = {"metadata": {"total": 0}, "products": []}
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch("products.views.get_sapo_client")
+        self.sapo_client = patcher.start()
+        self.sapo_client.return_value.core.list_brands_search_raw.return_value = {"brands": []}
+        self.addCleanup(patcher.stop)
+
+    def _get(self, url):
+        # SERVER_PORT 80 bị PortRedirectMiddleware redirect
+        response = self.client.get(url, SERVER_PORT="8000")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context["error"])
+        return response
+
+
+class TestVariantListBudget(ViewBudgetTestCase):
+    """Test số query của variant_list không tăng theo số variants"""
+
+    def _create_products(self, start, count):
+        ProductSyncService.__new__(ProductSyncService).save_products_bulk([
+            {
+                "id": product_id, "tenant_id": 1, "name": f"P{product_id}", "status": "active",
+                "brand_id": BRAND_ID,
+                "variants": [
+                    {
+                        "id": product_id * 10 + i, "tenant_id": 1, "product_id": product_id,
+                        "sku": f"SKU-{product_id}-{i}", "name": f"P{product_id} - {i}", "status": "active",
+                        "inventories": [{"variant_id": product_id * 10 + i, "location_id": 241737, "on_hand": 3, "available": 2}],
+                    }
+                    for i in range(2)
+                ],
+            }
+            for product_id in range(start, start + count)
+        ])
+
+    def test_queries_do_not_grow_with_variants(self):
+        url = reverse("products:variant_list")
+        self._create_products(1, 1)
+        self._get(url)  # Request đầu tạo session
+        with self.assertPerfBudget(max_queries=20, max_external_calls=0) as few:
+            response = self._get(url)
+        self.assertEqual(response.context["total"], 2)
+
+        self._create_products(2, 10)
+        with self.assertPerfBudget(max_queries=few.queries, max_external_calls=0):
+            response = self._get(url)
+        self.assertEqual(response.context["total"], 22)
+
+
+class TestSumPurchaseOrderDetailBudget(ViewBudgetTestCase):
+    """Test số query của sum_purchase_order_detail không tăng theo số PO"""
+
+    def setUp(self):
+        super().setUp()
+        template = ContainerTemplate.objects.create(code="CONT-01")
+        self.spo = SumPurchaseOrder.objects.create(code="SPO-2025-001", container_template=template)
+        patcher = mock.patch(
+            "products.services.spo_po_service.SPOPOService.get_po_from_sapo",
+            side_effect=lambda po_id: {"sapo_order_supplier_id": po_id, "line_items": [], "total_cpm": Decimal("1.5")},
+        )
+        self.get_po_from_sapo = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _create_po(self, i):
+        po = PurchaseOrder.objects.create(sapo_order_supplier_id=i, supplier_id=1)
+        PurchaseOrderCost.objects.create(purchase_order=po, cost_type="domestic_shipping_cn", amount_cny=Decimal("10"))
+        PurchaseOrderPayment.objects.create(purchase_order=po, amount_cny=Decimal("100"), exchange_rate=Decimal("3500"))
+        SPOPurchaseOrder.objects.create(sum_purchase_order=self.spo, purchase_order=po)
+
+    def test_queries_do_not_grow_with_purchase_orders(self):
+        url = reverse("products:sum_purchase_order_detail", args=[self.spo.id])
+        self._create_po(1)
+        self._get(url)  # Request đầu tạo session
+        with self.assertPerfBudget(max_queries=40, max_external_calls=0) as few:
+            response = self._get(url)
+        self.assertEqual(len(response.context["purchase_orders"]), 1)
+
+        for i in range(2, 12):
+            self._create_po(i)
+        self._get(url)  # Lần đầu sau khi thêm PO lưu lại total_cbm
+        self.get_po_from_sapo.reset_mock()
+        with self.assertPerfBudget(max_queries=few.queries, max_external_calls=0):
+            response = self._get(url)
+        self.assertEqual(len(response.context["purchase_orders"]), 11)
+        # Mỗi PO chỉ lấy từ Sapo 1 lần (tổng CBM tính từ dữ liệu đã lấy)
+        self.assertEqual(self.get_po_from_sapo.call_count, 11)
+        self.spo.refresh_from_db()
+        self.assertEqual(self.spo.total_cbm, Decimal("16.50"))
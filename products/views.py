@@ -21,6 +21,7 @@ except ImportError:
     xlsxwriter = None
 
 from core.sapo_client import get_sapo_client
+from core.services.job_queue import enqueue, job_accepted_payload
 from products.services.sapo_product_service import SapoProductService
 from products.services.dto import ProductDTO, ProductVariantDTO
 from products.services.metadata_helper import get_variant_metadata
@@ -268,7 +269,6 @@ def variant_list(request: HttpRequest):
         
         sapo_client = get_sapo_client()
         core_repo = sapo_client.core
-        product_service = SapoProductService(sapo_client)
         
         # Lấy danh sách brands từ API search (đầy đủ hơn)
         brands_response = core_repo.list_brands_search_raw(page=1, limit=220)
@@ -284,76 +284,35 @@ def variant_list(request: HttpRequest):
         ]
         context["brands"] = sorted(enabled_brands, key=lambda x: x.get("name", ""))
         
-        # Lấy products từ database cache (đã bao gồm variants và inventories)
-        logger.info(f"[variant_list] Starting to fetch products (with variants) from cache for brand_id={brand_id}")
+        # Lấy variants từ database cache (đã bao gồm inventories)
+        # Filter brand / product active / bỏ packsize = true (combo) bằng SQL trên cột materialize
+        logger.info(f"[variant_list] Starting to fetch variants from cache for brand_id={brand_id}")
         
-        # Lấy tất cả products từ cache
         from products.services.product_cache_service import ProductCacheService
         cache_service = ProductCacheService()
-        all_products_data = cache_service.list_products_raw(status="active")
-        
-        logger.info(f"[variant_list] Fetched {len(all_products_data)} products from cache")
-        
-        # Parse products và extract variants
-        # Tạo map product_id -> product để parse metadata
-        product_map = {}
-        all_variants_from_products = []
+        all_variants_from_products = cache_service.list_variants_raw(
+            brand_id=brand_id,
+            product_status="active",
+            include_packsize=False,
+        )
         
-        for product_data in all_products_data:
-            product_id = product_data.get("id")
-            if not product_id:
-                continue
-            
-            # Lấy brand_id từ product_data (có sẵn trong JSON)
-            brand_id_from_product = product_data.get("brand_id")
-            
-            # Parse product để có metadata
-            try:
-                product = product_service.get_product(product_id)
-                if product:
-                    product_map[product_id] = product
-            except Exception as e:
-                logger.warning(f"Failed to parse product {product_id}: {e}")
-                # Vẫn dùng product_data nếu parse lỗi
-                product = None
-            
-            # Extract variants từ product (đã có inventories sẵn)
-            # CHỈ lấy variants có packsize = false (1 pcs), loại bỏ packsize = true (combo)
-            variants = product_data.get("variants", [])
-            for variant_data in variants:
-                variant_id = variant_data.get("id")
-                if not variant_id:
-                    continue
-                
-                # Bỏ qua variant có packsize = true (combo)
-                packsize = variant_data.get("packsize", False)
-                if packsize is True:
-                    continue
-                
-                # Lưu variant với product_id và brand_id để filter sau
-                variant_data["_product_id"] = product_id
-                variant_data["_brand_id"] = brand_id_from_product
-                variant_data["_product"] = product  # Lưu product object nếu có
-                all_variants_from_products.append(variant_data)
+        # Chỉ lấy products có variant thuộc brand, 1 query (metadata đã materialize)
+        product_map = cache_service.get_products_many(
+            v.get("product_id") for v in all_variants_from_products
+        )
         
-        logger.info(f"[variant_list] Extracted {len(all_variants_from_products)} variants from {len(all_products_data)} products")
+        logger.info(f"[variant_list] Fetched {len(all_variants_from_products)} variants from {len(product_map)} products")
         
-        # Parse variants và lấy metadata, filter theo brand_id
+        # Parse variants và lấy metadata
         variants_data = []
         brands_set = set()
         statuses_set = set()
         
         for variant_data in all_variants_from_products:
             variant_id = variant_data.get("id")
-            product_id = variant_data.get("_product_id")
-            product = variant_data.get("_product")
-            
-            # Lấy brand_id từ variant_data (đã lưu từ product_data)
-            variant_brand_id = variant_data.get("_brand_id")
-            
-            # Filter theo brand_id (client-side)
-            if variant_brand_id != brand_id:
-                continue
+            product_id = variant_data.get("product_id")
+            product = product_map.get(product_id)
+            variant_brand_id = brand_id
             
             # Lấy brand name từ product hoặc all_brands
             brand = ""
@@ -577,7 +536,7 @@ def variant_detail(request: HttpRequest, variant_id: int):
 @require_POST
 def init_all_products_metadata(request: HttpRequest):
     """
-    Init metadata cho sản phẩm.
+    Init metadata cho sản phẩm (chạy nền: products.jobs.init_all_products_metadata).
     
     Endpoint: POST /products/init-all-metadata/
     
@@ -585,7 +544,8 @@ def init_all_products_metadata(request: HttpRequest):
     - test_mode: true/false - Nếu true: init tất cả sản phẩm (kể cả đã có metadata)
                    Nếu false: chỉ init sản phẩm chưa có metadata
     
-    Tự động init metadata cho products, thêm vào cuối description nếu có nội dung.
+    Returns:
+        202 JSON: {status: "queued", job_id, status_url} - kết quả ở /core/api/jobs/<job_id>/
     """
     try:
         # Lấy test_mode từ request body hoặc query params
@@ -600,94 +560,13 @@ def init_all_products_metadata(request: HttpRequest):
         else:
             test_mode = request.POST.get('test_mode', 'false').lower() == 'true'
         
-        sapo_client = get_sapo_client()
-        product_service = SapoProductService(sapo_client)
-        
-        # Lấy tất cả products (active)
-        all_products = []
-        page = 1
-        limit = 250
-        max_pages = 100  # Giới hạn để tránh quá tải
-        
-        while page <= max_pages:
-            products = product_service.list_products(page=page, limit=limit, status="active")
-            if not products:
-                break
-            all_products.extend(products)
-            if len(products) < limit:
-                break
-            page += 1
-        
-        # Xác định products cần init
-        products_to_init = []
-        products_already_have = []
-        products_skipped = []
-        
-        for product in all_products:
-            if test_mode:
-                # Test mode: init tất cả sản phẩm
-                products_to_init.append(product.id)
-            else:
-                # Normal mode: chỉ init sản phẩm chưa có metadata
-                if product.gdp_metadata:
-                    products_already_have.append(product.id)
-                else:
-                    products_to_init.append(product.id)
-        
-        # Init metadata cho các products
-        success_count = 0
-        error_count = 0
-        errors = []
-        
-        for product_id in products_to_init:
-            try:
-                # Nếu test_mode, force init bằng cách update trực tiếp
-                if test_mode:
-                    # Lấy product hiện tại
-                    product = product_service.get_product(product_id)
-                    if product:
-                        # Tạo metadata mới với structure đầy đủ
-                        from products.services.metadata_helper import init_empty_metadata
-                        variant_ids = [v.id for v in product.variants]
-                        metadata = init_empty_metadata(product_id, variant_ids)
-                        
-                        # Update metadata (preserve description nếu có)
-                        success = product_service.update_product_metadata(
-                            product_id, 
-                            metadata, 
-                            preserve_description=True
-                        )
-                        if success:
-                            success_count += 1
-                        else:
-                            error_count += 1
-                            errors.append(f"Product {product_id}: Failed to update")
-                    else:
-                        error_count += 1
-                        errors.append(f"Product {product_id}: Not found")
-                else:
-                    # Normal mode: dùng init_product_metadata (chỉ init nếu chưa có)
-                    success = product_service.init_product_metadata(product_id)
-                    if success:
-                        success_count += 1
-                    else:
-                        error_count += 1
-                        errors.append(f"Product {product_id}: Failed to init")
-            except Exception as e:
-                error_count += 1
-                errors.append(f"Product {product_id}: {str(e)}")
-                logger.error(f"Error init metadata for product {product_id}: {e}", exc_info=True)
-        
-        return JsonResponse({
-            "status": "success",
-            "test_mode": test_mode,
-            "total_products": len(all_products),
-            "products_to_init": len(products_to_init),
-            "products_already_have": len(products_already_have),
-            "success_count": success_count,
-            "error_count": error_count,
-            "errors": errors[:10] if len(errors) > 10 else errors,  # Chỉ trả về 10 lỗi đầu
-        })
+        job = enqueue(
+            "products.init_all_products_metadata",
+            {"test_mode": bool(test_mode)},
+            user=request.user,
+            unique=True,
+        )
+        return JsonResponse(job_accepted_payload(job), status=202)
         
     except Exception as e:
         logger.error(f"Error in init_all_products_metadata: {e}", exc_info=True)
@@ -2563,38 +2442,27 @@ def set_default_supplier(request: HttpRequest, template_id: int):
 @require_POST
 def resync_container_template_stats(request: HttpRequest, template_id: int):
     """
-    API endpoint để tính toán lại avg_total_amount và avg_import_cycle_days từ các SPO completed.
+    API endpoint để tính toán lại avg_total_amount và avg_import_cycle_days từ các SPO completed
+    (chạy nền: products.jobs.resync_container_template_stats).
     
     POST /products/container-templates/{template_id}/resync-stats/
     
     Returns:
-        JSON: {status, message, avg_total_amount, avg_import_cycle_days, spo_count}
+        202 JSON: {status: "queued", job_id, status_url}
+        Kết quả job: {status, message, avg_total_amount, avg_import_cycle_days, spo_count}
     """
     try:
-        from products.services.container_template_service import ContainerTemplateService
         from products.models import ContainerTemplate
         
         template = ContainerTemplate.objects.get(id=template_id)
         
-        sapo_client = get_sapo_client()
-        template_service = ContainerTemplateService(sapo_client)
-        
-        result = template_service.resync_template_stats(template_id)
-        
-        if result['status'] == 'success':
-            return JsonResponse({
-                "status": "success",
-                "message": result['message'],
-                "avg_total_amount": result['avg_total_amount'],
-                "avg_import_cycle_days": result['avg_import_cycle_days'],
-                "spo_count": result['spo_count']
-            })
-        else:
-            return JsonResponse({
-                "status": "warning",
-                "message": result['message'],
-                "spo_count": result['spo_count']
-            })
+        job = enqueue(
+            "products.resync_container_template_stats",
+            {"template_id": template.id},
+            user=request.user,
+            unique=True,
+        )
+        return JsonResponse(job_accepted_payload(job), status=202)
             
     except ContainerTemplate.DoesNotExist:
         return JsonResponse({
@@ -2834,7 +2702,6 @@ def sum_purchase_order_detail(request: HttpRequest, spo_id: int):
     }
     
     try:
-        from products.services.sum_purchase_order_service import SumPurchaseOrderService
         from products.services.spo_po_service import SPOPOService
         
         spo = SumPurchaseOrder.objects.select_related('container_template').prefetch_related(
@@ -2934,7 +2801,7 @@ def sum_purchase_order_detail(request: HttpRequest, spo_id: int):
         # Lấy danh sách PO từ SPOPurchaseOrder với đầy đủ thông tin từ PurchaseOrder model
         spo_po_relations = spo.spo_purchase_orders.select_related('purchase_order').prefetch_related(
             'purchase_order__costs',
-            'purchase_order__payments'
+            'purchase_order__payments__balance_transaction'
         ).all()
         
         # Lấy thông tin PO từ Sapo API và kết hợp với PurchaseOrder model
@@ -2946,6 +2813,8 @@ def sum_purchase_order_detail(request: HttpRequest, spo_id: int):
         total_quantity = 0
         total_amount = Decimal('0')
         total_packages = 0
+        pos_by_id = {}  # PO đã load (kèm prefetch) để tính tỷ giá, không query lại từng PO
+        total_cpm = Decimal('0')
         
         for spo_po_rel in spo_po_relations:
             if not spo_po_rel.purchase_order:
@@ -2957,6 +2826,7 @@ def sum_purchase_order_detail(request: HttpRequest, spo_id: int):
             try:
                 # Lấy thông tin từ Sapo API
                 po_data = spo_po_service.get_po_from_sapo(po_id)
+                total_cpm += po_data.get('total_cpm', Decimal('0'))
                 
                 # Cập nhật product_amount_cny từ Sapo API (tính từ price_tq trong metadata)
                 product_amount_cny_from_api = float(po_data.get('product_amount_cny', 0))
@@ -3056,9 +2926,11 @@ def sum_purchase_order_detail(request: HttpRequest, spo_id: int):
                         'payment_date': payment.payment_date,
                         'description': payment.description,
                     }
-                    for payment in po.payments.all().order_by('-payment_date')
+                    # Sắp xếp trên bản prefetch (order_by() sẽ query lại mỗi PO)
+                    for payment in sorted(po.payments.all(), key=lambda p: p.payment_date, reverse=True)
                 ]
                 
+                pos_by_id[po.id] = po
                 purchase_orders_data.append(po_data)
                 all_line_items.extend(po_data.get('line_items', []))
                 total_quantity += po_data.get('total_quantity', 0)
@@ -3087,13 +2959,7 @@ def sum_purchase_order_detail(request: HttpRequest, spo_id: int):
         # Tính tỷ giá trung bình từ các khoản thanh toán PO (tham chiếu PaymentPeriod)
         # Mục tiêu: Lấy được một tỷ giá TB, sau đó giá trị hàng VNĐ = tổng CNY * tỷ giá TB
         all_exchange_rates = []
-        for po_data in purchase_orders_data:
-            po_id = po_data.get('po_id')
-            if not po_id:
-                continue
-            
-            po = PurchaseOrder.objects.get(id=po_id)
-            
+        for po in pos_by_id.values():
             # Nguồn 1: PurchaseOrderPayment
             for payment in po.payments.all():
                 exchange_rate = None
@@ -3108,24 +2974,24 @@ def sum_purchase_order_detail(request: HttpRequest, spo_id: int):
                             exchange_rate = float(period_rate)
                 if exchange_rate:
                     all_exchange_rates.append(exchange_rate)
-            
-            # Nguồn 2: BalanceTransaction (withdraw_po) liên kết với PO này
-            withdraw_txns = BalanceTransaction.objects.filter(
-                transaction_type='withdraw_po',
-                purchase_order_payment__purchase_order=po
-            ).prefetch_related('payment_periods__payment_period')
-            
-            for txn in withdraw_txns:
-                exchange_rate = None
-                period_txn = txn.payment_periods.first()
-                if period_txn and period_txn.payment_period:
-                    period_rate = period_txn.payment_period.avg_exchange_rate_realtime
-                    if period_rate:
-                        exchange_rate = float(period_rate)
-                if not exchange_rate and txn.exchange_rate:
-                    exchange_rate = float(txn.exchange_rate)
-                if exchange_rate:
-                    all_exchange_rates.append(exchange_rate)
+        
+        # Nguồn 2: BalanceTransaction (withdraw_po) liên kết với các PO - 1 query cho cả SPO
+        withdraw_txns = BalanceTransaction.objects.filter(
+            transaction_type='withdraw_po',
+            purchase_order_payment__purchase_order__in=list(pos_by_id)
+        ).prefetch_related('payment_periods__payment_period') if pos_by_id else []
+        
+        for txn in withdraw_txns:
+            exchange_rate = None
+            period_txn = txn.payment_periods.first()
+            if period_txn and period_txn.payment_period:
+                period_rate = period_txn.payment_period.avg_exchange_rate_realtime
+                if period_rate:
+                    exchange_rate = float(period_rate)
+            if not exchange_rate and txn.exchange_rate:
+                exchange_rate = float(txn.exchange_rate)
+            if exchange_rate:
+                all_exchange_rates.append(exchange_rate)
         
         # Tỷ giá trung bình để hiển thị & dùng cho quy đổi tổng CNY
         avg_exchange_rate = None
@@ -3158,10 +3024,11 @@ def sum_purchase_order_detail(request: HttpRequest, spo_id: int):
         context["avg_exchange_rate"] = avg_exchange_rate
         context["total_amount_vnd"] = total_amount_vnd
         
-        # Tính lại total_cbm của SPO
-        spo_service = SumPurchaseOrderService(sapo_client)
-        spo_service._recalculate_spo_cbm(spo)
-        spo.refresh_from_db()
+        # Tính lại total_cbm của SPO từ dữ liệu PO vừa lấy (không gọi lại Sapo cho từng PO)
+        total_cpm = Decimal(str(total_cpm)).quantize(Decimal('0.01'))
+        if spo.total_cbm != total_cpm:
+            spo.total_cbm = total_cpm
+            spo.save(update_fields=['total_cbm', 'updated_at'])
         
         # Lấy ngày dự kiến từ warehouse stage trong timeline
         warehouse_planned_date = None
@@ -6101,52 +5968,21 @@ def remove_po_from_spo(request: HttpRequest, spo_id: int, po_id: int):
 @require_POST
 def refresh_sales_forecast(request: HttpRequest):
     """
-    API endpoint để refresh dữ liệu dự báo bán hàng.
-    Tự động tính cả 30 ngày và 10 ngày.
+    API endpoint để refresh dữ liệu dự báo bán hàng (chạy nền: products.jobs.refresh_sales_forecast).
+    Tự động tính cả 30 ngày và 10 ngày. Bấm nhiều lần khi job chưa xong sẽ nhận lại cùng job.
     
     Returns:
-        JSON với status và message
+        202 JSON: {status: "queued", job_id, status_url}
+        Kết quả job: {status, message, count_30, count_10}
     """
     try:
-        from products.services.sales_forecast_service import SalesForecastService
-        
-        sapo_client = get_sapo_client()
-        forecast_service = SalesForecastService(sapo_client)
-        
-        # Tính toán lại với force_refresh=True cho cả 30 và 10 ngày
-        logger.info(f"[refresh_sales_forecast] Refreshing forecast for 30 days and 10 days")
-        
-        # Tính 30 ngày
-        forecast_map_30, all_products_30, all_variants_map_30 = forecast_service.calculate_sales_forecast(
-            days=30,
-            force_refresh=True
-        )
-        
-        # Tính 10 ngày
-        forecast_map_10, all_products_10, all_variants_map_10 = forecast_service.calculate_sales_forecast(
-            days=10,
-            force_refresh=True
-        )
-        
-        return JsonResponse({
-            "status": "success",
-            "message": f"Đã tính toán lại dự báo cho {len(forecast_map_30)} variants (30 ngày) và {len(forecast_map_10)} variants (10 ngày)",
-            "count_30": len(forecast_map_30),
-            "count_10": len(forecast_map_10)
-        })
-        
+        job = enqueue("products.refresh_sales_forecast", user=request.user, unique=True)
+        return JsonResponse(job_accepted_payload(job), status=202)
     except Exception as e:
-        error_msg = str(e)
-        # Xử lý lỗi Bad Gateway hoặc JSON parsing
-        if "Bad Gateway" in error_msg or "502" in error_msg:
-            error_msg = "Lỗi kết nối tới Sapo (Bad Gateway). Vui lòng thử lại sau vài giây."
-        elif "JSON" in error_msg or "json" in error_msg.lower() or "Unexpected token" in error_msg:
-            error_msg = "Lỗi xử lý dữ liệu từ Sapo. Vui lòng thử lại."
-        
         logger.error(f"Error in refresh_sales_forecast: {e}", exc_info=True)
         return JsonResponse({
             "status": "error",
-            "message": error_msg
+            "message": str(e)
         }, status=500)
 
 
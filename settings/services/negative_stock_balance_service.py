@@ -56,33 +56,28 @@ class NegativeStockBalanceService:
         logger.info("[NegativeStockBalance] Bắt đầu lấy tất cả products và variants...")
         
         all_variants = []
-        page = 1
+        skipped_combo = 0
         limit = 250
         
-        while True:
-            try:
-                debug_print(f"\n📄 Đang lấy products (trang {page}, limit {limit})...")
-                
-                # Lấy products từ Sapo
-                response = self.core_repo.get("products.json", params={
+        # Fetch pages song song (paginator), xử lý tuần tự ở thread hiện tại
+        page_meta: Dict[str, Any] = {}
+        try:
+            for page, products in self.core_repo.paginate(
+                lambda page: self.core_repo.get("products.json", params={
                     "page": page,
                     "limit": limit,
                     "status": "active"  # Chỉ lấy sản phẩm active
-                })
-                
-                products = response.get("products", [])
-                debug_print(f"   ✓ API response: {len(products)} products")
-                
-                if not products:
-                    debug_print(f"   ⚠️  Không có products nào ở trang {page}, dừng pagination")
-                    break
-                
+                }),
+                items_key="products",
+                limit=limit,
+                stats=page_meta,
+                log_tag="NegativeStockBalance",
+            ):
                 logger.info(f"[NegativeStockBalance] Đã lấy {len(products)} products (trang {page})")
                 debug_print(f"   → Đã lấy {len(products)} products (trang {page})")
                 
                 # Xử lý từng product
                 variants_count = 0
-                skipped_combo = 0
                 for product in products:
                     variants = product.get("variants", [])
                     product_product_type = product.get("product_type", "normal")  # Kiểm tra product_type ở level product
@@ -122,24 +117,11 @@ class NegativeStockBalanceService:
                 
                 debug_print(f"   → Tổng variants đã lấy: {variants_count} (từ trang {page})")
                 debug_print(f"   → Tổng variants tích lũy: {len(all_variants)}")
-                
-                # Kiểm tra xem còn trang tiếp theo không
-                metadata = response.get("metadata", {})
-                total_pages = metadata.get("total_pages", 0)
-                debug_print(f"   → Metadata: total_pages = {total_pages}, current_page = {page}")
-                
-                if page >= total_pages:
-                    debug_print(f"   ✓ Đã đến trang cuối ({page}/{total_pages}), dừng pagination")
-                    break
-                
-                page += 1
-                
-            except Exception as e:
-                debug_print(f"   ❌ LỖI khi lấy products (trang {page}): {e}")
-                logger.error(f"[NegativeStockBalance] Lỗi khi lấy products (trang {page}): {e}", exc_info=True)
-                break
+        except Exception as e:
+            debug_print(f"   ❌ LỖI khi lấy products: {e}")
+            logger.error(f"[NegativeStockBalance] Lỗi khi lấy products: {e}", exc_info=True)
         
-        debug_print(f"\n✅ Hoàn tất: Tổng cộng lấy được {len(all_variants)} variants từ {page-1} trang")
+        debug_print(f"\n✅ Hoàn tất: Tổng cộng lấy được {len(all_variants)} variants từ {page_meta.get('pages', 0)} trang")
         if skipped_combo > 0:
             debug_print(f"   ⏭️  Đã bỏ qua {skipped_combo} variants combo/packed")
         logger.info(f"[NegativeStockBalance] Tổng cộng lấy được {len(all_variants)} variants (đã bỏ qua {skipped_combo} combo/packed)")
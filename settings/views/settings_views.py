@@ -9,7 +9,7 @@ from datetime import datetime
 
 from kho.utils import admin_only
 from ..services.config_service import SapoConfigService, ShopeeConfigService
-from core.sapo_client import SapoClient
+from core.sapo_client import get_sapo_client
 from products.services.shopee_init_service import ShopeeInitService
 from products.services.product_sync_service import ProductSyncService
 from core.services.notify import notify
@@ -155,7 +155,7 @@ def init_shopee_products_api(request):
         connection_ids = data.get("connection_ids")
         
         # Initialize Sapo client
-        sapo_client = SapoClient()
+        sapo_client = get_sapo_client()
         
         # Initialize service
         init_service = ShopeeInitService(sapo_client)